@@ -0,0 +1,636 @@
+"""
+Asyncio Playwright engine with a pool of warm browser contexts (scrape_method: playwright_async).
+
+WebContentExtractor renders one page at a time: every browser fetch creates a context and a
+page, navigates, extracts and closes them, on the sync Playwright API. This extractor keeps
+its static-first fetch logic (it is a subclass) but runs the browser side on an asyncio event
+loop in a background thread, with up to `vectara.render_concurrency` pages rendering at once
+in a single browser:
+
+- each context holds one page and is kept warm after a successful render, to be reused for a
+  later URL of the same origin (cookies, cache and the route handler survive);
+- a context whose render failed is closed instead of reused, and a context is recycled after
+  `browser_use_limit` navigations to bound renderer memory;
+- with a shared browser pool (core/browser_pool.py), the browser is a pooled Chromium server
+  attached over CDP, with render_concurrency pages assigned to it;
+- once the browser's processes outgrow `browser_memory_mb`, a new browser takes the new pages
+  and the old one is closed when its in-flight pages finish (see core/browser_memory.py);
+- prefetch() starts fetching the upcoming URLs of a batch on a thread pool, so while the
+  indexer parses and uploads one page the next ones are already rendering (see
+  Indexer.prefetching and PageCrawlWorker.process_batch).
+
+Callers keep the synchronous extractor interface.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import os
+import tempfile
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from omegaconf import OmegaConf
+from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeoutError
+
+from core.browser_memory import DISCONNECTED, FORCED, MEMORY
+from core.host_rate_limiter import paced
+from core.page_settle import FIXED, settle_page_async
+from core.stage_stats import RENDER, SETTLE, record_elapsed, stage
+from core.utils import get_headers
+from core.web_extractor_base import DEFAULT_RENDER_CONCURRENCY
+from core.web_content_extractor import (
+    BLOCKED_DOMAINS, BLOCKED_RESOURCE_TYPES, CHROMIUM_ARGS, CONTENT_INDICATORS_JS, IMAGES_JS, LINKS_JS,
+    TABLES_JS, WebContentExtractor, _FileDownload, removal_js, text_content_js
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _origin(url: str) -> str:
+    parsed = urlparse(url)
+    return f"{parsed.scheme}://{parsed.netloc}"
+
+
+async def _close_quietly(obj) -> None:
+    try:
+        await obj.close()
+    except Exception:
+        pass
+
+
+def _discard(result: Optional[Dict]) -> None:
+    """Delete the temp file behind a fetch_url download result that will not be used."""
+    if result and result.get("type") == "download":
+        path = getattr(result.get("download"), "path", None)
+        if path and os.path.exists(path):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+
+class _Slot:
+    """A browser context with its page."""
+    __slots__ = ("browser", "context", "page", "uses")
+
+    def __init__(self, browser, context, page):
+        self.browser = browser
+        self.context = context
+        self.page = page
+        self.uses = 0
+
+
+class _ContextPool:
+    """
+    At most `size` slots alive at once, in use or idle. Idle slots are kept per origin; when a
+    new one is needed and the pool is full, the least recently used idle slot is closed.
+    Used only from the event loop thread.
+    """
+
+    def __init__(self, size: int):
+        self.size = size
+        self._slots = asyncio.Semaphore(size)
+        self._idle: "OrderedDict[str, List[_Slot]]" = OrderedDict()
+        self._idle_count = 0
+        self._in_use = 0
+
+    async def acquire(self, origin: str, new_slot: Callable) -> _Slot:
+        await self._slots.acquire()
+        try:
+            idle = self._idle.get(origin)
+            if idle:
+                slot = idle.pop()
+                if not idle:
+                    del self._idle[origin]
+                self._idle_count -= 1
+            else:
+                if self._idle_count + self._in_use >= self.size:
+                    await self._evict_one()
+                slot = await new_slot()
+        except BaseException:
+            self._slots.release()
+            raise
+        self._in_use += 1
+        return slot
+
+    async def release(self, origin: str, slot: _Slot, reuse: bool) -> None:
+        self._in_use -= 1
+        try:
+            if reuse:
+                self._idle.setdefault(origin, []).append(slot)
+                self._idle.move_to_end(origin)
+                self._idle_count += 1
+            else:
+                await _close_quietly(slot.context)
+        finally:
+            self._slots.release()
+
+    async def _evict_one(self) -> None:
+        origin, idle = next(iter(self._idle.items()))
+        slot = idle.pop(0)
+        if not idle:
+            del self._idle[origin]
+        self._idle_count -= 1
+        await _close_quietly(slot.context)
+
+    async def close(self) -> None:
+        idle, self._idle, self._idle_count = self._idle, OrderedDict(), 0
+        for slots in idle.values():
+            for slot in slots:
+                await _close_quietly(slot.context)
+
+
+class AsyncWebContentExtractor(WebContentExtractor):
+    """Renders up to render_concurrency pages concurrently in one browser, from warm contexts."""
+
+    def __init__(self, cfg: OmegaConf, timeout: int = 90, post_load_timeout: int = 5, browser=None,
+                 concurrency: Optional[int] = None, browser_pool=None):
+        self.concurrency = max(1, int(concurrency or cfg.vectara.get("render_concurrency", DEFAULT_RENDER_CONCURRENCY)))
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[threading.Thread] = None
+        self._loop_lock = threading.Lock()
+        self._pool: Optional[_ContextPool] = None
+        self._relaunch_lock: Optional[asyncio.Lock] = None
+        self._storage_state: Optional[str] = None
+        self._cookies: List[Dict[str, Any]] = []
+        # url -> (fetch options, Future of the fetch_url result)
+        self._prefetched: Dict[str, Tuple[tuple, concurrent.futures.Future]] = {}
+        self._prefetch_lock = threading.Lock()
+        self._prefetch_pool: Optional[concurrent.futures.ThreadPoolExecutor] = None
+        super().__init__(cfg, timeout, post_load_timeout, browser=browser, browser_pool=browser_pool)
+
+    # ------------------------------------------------------------------
+    # Event loop and browser
+    # ------------------------------------------------------------------
+
+    def _event_loop(self) -> asyncio.AbstractEventLoop:
+        with self._loop_lock:
+            if self._loop is None:
+                self._loop = asyncio.new_event_loop()
+                self._loop_thread = threading.Thread(target=self._loop.run_forever,
+                                                     name="playwright-async", daemon=True)
+                self._loop_thread.start()
+            return self._loop
+
+    def _run(self, coro, timeout: Optional[float] = None):
+        """Run a coroutine on the extractor's event loop and wait for its result."""
+        future = asyncio.run_coroutine_threadsafe(coro, self._event_loop())
+        try:
+            return future.result(timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise
+
+    def _setup_browser(self):
+        """Start Playwright and launch the browser on the event loop"""
+        self._run(self._launch())
+
+    def _browser_lock(self) -> asyncio.Lock:
+        """Serializes every launch and swap of self.browser (used only on the event loop)."""
+        if self._relaunch_lock is None:
+            self._relaunch_lock = asyncio.Lock()
+        return self._relaunch_lock
+
+    async def _start_browser(self):
+        """Launch (or attach to a shared) browser; returns (browser, browser_pool lease or None)."""
+        if self.p is None:
+            self.p = await async_playwright().start()
+        if self.browser_pool is None:
+            before = self.recycler.launching()
+            browser = await self.p.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+            self.recycler.launched(before)
+            return browser, None
+        endpoint = await asyncio.get_running_loop().run_in_executor(
+            None, self.browser_pool.acquire, self.concurrency)
+        try:
+            return await self.p.chromium.connect_over_cdp(endpoint), (endpoint, self.concurrency)
+        except BaseException:
+            self.browser_pool.release(endpoint, self.concurrency)
+            raise
+
+    async def _launch(self, close_old: bool = True) -> None:
+        """
+        Start a browser and make it self.browser once it is ready, so renders never see None
+        or a half-started browser. The old browser is closed unless close_old is False (its
+        in-flight pages close it). Callers other than _setup_browser hold _browser_lock().
+        """
+        try:
+            browser, lease = await self._start_browser()
+        except Exception as e:
+            logger.error(f"Failed to setup async browser: {e}")
+            if close_old:
+                # The old browser is gone either way; the next render tries again
+                if self.browser is not None:
+                    await _close_quietly(self.browser)
+                self._release_browser_lease()
+                self.browser = None
+            raise
+        old = self.browser
+        self._release_browser_lease()
+        self.browser, self._browser_lease = browser, lease
+        self.browser_use_count = 0
+        self.consecutive_failures = 0
+        if old is not None and close_old:
+            await _close_quietly(old)
+        logger.debug(f"Async browser launched ({self.concurrency} pages in flight)")
+
+    async def _ensure_browser(self) -> None:
+        """Launch the browser if there is none (once, however many renders need it)."""
+        async with self._browser_lock():
+            if self.browser is None:
+                await self._launch()
+
+    async def _relaunch(self, browser, url: Optional[str] = None) -> None:
+        """Replace a crashed or disconnected browser (once, however many renders notice it)."""
+        async with self._browser_lock():
+            if self.browser is not browser:
+                return   # another render already replaced it
+            if self._pool is not None:
+                await self._pool.close()
+            reason = DISCONNECTED if not browser.is_connected() else FORCED
+            self.recycler.recycled(reason, self.browser_use_count, url=url)
+            await self._launch()
+            logger.info("Async browser relaunched after a crash")
+
+    async def _rotate(self, browser, url: str) -> None:
+        """
+        Start a new browser for new pages once this one is over its memory budget (the use
+        limit applies per context here). Pages still rendering in the old browser finish
+        there; it is closed by the last of them.
+        """
+        async with self._browser_lock():
+            if self.browser is not browser:
+                return
+            reason, rss = self.recycler.check(self.browser_use_count)
+            if reason != MEMORY:
+                return
+            self.recycler.recycled(reason, self.browser_use_count, rss, url)
+            # The old browser stays self.browser, serving new pages, until the new one is
+            # ready; then it is kept open for its in-flight pages
+            await self._launch(close_old=False)
+            if self._pool is not None:
+                await self._pool.close()   # idle contexts belong to the old browser
+
+    def use_auth(self, storage_state: Optional[str] = None, cookies: Optional[List[Dict[str, Any]]] = None) -> None:
+        """Load a Playwright storage_state file and/or add cookies to every new context."""
+        self._storage_state = storage_state
+        self._cookies = list(cookies or [])
+        if self._pool is not None:
+            self._run(self._pool.close())   # idle contexts were made without them
+
+    async def _new_slot(self) -> _Slot:
+        if self.browser is None:   # a relaunch failed while this render waited for a slot
+            await self._ensure_browser()
+        browser = self.browser
+        kwargs = {'viewport': {'width': 1920, 'height': 1080}, 'ignore_https_errors': True,
+                  'java_script_enabled': True, 'accept_downloads': True}
+        if self._storage_state:
+            kwargs['storage_state'] = self._storage_state
+        context = await browser.new_context(**kwargs)
+        try:
+            for cookie in self._cookies:
+                try:
+                    await context.add_cookies([cookie])
+                except Exception as e:
+                    logger.warning(f"Failed to add cookie {cookie.get('name')} to Playwright context: {e}")
+            await context.route("**/*", _route_handler)
+            page = await context.new_page()
+            await page.set_extra_http_headers(get_headers(self.cfg))
+        except BaseException:
+            await _close_quietly(context)
+            raise
+        return _Slot(browser, context, page)
+
+    # ------------------------------------------------------------------
+    # Rendering
+    # ------------------------------------------------------------------
+
+    def _render(
+        self,
+        url: str,
+        extract_tables: bool = False,
+        extract_images: bool = False,
+        remove_code: bool = False,
+        html_processing: Optional[dict] = None,
+        debug: bool = False,
+        classify: bool = False
+    ):
+        with stage(RENDER) as span:
+            # The navigation is capped in _render_async; this only guards against a hung loop
+            deadline = min(self.timeout, 90) + self.post_load_timeout + 60
+            timings = {}
+            try:
+                result, other = self._run(self._render_async(url, extract_tables, extract_images, remove_code,
+                                                             html_processing or {}, debug, classify, timings),
+                                          deadline)
+            except concurrent.futures.TimeoutError:
+                logger.warning(f"Rendering {url} did not finish within {deadline}s")
+                self.consecutive_failures += 1
+                result, other = {'text': '', 'html': '', 'title': '', 'url': url, 'links': [],
+                                 'images': [], 'tables': []}, None
+            if other is None:
+                span.add(bytes_in=len(result['html'] or ''))
+            elif other["type"] == "download":
+                span.add(bytes_in=other["download"].size)
+            else:
+                span.add(bytes_in=len(other["content"]))
+            if SETTLE in timings:
+                # Timed on the event loop thread, where this document's stage scope is not open
+                record_elapsed(SETTLE, timings[SETTLE])
+        if other is None and not result['html']:
+            logger.warning(f"Both static and browser fetch failed for {url}")
+        if other is None:
+            logger.info(f"For crawled page {url}: images = {len(result['images'])}, "
+                        f"tables = {len(result['tables'])}, links = {len(result['links'])}")
+        return result, other
+
+    async def _render_async(self, url, extract_tables, extract_images, remove_code, html_processing,
+                            debug, classify, timings: Optional[Dict[str, float]] = None):
+        result = {
+            'text': '',
+            'html': '',
+            'title': '',
+            'url': url,
+            'links': [],
+            'images': [],
+            'tables': []
+        }
+        other = None
+        if self.browser is None:
+            await self._ensure_browser()
+        if self._pool is None:
+            self._pool = _ContextPool(self.concurrency)
+        # Cap at 90s: a Chromium crash can leave goto() hanging until the TCP keepalive timeout
+        nav_timeout = min(self.timeout * 1000, 90000)
+        origin = _origin(url)
+        slot = await self._pool.acquire(origin, self._new_slot)
+        page = slot.page
+        downloads = []
+        healthy = False
+
+        def on_download(download):
+            downloads.append(download)
+
+        if classify:
+            page.on('download', on_download)
+        if debug:
+            on_console = lambda msg: logger.info(f"playwright debug: {msg.text}")  # noqa: E731
+            page.on('console', on_console)
+        try:
+            logger.debug(f"Starting browser navigation to {url} (timeout={nav_timeout}ms)")
+            try:
+                response = await page.goto(url, timeout=nav_timeout, wait_until="domcontentloaded")
+            except Exception:
+                # A navigation that turns into a download aborts goto ("Download is starting")
+                if not downloads:
+                    raise
+                response = None
+            slot.uses += 1
+            if downloads:
+                other = {"type": "download", "url": downloads[0].url,
+                         "filename": downloads[0].suggested_filename,
+                         "download": await _save_download(downloads[0])}
+            elif classify and response is not None and \
+                    'application/pdf' in (response.headers.get('content-type') or '').lower():
+                other = {"type": "pdf", "url": response.url, "content": await response.body(),
+                         "headers": dict(response.headers)}
+            else:
+                seconds = await self._settle_async(page, url)
+                if timings is not None:
+                    timings[SETTLE] = seconds
+
+                result['title'] = await page.title()
+                result['url'] = page.url
+
+                # Remove specified elements BEFORE capturing HTML snapshot
+                removal_script = removal_js(html_processing)
+                if removal_script is not None:
+                    logger.debug("html_processing removal results: %s", await page.evaluate(removal_script))
+                result['html'] = await page.content()
+
+                result['text'] = await page.evaluate(text_content_js(remove_code))
+                result['links'] = await page.evaluate(LINKS_JS)
+                if extract_tables:
+                    result['tables'] = await page.evaluate(TABLES_JS)
+                if extract_images:
+                    result['images'] = await page.evaluate(IMAGES_JS)
+            healthy = True
+        except PlaywrightTimeoutError:
+            logger.info(f"Page loading timed out for {url} after {nav_timeout}ms")
+            self.consecutive_failures += 1
+        except Exception as e:
+            logger.info(f"Page loading failed for {url} with exception '{e}'")
+            self.consecutive_failures += 1
+            if "crashed" in str(e).lower() or not slot.browser.is_connected():
+                await self._relaunch(slot.browser, url)
+        else:
+            self.consecutive_failures = 0
+            if slot.browser is self.browser:
+                self.browser_use_count += 1
+                try:
+                    await self._rotate(slot.browser, url)
+                except Exception as e:
+                    logger.warning(f"Could not replace the browser after {url}: {e}")
+        finally:
+            if classify:
+                page.remove_listener('download', on_download)
+            if debug:
+                page.remove_listener('console', on_console)
+            reuse = healthy and slot.browser is self.browser and slot.uses < self.browser_use_limit
+            await self._pool.release(origin, slot, reuse)
+            if slot.browser is not self.browser and not slot.browser.contexts:
+                await _close_quietly(slot.browser)   # a replaced browser's last page is done
+        return result, other
+
+    async def _settle_async(self, page, url: str) -> float:
+        """_settle on the async API; returns the seconds waited."""
+        start = time.monotonic()
+        if self.page_settle == FIXED:
+            await page.wait_for_timeout(self.post_load_timeout * 1000)
+            await self._scroll_to_bottom_async(page)
+            outcome = FIXED
+        else:
+            _, outcome = await settle_page_async(page, self.post_load_timeout, self.settle_quiet_ms)
+        seconds = time.monotonic() - start
+        logger.debug(f"{url} settled in {seconds:.2f}s ({outcome})")
+        return seconds
+
+    async def _scroll_to_bottom_async(self, page, max_scroll_time=20):
+        """_scroll_to_bottom on the async API: scroll until the page stops growing."""
+        start_time = time.time()
+        stable_count = 0
+        prev_height = None
+        prev_content_indicators = None
+        current_wait = 500
+
+        while time.time() - start_time < max_scroll_time:
+            current_height = await page.evaluate("document.body.scrollHeight")
+            content_indicators = await page.evaluate(CONTENT_INDICATORS_JS)
+            if prev_height == current_height and prev_content_indicators == content_indicators:
+                stable_count += 1
+                if stable_count >= 2:
+                    break
+            else:
+                stable_count = 0
+                if current_wait < 2000:
+                    current_wait = min(current_wait * 1.5, 2000)
+            prev_height = current_height
+            prev_content_indicators = content_indicators
+
+            await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+            try:
+                await page.wait_for_load_state("networkidle", timeout=current_wait)
+            except Exception:
+                await page.wait_for_timeout(current_wait)
+
+        if time.time() - start_time >= max_scroll_time:
+            logger.info(f"Scroll timeout reached ({max_scroll_time}s), stopping scroll")
+
+    # ------------------------------------------------------------------
+    # Prefetching
+    # ------------------------------------------------------------------
+
+    def prefetch(
+        self,
+        urls: List[str],
+        extract_tables: bool = False,
+        extract_images: bool = False,
+        remove_code: bool = False,
+        html_processing: Optional[dict] = None,
+        rate_limiter=None
+    ) -> None:
+        """
+        Start fetch_url for each URL in the background, at most render_concurrency at a time.
+        A later fetch_url of one of these URLs with the same options returns its result.
+        rate_limiter (a core.utils.RateLimiter or core.host_rate_limiter.HostRateLimiter)
+        paces the start of each fetch.
+        """
+        options = (extract_tables, extract_images, remove_code, html_processing or {})
+        with self._prefetch_lock:
+            if self._prefetch_pool is None:
+                self._prefetch_pool = concurrent.futures.ThreadPoolExecutor(
+                    self.concurrency, thread_name_prefix="prefetch")
+            for url in urls:
+                if url in self._prefetched:
+                    continue
+                self._prefetched[url] = (options, self._prefetch_pool.submit(
+                    self._prefetch_one, url, options, rate_limiter))
+
+    def _prefetch_one(self, url: str, options: tuple, rate_limiter) -> Dict:
+        if rate_limiter is not None:
+            with paced(rate_limiter, url):
+                pass
+        return super().fetch_url(url, *options)
+
+    def fetch_url(
+        self,
+        url: str,
+        extract_tables: bool = False,
+        extract_images: bool = False,
+        remove_code: bool = False,
+        html_processing: Optional[dict] = None,
+        debug: bool = False,
+        validators: Optional[dict] = None
+    ) -> Dict:
+        # A prefetched page was requested before its validators were known, so it is never conditional
+        with self._prefetch_lock:
+            entry = self._prefetched.pop(url, None)
+        if entry is not None:
+            options, future = entry
+            if options == (extract_tables, extract_images, remove_code, html_processing or {}):
+                return future.result()
+            future.add_done_callback(_discard_future)
+        return super().fetch_url(url, extract_tables, extract_images, remove_code, html_processing, debug,
+                                 validators=validators)
+
+    def discard_prefetched(self) -> None:
+        """Drop prefetched results nobody asked for (cancelling those not started yet)."""
+        with self._prefetch_lock:
+            entries, self._prefetched = self._prefetched, {}
+        for _, future in entries.values():
+            if not future.cancel():
+                future.add_done_callback(_discard_future)
+
+    # ------------------------------------------------------------------
+    # Rest of the extractor interface
+    # ------------------------------------------------------------------
+
+    def check_download_or_pdf(self, url: str, headers: dict = None, timeout: int = 5000):
+        """Check if URL triggers download or serves PDF content directly (via fetch_url)"""
+        result = self.fetch_url(url)
+        if result["type"] == "html":
+            return {"type": "html", "url": result["url"], "response": None}
+        return result
+
+    def url_triggers_download(self, url: str) -> bool:
+        """Check if URL triggers a download"""
+        result = self.check_download_or_pdf(url)
+        _discard(result)
+        return result["type"] == "download"
+
+    def cleanup(self):
+        """Stop prefetching, close the contexts, the browser and the event loop"""
+        self.discard_prefetched()
+        if self._prefetch_pool is not None:
+            self._prefetch_pool.shutdown(wait=True)
+            self._prefetch_pool = None
+        if self._loop is None:
+            return
+        try:
+            self._run(self._shutdown(), timeout=30)
+        except Exception as e:
+            logger.debug(f"Error closing async browser: {e}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._loop_thread.join(timeout=10)
+        self._loop = self._loop_thread = None
+        self.browser_use_count = 0
+        self.consecutive_failures = 0
+        self.recycler.log_summary()
+        logger.info("Async browser resources cleaned up successfully")
+
+    async def _shutdown(self) -> None:
+        if self._pool is not None:
+            await self._pool.close()
+            self._pool = None
+        if self.browser is not None:
+            await _close_quietly(self.browser)
+            self.browser = None
+        self._release_browser_lease()
+        if self.p is not None:
+            try:
+                await self.p.stop()
+            except Exception:
+                pass
+            self.p = None
+
+
+async def _route_handler(route) -> None:
+    """Block images, fonts, media and known trackers; let everything else through."""
+    try:
+        if route.request.resource_type in BLOCKED_RESOURCE_TYPES or \
+                any(domain in route.request.url for domain in BLOCKED_DOMAINS):
+            await route.abort()
+        else:
+            await route.continue_()
+    except Exception:
+        try:
+            await route.continue_()
+        except Exception:
+            pass
+
+
+async def _save_download(download) -> _FileDownload:
+    # Downloads are deleted with their context, which the pool keeps or closes later
+    fd, path = tempfile.mkstemp(prefix="vectara_download_")
+    os.close(fd)
+    await download.save_as(path)
+    return _FileDownload(download.url, download.suggested_filename, path)
+
+
+def _discard_future(future: concurrent.futures.Future) -> None:
+    if not future.cancelled() and future.exception() is None:
+        _discard(future.result())
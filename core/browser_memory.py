@@ -0,0 +1,140 @@
+"""
+When to recycle the crawler's Chromium (vectara.browser_memory_mb, vectara.browser_use_limit).
+
+A long-lived Chromium grows with every page it renders, so the web extractors restart it
+from time to time. Restarting after a fixed number of pages both restarts browsers that are
+still small (1-2 s of startup each time) and misses those that bloat faster.
+
+After every rendered page, BrowserRecycler measures the resident memory (RSS) of the
+browser's process tree (the Chromium processes that appeared when it was launched, with their
+renderers) and recycles the browser once it exceeds `browser_memory_mb`. `browser_use_limit` pages per browser remain a safety cap for when the
+processes cannot be measured. Every recycle is logged with its reason, the pages the browser
+served and its memory; a summary per reason and per site is logged when the extractor is
+cleaned up.
+"""
+
+import logging
+import os
+from collections import Counter
+from typing import Iterable, Optional, Set, Tuple
+from urllib.parse import urlparse
+
+import psutil
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MEMORY_MB = 1024
+DEFAULT_USE_LIMIT = 100
+
+MEMORY = "memory"
+USE_LIMIT = "use limit"
+FAILURES = "failures"
+DISCONNECTED = "disconnected"
+FORCED = "forced"
+
+_BROWSER_PROCESS_NAMES = ("chrome", "chromium", "headless_shell")
+
+
+def _is_browser(process: psutil.Process) -> bool:
+    return any(name in process.name().lower() for name in _BROWSER_PROCESS_NAMES)
+
+
+def browser_roots() -> Set[int]:
+    """PIDs of the top Chromium processes (one per browser) under this process."""
+    try:
+        processes = psutil.Process(os.getpid()).children(recursive=True)
+    except psutil.Error:
+        return set()
+    browsers = {}
+    for process in processes:
+        try:
+            if _is_browser(process):
+                browsers[process.pid] = process.ppid()
+        except psutil.Error:
+            continue   # exited or not ours to inspect
+    return {pid for pid, parent in browsers.items() if parent not in browsers}
+
+
+def browser_tree_rss(pids: Optional[Iterable[int]] = None) -> int:
+    """
+    Summed RSS in bytes of the given browser processes and their children, or of every
+    Chromium process under this process when pids is None.
+    """
+    if pids is None:
+        pids = browser_roots()
+    total = 0
+    for pid in pids:
+        try:
+            root = psutil.Process(pid)
+            tree = [root] + root.children(recursive=True)
+        except psutil.Error:
+            continue
+        for process in tree:
+            try:
+                total += process.memory_info().rss
+            except psutil.Error:
+                continue
+    return total
+
+
+class BrowserRecycler:
+    """
+    Recycle decisions for one extractor's browser, and the record of past recycles.
+
+    Args:
+        memory_mb (float): Browser memory budget in MB; 0 or None recycles on use_limit only
+        use_limit (int): Pages a browser may render before it is recycled regardless of memory
+    """
+
+    def __init__(self, memory_mb: Optional[float] = DEFAULT_MEMORY_MB, use_limit: int = DEFAULT_USE_LIMIT):
+        self.memory_budget = int(float(memory_mb) * 1024 * 1024) if memory_mb else 0
+        self.use_limit = max(1, int(use_limit))
+        self.reasons: Counter = Counter()
+        self.sites: Counter = Counter()
+        self.pages = 0   # pages rendered by browsers since recycled
+        self.pids: Optional[Set[int]] = None   # the current browser's processes; None = all under this process
+
+    @classmethod
+    def from_config(cls, vectara_cfg) -> "BrowserRecycler":
+        return cls(vectara_cfg.get("browser_memory_mb", DEFAULT_MEMORY_MB),
+                   vectara_cfg.get("browser_use_limit", DEFAULT_USE_LIMIT))
+
+    def launching(self) -> Set[int]:
+        """Call before launching a browser and pass the result to launched() after."""
+        return browser_roots() if self.memory_budget else set()
+
+    def launched(self, before: Set[int]) -> None:
+        """Attribute the Chromium processes started since launching() to the new browser."""
+        self.pids = (browser_roots() - before or None) if self.memory_budget else None
+
+    def check(self, uses: int) -> Tuple[Optional[str], int]:
+        """(MEMORY or USE_LIMIT if a browser that rendered `uses` pages should be recycled, else
+        None; the measured browser RSS in bytes, 0 when not measured)."""
+        rss = browser_tree_rss(self.pids) if self.memory_budget and uses else 0
+        if self.memory_budget and rss > self.memory_budget:
+            return MEMORY, rss
+        if uses >= self.use_limit:
+            return USE_LIMIT, rss
+        return None, rss
+
+    def recycled(self, reason: str, uses: int, rss: int = 0, url: Optional[str] = None) -> None:
+        """Record and log that a browser was recycled after rendering `uses` pages, the last of them url."""
+        self.reasons[reason] += 1
+        self.pages += uses
+        site = urlparse(url).netloc.lower() if url else ""
+        if site:
+            self.sites[site] += 1
+        total = sum(self.reasons.values())
+        memory = f", {rss / 1024 / 1024:.0f} MB of {self.memory_budget / 1024 / 1024:.0f} MB" if rss else ""
+        logger.info(f"Recycling browser ({reason}) after {uses} pages{memory}"
+                    f"{f', last page on {site}' if site else ''}; {total} recycles so far, "
+                    f"{self.pages / total:.1f} pages per browser on average")
+
+    def log_summary(self) -> None:
+        total = sum(self.reasons.values())
+        if not total:
+            return
+        reasons = ", ".join(f"{reason} {count}" for reason, count in self.reasons.most_common())
+        sites = ", ".join(f"{site} {count}" for site, count in self.sites.most_common(10))
+        logger.info(f"Browser recycles: {total} ({reasons}), {self.pages / total:.1f} pages per browser"
+                    f"{f'; by site of the last page: {sites}' if sites else ''}")
@@ -0,0 +1,233 @@
+"""
+Headless Chromium servers shared by the Ray workers of a website crawl (website_crawler.browser_pool_size).
+
+Each PageCrawlWorker normally launches its own Chromium, so a crawl with 32 workers runs 32
+browsers, each with its own base memory and startup cost, however few pages are rendering at
+once. With `browser_pool_size: N`, a BrowserPoolBroker runs as a Ray actor and starts up to N
+Chromium processes with a remote debugging port. A worker's web extractor asks the broker for
+an endpoint, attaches to that browser over CDP (Playwright's connect_over_cdp) and renders in
+browser contexts of its own, which keep cookies and storage isolated from other workers.
+
+The broker hands out the endpoint of the server with the fewest pages assigned (one per
+"playwright" worker, render_concurrency per "playwright_async" worker), and starts another
+server, up to N, when every running one is busy. A server that exited is restarted the next
+time an endpoint is asked for. A server whose processes use more than
+`browser_pool_memory_mb` is drained: it gets no new workers and is restarted once the workers
+on it have moved on, which they do when they recycle their connection (every
+`vectara.browser_use_limit` pages, see core/browser_memory.py).
+
+Servers listen on 127.0.0.1, so workers must run on the broker's node, as they do in the
+single-node Ray cluster the crawler starts.
+"""
+
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Sequence
+
+from core.browser_memory import browser_tree_rss
+
+logger = logging.getLogger(__name__)
+
+LAUNCH_TIMEOUT = 30
+DEFAULT_SERVER_MEMORY_MB = 4096
+
+
+class _Server:
+    """A Chromium process listening for CDP connections."""
+
+    __slots__ = ("process", "endpoint", "user_data_dir", "load", "draining")
+
+    def __init__(self, process: subprocess.Popen, endpoint: str, user_data_dir: str):
+        self.process = process
+        self.endpoint = endpoint
+        self.user_data_dir = user_data_dir
+        self.load = 0            # pages assigned by the workers attached to it
+        self.draining = False    # over its memory budget: no new workers, restarted once idle
+
+
+def launch_browser_server(executable: str, args: Sequence[str] = ()) -> _Server:
+    """Start a headless Chromium with a remote debugging port chosen by the browser."""
+    user_data_dir = tempfile.mkdtemp(prefix="vectara-chromium-")
+    try:
+        process = subprocess.Popen(
+            [executable, "--headless=new", "--remote-debugging-address=127.0.0.1", "--remote-debugging-port=0",
+             f"--user-data-dir={user_data_dir}", *args, "about:blank"],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    except OSError:
+        shutil.rmtree(user_data_dir, ignore_errors=True)
+        raise
+    # Chromium writes the port it listens on to DevToolsActivePort once it is ready
+    port_file = os.path.join(user_data_dir, "DevToolsActivePort")
+    deadline = time.monotonic() + LAUNCH_TIMEOUT
+    while True:
+        try:
+            with open(port_file) as f:
+                port = f.readline().strip()
+            if port:
+                return _Server(process, f"http://127.0.0.1:{port}", user_data_dir)
+        except OSError:
+            pass
+        if process.poll() is not None or time.monotonic() > deadline:
+            _stop(process, user_data_dir)
+            raise RuntimeError(f"Chromium server did not start ({executable})")
+        time.sleep(0.1)
+
+
+def _stop(process: subprocess.Popen, user_data_dir: str) -> None:
+    if process.poll() is None:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+            process.wait()
+    shutil.rmtree(user_data_dir, ignore_errors=True)
+
+
+def _chromium_executable() -> str:
+    from playwright.sync_api import sync_playwright
+
+    with sync_playwright() as p:
+        return p.chromium.executable_path
+
+
+class BrowserPoolBroker:
+    """
+    The Chromium servers of a crawl and the pages assigned to each.
+
+    Args:
+        size (int): Most servers running at once
+        memory_mb (float): Memory budget in MB of each server; 0 or None never drains a server
+        args (list): Chromium command line flags
+        executable (str): Chromium binary; Playwright's Chromium by default
+    """
+
+    def __init__(self, size: int, memory_mb: Optional[float] = DEFAULT_SERVER_MEMORY_MB,
+                 args: Sequence[str] = (), executable: Optional[str] = None):
+        self.size = max(1, int(size))
+        self.memory_budget = int(float(memory_mb) * 1024 * 1024) if memory_mb else 0
+        self.args = list(args)
+        self.executable = executable
+        self._servers: List[_Server] = []
+        self.restarts: Counter = Counter()
+
+    def _launch(self) -> _Server:
+        if self.executable is None:
+            self.executable = _chromium_executable()
+        server = launch_browser_server(self.executable, self.args)
+        logger.info(f"Started shared browser server {server.endpoint} ({len(self._servers) + 1} of {self.size})")
+        return server
+
+    def _restart(self, server: _Server, reason: str) -> None:
+        _stop(server.process, server.user_data_dir)
+        self._servers.remove(server)
+        self.restarts[reason] += 1
+        logger.info(f"Restarting shared browser server {server.endpoint} ({reason})")
+        try:
+            self._servers.append(self._launch())
+        except Exception as e:
+            logger.warning(f"Could not restart a shared browser server: {e}")
+
+    def _check_servers(self) -> None:
+        for server in list(self._servers):
+            if server.process.poll() is not None:
+                self._restart(server, "exited")
+            elif self.memory_budget and not server.draining:
+                rss = browser_tree_rss({server.process.pid})
+                if rss > self.memory_budget:
+                    logger.info(f"Shared browser server {server.endpoint} uses {rss / 1024 / 1024:.0f} MB "
+                                f"for {server.load} pages, draining it")
+                    server.draining = True
+                    if not server.load:
+                        self._restart(server, "memory")
+
+    def acquire(self, pages: int = 1) -> str:
+        """CDP endpoint for a worker that renders up to `pages` pages at once."""
+        self._check_servers()
+        available = [s for s in self._servers if not s.draining]
+        if len(self._servers) < self.size and not any(s.load == 0 for s in available):
+            server = self._launch()
+            self._servers.append(server)
+        else:
+            server = min(available or self._servers, key=lambda s: s.load)
+        server.load += max(1, int(pages))
+        return server.endpoint
+
+    def release(self, endpoint: str, pages: int = 1) -> None:
+        """A worker detached from endpoint (a restarted server's old endpoint is ignored)."""
+        server = next((s for s in self._servers if s.endpoint == endpoint), None)
+        if server is None:
+            return
+        server.load = max(0, server.load - max(1, int(pages)))
+        if server.draining and not server.load:
+            self._restart(server, "memory")
+
+    def stats(self) -> List[Dict]:
+        return [{"endpoint": s.endpoint, "pages": s.load, "draining": s.draining} for s in self._servers]
+
+    def shutdown(self) -> None:
+        servers, self._servers = self._servers, []
+        for server in servers:
+            _stop(server.process, server.user_data_dir)
+        if self.restarts:
+            logger.info(f"Shared browser server restarts: {dict(self.restarts)}")
+
+
+class BrowserPool:
+    """
+    Worker-side client of a BrowserPoolBroker (a Ray actor handle or a local instance).
+    Thread-safe; picklable, so one instance can be passed to every Ray actor.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, *args):
+        fn = getattr(self.broker, method)
+        if hasattr(fn, "remote"):
+            import ray
+            return ray.get(fn.remote(*args))
+        with self._lock:
+            return fn(*args)
+
+    def acquire(self, pages: int = 1) -> str:
+        return self._call("acquire", pages)
+
+    def release(self, endpoint: str, pages: int = 1) -> None:
+        self._call("release", endpoint, pages)
+
+    def shutdown(self) -> None:
+        self._call("shutdown")
+
+
+def create_browser_pool(section_cfg, remote=None) -> Optional[BrowserPool]:
+    """
+    The shared browser servers for a crawler config section, or None when its
+    `browser_pool_size` is 0. Pass remote=ray.remote (after ray.init()) to run the broker as a
+    Ray actor that all workers share.
+    """
+    size = int(section_cfg.get("browser_pool_size", 0) or 0)
+    if size <= 0:
+        return None
+    from core.web_content_extractor import CHROMIUM_ARGS
+
+    memory_mb = section_cfg.get("browser_pool_memory_mb", DEFAULT_SERVER_MEMORY_MB)
+    broker = (remote(BrowserPoolBroker).remote(size, memory_mb, CHROMIUM_ARGS) if remote
+              else BrowserPoolBroker(size, memory_mb, CHROMIUM_ARGS))
+    return BrowserPool(broker)
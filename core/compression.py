@@ -0,0 +1,170 @@
+"""
+gzip Content-Encoding for upload bodies (vectara.compress_uploads).
+
+Structured documents, spreadsheets and their metadata are JSON / text that compresses
+5-10x, and bandwidth-bound ingest hosts spend most of an upload pushing those bytes.
+With compress_uploads on, the Indexer gzips document POST bodies and upload_file
+multipart bodies before sending them.
+
+Compression is streaming: the source chunks (a JSON string, a StreamingJSONBody, or
+the multipart parts with the file read in blocks) go through a zlib compressor into a
+spooled temporary file, which stays in memory up to a limit and moves to disk beyond
+it. That gives an exact Content-Length and a seekable body that urllib3 can rewind on
+retry, without ever holding the uncompressed payload.
+
+Servers that do not accept gzip answer 415, or a 400 naming the gzip Content-Encoding.
+is_gzip_rejection() recognises both, so the caller can resend the identity-encoded body
+and stop compressing. Other 400s (a metadata field that could not be parsed, say) reject
+the document itself and are not retried.
+"""
+
+import re
+import tempfile
+import threading
+import zlib
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple
+
+_SPOOL_LIMIT = 8 * 1024 * 1024
+_READ_BLOCK = 64 * 1024
+
+# 400 messages that blame the gzip encoding, as opposed to the document
+_REJECTION_PATTERN = re.compile(r"gzip|content-encoding|decompress", re.IGNORECASE)
+
+
+class GzipBody:
+    """
+    Seekable, sized request body holding the gzip of a stream of byte chunks.
+
+    Args:
+        chunks: Iterable of bytes to compress, in order.
+        level (int): zlib compression level (1 fastest - 9 smallest).
+    """
+
+    def __init__(self, chunks: Iterable[bytes], level: int = 6):
+        self._file = tempfile.SpooledTemporaryFile(max_size=_SPOOL_LIMIT)
+        compressor = zlib.compressobj(level, zlib.DEFLATED, 31)   # wbits=31: gzip container
+        raw = 0
+        for chunk in chunks:
+            raw += len(chunk)
+            self._file.write(compressor.compress(chunk))
+        self._file.write(compressor.flush())
+        self.raw_size = raw
+        self.size = self._file.tell()
+        self._file.seek(0)
+
+    def __len__(self) -> int:
+        return self.size
+
+    def read(self, n: int = -1) -> bytes:
+        return self._file.read(n)
+
+    def tell(self) -> int:
+        return self._file.tell()
+
+    def seek(self, offset: int, whence: int = 0) -> int:
+        return self._file.seek(offset, whence)
+
+    def __iter__(self) -> Iterator[bytes]:
+        self._file.seek(0)
+        while True:
+            block = self._file.read(_READ_BLOCK)
+            if not block:
+                return
+            yield block
+
+    def close(self) -> None:
+        self._file.close()
+
+    def __enter__(self) -> "GzipBody":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def _quote_param(value: str) -> str:
+    # Same escaping urllib3 (and so requests) applies to multipart header parameters
+    return value.replace("\\", "\\\\").replace('"', "%22")
+
+
+def iter_multipart(files: Dict[str, Tuple[Optional[str], Any, str]], boundary: str) -> Iterator[bytes]:
+    """
+    Yield a multipart/form-data body for a requests-style `files` dict, reading file
+    objects in blocks instead of loading them whole.
+
+    Args:
+        files: {field name: (filename or None, str / bytes / binary file object, content type)}
+        boundary (str): Multipart boundary; the Content-Type header must carry the same one.
+    """
+    for name, (filename, value, content_type) in files.items():
+        disposition = f'form-data; name="{_quote_param(name)}"'
+        if filename:
+            disposition += f'; filename="{_quote_param(filename)}"'
+        yield (f"--{boundary}\r\nContent-Disposition: {disposition}\r\n"
+               f"Content-Type: {content_type}\r\n\r\n").encode("utf-8")
+        if hasattr(value, "read"):
+            while True:
+                block = value.read(_READ_BLOCK)
+                if not block:
+                    break
+                yield block
+        else:
+            yield value.encode("utf-8") if isinstance(value, str) else value
+        yield b"\r\n"
+    yield f"--{boundary}--\r\n".encode("utf-8")
+
+
+def is_gzip_rejection(response) -> bool:
+    """True if the server refused a gzip body (as opposed to rejecting the document)."""
+    if response.status_code == 415:
+        return True
+    return response.status_code == 400 and bool(_REJECTION_PATTERN.search(response.text or ""))
+
+
+class CompressionStats:
+    """Thread-safe running totals of uncompressed vs on-the-wire upload bytes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.uploads = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+
+    def record(self, raw_bytes: int, sent_bytes: int) -> None:
+        with self._lock:
+            self.uploads += 1
+            self.raw_bytes += raw_bytes
+            self.sent_bytes += sent_bytes
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            saved = self.raw_bytes - self.sent_bytes
+            return {
+                "uploads": self.uploads,
+                "raw_bytes": self.raw_bytes,
+                "sent_bytes": self.sent_bytes,
+                "saved_bytes": saved,
+                "saved_pct": round(100.0 * saved / self.raw_bytes, 1) if self.raw_bytes else 0.0,
+            }
+
+    # Locks do not pickle; the Indexer (and so this object) is shipped to Ray actors.
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def file_positions(files: Dict[str, Tuple[Optional[str], Any, str]]) -> Dict[str, int]:
+    """Current position of every file object in a requests-style `files` dict."""
+    return {name: part[1].tell() for name, part in files.items() if hasattr(part[1], "read")}
+
+
+def rewind_files(files: Dict[str, Tuple[Optional[str], Any, str]], positions: Dict[str, int]) -> None:
+    """Seek every file object in `files` back to a position recorded by file_positions()."""
+    for name, pos in positions.items():
+        files[name][1].seek(pos)
+
@@ -0,0 +1,370 @@
+"""
+Adaptive concurrency control for Vectara API calls (vectara.adaptive_concurrency).
+
+A fixed number of upload threads or Ray workers is either too timid for a quiet
+corpus or too aggressive once Vectara starts answering 429. With adaptive
+concurrency on, every request to the Vectara API goes through an AIMD limiter:
+
+- each healthy response raises the in-flight limit by 1/limit, so the limit grows by
+  about one per round of requests (additive increase);
+- a 429 / 503 halves it, at most once per cooldown so a burst of throttled responses
+  counts as one signal (multiplicative decrease);
+- a response slower than `concurrency_latency_target` trims it by 10%;
+- a Retry-After header pauses every request until it has passed.
+
+Throttled requests are retried here, after Retry-After or an exponential backoff,
+rather than by the urllib3 retry policy, so the limiter sees every 429.
+
+One limiter is shared by every Indexer in a process (and so by its upload threads).
+Under Ray, the limiters of all worker processes report to a named
+ConcurrencyControllerActor about once a second; the actor keeps the cluster-wide
+limit, and each process runs with its share of it. A Retry-After seen by one worker
+pauses all of them.
+"""
+
+import logging
+import os
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import ray
+from requests import PreparedRequest, Response
+from urllib3.util.retry import Retry
+
+from core.utils import (
+    LoggingAdapter, DEFAULT_RETRY_ATTEMPTS, DEFAULT_RETRY_STATUS_CODES,
+    DEFAULT_RETRY_BACKOFF_FACTOR, DEFAULT_RETRY_METHODS,
+)
+
+logger = logging.getLogger(__name__)
+
+THROTTLE_STATUS_CODES = (429, 503)
+ACTOR_NAME = "vectara-ingest-concurrency"
+
+_SLOW_DECREASE_FACTOR = 0.9
+_MAX_BACKOFF_SECONDS = 30.0
+# A worker that has not reported for this long no longer counts towards the share
+_CLIENT_EXPIRY_SECONDS = 10.0
+
+
+def concurrency_settings(vectara_cfg) -> Optional[Dict[str, Any]]:
+    """Limiter settings from the `vectara` config section, or None when adaptive concurrency is off."""
+    if not vectara_cfg.get("adaptive_concurrency", False):
+        return None
+    max_limit = int(vectara_cfg.get("max_concurrency", 16))
+    min_limit = max(1, min(int(vectara_cfg.get("min_concurrency", 1)), max_limit))
+    initial = int(vectara_cfg.get("initial_concurrency", min(4, max_limit)))
+    target = vectara_cfg.get("concurrency_latency_target", None)
+    return {
+        'initial': max(min_limit, min(initial, max_limit)),
+        'min_limit': min_limit,
+        'max_limit': max_limit,
+        'latency_target': float(target) if target else None,
+    }
+
+
+def parse_retry_after(value: Optional[str]) -> Optional[float]:
+    """Seconds to wait from a Retry-After header (delta-seconds or HTTP-date), or None."""
+    if not value:
+        return None
+    value = value.strip()
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class AIMDState:
+    """
+    The additive-increase / multiplicative-decrease arithmetic, without any locking.
+    Shared by the per-process limiter and the cluster-wide actor.
+
+    Args:
+        initial (int): Starting limit.
+        min_limit (int): The limit never drops below this.
+        max_limit (int): The limit never rises above this.
+        latency_target (float): Responses slower than this many seconds trim the limit (None = ignore latency).
+        decrease_factor (float): Multiplier applied on a throttled response.
+        cooldown (float): Minimum seconds between two decreases.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int,
+                 latency_target: Optional[float] = None, decrease_factor: float = 0.5,
+                 cooldown: float = 1.0):
+        self.limit = float(initial)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.latency_target = latency_target
+        self.decrease_factor = decrease_factor
+        self.cooldown = cooldown
+        self.blocked_until = 0.0   # wall-clock time, so it means the same thing on every host
+        self.successes = 0
+        self.throttles = 0
+        self.decreases = 0
+        self._last_decrease = 0.0
+
+    def on_success(self, count: int = 1) -> None:
+        self.successes += count
+        for _ in range(count):
+            self.limit = min(float(self.max_limit), self.limit + 1.0 / self.limit)
+
+    def on_throttle(self, retry_after: Optional[float], now: float) -> None:
+        self.throttles += 1
+        if retry_after:
+            self.blocked_until = max(self.blocked_until, now + retry_after)
+        self._decrease(self.decrease_factor, now)
+
+    def on_slow(self, now: float) -> None:
+        self._decrease(_SLOW_DECREASE_FACTOR, now)
+
+    def observe(self, status: Optional[int], latency: float, retry_after: Optional[float], now: float) -> str:
+        """Apply one response and return how it was classified: 'throttle', 'slow', 'ok' or 'error'."""
+        if status in THROTTLE_STATUS_CODES:
+            self.on_throttle(retry_after, now)
+            return 'throttle'
+        if status is None or status >= 500:
+            return 'error'
+        if self.latency_target and latency > self.latency_target:
+            self.on_slow(now)
+            return 'slow'
+        self.on_success()
+        return 'ok'
+
+    def _decrease(self, factor: float, now: float) -> None:
+        if now - self._last_decrease < self.cooldown:
+            return
+        self.limit = max(float(self.min_limit), self.limit * factor)
+        self._last_decrease = now
+        self.decreases += 1
+
+
+class ConcurrencyControllerActor:
+    """
+    Ray actor holding the cluster-wide limit. Workers report what they saw since their
+    last report and get back the current limit, the number of active workers to split
+    it between, and the shared Retry-After deadline.
+    """
+
+    def __init__(self, initial: int, min_limit: int, max_limit: int,
+                 latency_target: Optional[float] = None):
+        self.state = AIMDState(initial, min_limit, max_limit, latency_target)
+        self.clients: Dict[str, float] = {}
+
+    def report(self, client_id: str, successes: int, throttles: int, slow: int,
+               retry_after: Optional[float]) -> Tuple[float, int, float]:
+        now = time.time()
+        self.clients[client_id] = now
+        if throttles:
+            self.state.throttles += throttles - 1
+            self.state.on_throttle(retry_after, now)
+        elif slow:
+            self.state.on_slow(now)
+        self.state.on_success(successes)
+        self.clients = {c: seen for c, seen in self.clients.items() if now - seen < _CLIENT_EXPIRY_SECONDS}
+        return self.state.limit, len(self.clients), self.state.blocked_until
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            'limit': round(self.state.limit, 2),
+            'clients': len(self.clients),
+            'successes': self.state.successes,
+            'throttles': self.state.throttles,
+            'decreases': self.state.decreases,
+        }
+
+
+class AdaptiveConcurrencyController:
+    """
+    Thread-safe AIMD limiter for one process.
+
+    Args:
+        initial, min_limit, max_limit, latency_target: see AIMDState.
+        actor: Optional ConcurrencyControllerActor handle to coordinate with.
+        sync_interval (float): Seconds between reports to the actor.
+    """
+
+    def __init__(self, initial: int = 4, min_limit: int = 1, max_limit: int = 16,
+                 latency_target: Optional[float] = None, actor=None, sync_interval: float = 1.0):
+        self._state = AIMDState(initial, min_limit, max_limit, latency_target)
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.actor = actor
+        self.sync_interval = sync_interval
+        self.client_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._share: Optional[float] = None
+        self._pending = {'successes': 0, 'throttles': 0, 'slow': 0, 'retry_after': None}
+        self._last_sync = 0.0
+        self._syncing = False
+
+    @property
+    def limit(self) -> int:
+        """Current number of requests allowed in flight in this process."""
+        limit = self._state.limit
+        if self._share is not None:
+            limit = min(limit, self._share)
+        return max(1, int(limit))
+
+    def acquire(self) -> None:
+        with self._cond:
+            while True:
+                wait = self._state.blocked_until - time.time()
+                if wait > 0:
+                    self._cond.wait(wait)
+                elif self.in_flight < self.limit:
+                    self.in_flight += 1
+                    return
+                else:
+                    self._cond.wait(1.0)
+
+    def release(self) -> None:
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify_all()
+
+    @contextmanager
+    def slot(self) -> Iterator[None]:
+        """Hold one in-flight slot for the duration of a request."""
+        self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def record(self, status: Optional[int], latency: float, retry_after: Optional[float] = None) -> None:
+        """Feed one response (status None for a connection error) into the limiter."""
+        now = time.time()
+        with self._cond:
+            kind = self._state.observe(status, latency, retry_after, now)
+            if self.actor is not None:
+                if kind == 'ok':
+                    self._pending['successes'] += 1
+                elif kind in ('throttle', 'slow'):
+                    self._pending['throttles' if kind == 'throttle' else 'slow'] += 1
+                if retry_after:
+                    self._pending['retry_after'] = max(self._pending['retry_after'] or 0.0, retry_after)
+            self._cond.notify_all()
+        self._maybe_sync(now)
+
+    def _maybe_sync(self, now: float) -> None:
+        with self._cond:
+            if self.actor is None or self._syncing or now - self._last_sync < self.sync_interval:
+                return
+            self._syncing = True
+            pending = self._pending
+            self._pending = {'successes': 0, 'throttles': 0, 'slow': 0, 'retry_after': None}
+        try:
+            limit, clients, blocked_until = ray.get(
+                self.actor.report.remote(self.client_id, pending['successes'], pending['throttles'],
+                                         pending['slow'], pending['retry_after']), timeout=5)
+        except Exception as e:
+            logger.debug(f"Could not sync with the concurrency controller actor, using the local limit: {e}")
+            limit = None
+        with self._cond:
+            if limit is not None:
+                self._share = max(1.0, limit / max(1, clients))
+                self._state.blocked_until = max(self._state.blocked_until, blocked_until)
+            self._last_sync = time.time()
+            self._syncing = False
+            self._cond.notify_all()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'limit': self.limit,
+                'successes': self._state.successes,
+                'throttles': self._state.throttles,
+                'decreases': self._state.decreases,
+                'coordinated': self.actor is not None,
+            }
+
+
+_controllers: Dict[Tuple, AdaptiveConcurrencyController] = {}
+_controllers_lock = threading.Lock()
+
+
+def _controller_actor(settings: Dict[str, Any]):
+    """Get or create the named cluster-wide actor; None outside Ray or if it cannot be reached."""
+    if not ray.is_initialized():
+        return None
+    try:
+        return ray.remote(num_cpus=0)(ConcurrencyControllerActor).options(
+            name=ACTOR_NAME, get_if_exists=True).remote(**settings)
+    except Exception as e:
+        logger.warning(f"Could not start the concurrency controller actor, each worker adapts on its own: {e}")
+        return None
+
+
+def get_controller(settings: Dict[str, Any]) -> AdaptiveConcurrencyController:
+    """The process-wide controller for these settings, coordinated through Ray when it is running."""
+    key = tuple(sorted(settings.items()))
+    with _controllers_lock:
+        controller = _controllers.get(key)
+        if controller is None:
+            controller = AdaptiveConcurrencyController(**settings, actor=_controller_actor(settings))
+            _controllers[key] = controller
+        return controller
+
+
+class AdaptiveConcurrencyAdapter(LoggingAdapter):
+    """
+    Transport adapter that runs every request through the process's
+    AdaptiveConcurrencyController and retries 429 / 503 itself. Other retryable
+    statuses and connection errors keep the usual urllib3 retry policy.
+    """
+
+    __attrs__ = LoggingAdapter.__attrs__ + ['settings', 'throttle_retries']
+
+    def __init__(self, settings: Dict[str, Any], throttle_retries: int = DEFAULT_RETRY_ATTEMPTS):
+        self.settings = settings
+        self.throttle_retries = throttle_retries
+        retry_strategy = Retry(
+            total=DEFAULT_RETRY_ATTEMPTS,
+            status_forcelist=[c for c in DEFAULT_RETRY_STATUS_CODES if c not in THROTTLE_STATUS_CODES],
+            backoff_factor=DEFAULT_RETRY_BACKOFF_FACTOR,
+            raise_on_status=False,
+            # urllib3 would otherwise retry any 429/503 carrying Retry-After on its own
+            respect_retry_after_header=False,
+            allowed_methods=DEFAULT_RETRY_METHODS,
+        )
+        super().__init__(max_retries=retry_strategy)
+
+    @property
+    def controller(self) -> AdaptiveConcurrencyController:
+        # Resolved per call rather than stored: the adapter is pickled with the session into
+        # Ray actors, where it has to attach to that process's controller.
+        return get_controller(self.settings)
+
+    def send(self, request: PreparedRequest, **kwargs) -> Response:
+        controller = self.controller
+        body = request.body
+        start_pos = body.tell() if hasattr(body, "seek") and hasattr(body, "tell") else None
+        attempt = 0
+        while True:
+            with controller.slot():
+                st = time.monotonic()
+                try:
+                    response = super().send(request, **kwargs)
+                except Exception:
+                    controller.record(None, time.monotonic() - st)
+                    raise
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            controller.record(response.status_code, time.monotonic() - st, retry_after)
+            if response.status_code not in THROTTLE_STATUS_CODES or attempt >= self.throttle_retries:
+                return response
+            attempt += 1
+            logger.info(f"Vectara answered {response.status_code}, retrying (attempt {attempt}) "
+                        f"with concurrency limit {controller.limit}")
+            response.close()
+            if retry_after is None:
+                # With a Retry-After the controller already holds every request back
+                time.sleep(min(_MAX_BACKOFF_SECONDS, DEFAULT_RETRY_BACKOFF_FACTOR * 2 ** (attempt - 1)))
+            if start_pos is not None:
+                body.seek(start_pos)
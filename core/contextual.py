@@ -3,6 +3,7 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 from omegaconf import OmegaConf
 
 from core.models import generate
+from core.stage_stats import bind_scope
 
 logger = logging.getLogger(__name__)
 
@@ -54,7 +55,7 @@ class ContextualChunker():
         # Using ThreadPoolExecutor to parallelize cc.transform calls
         with ThreadPoolExecutor(max_workers=max_workers) as executor:
             # Submit tasks for all text segments along with their indices
-            future_to_index = {executor.submit(self.transform, text): idx for idx, text in enumerate(texts)}
+            future_to_index = {executor.submit(bind_scope(self.transform), text): idx for idx, text in enumerate(texts)}
 
             # Collect results as they complete
             for future in as_completed(future_to_index):
@@ -21,6 +21,7 @@ from slugify import slugify
 from core.summary import TableSummarizer, ImageSummarizer
 from core.utils import detect_file_type, markdown_to_df, get_headers, MIN_IMAGE_DIMENSION, release_memory
 from core.context_utils import extract_image_context
+from core.stage_stats import IMAGE_SUMMARY, TABLE_SUMMARY, bind_scope, stage
 
 import unstructured as us
 from unstructured.partition.pdf import partition_pdf
@@ -280,22 +281,24 @@ class DocumentParser():
                 logger.error(f"Image summarization failed: {e}")
                 return None
 
-        if self.summarization_workers <= 1:
-            return [_summarize_one(t) for t in tasks]
+        # Timed as one stage on this thread; the pool threads' LLM tokens are charged to it
+        with stage(IMAGE_SUMMARY):
+            if self.summarization_workers <= 1:
+                return [_summarize_one(t) for t in tasks]
 
-        results = [None] * len(tasks)
-        with ThreadPoolExecutor(max_workers=self.summarization_workers) as executor:
-            future_to_idx = {
-                executor.submit(_summarize_one, task): idx
-                for idx, task in enumerate(tasks)
-            }
-            for future in as_completed(future_to_idx):
-                idx = future_to_idx[future]
-                try:
-                    results[idx] = future.result()
-                except Exception as e:
-                    logger.error(f"Image summarization future failed for task {idx}: {e}")
-        return results
+            results = [None] * len(tasks)
+            with ThreadPoolExecutor(max_workers=self.summarization_workers) as executor:
+                future_to_idx = {
+                    executor.submit(bind_scope(_summarize_one), task): idx
+                    for idx, task in enumerate(tasks)
+                }
+                for future in as_completed(future_to_idx):
+                    idx = future_to_idx[future]
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        logger.error(f"Image summarization future failed for task {idx}: {e}")
+            return results
 
     def _parallel_summarize_tables(self, table_texts):
         """
@@ -321,22 +324,24 @@ class DocumentParser():
                 logger.error(f"Table summarization failed: {e}")
                 return ""
 
-        if self.summarization_workers <= 1:
-            return [_summarize_one(t) for t in table_texts]
+        # Timed as one stage on this thread; the pool threads' LLM tokens are charged to it
+        with stage(TABLE_SUMMARY):
+            if self.summarization_workers <= 1:
+                return [_summarize_one(t) for t in table_texts]
 
-        results = [""] * len(table_texts)
-        with ThreadPoolExecutor(max_workers=self.summarization_workers) as executor:
-            future_to_idx = {
-                executor.submit(_summarize_one, text): idx
-                for idx, text in enumerate(table_texts)
-            }
-            for future in as_completed(future_to_idx):
-                idx = future_to_idx[future]
-                try:
-                    results[idx] = future.result()
-                except Exception as e:
-                    logger.error(f"Table summarization future failed for task {idx}: {e}")
-        return results
+            results = [""] * len(table_texts)
+            with ThreadPoolExecutor(max_workers=self.summarization_workers) as executor:
+                future_to_idx = {
+                    executor.submit(bind_scope(_summarize_one), text): idx
+                    for idx, text in enumerate(table_texts)
+                }
+                for future in as_completed(future_to_idx):
+                    idx = future_to_idx[future]
+                    try:
+                        results[idx] = future.result()
+                    except Exception as e:
+                        logger.error(f"Table summarization future failed for task {idx}: {e}")
+            return results
 
     def parse(self, filename: str, source_url: str = "No URL") -> ParsedDocument:
         """
@@ -12,6 +12,7 @@ from core.doc_parser import (
 )
 from core.contextual import ContextualChunker
 from core.summary import get_attributes_from_text
+from core.stage_stats import CONTEXTUAL_CHUNKING, PARSE, stage
 
 logger = logging.getLogger(__name__)
 
@@ -251,7 +252,10 @@ class FileProcessor:
             whole_document=all_text
         )
         
-        return cc.parallel_transform(chunks)
+        with stage(CONTEXTUAL_CHUNKING, bytes_in=len(all_text)) as span:
+            results = cc.parallel_transform(chunks)
+            span.add(bytes_out=sum(len(r) for r in results if r))
+        return results
     
     def process_file(self, filename: str, uri: str) -> ParsedDocument:
         """
@@ -269,7 +273,10 @@ class FileProcessor:
                 # Parser returned None (e.g., image file with summarize_images disabled)
                 logger.warning(f"No parser available for {filename}, returning empty ParsedDocument")
                 return ParsedDocument(title='', content_stream=[], tables=[], image_bytes=[])
-            return dp.parse(filename, uri)
+            with stage(PARSE, bytes_in=os.path.getsize(filename)) as span:
+                parsed = dp.parse(filename, uri)
+                span.add(bytes_out=sum(len(c) for c, _ in parsed.content_stream if isinstance(c, str)))
+            return parsed
         except Exception as e:
             logger.error(f"Failed to parse {filename}: {e}")
             raise
@@ -0,0 +1,254 @@
+"""
+Cluster-wide, per-host request pacing for the website and docs crawlers.
+
+A `core.utils.RateLimiter` lives inside each worker, so N Ray workers hit a site at N times
+`num_per_second`. Here a single HostRateBroker owns the pace of every host. It runs as a Ray
+actor, or as a plain object in a single-process crawl. It schedules each host as a GCRA token
+bucket that allows `num_per_second` requests per second in bursts of up to `burst`. The rate is
+slowed to the site's robots.txt `Crawl-delay` / `Request-rate` when one is declared. The broker
+hands the robots.txt lookup of each host to the first worker that asks, so the cluster reads it
+once per host; the broker itself never fetches, as that would stall every reservation behind it.
+
+Each worker holds a HostRateLimiter client. The client leases start slots from the broker a few
+at a time, so a busy worker does not pay an actor round trip per request. A slot is valid for one
+interval; a slot the worker could not use in time is dropped rather than spent late, so leases
+never add up to a burst. The lease size adapts: it doubles while a worker uses every slot it gets
+and halves once slots expire, so slow workers do not hold capacity the others could use.
+
+Slots are wall-clock times, so Ray nodes on different machines must have synchronized clocks.
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Set, Tuple
+from urllib.parse import urlparse
+from urllib.robotparser import RobotFileParser
+
+import requests
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_LEASE = 8
+ROBOTS_TIMEOUT = 10
+
+
+class HostRateBroker:
+    """
+    Per-host start-slot scheduler shared by every worker of a crawl.
+
+    Args:
+        rate (float): Requests per second allowed per host
+        burst (int): Requests a host may receive at once after being idle (default: one second's worth)
+    """
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = max(float(rate), 1e-6)
+        self.burst = max(1, int(burst if burst is not None else self.rate))
+        self._tat: Dict[str, float] = {}      # theoretical arrival time of the next request per host
+        self._delay: Dict[str, float] = {}    # robots.txt crawl delay per host
+        self._granted: Dict[str, int] = {}
+        self._robots_claimed: Set[str] = set()
+
+    def claim_robots(self, host: str) -> bool:
+        """True for the first caller only, which then reads host's robots.txt and reports
+        its delay with set_crawl_delay()."""
+        if host in self._robots_claimed:
+            return False
+        self._robots_claimed.add(host)
+        return True
+
+    def set_crawl_delay(self, host: str, seconds: float) -> None:
+        """Pace host at most one request per `seconds` (robots.txt Crawl-delay)."""
+        if seconds and seconds > 0:
+            self._delay[host] = max(self._delay.get(host, 0.0), float(seconds))
+
+    def interval(self, host: str) -> float:
+        return max(1.0 / self.rate, self._delay.get(host, 0.0))
+
+    def reserve(self, host: str, count: int, now: Optional[float] = None) -> Tuple[List[float], float]:
+        """
+        Reserve the next `count` start slots for host.
+
+        Returns:
+            (slots, interval): ascending wall-clock times at which a request may start, and the
+            host's current interval (how long each slot stays valid)
+        """
+        now = time.time() if now is None else now
+        interval = self.interval(host)
+        # A host with a crawl delay gets no burst
+        burst = 1 if host in self._delay else self.burst
+        tolerance = interval * (burst - 1)
+        tat = self._tat.get(host, now)
+        slots = []
+        for _ in range(max(1, count)):
+            slot = max(now, tat - tolerance)
+            slots.append(slot)
+            tat = max(tat, slot) + interval
+        self._tat[host] = tat
+        self._granted[host] = self._granted.get(host, 0) + len(slots)
+        return slots, interval
+
+    def stats(self) -> Dict[str, dict]:
+        return {host: {"granted": n, "interval": self.interval(host)} for host, n in self._granted.items()}
+
+
+class _Lease:
+    """Start slots a client holds for one host."""
+
+    __slots__ = ("slots", "interval", "size", "dropped", "lock")
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.slots = deque()
+        self.interval = 0.0
+        self.size = 1
+        self.dropped = False
+
+    def take(self, now: float) -> Optional[float]:
+        while self.slots and self.slots[0] < now - self.interval:
+            self.slots.popleft()
+            self.dropped = True
+        return self.slots.popleft() if self.slots else None
+
+    def refill(self, slots: List[float], interval: float, max_size: int) -> None:
+        # Grow the next lease while every slot gets used, shrink it once slots expire unused
+        self.size = max(1, self.size // 2) if self.dropped else min(max_size, self.size * 2)
+        self.dropped = False
+        self.slots.extend(slots)
+        self.interval = interval
+
+
+def robots_crawl_delay(site_root: str, user_agent: str = "*", session=None) -> Optional[float]:
+    """
+    The delay in seconds robots.txt at site_root asks between requests from user_agent
+    (the larger of Crawl-delay and Request-rate), or None if it sets none or cannot be read.
+    """
+    get = session.get if session is not None else requests.get
+    try:
+        response = get(site_root.rstrip("/") + "/robots.txt", timeout=ROBOTS_TIMEOUT,
+                       headers={"User-Agent": user_agent})
+        if response.status_code != 200:
+            return None
+        parser = RobotFileParser()
+        parser.parse(response.text.splitlines())
+    except Exception as e:
+        logger.debug(f"Could not read robots.txt of {site_root}: {e}")
+        return None
+    delays = []
+    crawl_delay = parser.crawl_delay(user_agent)
+    if crawl_delay:
+        delays.append(float(crawl_delay))
+    request_rate = parser.request_rate(user_agent)
+    if request_rate and request_rate.requests:
+        delays.append(request_rate.seconds / request_rate.requests)
+    return max(delays) if delays else None
+
+
+class HostRateLimiter:
+    """
+    Worker-side client of a HostRateBroker (a Ray actor handle or a local instance).
+    Thread-safe; picklable, so one instance can be passed to every Ray actor. Threads pacing
+    different hosts do not wait on each other's broker round trips.
+
+    Args:
+        broker: HostRateBroker, or the handle of one running as a Ray actor
+        max_lease (int): Upper bound on the slots leased per round trip
+        respect_crawl_delay (bool): Read each host's robots.txt once per crawl and honor its crawl delay
+        user_agent (str): User agent matched against robots.txt groups
+    """
+
+    def __init__(self, broker, max_lease: int = DEFAULT_MAX_LEASE, respect_crawl_delay: bool = True,
+                 user_agent: str = "*"):
+        self.broker = broker
+        self.max_lease = max(1, int(max_lease))
+        self.respect_crawl_delay = respect_crawl_delay
+        self.user_agent = user_agent
+        self._leases: Dict[str, _Lease] = {}
+        self._robots_checked: Set[str] = set()   # hosts this process has asked the broker about
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_leases"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, *args):
+        fn = getattr(self.broker, method)
+        if hasattr(fn, "remote"):
+            import ray
+            return ray.get(fn.remote(*args))
+        with self._lock:
+            return fn(*args)
+
+    def _check_robots(self, host: str, url: str) -> None:
+        with self._lock:
+            if host in self._robots_checked:
+                return
+            self._robots_checked.add(host)
+        if not self._call("claim_robots", host):
+            return
+        scheme = urlparse(url).scheme or "https"
+        delay = robots_crawl_delay(f"{scheme}://{host}", self.user_agent)
+        if delay:
+            logger.info(f"Honoring robots.txt crawl delay of {delay:g}s for {host}")
+            self._call("set_crawl_delay", host, delay)
+
+    def acquire(self, url: str) -> None:
+        """Block until a request to url's host may start."""
+        host = urlparse(url).netloc.lower()
+        if not host:
+            return
+        if self.respect_crawl_delay:
+            self._check_robots(host, url)
+        with self._lock:
+            lease = self._leases.setdefault(host, _Lease())
+        # Only threads pacing the same host wait on this host's reserve round trip
+        with lease.lock:
+            slot = lease.take(time.time())
+            while slot is None:
+                slots, interval = self._call("reserve", host, lease.size)
+                lease.refill(slots, interval, self.max_lease)
+                slot = lease.take(time.time())
+        wait = slot - time.time()
+        if wait > 0:
+            time.sleep(wait)
+
+    @contextmanager
+    def limit(self, url: str):
+        """`with limiter.limit(url):` paces the block like `with RateLimiter():` does."""
+        self.acquire(url)
+        yield
+
+
+def paced(limiter, url: str):
+    """The context manager that paces a request to url: a HostRateLimiter paces url's host,
+    any other limiter (RateLimiter, nullcontext) is used as is."""
+    if isinstance(limiter, HostRateLimiter):
+        return limiter.limit(url)
+    return limiter
+
+
+def create_host_rate_limiter(section_cfg, num_per_second: float, user_agent: str = "*",
+                             remote=None) -> Optional[HostRateLimiter]:
+    """
+    The shared per-host limiter for a crawler config section (website_crawler, docs_crawler),
+    or None when its `shared_rate_limit` is off. Pass remote=ray.remote (after ray.init()) to
+    run the broker as a Ray actor that all workers share.
+    """
+    if not section_cfg.get("shared_rate_limit", True):
+        return None
+    broker = remote(HostRateBroker).remote(num_per_second) if remote else HostRateBroker(num_per_second)
+    return HostRateLimiter(
+        broker,
+        max_lease=section_cfg.get("rate_limit_lease", DEFAULT_MAX_LEASE),
+        respect_crawl_delay=section_cfg.get("respect_crawl_delay", True),
+        user_agent=user_agent,
+    )
@@ -1,27 +1,44 @@
 import logging
-import os
 import requests
-from typing import List, Dict, Any, Tuple
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Any, Optional, Tuple
 from omegaconf import OmegaConf
 from slugify import slugify
 from core.summary import ImageSummarizer
+from core.stage_stats import IMAGE_SUMMARY, bind_scope, stage
 from core.utils import get_headers, MIN_IMAGE_DIMENSION
 
 import base64
-import mimetypes
-import tempfile
-from urllib.parse import urlparse
+import io
 
 logger = logging.getLogger(__name__)
 
+
+def _is_svg(content: bytes, image_url: str) -> bool:
+    """Whether image bytes are an SVG, judged like ImageSummarizer._is_svg_file: by a data URL's
+    mime type, the URL's extension, then an SVG signature in the first 1 KB."""
+    if 'image/svg+xml' in image_url[:100]:
+        return True
+    if image_url.lower().rsplit('.', 1)[-1] == 'svg':
+        return True
+    head = content[:1024].decode('utf-8', errors='ignore').lower()
+    return '<svg' in head or 'xmlns="http://www.w3.org/2000/svg"' in head
+
 class ImageProcessor:
     """Handles image processing and summarization"""
     
-    def __init__(self, cfg: OmegaConf, model_config: Dict[str, Any], verbose: bool = False):
+    def __init__(self, cfg: OmegaConf, model_config: Dict[str, Any], verbose: bool = False,
+                 session: Optional[requests.Session] = None):
         self.cfg = cfg
         self.model_config = model_config
         self.verbose = verbose
         self.image_summarizer = None
+        self.session = session
+        # Images of a page downloaded and summarized at once (same setting as the document parsers)
+        try:
+            self.workers = int(cfg.doc_processing.get("summarization_workers", 4))
+        except (AttributeError, KeyError, TypeError, ValueError):
+            self.workers = 4
         
     def _get_image_summarizer(self):
         """Lazy initialization of image summarizer"""
@@ -66,106 +83,120 @@ class ImageProcessor:
         """
         if not images:
             return [], []
-        
+        # Downloading and summarizing the page's images is timed as one stage
+        with stage(IMAGE_SUMMARY):
+            return self._process_web_images(images, url, ex_metadata)
+
+    def _get_session(self) -> requests.Session:
+        """HTTP session for image downloads: the indexer's (with its cookies) or a pooled one of our own."""
+        if self.session is None:
+            self.session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_maxsize=max(self.workers, 10))
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+        return self.session
+
+    def _load_web_image(self, image_url: str, url: str) -> Optional[Tuple[bytes, bool]]:
+        """
+        (renderable_bytes, is_svg) of one web image, downloaded into memory, or None if it
+        cannot be fetched or read, or is too small to be worth summarizing.
+        """
+        if image_url.startswith('data:image/'):
+            # e.g. "data:image/svg+xml;base64,<payload>"
+            content = base64.b64decode(image_url.split(',', 1)[1])
+        elif image_url.startswith('http'):
+            response = self._get_session().get(image_url, headers=get_headers(self.cfg), timeout=30)
+            if response.status_code != 200:
+                logger.info(f"Failed to retrieve image {image_url} from {url} "
+                            f"(HTTP {response.status_code} {response.reason}), skipping")
+                return None
+            content = response.content
+        else:
+            logger.info(f"Image URL '{image_url}' is not valid, skipping")
+            return None
+
+        # Skip small raster images (avatars, icons) — consistent with DoclingParser
+        # SVGs are vector and don't have inherent pixel dimensions; skip the size check for them
+        is_svg = _is_svg(content, image_url)
+        if not is_svg:
+            from PIL import Image as _PILImage
+            with _PILImage.open(io.BytesIO(content)) as pil_img:
+                w, h = pil_img.size
+            if min(w, h) < MIN_IMAGE_DIMENSION:
+                logger.debug(f"Skipping small image ({w}x{h}px) from {image_url}")
+                return None
+
+        # Store binary data. SVG must be rasterized to PNG (see _read_renderable_image_bytes) —
+        # the corpus renders image_data as <img>, and raw SVG bytes labeled image/png don't decode.
+        try:
+            if is_svg:
+                import cairosvg
+                content = cairosvg.svg2png(bytestring=content)
+        except Exception as e:
+            logger.info(f"Failed to read image {image_url} from {url}: {e}, skipping")
+            return None
+        return content, is_svg
+
+    def _process_web_image(self, image_summarizer, inx: int, image: Dict[str, str], url: str,
+                           ex_metadata: Dict[str, Any]):
+        """Download, probe and summarize one image. Returns (image_bytes_entry, processed_image),
+        either of which may be None."""
+        image_url = image['src']
+        try:
+            loaded = self._load_web_image(image_url, url)
+            if loaded is None:
+                return None, None
+            image_binary, _ = loaded
+            image_id = f"web_{slugify(url)}_image_{inx}"
+
+            image_summary = image_summarizer.summarize_image(None, image_url, None, image_bytes=image_binary)
+            if not image_summary:
+                logger.info(f"Failed to generate summary for image {image_url}")
+                return (image_id, image_binary), None
+
+            # Prepare metadata
+            metadata = {
+                'element_type': 'image',
+                'url': image_url,
+                'alt_text': image.get('alt', ''),
+                'image_id': image_id
+            }
+            if ex_metadata:
+                metadata.update(ex_metadata)
+
+            if self.verbose:
+                logger.info(f"Image summary: {image_summary[:500]}...")
+
+            # Generate document ID
+            doc_id = slugify(url) + "_image_" + str(inx)
+            return (image_id, image_binary), (doc_id, image_summary, metadata)
+        except Exception as e:
+            logger.warning(f"Failed to process image {image.get('src', 'unknown')}: {e}")
+            return None, None
+
+    def _process_web_images(self, images: List[Dict[str, str]], url: str, ex_metadata: Dict[str, Any]) -> Tuple[List[Tuple[str, str, Dict[str, Any]]], List[Tuple[str, bytes]]]:
+        """Download and summarize the web images, `workers` at a time; see process_web_images."""
         image_summarizer = self._get_image_summarizer()
         if not image_summarizer:
             return [], []
         
         if self.verbose:
             logger.info(f"Found {len(images)} images in {url}")
-        
-        processed_images = []
-        image_bytes = []
-        image_filename = 'image.png'
-        
-        for inx, image in enumerate(images):
-            try:
-                image_url = image['src']
-
-                if image_url.startswith('data:image/'):
-                    header, payload = image_url.split(',', 1)
-                    # header will be like "data:image/svg+xml;base64"
-                    mime = header.split(';')[0].split(':')[1]  # e.g. "image/svg+xml"
-                    ext = mimetypes.guess_extension(mime) or '.bin'
-                    # write to a temp file
-                    with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp:
-                        tmp.write(base64.b64decode(payload))
-                        tmp_filename = tmp.name
-                    local_path = tmp_filename
-
-                elif image_url.startswith('http'):
-                    # download as before
-                    response = requests.get(image_url, headers=get_headers(self.cfg), stream=True, timeout=30)
-                    if response.status_code != 200:
-                        logger.info(f"Failed to retrieve image {image_url} from {url} "
-                                    f"(HTTP {response.status_code} {response.reason}), skipping")
-                        continue
-                    # write to a temp file with appropriate extension guessed from URL path or default to .png
-                    url_path = urlparse(image_url).path
-                    ext = os.path.splitext(url_path)[1] or '.png'
-                    with tempfile.NamedTemporaryFile(suffix=ext, delete=False) as tmp:
-                        for chunk in response.iter_content(chunk_size=8192):
-                            tmp.write(chunk)
-                        local_path = tmp.name
-
-                else:
-                    logger.info(f"Image URL '{image_url}' is not valid, skipping")
-                    continue
-
-                # Skip small raster images (avatars, icons) — consistent with DoclingParser
-                # SVGs are vector and don't have inherent pixel dimensions; skip the size check for them
-                is_svg = image_summarizer._is_svg_file(local_path, image_url)
-                if not is_svg:
-                    from PIL import Image as _PILImage
-                    with _PILImage.open(local_path) as pil_img:
-                        w, h = pil_img.size
-                    if min(w, h) < MIN_IMAGE_DIMENSION:
-                        logger.debug(f"Skipping small image ({w}x{h}px) from {image_url}")
-                        continue
-
-                # Store binary data. SVG must be rasterized to PNG (see helper) — the corpus
-                # renders image_data as <img>, and raw SVG bytes labeled image/png don't decode.
-                try:
-                    image_binary = self._read_renderable_image_bytes(local_path, is_svg)
-                except Exception as e:
-                    logger.info(f"Failed to read image {image_url} from {url}: {e}, skipping")
-                    continue
-                image_id = f"web_{slugify(url)}_image_{inx}"
-                image_bytes.append((image_id, image_binary))
-
-                # Generate summary from local_path
-                image_summary = image_summarizer.summarize_image(local_path, image_url, None)
-                if not image_summary:
-                    logger.info(f"Failed to generate summary for image {image_url}")
-                    continue
-                
-                # Prepare metadata
-                metadata = {
-                    'element_type': 'image',
-                    'url': image_url,
-                    'alt_text': image.get('alt', ''),
-                    'image_id': image_id
-                }
-                if ex_metadata:
-                    metadata.update(ex_metadata)
-                
-                if self.verbose:
-                    logger.info(f"Image summary: {image_summary[:500]}...")
-                
-                # Generate document ID
-                doc_id = slugify(url) + "_image_" + str(inx)
-                
-                processed_images.append((doc_id, image_summary, metadata))
-                
-            except Exception as e:
-                logger.warning(f"Failed to process image {image.get('src', 'unknown')}: {e}")
-                continue
 
-            finally:
-                # Clean up temporary file
-                if 'local_path' in locals() and os.path.exists(local_path):
-                    os.remove(local_path)
+        def _one(inx_image):
+            inx, image = inx_image
+            return self._process_web_image(image_summarizer, inx, image, url, ex_metadata)
+
+        if self.workers <= 1 or len(images) == 1:
+            results = [_one(item) for item in enumerate(images)]
+        else:
+            # Each image is downloaded, probed and summarized on a pool thread; map() keeps
+            # page order, and the pool threads' LLM tokens are charged to the caller's stage
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(images))) as executor:
+                results = list(executor.map(bind_scope(_one), enumerate(images)))
 
+        processed_images = [processed for _, processed in results if processed is not None]
+        image_bytes = [entry for entry, _ in results if entry is not None]
         return processed_images, image_bytes
     
     def process_document_images(self, images: List[tuple], uri: str, ex_metadata: Dict[str, Any]) -> List[Tuple[str, str, Dict[str, Any]]]:
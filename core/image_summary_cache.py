@@ -0,0 +1,157 @@
+"""
+Persistent cache of image summaries (doc_processing.image_summary_cache).
+
+Image summarization is the most expensive LLM call of a crawl, and most of it is repeated
+work: site-wide logos and diagrams reused across pages, and unchanged images on every
+re-crawl. ImageSummarizer.summarize_image looks each image up here before calling the
+vision model.
+
+Entries are content-addressed: the key is a SHA-256 of the image bytes, the vision model
+config (credentials left out) and the prompt, which carries the surrounding-text context.
+A different model or context is a miss, never a stale hit. Only successful summaries are
+stored.
+
+The cache is an SQLite file next to the crawl tracking DB (image_summary_cache.db in
+output_dir), so every Ray worker on the machine and every later run shares it. It is
+bounded by `image_summary_cache_mb` of summary text; past that, the least recently used
+entries are evicted. Hits and misses are logged at the end of the crawl.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, Optional
+
+from omegaconf import DictConfig, OmegaConf
+
+from core.sqlite_store import SQLiteStore
+from core.utils import get_docker_or_local_path
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MAX_MB = 256
+# Evict down to this fraction of the size bound, so eviction does not run on every insert
+_EVICT_TO = 0.9
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS image_summaries (
+    key         TEXT PRIMARY KEY,
+    summary     TEXT NOT NULL,
+    size        INTEGER NOT NULL,
+    last_used   REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS image_summaries_last_used ON image_summaries (last_used);
+"""
+
+
+def _model_signature(model_config: Any) -> str:
+    """Canonical JSON of a model config without its credentials."""
+    if isinstance(model_config, DictConfig):
+        model_config = OmegaConf.to_container(model_config, resolve=True)
+    config = {k: v for k, v in dict(model_config or {}).items()
+              if 'api_key' not in str(k).lower() and 'secret' not in str(k).lower()}
+    return json.dumps(config, sort_keys=True, default=str)
+
+
+class ImageSummaryCache(SQLiteStore):
+    """
+    SQLite-backed, size-bounded LRU map from cache key to image summary.
+
+    Thread-safe; several processes (Ray workers) can share the same file.
+
+    Args:
+        db_path (str): SQLite file holding the cache
+        max_bytes (int): Upper bound on the stored summary text, in bytes
+    """
+
+    SCHEMA_SQL = _SCHEMA_SQL
+
+    def __init__(self, db_path: str, max_bytes: int = DEFAULT_MAX_MB * 1024 * 1024):
+        super().__init__(db_path)
+        self.max_bytes = max(1, int(max_bytes))
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(content_b64: str, model_config: Any, prompt: str) -> str:
+        """Cache key of an image (base64 of its bytes) summarized by model_config with prompt."""
+        h = hashlib.sha256()
+        for part in (_model_signature(model_config), prompt, content_b64):
+            h.update(part.encode('utf-8'))
+            h.update(b'\0')
+        return h.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute("SELECT summary FROM image_summaries WHERE key=?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            conn.execute("UPDATE image_summaries SET last_used=? WHERE key=?", (time.time(), key))
+            conn.commit()
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, summary: str) -> None:
+        if not summary:
+            return
+        size = len(summary.encode('utf-8'))
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO image_summaries (key, summary, size, last_used) "
+                         "VALUES (?, ?, ?, ?)", (key, summary, size, time.time()))
+            total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM image_summaries").fetchone()[0]
+            if total > self.max_bytes:
+                self._evict(conn, total - int(self.max_bytes * _EVICT_TO))
+            conn.commit()
+
+    @staticmethod
+    def _evict(conn: sqlite3.Connection, excess: int) -> None:
+        """Delete least recently used entries until at least `excess` bytes are freed."""
+        freed, doomed = 0, []
+        for key, size in conn.execute("SELECT key, size FROM image_summaries ORDER BY last_used"):
+            if freed >= excess:
+                break
+            doomed.append((key,))
+            freed += size
+        conn.executemany("DELETE FROM image_summaries WHERE key=?", doomed)
+        logger.debug(f"Image summary cache: evicted {len(doomed)} entries ({freed} bytes)")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries, size = self._connection().execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM image_summaries").fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            "entries": entries,
+            "bytes": size,
+        }
+
+
+# One cache per output_dir and process, so every summarizer counts towards the same hit rate
+_caches: Dict[str, ImageSummaryCache] = {}
+_caches_lock = threading.Lock()
+
+
+def get_image_summary_cache(cfg) -> Optional[ImageSummaryCache]:
+    """This process's image summary cache for cfg, or None when doc_processing.image_summary_cache is off."""
+    doc_processing = cfg.get('doc_processing', None) or {}
+    if not doc_processing.get('image_summary_cache', False):
+        return None
+    output_dir = cfg.vectara.get('output_dir', 'vectara_ingest_output')
+    with _caches_lock:
+        cache = _caches.get(output_dir)
+        if cache is None:
+            db_dir = get_docker_or_local_path(docker_path=f'/home/vectara/{output_dir}', output_dir=output_dir)
+            max_mb = doc_processing.get('image_summary_cache_mb', DEFAULT_MAX_MB)
+            cache = _caches[output_dir] = ImageSummaryCache(os.path.join(db_dir, 'image_summary_cache.db'),
+                                                            max_bytes=float(max_mb) * 1024 * 1024)
+        return cache
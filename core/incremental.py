@@ -21,12 +21,15 @@ Design notes:
   refuse to delete rather than risk wiping live documents.
 """
 
+import hashlib
 import json
 import logging
-from dataclasses import dataclass
+import re
+from array import array
+from bisect import bisect_left
 from datetime import datetime, timezone
 from email.utils import parsedate_to_datetime
-from typing import Any, Dict, List, Optional, Set, Tuple
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple, Union
 
 from core.indexer_utils import normalize_url_for_metadata, md5_hex
 
@@ -72,18 +75,146 @@ _CONFIG_SIG_DOC_PROCESSING_KEYS = (
 _CONFIG_SIG_VECTARA_KEYS = ("chunking_strategy", "chunk_size", "whisper_model")
 
 
-@dataclass
+_MD5_HEX = re.compile(r"[0-9a-f]{32}")
+# One shared bytes object per distinct digest for the fields that repeat across documents
+# (config_sig is the same for every document indexed under one config).
+_interned_digests: Dict[bytes, bytes] = {}
+
+
+def _pack_digest(value: Optional[str], intern: bool = False) -> Union[bytes, str, None]:
+    """An md5 hex string as its 16-byte digest; anything else is kept as given."""
+    if value is None or not isinstance(value, str) or not _MD5_HEX.fullmatch(value):
+        return value
+    digest = bytes.fromhex(value)
+    if intern:
+        digest = _interned_digests.setdefault(digest, digest)
+    return digest
+
+
+def _unpack_digest(value: Union[bytes, str, None]) -> Optional[str]:
+    return value.hex() if isinstance(value, bytes) else value
+
+
 class ManifestEntry:
-    """One document as it currently exists in the corpus."""
-    doc_id: str
-    fingerprint: Optional[str] = None
-    content_hash: Optional[str] = None
-    config_sig: Optional[str] = None
-    last_updated: Optional[str] = None
-    parent_doc_id: Optional[str] = None
-    url: Optional[str] = None
-    sitemap_lastmod: Optional[str] = None
-    pub_date: Optional[str] = None
+    """
+    One document as it currently exists in the corpus.
+
+    Slotted, with the md5 fields (fingerprint, content_hash, config_sig) held as 16-byte
+    digests and exposed as hex strings, so a manifest of millions of documents stays small.
+    """
+    __slots__ = ("doc_id", "_fingerprint", "_content_hash", "_config_sig", "last_updated",
+                 "parent_doc_id", "url", "sitemap_lastmod", "pub_date")
+
+    _FIELDS = ("doc_id", "fingerprint", "content_hash", "config_sig", "last_updated",
+               "parent_doc_id", "url", "sitemap_lastmod", "pub_date")
+
+    def __init__(self, doc_id: str, fingerprint: Optional[str] = None,
+                 content_hash: Optional[str] = None, config_sig: Optional[str] = None,
+                 last_updated: Optional[str] = None, parent_doc_id: Optional[str] = None,
+                 url: Optional[str] = None, sitemap_lastmod: Optional[str] = None,
+                 pub_date: Optional[str] = None):
+        self.doc_id = doc_id
+        self.fingerprint = fingerprint
+        self.content_hash = content_hash
+        self.config_sig = config_sig
+        self.last_updated = last_updated
+        self.parent_doc_id = parent_doc_id
+        self.url = url
+        self.sitemap_lastmod = sitemap_lastmod
+        self.pub_date = pub_date
+
+    @property
+    def fingerprint(self) -> Optional[str]:
+        return _unpack_digest(self._fingerprint)
+
+    @fingerprint.setter
+    def fingerprint(self, value: Optional[str]) -> None:
+        self._fingerprint = _pack_digest(value)
+
+    @property
+    def content_hash(self) -> Optional[str]:
+        return _unpack_digest(self._content_hash)
+
+    @content_hash.setter
+    def content_hash(self, value: Optional[str]) -> None:
+        self._content_hash = _pack_digest(value)
+
+    @property
+    def config_sig(self) -> Optional[str]:
+        return _unpack_digest(self._config_sig)
+
+    @config_sig.setter
+    def config_sig(self, value: Optional[str]) -> None:
+        self._config_sig = _pack_digest(value, intern=True)
+
+    def _astuple(self) -> Tuple:
+        return tuple(getattr(self, f) for f in self._FIELDS)
+
+    def __eq__(self, other: Any) -> bool:
+        if not isinstance(other, ManifestEntry):
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{f}={getattr(self, f)!r}" for f in self._FIELDS)
+        return f"ManifestEntry({fields})"
+
+    def __getstate__(self) -> Tuple:
+        return tuple(getattr(self, slot) for slot in self.__slots__)
+
+    def __setstate__(self, state: Tuple) -> None:
+        for slot, value in zip(self.__slots__, state):
+            setattr(self, slot, value)
+
+
+class FingerprintMap:
+    """
+    Read-only {key: fingerprint} map for shipping to crawl workers (e.g. via ray.put).
+
+    Keys are stored as sorted 64-bit hashes in an array and fingerprints as 16-byte
+    digests in one bytes blob: about 24 bytes per document, against a few hundred for a
+    dict of strings. A hash collision can only hand a document another document's
+    fingerprint, which will not match its own, so the worst case is a re-index.
+    Fingerprints that are not md5 hex strings are left out (their documents are re-indexed).
+    """
+
+    def __init__(self, items: Iterable[Tuple[str, Optional[str]]]):
+        keys, digests = array("Q"), bytearray()
+        for key, fp in items:
+            if fp and isinstance(fp, str) and _MD5_HEX.fullmatch(fp):
+                keys.append(self._key(key))
+                digests += bytes.fromhex(fp)
+        # Sort by key hash through an index permutation rather than a list of (key, digest) tuples
+        order = sorted(range(len(keys)), key=keys.__getitem__)
+        self._keys = array("Q", (keys[i] for i in order))
+        sorted_digests = bytearray(len(digests))
+        for j, i in enumerate(order):
+            sorted_digests[16 * j:16 * (j + 1)] = digests[16 * i:16 * (i + 1)]
+        self._digests = bytes(sorted_digests)
+
+    @staticmethod
+    def _key(key: str) -> int:
+        return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "little")
+
+    def _index(self, key: str) -> int:
+        h = self._key(key)
+        i = bisect_left(self._keys, h)
+        return i if i < len(self._keys) and self._keys[i] == h else -1
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        i = self._index(key)
+        return self._digests[16 * i:16 * (i + 1)].hex() if i >= 0 else default
+
+    def __contains__(self, key: str) -> bool:
+        return self._index(key) >= 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+def fingerprint_map(manifest: Dict[str, ManifestEntry]) -> FingerprintMap:
+    """The compact {manifest key: fingerprint} map crawlers hand to index_url / index_file workers."""
+    return FingerprintMap((k, e.fingerprint) for k, e in manifest.items())
 
 
 def _canonical_json(obj: Any) -> str:
@@ -201,8 +332,13 @@ def build_manifest(indexer: Any, key: str = "url", source: Optional[str] = None)
     silently fail and degrade incremental to a full re-index. Docs missing a `source` (indexed
     before incremental was enabled) are excluded from a source-scoped manifest; they are then
     treated as new and re-indexed (and stamped) on the first incremental run.
+
+    The listing is consumed as it streams in, so only the (slotted) entries are held. Workers
+    that only need fingerprints should be given fingerprint_map(manifest) instead of the dict.
     """
     manifest: Dict[str, ManifestEntry] = {}
+    # Dates repeat across documents (a sitemap stamps whole sections with one lastmod): keep one copy
+    dates: Dict[Any, Any] = {}
     for d in indexer._list_docs():
         if source is not None and d.get("source") != source:
             continue
@@ -211,16 +347,18 @@ def build_manifest(indexer: Any, key: str = "url", source: Optional[str] = None)
             fingerprint=d.get("fingerprint"),
             content_hash=d.get("content_hash"),
             config_sig=d.get("config_sig"),
-            last_updated=d.get("last_updated"),
+            last_updated=dates.setdefault(d.get("last_updated"), d.get("last_updated")),
             parent_doc_id=d.get("parent_doc_id"),
             url=d.get("url"),
-            sitemap_lastmod=d.get("sitemap_lastmod"),
-            pub_date=d.get("pub_date"),
+            sitemap_lastmod=dates.setdefault(d.get("sitemap_lastmod"), d.get("sitemap_lastmod")),
+            pub_date=dates.setdefault(d.get("pub_date"), d.get("pub_date")),
         )
         if key == "url":
             if not entry.url:
                 continue
-            manifest[normalize_url_for_metadata(entry.url)] = entry
+            normalized = normalize_url_for_metadata(entry.url)
+            # Share the string with the entry when normalization leaves the URL unchanged
+            manifest[entry.url if normalized == entry.url else normalized] = entry
         else:
             if not entry.doc_id:
                 continue
@@ -3,10 +3,10 @@ logger = logging.getLogger(__name__)
 import json
 import time
 import warnings
-import base64
 import hashlib
-from typing import Dict, Any, List, Optional, Sequence, Tuple
-from collections import OrderedDict
+from typing import Dict, Any, Iterator, List, Optional, Sequence, Tuple, Union
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import shutil
 import mimetypes
 
@@ -19,7 +19,7 @@ import requests
 
 from slugify import slugify
 
-from omegaconf import OmegaConf
+from omegaconf import DictConfig, OmegaConf
 from nbconvert import HTMLExporter  # type: ignore
 import nbformat
 import markdown
@@ -29,10 +29,10 @@ import whisper
 from core.summary import get_attributes_from_text
 from core.models import get_api_key
 from core.utils import (
-    html_to_text, detect_language, create_session_with_retries,
+    html_to_text, detect_language, create_session_with_retries, RateLimiter,
     safe_remove_file, url_to_filename,
-    get_file_path_from_url, configure_session_for_ssl, get_docker_or_local_path,
-    get_headers, normalize_text, normalize_value, IMG_EXTENSIONS, release_memory
+    configure_session_for_ssl, get_docker_or_local_path,
+    get_headers, normalize_text, normalize_value, IMG_EXTENSIONS, release_memory, LRUCache
 )
 from core.extract import get_article_content
 from core.doc_parser import UnstructuredDocumentParser
@@ -51,6 +51,23 @@ from core.incremental import (
 from core.web_extractor_base import create_web_extractor
 from core.file_processor import FileProcessor
 from core.document_builder import MAX_SECTION_CHARS, MAX_PART_SIZE
+from core.upload_queue import UploadQueue, UploadTicket
+from core.json_stream import Base64Bytes, StreamingJSONBody
+from core.concurrency import AdaptiveConcurrencyAdapter, concurrency_settings, get_controller
+from core.upload_outbox import UploadOutbox
+from core.manifest_store import ManifestStore, manifest_record
+from core.near_duplicates import DEFAULT_MAX_DISTANCE, NearDuplicateIndex
+from core.image_summary_cache import ImageSummaryCache, get_image_summary_cache
+from core.validator_store import ValidatorStore
+from core.render_modes import RenderModes, create_render_modes
+from core.browser_pool import BrowserPool
+from core.stage_stats import (
+    CONFLICT_RETRY, DOCUMENT_BUILD, PARSE, TABLE_SUMMARY, UPLOAD, StageStats, bind_scope,
+    measured_document, stage
+)
+from core.compression import (
+    CompressionStats, GzipBody, file_positions, is_gzip_rejection, iter_multipart, rewind_files
+)
 
 # Suppress FutureWarning related to torch.load
 warnings.filterwarnings("ignore", category=FutureWarning, module="whisper")
@@ -74,6 +91,15 @@ def _document_has_oversized_part(document: Dict[str, Any]) -> bool:
     return False
 
 
+class _ListDocsError(Exception):
+    """A page of the corpus document listing could not be fetched."""
+
+
+def _is_transient_failure(status: Optional[int]) -> bool:
+    """True if an upload that failed with this status (None = no response) may succeed on a later try."""
+    return status is None or status == 429 or status >= 500
+
+
 class Indexer:
     """
     Vectara API class.
@@ -83,6 +109,41 @@ class Indexer:
         api_key (str): API key for the Vectara API.
     """
 
+    # Background upload state (see core/upload_queue.py). Class-level defaults keep the
+    # synchronous path working for instances built without __init__ (e.g. in tests).
+    upload_threads = 0
+    upload_queue_size = None
+    upload_queue: Optional[UploadQueue] = None
+    _upload_ticket: Optional[UploadTicket] = None
+    # gzip upload bodies (see core/compression.py); same reason for class-level defaults.
+    compress_uploads = False
+    _compression_stats: Optional[CompressionStats] = None
+    _compression_logged_bytes = 0
+    # Adaptive concurrency limiter settings (see core/concurrency.py); None = off.
+    concurrency_settings: Optional[Dict[str, Any]] = None
+    # Crash-safe upload outbox (see core/upload_outbox.py); None = off.
+    upload_outbox: Optional[UploadOutbox] = None
+    # Local corpus manifest kept write-through (see core/manifest_store.py); None = off.
+    manifest_store: Optional[ManifestStore] = None
+    manifest_ttl_seconds = 0.0
+    # Per-stage timing / byte / token counters (see core/stage_stats.py); None = off.
+    stage_stats: Optional[StageStats] = None
+    _stage_stats_logged_docs = 0
+    # Image summary cache shared by this process's summarizers (see core/image_summary_cache.py); None = off.
+    image_summary_cache: Optional[ImageSummaryCache] = None
+    _image_cache_logged_lookups = 0
+    # SimHash index of the pages indexed so far (see core/near_duplicates.py); None = off.
+    near_duplicates: Optional[NearDuplicateIndex] = None
+    _near_duplicate_candidate: Optional[Tuple[str, str, int]] = None   # (doc_id, url, fingerprint) of the page being indexed
+    # ETag / Last-Modified of statically fetched pages (see core/validator_store.py); None = off.
+    validator_store: Optional[ValidatorStore] = None
+    # Per-domain static / browser decision handed to the web extractor (see core/render_modes.py);
+    # None = always probe. Crawlers with Ray workers replace it with one shared by all workers.
+    render_modes: Optional[RenderModes] = None
+    # Shared Chromium servers the web extractor attaches to (see core/browser_pool.py); None =
+    # the extractor launches its own browser. Set by crawlers with Ray workers before first use.
+    browser_pool: Optional[BrowserPool] = None
+
     def __init__(self, cfg: OmegaConf, api_url: str,
                  corpus_key: str, api_key: str, scrape_method: str = None) -> None:
         self.cfg = cfg
@@ -124,6 +185,64 @@ class Indexer:
         if self.incremental and self.reindex:
             logger.info("vectara.reindex is redundant under incremental mode (changed "
                         "documents are replaced automatically); you can remove it.")
+        # The opt-in SQLite stores below live next to the crawl tracking DB. Resolved once, and
+        # only when one of them is on, so other runs do not create the output dir.
+        conditional_requests = self.incremental and _crawler_cfg.get("conditional_requests", False)
+        near_duplicate_store = cfg.vectara.get("near_duplicates", False) and cfg.vectara.get("near_duplicate_store", False)
+        db_dir = None
+        if (conditional_requests or near_duplicate_store or _crawler_cfg.get("learn_render_mode", False)
+                or cfg.vectara.get("upload_outbox", False) or cfg.vectara.get("manifest_cache", False)):
+            db_dir = get_docker_or_local_path(docker_path=f'/home/vectara/{self.output_dir}',
+                                              output_dir=self.output_dir)
+        # Conditional re-crawls: pages whose stored validators still match the corpus
+        # fingerprint are requested with If-None-Match / If-Modified-Since, and a 304 is a skip.
+        self.validator_store = None
+        if conditional_requests:
+            self.validator_store = ValidatorStore(os.path.join(db_dir, "http_validators.db"), corpus_key)
+        self.render_modes = None
+        if _crawler_cfg.get("learn_render_mode", False):
+            self.render_modes = create_render_modes(_crawler_cfg, db_dir)
+        # Pipelined uploads: with upload_threads > 0, index_segments / _index_file hand the
+        # built document to a bounded pool of uploader threads and return immediately, so
+        # parsing the next document overlaps the Vectara POST. The queue itself is created
+        # lazily (threads do not pickle, and the Indexer is shipped to Ray actors).
+        self.upload_threads = int(cfg.vectara.get("upload_threads", 0) or 0)
+        self.upload_queue_size = cfg.vectara.get("upload_queue_size", None)
+        self.upload_queue = None
+        self._upload_ticket = None
+        # gzip Content-Encoding for document and upload_file bodies. Switched off for the
+        # rest of the run if the endpoint turns out not to accept it.
+        self.compress_uploads = bool(cfg.vectara.get("compress_uploads", False))
+        self._compression_stats = CompressionStats() if self.compress_uploads else None
+        self._compression_logged_bytes = 0
+        # AIMD limit on in-flight Vectara API requests, driven by 429/503 and latency
+        # (None when vectara.adaptive_concurrency is off). See core/concurrency.py.
+        self.concurrency_settings = concurrency_settings(cfg.vectara)
+        # Built documents are kept in an SQLite outbox next to the crawl tracking DB until
+        # Vectara has answered, and replayed by drain_outbox() if the run dies first.
+        self.upload_outbox = None
+        if cfg.vectara.get("upload_outbox", False):
+            self.upload_outbox = UploadOutbox(os.path.join(db_dir, "upload_outbox.db"),
+                                              corpus_key, self.crawler_type)
+        # Local copy of the corpus manifest, so incremental runs do not list the whole
+        # corpus every time; see _list_docs.
+        self.manifest_store = None
+        if cfg.vectara.get("manifest_cache", False):
+            self.manifest_store = ManifestStore(os.path.join(db_dir, "corpus_manifest.db"), corpus_key)
+            self.manifest_ttl_seconds = float(cfg.vectara.get("manifest_ttl_hours", 24) or 0) * 3600
+        # Where the time goes per document: every index_* call is timed stage by stage, and
+        # the totals and percentiles are logged at the end of the crawl.
+        self.stage_stats = StageStats() if cfg.vectara.get("stage_stats", False) else None
+        self._stage_stats_logged_docs = 0
+        self._image_cache_logged_lookups = 0
+        # Pages whose text nearly duplicates a page already indexed (print views, tracking
+        # parameters, mirrors) are skipped in index_url before any LLM or upload work.
+        self.near_duplicates = None
+        if cfg.vectara.get("near_duplicates", False):
+            db_path = os.path.join(db_dir, "near_duplicates.db") if near_duplicate_store else None
+            self.near_duplicates = NearDuplicateIndex(
+                max_distance=cfg.vectara.get("near_duplicate_distance", DEFAULT_MAX_DISTANCE),
+                db_path=db_path, scope=corpus_key)
         self.whisper_model = None
         self.whisper_model_name = cfg.vectara.get("whisper_model", "base")
         self.static_metadata = cfg.get('metadata', None)
@@ -134,6 +253,7 @@ class Indexer:
         self.enable_gmft = cfg.doc_processing.get("enable_gmft", False)
         self.do_ocr = cfg.doc_processing.get("do_ocr", False)
         self.summarize_images = cfg.doc_processing.get("summarize_images", False)
+        self.image_summary_cache = get_image_summary_cache(cfg) if self.summarize_images else None
         self.add_image_bytes = cfg.doc_processing.get("add_image_bytes", False)
         self.process_locally = cfg.doc_processing.get("process_locally", False)
         self.doc_parser = cfg.doc_processing.get("doc_parser", "docling")
@@ -183,8 +303,9 @@ class Indexer:
         self.file_processor = None
         
         # Performance optimizations
-        self._doc_exists_cache = OrderedDict()  # LRU cache for document existence checks
-        self._max_cache_size = 1000  # Prevent memory leaks on large corpora
+        # LRU cache for document existence checks, bounded to prevent memory leaks on large
+        # corpora; locked, since uploader and delete threads evict from it
+        self._doc_exists_cache = LRUCache(max_size=1000)
 
         self.setup()
     
@@ -208,12 +329,16 @@ class Indexer:
     def _init_processors(self):
         """Lazy initialization of specialized processors"""
         if self.web_extractor is None:
+            pool_kwargs = {'browser_pool': self.browser_pool} if self.browser_pool is not None else {}
             self.web_extractor = create_web_extractor(
                 cfg=self.cfg,
                 scrape_method=self.scrape_method,
                 timeout=self.timeout,
-                post_load_timeout=self.post_load_timeout
+                post_load_timeout=self.post_load_timeout,
+                **pool_kwargs
             )
+            if hasattr(self.web_extractor, 'render_modes'):
+                self.web_extractor.render_modes = self.render_modes
         
         if self.file_processor is None:
             self.file_processor = FileProcessor(
@@ -276,6 +401,8 @@ class Indexer:
 
     def setup(self, use_playwright: bool = True) -> None:
         self.session = create_session_with_retries()
+        if self.concurrency_settings:
+            self.session.mount(self.api_url, AdaptiveConcurrencyAdapter(self.concurrency_settings))
         configure_session_for_ssl(self.session, self.cfg.vectara)
 
         # Browser handling is now done by WebContentExtractor
@@ -323,6 +450,229 @@ class Indexer:
         # Direct sync call since WebContentExtractor is now sync
         return self.web_extractor.check_download_or_pdf(url, get_headers(self.cfg), timeout)
 
+    def fetch_url(
+            self,
+            url: str,
+            extract_tables: bool = False,
+            extract_images: bool = False,
+            remove_code: bool = False,
+            html_processing: dict = None,
+            validators: dict = None,
+    ) -> dict:
+        '''
+        Classify a URL and fetch it in one request / navigation: returns {'type': 'html', ...page contents},
+        {'type': 'pdf', 'url', 'content', 'headers'} or {'type': 'download', 'url', 'filename', 'download'}.
+        With validators (an earlier response's ETag / Last-Modified) the request is conditional, and
+        {'type': 'not_modified', 'url'} means the page has not changed since.
+        '''
+        self._init_processors()
+        if validators:
+            return self.web_extractor.fetch_url(url, extract_tables, extract_images, remove_code, html_processing,
+                                                validators=validators)
+        return self.web_extractor.fetch_url(url, extract_tables, extract_images, remove_code, html_processing)
+
+    def _fetch_signature(self, html_processing: dict) -> str:
+        """md5 of the options that shape a page's extracted text, which config_sig does not cover."""
+        if isinstance(html_processing, DictConfig):
+            html_processing = OmegaConf.to_container(html_processing, resolve=True)
+        return md5_hex(json.dumps({'html_processing': html_processing or {}, 'remove_code': self.remove_code},
+                                  sort_keys=True, default=str))
+
+    def _conditional_validators(self, url: str, metadata: Dict[str, Any], html_processing: dict,
+                                prior_fingerprint: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        The stored validators of url, if a 304 for them would provably mean "unchanged": the
+        page's stored content hash and page-derived metadata, with this run's source metadata
+        and config, reproduce the fingerprint the corpus holds. Otherwise None (fetch in full).
+        """
+        if self.validator_store is None or not prior_fingerprint:
+            return None
+        stored = self.validator_store.get(normalize_url_for_metadata(url))
+        if stored is None or stored['fetch_sig'] != self._fetch_signature(html_processing):
+            return None
+        expected = compute_fingerprint(stored['content_hash'], {**metadata, **stored['page_metadata']},
+                                       self.config_sig)
+        return stored if expected == prior_fingerprint else None
+
+    @contextmanager
+    def prefetching(self, urls: List[str], html_processing: dict = None, rate_limiter=None) -> Iterator[bool]:
+        """
+        Let the web extractor fetch the given URLs ahead of the index_url() calls for them,
+        when it can (scrape_method: playwright_async). Yields True if prefetching is on; the
+        caller then need not rate-limit index_url, since each prefetch passes rate_limiter.
+        Prefetched results left unused when the block exits are discarded.
+
+        Usage:
+            with indexer.prefetching(urls, html_processing) as prefetched:
+                for url in urls:
+                    indexer.index_url(url, metadata, html_processing=html_processing)
+        """
+        self._init_processors()
+        prefetch = getattr(self.web_extractor, 'prefetch', None)
+        if prefetch is None:
+            yield False
+            return
+        # The same URLs and options index_url() will ask the extractor for
+        urls = [u.split("#")[0] for u in urls]
+        prefetch([u for u in urls if not u.lower().endswith((".md", ".ipynb"))],
+                 extract_tables=self.parse_tables, extract_images=False, remove_code=self.remove_code,
+                 html_processing=html_processing or {}, rate_limiter=rate_limiter)
+        try:
+            yield True
+        finally:
+            self.web_extractor.discard_prefetched()
+
+    def _get_upload_queue(self) -> Optional[UploadQueue]:
+        """The background upload queue, or None when uploads are synchronous."""
+        if self.upload_threads <= 0:
+            return None
+        if self.upload_queue is None:
+            self.upload_queue = UploadQueue(self.upload_threads, self.upload_queue_size)
+            logger.info(f"Background uploads enabled: {self.upload_queue.num_threads} uploader threads, "
+                        f"up to {self.upload_queue.max_pending} documents queued")
+        return self.upload_queue
+
+    @contextmanager
+    def upload_ticket(self, key: str) -> Iterator[UploadTicket]:
+        """
+        Group every background upload submitted inside the block under one UploadTicket,
+        so a crawler can report the source item (file, URL) once all of its documents have
+        been accepted or rejected. With synchronous uploads the ticket stays empty and the
+        index_* return value is already final.
+
+        Usage:
+            with indexer.upload_ticket(file_path) as ticket:
+                ok = indexer.index_file(file_path, uri, metadata)
+            if len(ticket):   # uploads still in flight
+                ...           # ticket.done() / ticket.wait() / ticket.errors()
+        """
+        ticket = UploadTicket(key)
+        previous = self._upload_ticket
+        self._upload_ticket = ticket
+        try:
+            yield ticket
+        finally:
+            self._upload_ticket = previous
+            if previous is not None:
+                previous.extend(ticket)   # a nested ticket's uploads also count for the enclosing one
+
+    def _enqueue_upload(self, doc_id: str, upload_fn) -> bool:
+        """Submit an upload job (blocking while the queue is full) and attach it to the
+        current ticket, if any. Uploads outside a ticket are only logged and counted."""
+        # The upload still counts towards the document's stages when it runs on an uploader thread
+        future = self._get_upload_queue().submit(bind_scope(upload_fn))
+        if self._upload_ticket is not None:
+            self._upload_ticket.add(doc_id, future)
+        return True
+
+    def wait_for_uploads(self) -> Dict[str, Any]:
+        """Block until every queued upload has finished and shut the uploader threads down.
+        Returns the queue's counters (empty when uploads are synchronous)."""
+        stats = {}
+        if self.upload_queue is not None:
+            queue, self.upload_queue = self.upload_queue, None
+            queue.close(wait=True)
+            stats = queue.stats()
+            logger.info(f"Background uploads: {stats['succeeded']} succeeded, {stats['failed']} failed; "
+                        f"{stats['upload_seconds']}s uploading overlapped with parsing, "
+                        f"{stats['blocked_seconds']}s waiting on a full queue")
+        self._log_compression_stats()
+        self._log_stage_stats()
+        self._log_image_cache_stats()
+        if self.concurrency_settings:
+            c = get_controller(self.concurrency_settings).stats()
+            logger.info(f"Adaptive concurrency: limit {c['limit']}, {c['successes']} healthy responses, "
+                        f"{c['throttles']} throttled, {c['decreases']} decreases")
+        return stats
+
+    def _log_compression_stats(self) -> None:
+        """Log bytes saved by gzip upload bodies (once per batch of new uploads)."""
+        if self._compression_stats is None:
+            return
+        summary = self._compression_stats.summary()
+        if summary['raw_bytes'] == self._compression_logged_bytes:
+            return
+        self._compression_logged_bytes = summary['raw_bytes']
+        logger.info(f"Upload compression: {summary['uploads']} gzip uploads, "
+                    f"{summary['raw_bytes'] / 1e6:.1f} MB -> {summary['sent_bytes'] / 1e6:.1f} MB on the wire "
+                    f"({summary['saved_pct']}% saved)")
+
+    def _log_image_cache_stats(self) -> None:
+        """Log the image summary cache hit rate (once per batch of new lookups)."""
+        cache = self.image_summary_cache
+        if cache is None or cache.hits + cache.misses == self._image_cache_logged_lookups:
+            return
+        self._image_cache_logged_lookups = cache.hits + cache.misses
+        c = cache.stats()
+        logger.info(f"Image summary cache: {c['hits']} hits, {c['misses']} misses "
+                    f"({c['hit_rate']:.0%} hit rate); {c['entries']} summaries, {c['bytes'] / 1e6:.1f} MB stored")
+
+    def stage_summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per-stage totals and percentiles of the documents indexed so far (see
+        core/stage_stats.py); empty when vectara.stage_stats is off."""
+        return self.stage_stats.summary() if self.stage_stats is not None else {}
+
+    def _log_stage_stats(self) -> None:
+        """Log the per-stage table (once per batch of new documents)."""
+        if self.stage_stats is None:
+            return
+        docs = self.stage_stats.documents()
+        if docs == self._stage_stats_logged_docs:
+            return
+        self._stage_stats_logged_docs = docs
+        logger.info(f"Per-stage timing over {docs} documents:\n{self.stage_stats.format_summary()}")
+
+    def _send_gzip(self, url: str, headers: Dict[str, str], chunks, content_type: Optional[str],
+                   send_identity) -> requests.Response:
+        """
+        POST the gzip of `chunks`. If the endpoint refuses gzip, resend with send_identity()
+        and, when that gets a different answer, stop compressing for the rest of the run.
+        """
+        gzip_headers = dict(headers, **{'Content-Encoding': 'gzip'})
+        if content_type:
+            gzip_headers['Content-Type'] = content_type
+        with GzipBody(chunks) as body:
+            response = self.session.post(url, data=body, headers=gzip_headers)
+            raw_size, sent_size = body.raw_size, body.size
+        if not is_gzip_rejection(response):
+            if self._compression_stats is None:
+                self._compression_stats = CompressionStats()
+            self._compression_stats.record(raw_size, sent_size)
+            return response
+
+        identity_response = send_identity()
+        # A document the API rejects either way says nothing about gzip support.
+        if identity_response.status_code != response.status_code:
+            logger.warning(f"Endpoint rejected a gzip upload body (HTTP {response.status_code}); "
+                           f"sending uncompressed bodies from now on")
+            self.compress_uploads = False
+        return identity_response
+
+    def _post_body(self, url: str, data: Union[str, bytes, StreamingJSONBody],
+                   headers: Dict[str, str]) -> requests.Response:
+        """POST a serialized document, gzip-encoded when compress_uploads is on."""
+        if not self.compress_uploads:
+            return self.session.post(url, data=data, headers=headers)
+        if isinstance(data, (str, bytes)):
+            chunks = [data.encode('utf-8') if isinstance(data, str) else data]
+        else:
+            chunks = data
+        return self._send_gzip(url, headers, chunks, None,
+                               lambda: self.session.post(url, data=data, headers=headers))
+
+    def _post_multipart(self, url: str, headers: Dict[str, str], files: Dict[str, Any]) -> requests.Response:
+        """POST an upload_file multipart body, gzip-encoded when compress_uploads is on."""
+        if not self.compress_uploads:
+            return self.session.request("POST", url, headers=headers, files=files)
+        positions = file_positions(files)
+        boundary = uuid.uuid4().hex
+
+        def _identity():
+            rewind_files(files, positions)
+            return self.session.request("POST", url, headers=headers, files=files)
+
+        return self._send_gzip(url, headers, iter_multipart(files, boundary),
+                               f"multipart/form-data; boundary={boundary}", _identity)
 
     def _does_doc_exist(self, doc_id: str) -> bool:
         """
@@ -338,10 +688,10 @@ class Indexer:
         Returns:
             bool: True if the document exists, False otherwise.
         """
-        # Check cache first - this moves item to end (most recently used)
-        if doc_id in self._doc_exists_cache:
-            self._doc_exists_cache.move_to_end(doc_id)
-            return self._doc_exists_cache[doc_id]
+        # Check cache first - this marks the item most recently used
+        cached = self._doc_exists_cache.get(doc_id)
+        if cached is not None:
+            return cached
         
         post_headers = {
             'x-api-key': self.api_key,
@@ -353,11 +703,7 @@ class Indexer:
             headers=post_headers)
 
         exists = response.status_code == 200
-        
-        # LRU eviction: remove least recently used item when cache is full
-        if len(self._doc_exists_cache) >= self._max_cache_size:
-            self._doc_exists_cache.popitem(last=False)
-        
+        # Evicts the least recently used item when the cache is full
         self._doc_exists_cache[doc_id] = exists
         return exists
 
@@ -394,11 +740,74 @@ class Indexer:
         
         # Clear from cache since it's now deleted
         self._doc_exists_cache.pop(doc_id, None)
+        if self.manifest_store is not None:
+            self.manifest_store.delete(doc_id)
+        if self.near_duplicates is not None:
+            self.near_duplicates.remove(doc_id)
         return True
 
-    def _list_docs(self, metadata_filter: Optional[str] = None) -> List[Dict[str, Any]]:
+    def delete_docs(self, doc_ids: Sequence[str], num_threads: Optional[int] = None,
+                    max_per_second: Optional[float] = None) -> Dict[str, bool]:
+        """
+        Delete many documents (e.g. the plan_deletions output) through a bounded pool of
+        threads, rate limited, logging progress as it goes.
+
+        Args:
+            doc_ids: IDs of the documents to delete. Duplicates are deleted once.
+            num_threads (int): Concurrent deletes (defaults to vectara.delete_threads, 8).
+            max_per_second (float): Cap on delete requests per second (defaults to
+                vectara.delete_per_second, 50; 0 = no cap).
+
+        Returns:
+            dict: {doc_id: True if deleted, False otherwise}, in the order given.
+        """
+        doc_ids = list(dict.fromkeys(doc_ids))
+        if not doc_ids:
+            return {}
+        if num_threads is None:
+            num_threads = int(self.cfg.vectara.get("delete_threads", 8) or 1)
+        if max_per_second is None:
+            max_per_second = float(self.cfg.vectara.get("delete_per_second", 50) or 0)
+        limiter = RateLimiter(max_per_second) if max_per_second > 0 else None
+
+        def _delete(doc_id: str) -> bool:
+            if limiter is None:
+                return self.delete_doc(doc_id)
+            with limiter:
+                return self.delete_doc(doc_id)
+
+        outcomes: Dict[str, bool] = {}
+        total = len(doc_ids)
+        log_every = max(100, total // 20)
+        st = time.time()
+        with ThreadPoolExecutor(max_workers=max(1, min(num_threads, total)),
+                                thread_name_prefix="vectara-delete") as executor:
+            futures = {executor.submit(_delete, doc_id): doc_id for doc_id in doc_ids}
+            for done, future in enumerate(as_completed(futures), start=1):
+                try:
+                    outcomes[futures[future]] = future.result()
+                except Exception as e:
+                    logger.error(f"Delete failed for doc_id = {futures[future]}: {e}")
+                    outcomes[futures[future]] = False
+                if done % log_every == 0 and done < total:
+                    logger.info(f"Deleted {sum(outcomes.values())} of {done} docs processed "
+                                f"({total} planned, {done / (time.time() - st):.1f}/s)")
+        deleted = sum(outcomes.values())
+        logger.info(f"Bulk delete: {deleted} deleted, {total - deleted} failed, "
+                    f"{time.time() - st:.1f}s")
+        return {doc_id: outcomes[doc_id] for doc_id in doc_ids}
+
+    def _list_docs(self, metadata_filter: Optional[str] = None) -> Iterator[Dict[str, Any]]:
         """
-        List documents in the corpus.
+        List documents in the corpus, one page at a time.
+
+        This is a generator, so a corpus of millions of documents is never held in memory
+        as a list; callers that need one should wrap it in list(). If a page cannot be
+        fetched the error is logged and the listing stops early.
+
+        With vectara.manifest_cache on, an unfiltered listing is served from the local
+        manifest store while it is fresh (see core/manifest_store.py), and otherwise
+        refreshes it.
 
         Args:
             metadata_filter (str, optional): Raw Vectara metadata filter expression (same
@@ -407,13 +816,33 @@ class Indexer:
                 the corpus; otherwise it errors. Source-scoping for incremental crawls is done
                 client-side in build_manifest instead, so it does not depend on corpus config.
 
-        Returns:
-            list of dicts, one per document, with: id, url, source, fingerprint, content_hash,
+        Yields:
+            one dict per document, with: id, url, source, fingerprint, content_hash,
             config_sig, last_updated, parent_doc_id, sitemap_lastmod, pub_date. Values are
             taken from metadata; missing keys are None.
         """
+        try:
+            if metadata_filter is None and self.manifest_store is not None:
+                yield from self._list_docs_cached()
+            else:
+                yield from self._iter_corpus_docs(metadata_filter)
+        except _ListDocsError as e:
+            logger.error(str(e))
+
+    def _list_docs_cached(self) -> Iterator[Dict[str, Any]]:
+        store = self.manifest_store
+        if store.is_fresh(self.manifest_ttl_seconds, self.corpus_doc_count()):
+            logger.info(f"Using the local corpus manifest ({store.count()} docs) instead of listing the corpus")
+        else:
+            # Raises _ListDocsError before the store is marked filled, so nothing partial is served
+            listed = store.replace_all(self._iter_corpus_docs())
+            logger.info(f"Listed {listed} docs from the corpus into the local corpus manifest")
+        yield from store.records()
+
+    def _iter_corpus_docs(self, metadata_filter: Optional[str] = None) -> Iterator[Dict[str, Any]]:
+        """Page through the documents API, yielding manifest records. Raises _ListDocsError
+        if a page cannot be fetched, so a partial listing is never taken for a full one."""
         page_key = None  # Initialize page_key as None
-        docs = []
 
         # Loop until there's no next page
         while True:
@@ -431,25 +860,12 @@ class Indexer:
                 f"{self.api_url}/v2/corpora/{self.corpus_key}/documents",
                 headers=post_headers, params=params)
             if response.status_code != 200:
-                logger.error(f"Error listing documents with status code {response.status_code}")
-                return []
+                raise _ListDocsError(f"Error listing documents with status code {response.status_code}")
             res = response.json()
 
             # Extract id + reindexing fields from document metadata
             for doc in res.get('documents', []):
-                md = doc.get('metadata', {}) or {}
-                docs.append({
-                    'id': doc['id'],
-                    'url': md.get('url'),
-                    'source': md.get('source'),
-                    'fingerprint': md.get('fingerprint'),
-                    'content_hash': md.get('content_hash'),
-                    'config_sig': md.get('config_sig'),
-                    'last_updated': md.get('last_updated'),
-                    'parent_doc_id': md.get('parent_doc_id'),
-                    'sitemap_lastmod': md.get('sitemap_lastmod'),
-                    'pub_date': md.get('pub_date'),
-                })
+                yield manifest_record(doc['id'], doc.get('metadata', {}))
 
             response_metadata = res.get('metadata', None)
             # Check if we need to go further
@@ -458,7 +874,19 @@ class Indexer:
             else:
                 page_key = response_metadata['page_key']
 
-        return docs
+    def corpus_doc_count(self) -> Optional[int]:
+        """Number of documents in the corpus per the compute_size API, or None if unavailable."""
+        try:
+            response = self.session.post(
+                f"{self.api_url}/v2/corpora/{self.corpus_key}/compute_size",
+                headers={'x-api-key': self.api_key, 'X-Source': self.x_source})
+        except requests.exceptions.RequestException as e:
+            logger.warning(f"Could not get the corpus size: {e}")
+            return None
+        if response.status_code != 200:
+            logger.warning(f"Could not get the corpus size (status code {response.status_code})")
+            return None
+        return response.json().get('used_docs')
 
 
     def _incremental_skip(self, content_hash: Optional[str], metadata: Dict[str, Any],
@@ -500,10 +928,11 @@ class Indexer:
         return h.hexdigest()
 
     def was_skipped(self) -> bool:
-        """True if the most recent index_* call skipped an unchanged document (incremental).
+        """True if the most recent index_* call skipped an unchanged document (incremental)
+        or a near-duplicate of a page already indexed (near_duplicates).
         Lets crawler workers distinguish a skip from a fresh index without poking at the
         last_skip_reason attribute directly."""
-        return self.last_skip_reason == "unchanged"
+        return self.last_skip_reason in ("unchanged", "near_duplicate")
 
     def stamp_subdoc_metadata(self, sub_metadata: Dict[str, Any], parent_doc_id: str) -> None:
         """Tag a sub-document (image / PDF part / media transcript / spreadsheet sheet) so the
@@ -525,6 +954,46 @@ class Indexer:
 
         metadata = prepare_file_metadata(metadata, filename, self.static_metadata)
 
+        if self._get_upload_queue() is not None:
+            # Callers routinely delete the file (temp downloads, split PDF parts) as soon as
+            # this returns, so the queued upload works from its own hard link / copy.
+            staged = self._stage_file_for_upload(filename)
+
+            def _upload():
+                try:
+                    return self._upload_file(staged, uri, metadata, id)
+                finally:
+                    safe_remove_file(staged)
+                    shutil.rmtree(os.path.dirname(staged), ignore_errors=True)
+            return self._enqueue_upload(id if id is not None else os.path.basename(filename), _upload)
+
+        succeeded, error = self._upload_file(filename, uri, metadata, id)
+        if not succeeded:
+            self.last_error = error
+        return succeeded
+
+    @staticmethod
+    def _stage_file_for_upload(filename: str) -> str:
+        """Hard-link (or, across filesystems, copy) a file into a private temp dir so a
+        queued upload does not race the caller's cleanup of the original."""
+        staging_dir = tempfile.mkdtemp(prefix="vectara-upload-")
+        staged = os.path.join(staging_dir, os.path.basename(filename))
+        try:
+            os.link(filename, staged)
+        except OSError:
+            shutil.copyfile(filename, staged)
+        return staged
+
+    def _upload_file(self, filename: str, uri: str, metadata: Dict[str, Any],
+                     id: str = None) -> Tuple[bool, Optional[str]]:
+        """
+        POST a file to the upload_file API, replacing it on conflict when reindex or
+        incremental is set. Runs on an uploader thread: the instance state it shares with the
+        caller (the doc-exists cache, the stores, the compression stats) is thread-safe.
+
+        Returns:
+            (succeeded, error message or None)
+        """
         post_headers = {
             'Accept': 'application/json',
             'x-api-key': self.api_key,
@@ -534,14 +1003,14 @@ class Indexer:
 
         # Simple approach: upload the file, replacing on conflict when reindex or incremental is set
         try:
-            with open(filename, 'rb') as file_handle:
+            with stage(UPLOAD) as span, open(filename, 'rb') as file_handle:
+                span.add(bytes_out=os.fstat(file_handle.fileno()).st_size)
                 files, _, content_type = create_upload_files_dict(filename, metadata, self.parse_tables, self.cfg)
                 files['file'] = (upload_filename, file_handle, content_type)
-                response = self.session.request("POST", url, headers=post_headers, files=files)
+                response = self._post_multipart(url, post_headers, files)
         except Exception as e:
             logger.error(f"Exception {e} while uploading file {filename}")
-            self.last_error = f"upload exception: {e}"
-            return False
+            return False, f"upload exception: {e}"
 
         # Handle the response
         if response.status_code == 201:
@@ -549,7 +1018,8 @@ class Indexer:
                 logger.info(f"File {uri} indexed successfully")
             if self.store_docs:
                 store_file(filename, url_to_filename(uri), self.store_docs, self.store_docs_folder)
-            return True
+            self._record_in_manifest(upload_filename, metadata)
+            return True, None
         elif response.status_code in [409, 412]:
             # reindex replaces on conflict by request; incremental implies it — a doc only
             # reaches this upload if it is new or changed, so an existing-doc conflict means
@@ -567,38 +1037,42 @@ class Indexer:
                 doc_id = parse_conflict_doc_id(response.text) or (id if id else os.path.basename(filename))
 
                 # Delete the existing document
+                retry = stage(CONFLICT_RETRY)
                 if self.delete_doc(doc_id):
                     # Retry the upload
                     try:
-                        with open(filename, 'rb') as file_handle:
+                        with retry, open(filename, 'rb') as file_handle:
+                            retry.add(bytes_out=os.fstat(file_handle.fileno()).st_size)
                             files, _, content_type = create_upload_files_dict(filename, metadata, self.parse_tables, self.cfg)
                             files['file'] = (upload_filename, file_handle, content_type)
-                            response = self.session.request("POST", url, headers=post_headers, files=files)
+                            response = self._post_multipart(url, post_headers, files)
 
                         if response.status_code == 201:
                             if self.verbose:
                                 logger.info(f"File {uri} re-indexed successfully")
                             if self.store_docs:
                                 store_file(filename, url_to_filename(uri), self.store_docs, self.store_docs_folder)
-                            return True
+                            self._record_in_manifest(upload_filename, metadata)
+                            return True, None
                         # Re-upload returned a non-201 — fall through to the
                         # generic error path below so the status code lands in
                         # last_error.
                     except Exception as e:
                         logger.error(f"Failed to re-index file {uri}: {e}")
-                        self.last_error = f"re-upload exception: {e}"
-                        return False
+                        return False, f"re-upload exception: {e}"
+                else:
+                    retry.end()
             else:
                 # File already exists but reindex is disabled - treat as success
                 if self.verbose:
                     logger.info(f"File {uri} already exists (skipping, already indexed)")
-                return True
+                return True, None
 
         # Log error for any other status code
         logger.error(f"Failed to upload file {uri}. Status code: {response.status_code}, Message: {response.text}")
-        self.last_error = f"upload returned HTTP {response.status_code}: {response.text[:200]}"
-        return False
+        return False, f"upload returned HTTP {response.status_code}: {response.text[:200]}"
 
+    @measured_document
     def index_document(self, document: Dict[str, Any], use_core_indexing: bool = False,
                        prior_fingerprint: Optional[str] = None,
                        content_hash_override: Optional[str] = None) -> bool:
@@ -623,8 +1097,31 @@ class Indexer:
         """
         self._last_response_status = None
         self.last_skip_reason = None
-        api_endpoint = f"{self.api_url}/v2/corpora/{self.corpus_key}/documents"
+        data = self._prepare_document(document, use_core_indexing, prior_fingerprint,
+                                      content_hash_override)
+        if data is None:
+            # Either serialization failed or the document is unchanged (incremental skip).
+            return self.was_skipped()
+
+        succeeded, status, _ = self._post_document(document, data)
+        self._last_response_status = status
+        return succeeded
+
+    def _prepare_document(self, document: Dict[str, Any], use_core_indexing: bool,
+                          prior_fingerprint: Optional[str] = None,
+                          content_hash_override: Optional[str] = None
+                          ) -> Optional[Union[str, StreamingJSONBody]]:
+        """
+        Everything index_document does before the network: static metadata, URL
+        normalization, the incremental skip decision, document type / chunking and JSON
+        serialization. Runs on the caller's thread even when uploads are queued, so
+        last_skip_reason stays meaningful for the caller.
 
+        Returns:
+            The serialized document (a StreamingJSONBody when it carries image bytes), or
+            None if it was skipped as unchanged (was_skipped() is True) or could not be
+            serialized.
+        """
         # Prepare the document data
         if self.static_metadata:
             metadata = None
@@ -653,7 +1150,7 @@ class Indexer:
             if self._incremental_skip(content_hash, document['metadata'], prior_fingerprint):
                 if self.verbose:
                     logger.info(f"Document {document['id']} unchanged (fingerprint match) — skipping")
-                return True
+                return None
 
         if use_core_indexing:
             document['type'] = 'core'
@@ -665,40 +1162,116 @@ class Indexer:
             if chunking_config:
                 document['chunking_strategy'] = chunking_config
 
-        post_headers = {
-            'x-api-key': self.api_key,
-            'X-Source': self.x_source
-        }
-
         try:
-            data = json.dumps(document)
+            with stage(DOCUMENT_BUILD) as span:
+                if document.get('images'):
+                    # Image bytes stay raw and are base64-encoded chunk by chunk as the request
+                    # is sent, instead of materializing the whole JSON payload here.
+                    data = StreamingJSONBody(document)
+                else:
+                    data = json.dumps(document)
+                # json.dumps escapes non-ASCII, so characters == bytes
+                doc_size = len(data)
+                span.add(bytes_out=doc_size)
         except Exception as e:
             logger.info(f"Can't serialize document {document} (error {e}), skipping")
-            return False
+            return None
 
-        doc_size = len(data.encode('utf-8'))
         if doc_size < 1024:
             logger.info(f"Document '{document['id']}' size: {doc_size} bytes")
         else:
             logger.info(f"Document '{document['id']}' size: {doc_size / 1024:.1f} KB")
+        return data
+
+    def _write_to_outbox(self, document: Dict[str, Any], data: Union[str, bytes, StreamingJSONBody]) -> None:
+        """Record a serialized document in the upload outbox (if on) before it is posted or queued."""
+        if self.upload_outbox is None:
+            return
+        try:
+            self.upload_outbox.put(document['id'], data, document.get('metadata'))
+        except Exception as e:
+            logger.warning(f"Could not write document {document['id']} to the upload outbox: {e}")
+
+    def _post_document(self, document: Dict[str, Any], data: Union[str, bytes, StreamingJSONBody],
+                       in_outbox: bool = False) -> Tuple[bool, Optional[int], Optional[str]]:
+        """
+        POST a serialized document, replacing it on conflict when reindex or incremental is
+        set. Runs on an uploader thread: the instance state it shares with the caller (the
+        doc-exists cache, the stores, the compression stats) is thread-safe.
+
+        With the upload outbox on, the body is written to the outbox first (unless in_outbox:
+        _enqueue_document writes it before queueing) and stays there only if the upload may
+        still succeed later (connection error, 429 or 5xx).
+
+        Returns:
+            (succeeded, last HTTP status or None, error message or None)
+        """
+        if self.upload_outbox is None:
+            return self._send_document(document, data)
+        if not in_outbox:
+            self._write_to_outbox(document, data)
+        result = self._send_document(document, data)
+        succeeded, status, _ = result
+        if succeeded or not _is_transient_failure(status):
+            self.upload_outbox.remove(document['id'])
+        return result
+
+    def drain_outbox(self) -> List[str]:
+        """
+        Upload the documents a previous run built but did not get accepted, without
+        rebuilding them. Documents that fail again for a transient reason stay in the
+        outbox for the next run.
+
+        Returns:
+            The ids of the documents Vectara accepted.
+        """
+        if self.upload_outbox is None:
+            return []
+        pending = self.upload_outbox.count()
+        if not pending:
+            return []
+        logger.info(f"Replaying {pending} document(s) left in the upload outbox by a previous run")
+        accepted = []
+        for doc_id, body, metadata in self.upload_outbox.pending():
+            document = {'id': doc_id, 'metadata': metadata}
+            succeeded, status, error = self._send_document(document, body)
+            if succeeded:
+                accepted.append(doc_id)
+                self.upload_outbox.remove(doc_id)
+            elif _is_transient_failure(status):
+                self.upload_outbox.mark_attempt(doc_id)
+            else:
+                logger.warning(f"Dropping document {doc_id} from the upload outbox: {error}")
+                self.upload_outbox.remove(doc_id)
+        logger.info(f"Upload outbox: {len(accepted)} of {pending} document(s) replayed")
+        return accepted
+
+    def _send_document(self, document: Dict[str, Any],
+                       data: Union[str, bytes, StreamingJSONBody]) -> Tuple[bool, Optional[int], Optional[str]]:
+        """The network half of _post_document."""
+        api_endpoint = f"{self.api_url}/v2/corpora/{self.corpus_key}/documents"
+        post_headers = {
+            'x-api-key': self.api_key,
+            'X-Source': self.x_source
+        }
 
         # Simple approach: POST the document, replacing on conflict when reindex or incremental is set
         try:
-            response = self.session.post(api_endpoint, data=data, headers=post_headers)
+            with stage(UPLOAD) as span:
+                span.add(bytes_out=len(data))
+                response = self._post_body(api_endpoint, data, post_headers)
         except Exception as e:
             logger.info(f"Exception {e} while indexing document {document['id']}")
-            return False
-
-        self._last_response_status = response.status_code
+            return False, None, f"upload exception: {e}"
 
         # Handle the response
         if response.status_code == 201:
             if self.verbose:
                 logger.info(f"Document {document['id']} indexed successfully")
             if self.store_docs:
-                with open(f"{self.store_docs_folder}/{document['id']}.json", "w") as f:
-                    json.dump(document, f)
-            return True
+                self._store_document(document, data)
+            self._record_in_manifest(document['id'], document.get('metadata'))
+            return True, response.status_code, None
         elif response.status_code in [409, 412]:
             # See _index_file: incremental implies replace-on-conflict, because an unchanged
             # document would have been skipped before upload — a conflict here means it changed.
@@ -708,33 +1281,60 @@ class Indexer:
                     logger.info(f"Document {document['id']} already exists. Deleting and re-indexing...")
 
                 # Delete the existing document
+                retry = stage(CONFLICT_RETRY)
                 if self.delete_doc(document['id']):
                     # Retry the upload
                     try:
-                        response = self.session.post(api_endpoint, data=data, headers=post_headers)
-                        self._last_response_status = response.status_code
+                        with retry:
+                            retry.add(bytes_out=len(data))
+                            response = self._post_body(api_endpoint, data, post_headers)
                         if response.status_code == 201:
                             if self.verbose:
                                 logger.info(f"Document {document['id']} re-indexed successfully")
                             if self.store_docs:
-                                with open(f"{self.store_docs_folder}/{document['id']}.json", "w") as f:
-                                    json.dump(document, f)
-                            return True
+                                self._store_document(document, data)
+                            self._record_in_manifest(document['id'], document.get('metadata'))
+                            return True, response.status_code, None
                     except Exception as e:
                         logger.error(f"Failed to re-index document {document['id']}: {e}")
-                        return False
+                        return False, None, f"re-upload exception: {e}"
+                else:
+                    retry.end()
             else:
                 # Document already exists but reindex is disabled - treat as success
                 if self.verbose:
                     logger.info(f"Document {document['id']} already exists (skipping, already indexed)")
-                return True
+                return True, response.status_code, None
 
         # Log error for any other status code
         logger.error(f"Failed to index document {document['id']}. Status code: {response.status_code}, Message: {response.text}")
-        return False
+        return False, response.status_code, f"upload returned HTTP {response.status_code}: {response.text[:200]}"
+
+    def _record_in_manifest(self, doc_id: str, metadata: Optional[Dict[str, Any]]) -> None:
+        """Write-through of an accepted document to the local corpus manifest, if kept."""
+        if self.manifest_store is None:
+            return
+        try:
+            self.manifest_store.upsert(doc_id, metadata)
+        except Exception as e:
+            logger.warning(f"Could not record document {doc_id} in the local corpus manifest: {e}")
+
+    def _store_document(self, document: Dict[str, Any], data: Union[str, bytes, StreamingJSONBody]) -> None:
+        """Write the uploaded JSON body to store_docs_folder (streamed when it carries images)."""
+        path = f"{self.store_docs_folder}/{document['id']}.json"
+        if isinstance(data, StreamingJSONBody):
+            with open(path, "wb") as f:
+                data.write_to(f)
+        elif isinstance(data, bytes):
+            with open(path, "wb") as f:
+                f.write(data)
+        else:
+            with open(path, "w") as f:
+                f.write(data)
 
 
 
+    @measured_document
     def index_url(self, url: str, metadata: Dict[str, Any], html_processing: dict = None,
                   metadata_extractor: callable = None, prior_fingerprint: Optional[str] = None) -> bool:
         """
@@ -751,6 +1351,21 @@ class Indexer:
         Returns:
             bool: True if the upload was successful, False otherwise.
         """
+        if self.near_duplicates is None:
+            return self._index_url(url, metadata, html_processing, metadata_extractor, prior_fingerprint)
+        self._near_duplicate_candidate = None
+        with self.upload_ticket(url) as ticket:
+            succeeded = self._index_url(url, metadata, html_processing, metadata_extractor, prior_fingerprint)
+        candidate, self._near_duplicate_candidate = self._near_duplicate_candidate, None
+        if succeeded and candidate is not None:
+            # Only a page the corpus holds may make later copies skip; with background
+            # uploads that is known once the page's uploads have finished
+            index, (doc_id, page_url, fingerprint) = self.near_duplicates, candidate
+            ticket.when_done(lambda ok: ok and index.add(doc_id, page_url, fingerprint))
+        return succeeded
+
+    def _index_url(self, url: str, metadata: Dict[str, Any], html_processing: dict = None,
+                   metadata_extractor: callable = None, prior_fingerprint: Optional[str] = None) -> bool:
         succeeded = False
         self.last_skip_reason = None
         if html_processing is None:
@@ -758,28 +1373,6 @@ class Indexer:
         st = time.time()
         url = url.split("#")[0]  # remove fragment, if exists
 
-        # if file is going to download, then handle it as local file
-        if self.url_triggers_download(url):
-            os.makedirs("/tmp", exist_ok=True)
-            url_file_path = get_file_path_from_url(url)
-            if not url_file_path:
-                logger.error(f"Failed to extract file path from URL {url}, skipping...")
-                return False
-            file_path = os.path.join("/tmp/" + url_file_path)
-
-            response = self.session.get(url, headers=get_headers(self.cfg), stream=True)
-            if response.status_code == 200:
-                with open(file_path, 'wb') as f:
-                    for chunk in response.iter_content(chunk_size=8192):
-                        f.write(chunk)
-                logger.info(f"File downloaded successfully and saved as {file_path}")
-                res = self.index_file(file_path, url, metadata, prior_fingerprint=prior_fingerprint)
-                safe_remove_file(file_path)
-                return res
-            else:
-                logger.error(f"Failed to download file. Status code: {response.status_code}")
-                return False
-
         # If MD or IPYNB file, then we don't need playwright - can just download content directly and convert to text
         if url.lower().endswith(".md") or url.lower().endswith(".ipynb"):
             response = self.session.get(url, timeout=self.timeout)
@@ -797,16 +1390,31 @@ class Indexer:
 
         else:
             try:
-                # Check if URL triggers download or serves PDF content
-                result = self.check_download_or_pdf(url)
-                
-                if result["type"] == "download":
+                # One request (and at most one browser navigation) tells a page from an
+                # inline PDF or a download, and fetches it at the same time
+                validators = self._conditional_validators(url, metadata, html_processing, prior_fingerprint)
+                res = self.fetch_url(
+                    url=url,
+                    extract_tables=self.parse_tables,
+                    extract_images=False,
+                    remove_code=self.remove_code,
+                    html_processing=html_processing,
+                    validators=validators,
+                )
+
+                if res["type"] == "not_modified":
+                    if self.verbose:
+                        logger.info(f"URL {url} not modified (HTTP 304) — skipping")
+                    self.last_skip_reason = "unchanged"
+                    return True
+
+                if res["type"] == "download":
                     # Handle explicit download
-                    download = result["download"]
-                    final_url = result["url"]
+                    download = res["download"]
+                    final_url = res["url"]
                     if 'url' in metadata:
                         metadata['url'] = normalize_url_for_metadata(final_url)
-                    suggested = result["filename"] or ""
+                    suggested = res["filename"] or ""
                     ext = os.path.splitext(suggested)[1]
                     if not ext:
                         parsed = urllib.parse.urlparse(final_url)
@@ -819,9 +1427,9 @@ class Indexer:
                     safe_remove_file(file_path)
                     return result
                     
-                elif result["type"] == "pdf":
+                elif res["type"] == "pdf":
                     # Handle inline PDF
-                    final_url = result["url"]
+                    final_url = res["url"]
                     parsed = urllib.parse.urlparse(final_url)
                     ext = os.path.splitext(parsed.path)[1] or ".pdf"
                     filename = os.path.basename(parsed.path) or f"{uuid.uuid4()}{ext}"
@@ -830,19 +1438,11 @@ class Indexer:
                     if 'url' in metadata:
                         metadata['url'] = normalize_url_for_metadata(final_url)
                     with open(file_path, "wb") as f:
-                        f.write(result["content"])
-                    res = self.index_file(file_path, final_url, metadata, prior_fingerprint=prior_fingerprint)
+                        f.write(res["content"])
+                    result = self.index_file(file_path, final_url, metadata, prior_fingerprint=prior_fingerprint)
                     safe_remove_file(file_path)
-                    return res
+                    return result
 
-                # If not download or PDF, fetch the page content
-                res = self.fetch_page_contents(
-                    url=url,
-                    extract_tables=self.parse_tables,
-                    extract_images=False,
-                    remove_code=self.remove_code,
-                    html_processing=html_processing,
-                )
                 # If the fetch was bounced to a sign-in / IdP page, treat it
                 # as a crawl failure: do not index the login form's HTML.
                 auth_reason = auth_redirect_reason(url, res.get('url'))
@@ -862,6 +1462,16 @@ class Indexer:
                 if text is None or len(text) < 3:
                     return False
 
+                if self.near_duplicates is not None:
+                    doc_id = slugify(normalize_url_for_metadata(url))
+                    duplicate_of, fingerprint = self.near_duplicates.lookup(doc_id, text)
+                    if duplicate_of:
+                        logger.info(f"Skipping {url}: near-duplicate of {duplicate_of}")
+                        self.last_skip_reason = "near_duplicate"
+                        return True
+                    if fingerprint is not None:
+                        self._near_duplicate_candidate = (doc_id, metadata['url'], fingerprint)
+
                 # Route web content through the local document parser when configured,
                 # or when the page has images we must attach as binary data: the inline
                 # web path below always builds a *structured* document, but binary images
@@ -882,6 +1492,9 @@ class Indexer:
 
                         if self.verbose:
                             logger.info(f"Processing web content from {url} locally using doc parser: {self.doc_parser}")
+                        if self._near_duplicate_candidate is not None:
+                            # index_file names the document after the URL as given
+                            self._near_duplicate_candidate = (slugify(url), *self._near_duplicate_candidate[1:])
 
                         # Process through index_file which uses the configured document parser.
                         # Docling misses images nested inside <p>/<li> tags — pass them
@@ -899,6 +1512,9 @@ class Indexer:
                         return result
                     except Exception as e:
                         logger.warning(f"Failed to process {url} locally with doc parser: {e}. Falling back to web extraction.")
+                        if self._near_duplicate_candidate is not None:
+                            self._near_duplicate_candidate = (slugify(normalize_url_for_metadata(url)),
+                                                              *self._near_duplicate_candidate[1:])
                         if temp_html_path:
                             safe_remove_file(temp_html_path)
                         # Continue with normal web processing below
@@ -914,7 +1530,12 @@ class Indexer:
                 # noise changes every fetch) and compute it before extract_metadata / image
                 # summarization, so the value is stable across runs (LLM output excluded) and
                 # those costs plus the upload are skipped when the document is unchanged.
-                if self._incremental_skip(content_hash_from_text(text), metadata, prior_fingerprint):
+                content_hash = content_hash_from_text(text)
+                if self.validator_store is not None and res.get('validators'):
+                    page_metadata = {k: metadata[k] for k in ('url', 'last_updated') if k in metadata}
+                    self.validator_store.put(normalize_url_for_metadata(url), res['validators'], content_hash,
+                                             page_metadata, self._fetch_signature(html_processing))
+                if self._incremental_skip(content_hash, metadata, prior_fingerprint):
                     if self.verbose:
                         logger.info(f"URL {url} unchanged (fingerprint match) — skipping")
                     return True
@@ -969,7 +1590,8 @@ class Indexer:
                         model_config=self.model_config,
                         verbose=self.verbose
                     )
-                    vec_tables = table_extractor.process_tables(res['tables'], url)
+                    with stage(TABLE_SUMMARY):
+                        vec_tables = table_extractor.process_tables(res['tables'], url)
 
                 # Check if images should be indexed inline or separately
                 if self.file_processor.inline_images:
@@ -987,7 +1609,8 @@ class Indexer:
                         image_processor = ImageProcessor(
                             cfg=self.cfg,
                             model_config=self.model_config,
-                            verbose=self.verbose
+                            verbose=self.verbose,
+                            session=self.session
                         )
                         processed_images, web_image_bytes = image_processor.process_web_images(res['images'], url, ex_metadata)
                         if web_image_bytes and self.verbose:
@@ -1027,7 +1650,8 @@ class Indexer:
                         image_processor = ImageProcessor(
                             cfg=self.cfg,
                             model_config=self.model_config,
-                            verbose=self.verbose
+                            verbose=self.verbose,
+                            session=self.session
                         )
                         processed_images, web_image_bytes = image_processor.process_web_images(res['images'], url, ex_metadata)
                         if web_image_bytes and self.verbose:
@@ -1057,6 +1681,7 @@ class Indexer:
 
         return succeeded
 
+    @measured_document
     def index_segments(self, doc_id: str, texts: List[str], titles: Optional[List[str]] = None,
                        metadatas: Optional[List[Dict[str, Any]]] = None,
                        doc_metadata: Dict[str, Any] = None, doc_title: str = "",
@@ -1104,11 +1729,12 @@ class Indexer:
         if doc_metadata and 'url' in doc_metadata:
             doc_metadata['url'] = normalize_url_for_metadata(doc_metadata['url'])
         
+        build = stage(DOCUMENT_BUILD, bytes_in=sum(len(t) for t in texts if t))
         document_builder = DocumentBuilder(
             cfg=self.cfg,
             normalize_text_func=lambda text: normalize_text(text, self.cfg)
         )
-        document = document_builder.build_document(
+        build_kwargs = dict(
             doc_id=doc_id,
             texts=texts,
             titles=titles,
@@ -1118,8 +1744,10 @@ class Indexer:
             tables=tables,
             use_core_indexing=use_core_indexing
         )
+        document = document_builder.build_document(**build_kwargs)
         
         if document is None:
+            build.end()
             return False
             
         # Add image binary data if available and enabled
@@ -1143,13 +1771,13 @@ class Indexer:
                     if binary_data:
                         mime_type = self._detect_image_mime_type(image_id, binary_data)
                         
-                        # Add to images array - encode binary data as base64 for JSON serialization
+                        # Add to images array - the bytes are base64-encoded while the body streams
                         images_array.append({
                             "id": image_id,
                             "caption": "",
                             "description": text,
                             "image_data": {
-                                "data": base64.b64encode(binary_data).decode('utf-8'),
+                                "data": Base64Bytes(binary_data),
                                 "mime_type": mime_type
                             }
                         })
@@ -1190,10 +1818,15 @@ class Indexer:
                 document["document_parts"] = updated_document_parts
                 if self.verbose:
                     logger.info(f"Document {doc_id} now includes {len(images_array)} images with binary data")
-            
+        build.end()
+
         if self.verbose:
             logger.info(f"Indexing document {doc_id} with json {str(document)[:1000]}...")
 
+        if self._get_upload_queue() is not None:
+            return self._enqueue_document(document, document_builder, build_kwargs,
+                                          prior_fingerprint, content_hash_override)
+
         result = self.index_document(document, use_core_indexing,
                                      prior_fingerprint=prior_fingerprint,
                                      content_hash_override=content_hash_override)
@@ -1202,23 +1835,52 @@ class Indexer:
                 and _document_has_oversized_part(document)):
             logger.info(f"Document {doc_id} failed with an oversized-part 400, "
                         f"retrying with split_oversized=True")
-            document_retry = document_builder.build_document(
-                doc_id=doc_id,
-                texts=texts,
-                titles=titles,
-                metadatas=metadatas,
-                doc_metadata=doc_metadata,
-                doc_title=doc_title,
-                tables=tables,
-                use_core_indexing=use_core_indexing,
-                split_oversized=True
-            )
+            document_retry = document_builder.build_document(**build_kwargs, split_oversized=True)
             if document_retry is not None:
                 self.delete_doc(document_retry['id'])
                 result = self.index_document(document_retry, use_core_indexing)
 
         return result
 
+    def _enqueue_document(self, document: Dict[str, Any], document_builder, build_kwargs: Dict[str, Any],
+                          prior_fingerprint: Optional[str] = None,
+                          content_hash_override: Optional[str] = None) -> bool:
+        """
+        Queued counterpart of the index_document + split_oversized retry tail of
+        index_segments. Preparation (including the incremental skip) and the upload outbox
+        write run here on the caller's thread, so a document waiting in the queue survives a
+        crash; the POST, conflict replace and oversized-part retry run on an uploader thread.
+
+        Returns:
+            True once the document is queued (or skipped as unchanged), False if it could
+            not be serialized. The upload outcome is reported through the upload ticket.
+        """
+        use_core_indexing = build_kwargs['use_core_indexing']
+        self._last_response_status = None
+        self.last_skip_reason = None
+        data = self._prepare_document(document, use_core_indexing, prior_fingerprint,
+                                      content_hash_override)
+        if data is None:
+            return self.was_skipped()
+        self._write_to_outbox(document, data)
+
+        def _upload():
+            succeeded, status, error = self._post_document(document, data, in_outbox=True)
+            if (not succeeded and not use_core_indexing and status == 400
+                    and _document_has_oversized_part(document)):
+                logger.info(f"Document {document['id']} failed with an oversized-part 400, "
+                            f"retrying with split_oversized=True")
+                document_retry = document_builder.build_document(**build_kwargs, split_oversized=True)
+                if document_retry is not None:
+                    self.delete_doc(document_retry['id'])
+                    retry_data = self._prepare_document(document_retry, use_core_indexing)
+                    if retry_data is not None:
+                        succeeded, _, error = self._post_document(document_retry, retry_data)
+            return succeeded, error
+
+        return self._enqueue_upload(document['id'], _upload)
+
+    @measured_document
     def index_file(self, filename: str, uri: str, metadata: Dict[str, Any], id: str = None, title_hint: str = None,
                    extra_image_urls: Optional[List[Dict[str, str]]] = None,
                    force_local_processing: bool = False,
@@ -1300,7 +1962,8 @@ class Indexer:
                     summarize_images=self.summarize_images,
                     image_context=self.image_context,
                 )
-                parsed_doc = dp.parse(filename, uri)
+                with stage(PARSE, bytes_in=os.path.getsize(filename)):
+                    parsed_doc = dp.parse(filename, uri)
                 title, texts, _, images = parsed_doc.to_legacy_format()
 
             # Get metadata attribute values from text content (if defined)
@@ -1483,7 +2146,7 @@ class Indexer:
             # Append summaries for images Docling missed (e.g. nested in <p>/<li> tags)
             if extra_image_urls and self.summarize_images:
                 image_processor = ImageProcessor(
-                    cfg=self.cfg, model_config=self.model_config, verbose=self.verbose
+                    cfg=self.cfg, model_config=self.model_config, verbose=self.verbose, session=self.session
                 )
                 processed_images, extra_img_bytes = image_processor.process_web_images(
                     extra_image_urls, uri, {}
@@ -1587,6 +2250,7 @@ class Indexer:
 
         return succeeded
 
+    @measured_document
     def index_media_file(self, file_path, metadata=None):
         """
         Index a media file (audio or video) by transcribing it with Whisper and uploading it to the Vectara corpus.
@@ -1619,6 +2283,8 @@ class Indexer:
 
     def cleanup(self):
         """Clean up resources used by the indexer"""
+        # Finish queued uploads before the session they use is closed below.
+        self.wait_for_uploads()
         if self.web_extractor:
             # Direct sync call since WebContentExtractor is now sync
             self.web_extractor.cleanup()
@@ -1630,6 +2296,12 @@ class Indexer:
         # Close HTTP session to release connection pool memory
         if hasattr(self, 'session') and self.session:
             self.session.close()
+        if self.upload_outbox is not None:
+            self.upload_outbox.close()
+        if self.manifest_store is not None:
+            self.manifest_store.close()
+        if self.validator_store is not None:
+            self.validator_store.close()
         # Clear caches
         self._doc_exists_cache.clear()
         
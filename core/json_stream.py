@@ -0,0 +1,128 @@
+"""
+Streaming JSON request bodies for documents that carry binary image data.
+
+With add_image_bytes a core document holds every image as a base64 string, and the
+old path then serialized the whole thing with json.dumps and re-encoded it to bytes
+just to log the size: three or four full copies of a payload that can run to hundreds
+of MB for an image-heavy deck. Here the document keeps the raw bytes (wrapped in
+Base64Bytes) and StreamingJSONBody emits the JSON in bounded chunks while the request
+is being sent, base64-encoding each image slice on the fly.
+
+The exact body size is known up front without encoding anything (base64 length is
+arithmetic), so requests sends a normal Content-Length body rather than a chunked one,
+and the body can be iterated again when urllib3 retries the request.
+"""
+
+import base64
+import json
+from typing import Any, BinaryIO, Iterator, Optional, Union
+
+# Must be a multiple of 3 so the base64 of consecutive slices concatenates cleanly.
+_B64_SLICE = 48 * 1024
+
+
+class Base64Bytes:
+    """Raw bytes that serialize as a base64 JSON string inside a StreamingJSONBody."""
+
+    __slots__ = ("data",)
+
+    def __init__(self, data: bytes):
+        self.data = data
+
+    def encoded_len(self) -> int:
+        return 4 * ((len(self.data) + 2) // 3)
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __repr__(self) -> str:
+        return f"<Base64Bytes {len(self.data)} bytes>"
+
+
+def _pieces(obj: Any) -> Iterator[Union[str, Base64Bytes]]:
+    """Walk obj and yield its JSON text, leaving Base64Bytes leaves to the caller.
+
+    Separators and escaping match json.dumps defaults, so a document without binary
+    data streams to exactly the bytes json.dumps(document) would produce.
+    """
+    if isinstance(obj, dict):
+        yield "{"
+        first = True
+        for key, value in obj.items():
+            if not first:
+                yield ", "
+            first = False
+            yield json.dumps(key if isinstance(key, str) else json.dumps(key))
+            yield ": "
+            yield from _pieces(value)
+        yield "}"
+    elif isinstance(obj, (list, tuple)):
+        yield "["
+        for i, value in enumerate(obj):
+            if i:
+                yield ", "
+            yield from _pieces(value)
+        yield "]"
+    elif isinstance(obj, Base64Bytes):
+        yield obj
+    else:
+        yield json.dumps(obj)
+
+
+class StreamingJSONBody:
+    """
+    Re-iterable request body that serializes a document to JSON in chunks.
+
+    Args:
+        obj: JSON-serializable document; Base64Bytes leaves are base64-encoded while streaming.
+        chunk_size (int): Approximate size of each chunk handed to the HTTP client.
+    """
+
+    def __init__(self, obj: Any, chunk_size: int = 64 * 1024):
+        self.obj = obj
+        self.chunk_size = chunk_size
+        self._size: Optional[int] = None
+        self.bytes_streamed = 0
+
+    @property
+    def size(self) -> int:
+        """Exact body size in bytes. Raises TypeError if the document is not serializable."""
+        if self._size is None:
+            total = 0
+            for piece in _pieces(self.obj):
+                # json.dumps escapes non-ASCII, so characters == bytes
+                total += 2 + piece.encoded_len() if isinstance(piece, Base64Bytes) else len(piece)
+            self._size = total
+        return self._size
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __iter__(self) -> Iterator[bytes]:
+        self.bytes_streamed = 0
+        buf = bytearray()
+        for piece in _pieces(self.obj):
+            if isinstance(piece, Base64Bytes):
+                view = memoryview(piece.data)
+                buf += b'"'
+                for start in range(0, len(view), _B64_SLICE):
+                    buf += base64.b64encode(view[start:start + _B64_SLICE])
+                    if len(buf) >= self.chunk_size:
+                        yield from self._flush(buf)
+                buf += b'"'
+            else:
+                buf += piece.encode("ascii")
+            if len(buf) >= self.chunk_size:
+                yield from self._flush(buf)
+        if buf:
+            yield from self._flush(buf)
+
+    def _flush(self, buf: bytearray) -> Iterator[bytes]:
+        chunk = bytes(buf)
+        buf.clear()
+        self.bytes_streamed += len(chunk)
+        yield chunk
+
+    def write_to(self, fh: BinaryIO) -> None:
+        for chunk in self:
+            fh.write(chunk)
@@ -0,0 +1,189 @@
+"""
+Persistent local copy of the corpus manifest (vectara.manifest_cache).
+
+Incremental crawls start by listing the whole corpus through the documents API, 1000
+documents per request, to learn what is indexed and how it was fingerprinted. On
+corpora with millions of documents that listing can take longer than the crawl.
+
+With the manifest cache on, the Indexer keeps the listed fields (id, url, source,
+fingerprint, content_hash, config_sig, last_updated, parent_doc_id, sitemap_lastmod,
+pub_date) in an SQLite file next to the crawl tracking DB, and updates it write-through
+whenever a document is indexed or deleted. A run re-lists the corpus only when:
+
+- the store has never been filled for this corpus,
+- it was last filled longer ago than `manifest_ttl_hours`, or
+- its document count differs from the corpus document count reported by the
+  compute_size API (which also catches a corpus reset or edits by another tool).
+"""
+
+import logging
+import sys
+import time
+from typing import Any, Dict, Iterable, Iterator, Optional
+
+from core.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+# Metadata fields kept per document; the same ones Indexer._list_docs extracts.
+MANIFEST_FIELDS = ("url", "source", "fingerprint", "content_hash", "config_sig", "last_updated",
+                   "parent_doc_id", "sitemap_lastmod", "pub_date")
+_INTERNED_FIELDS = ("source", "config_sig")
+
+_SCHEMA_SQL = f"""
+CREATE TABLE IF NOT EXISTS manifest_docs (
+    corpus_key  TEXT NOT NULL,
+    doc_id      TEXT NOT NULL,
+    {', '.join(MANIFEST_FIELDS)},
+    PRIMARY KEY (corpus_key, doc_id)
+);
+
+CREATE TABLE IF NOT EXISTS manifest_state (
+    corpus_key  TEXT PRIMARY KEY,
+    listed_at   REAL NOT NULL
+);
+"""
+
+_UPSERT_SQL = f"""
+INSERT INTO manifest_docs (corpus_key, doc_id, {', '.join(MANIFEST_FIELDS)})
+VALUES (?, ?, {', '.join('?' for _ in MANIFEST_FIELDS)})
+ON CONFLICT(corpus_key, doc_id) DO UPDATE SET
+    {', '.join(f'{f}=excluded.{f}' for f in MANIFEST_FIELDS)}
+"""
+
+
+def manifest_record(doc_id: str, metadata: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """The manifest view of one document: its id plus the tracked metadata fields (None if missing)."""
+    metadata = metadata or {}
+    record = {'id': doc_id}
+    for field in MANIFEST_FIELDS:
+        value = metadata.get(field)
+        # Untyped columns keep ints / floats as such (an epoch last_updated must not turn into a string)
+        record[field] = value if value is None or isinstance(value, (str, int, float)) else str(value)
+    # A handful of distinct values shared by every document: keep one copy of each
+    for field in _INTERNED_FIELDS:
+        if isinstance(record[field], str):
+            record[field] = sys.intern(record[field])
+    return record
+
+
+class ManifestStore(SQLiteStore):
+    """
+    SQLite-backed manifest of one corpus. Thread-safe; several processes (Ray workers) can
+    write through to the same file.
+    """
+
+    SCHEMA_SQL = _SCHEMA_SQL
+
+    def __init__(self, db_path: str, corpus_key: str):
+        super().__init__(db_path)
+        self.corpus_key = corpus_key
+
+    def _row(self, record: Dict[str, Any]):
+        return (self.corpus_key, record['id'], *(record.get(f) for f in MANIFEST_FIELDS))
+
+    # ------------------------------------------------------------------
+    # Freshness
+    # ------------------------------------------------------------------
+
+    def listed_at(self) -> Optional[float]:
+        """When the store was last filled from a full corpus listing (epoch seconds), or None."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT listed_at FROM manifest_state WHERE corpus_key=?", (self.corpus_key,)).fetchone()
+        return row[0] if row else None
+
+    def is_fresh(self, ttl_seconds: float, corpus_doc_count: Optional[int]) -> bool:
+        """
+        True if the store can stand in for a corpus listing. `corpus_doc_count` is the
+        document count reported by the corpus; None (unknown) counts as a mismatch.
+        """
+        listed_at = self.listed_at()
+        if listed_at is None:
+            return False
+        age = time.time() - listed_at
+        if ttl_seconds > 0 and age > ttl_seconds:
+            logger.info(f"Local corpus manifest is {age / 3600:.1f}h old (older than the TTL), re-listing")
+            return False
+        count = self.count()
+        if corpus_doc_count != count:
+            logger.info(f"Local corpus manifest has {count} docs but the corpus reports "
+                        f"{corpus_doc_count}, re-listing")
+            return False
+        return True
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM manifest_docs WHERE corpus_key=?", (self.corpus_key,)).fetchone()[0]
+
+    # ------------------------------------------------------------------
+    # Full refresh and reads
+    # ------------------------------------------------------------------
+
+    def replace_all(self, records: Iterable[Dict[str, Any]], batch_size: int = 5000) -> int:
+        """Replace the stored manifest with a full corpus listing, consumed as it arrives.
+        Until the new listing is complete the store is marked unfilled, so an interrupted
+        refresh is never mistaken for a fresh one."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM manifest_state WHERE corpus_key=?", (self.corpus_key,))
+            conn.execute("DELETE FROM manifest_docs WHERE corpus_key=?", (self.corpus_key,))
+            conn.commit()
+        total = 0
+        batch = []
+        for record in records:
+            batch.append(self._row(record))
+            if len(batch) >= batch_size:
+                total += self._write_batch(batch)
+                batch = []
+        total += self._write_batch(batch)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO manifest_state (corpus_key, listed_at) VALUES (?, ?) "
+                "ON CONFLICT(corpus_key) DO UPDATE SET listed_at=excluded.listed_at",
+                (self.corpus_key, time.time()))
+            conn.commit()
+        return total
+
+    def _write_batch(self, rows) -> int:
+        if not rows:
+            return 0
+        with self._lock:
+            conn = self._connection()
+            conn.executemany(_UPSERT_SQL, rows)
+            conn.commit()
+        return len(rows)
+
+    def records(self, page_size: int = 5000) -> Iterator[Dict[str, Any]]:
+        """Yield every stored document in the same shape as Indexer._list_docs.
+        Rows are read a page at a time (keyset on doc_id), so the manifest is never loaded whole."""
+        last_id = ""
+        while True:
+            with self._lock:
+                rows = self._connection().execute(
+                    f"SELECT doc_id, {', '.join(MANIFEST_FIELDS)} FROM manifest_docs "
+                    "WHERE corpus_key=? AND doc_id>? ORDER BY doc_id LIMIT ?",
+                    (self.corpus_key, last_id, page_size)).fetchall()
+            for row in rows:
+                record = {'id': row[0]}
+                record.update(zip(MANIFEST_FIELDS, row[1:]))
+                yield record
+            if len(rows) < page_size:
+                return
+            last_id = rows[-1][0]
+
+    # ------------------------------------------------------------------
+    # Write-through
+    # ------------------------------------------------------------------
+
+    def upsert(self, doc_id: str, metadata: Optional[Dict[str, Any]]) -> None:
+        """Record a document Vectara just accepted."""
+        self._write_batch([self._row(manifest_record(doc_id, metadata))])
+
+    def delete(self, doc_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM manifest_docs WHERE corpus_key=? AND doc_id=?", (self.corpus_key, doc_id))
+            conn.commit()
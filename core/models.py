@@ -7,6 +7,7 @@ from anthropic import Anthropic
 from omegaconf import OmegaConf
 
 from .utils import get_media_type_from_base64
+from .stage_stats import record_tokens
 
 # Try to import Vertex AI SDK
 try:
@@ -27,6 +28,19 @@ _vertex_ai_init_state = None
 _OPENAI_NEW_PARAM_PREFIXES = ("gpt-5", "o1", "o3", "o4")
 
 
+def _record_usage(response, provider: str) -> None:
+    """Charge the call's token usage to the current pipeline stage (see core/stage_stats.py)."""
+    if provider == 'vertex':
+        usage = getattr(response, 'usage_metadata', None)
+        record_tokens(getattr(usage, 'prompt_token_count', None), getattr(usage, 'candidates_token_count', None))
+    elif provider == 'anthropic':
+        usage = getattr(response, 'usage', None)
+        record_tokens(getattr(usage, 'input_tokens', None), getattr(usage, 'output_tokens', None))
+    else:
+        usage = getattr(response, 'usage', None)
+        record_tokens(getattr(usage, 'prompt_tokens', None), getattr(usage, 'completion_tokens', None))
+
+
 def _openai_token_params(model_name: str, max_tokens: int) -> dict:
     """Token/temperature kwargs for chat.completions.create, selected by model name.
 
@@ -151,6 +165,7 @@ def generate(
             ],
             **_openai_token_params(model_name, max_tokens),
         )
+        _record_usage(response, provider)
         res = str(response.choices[0].message.content)
     elif provider == 'anthropic':
         client = Anthropic(api_key=model_api_key)
@@ -171,6 +186,7 @@ def generate(
             ],
             max_tokens=max_tokens,
         )
+        _record_usage(response, provider)
         res = str(response.content[0].text)
     elif provider == 'vertex':
         _init_vertex_ai(cfg, model_config)
@@ -187,6 +203,7 @@ def generate(
                 'max_output_tokens': max_tokens,
             }
         )
+        _record_usage(response, provider)
         res = str(response.text)
     else:
         raise ValueError(f"Unsupported provider for text generation: {provider}")
@@ -236,6 +253,7 @@ def generate_image_summary(
             messages=messages,
             **_openai_token_params(model_name, max_tokens),
         )
+        _record_usage(response, provider)
         summary = response.choices[0].message.content
         return summary
 
@@ -267,6 +285,7 @@ def generate_image_summary(
             max_tokens=max_tokens,
             messages=messages,
         )
+        _record_usage(response, provider)
         summary = str(response.content[0].text)
         return summary
     elif provider == 'vertex':
@@ -287,6 +306,7 @@ def generate_image_summary(
                 'max_output_tokens': max_tokens,
             }
         )
+        _record_usage(response, provider)
         summary = str(response.text)
         return summary
     else:
@@ -0,0 +1,180 @@
+"""
+Near-duplicate page detection (vectara.near_duplicates).
+
+Many sites serve one page under several URLs: print views, tracking or session query
+parameters, localized mirrors with the same text. Each copy would otherwise be rendered,
+summarized by the LLM and uploaded again.
+
+index_url computes a 64-bit SimHash of each page's extracted text (word 4-gram shingles)
+and looks it up in a NearDuplicateIndex before any LLM or upload work. A page whose
+fingerprint is within `near_duplicate_distance` bits of a page already indexed is skipped
+as a near-duplicate of that page. A page is added to the index only once its upload has
+succeeded, and removed when its document is deleted from the corpus, so copies are never
+skipped in favor of a page the corpus does not hold.
+
+Lookups use LSH banding: the 64 bits are cut into `max_distance + 1` bands, and two
+fingerprints at most `max_distance` bits apart agree exactly on at least one band, so
+only pages sharing a band value are compared.
+
+The index lives in memory for one run and one process. With `near_duplicate_store`, it is
+kept in an SQLite file next to the crawl tracking DB instead, shared by the Ray workers on
+one machine and by later runs, so the same copy of a page stays the indexed one.
+"""
+
+import hashlib
+import logging
+import re
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from core.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_BITS = 64
+DEFAULT_MAX_DISTANCE = 3
+SHINGLE_WORDS = 4
+# Below this many words a fingerprint says little about the page; such pages are never matched
+MIN_WORDS = 50
+
+_WORD_RE = re.compile(r"\w+", re.UNICODE)
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS near_duplicate_docs (
+    scope       TEXT NOT NULL,
+    band        INTEGER NOT NULL,
+    value       TEXT NOT NULL,
+    doc_id      TEXT NOT NULL,
+    url         TEXT NOT NULL,
+    fingerprint TEXT NOT NULL,
+    PRIMARY KEY (scope, band, value, doc_id)
+);
+CREATE INDEX IF NOT EXISTS near_duplicate_docs_doc_id ON near_duplicate_docs (scope, doc_id);
+"""
+
+
+def simhash(text: str, shingle_words: int = SHINGLE_WORDS, min_words: int = MIN_WORDS) -> Optional[int]:
+    """64-bit SimHash of text's lower-cased word shingles, or None if text has fewer than min_words words."""
+    words = _WORD_RE.findall((text or "").lower())
+    if len(words) < max(1, min_words):
+        return None
+    k = min(shingle_words, len(words))
+    shingles = {" ".join(words[i:i + k]) for i in range(len(words) - k + 1)}
+    hashes = np.fromiter(
+        (int.from_bytes(hashlib.blake2b(s.encode("utf-8"), digest_size=8).digest(), "little") for s in shingles),
+        dtype=np.uint64, count=len(shingles))
+    # One row of 64 bits per shingle; column i holds bit i of its hash
+    bits = np.unpackbits(hashes.view(np.uint8).reshape(-1, 8), axis=1, bitorder="little")
+    majority = bits.sum(axis=0, dtype=np.int64) * 2 > len(shingles)
+    return int.from_bytes(np.packbits(majority, bitorder="little").tobytes(), "little")
+
+
+def hamming_distance(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+def _bands(max_distance: int) -> List[Tuple[int, int]]:
+    """(shift, width) of each LSH band: max_distance + 1 bands covering all 64 bits."""
+    count = max_distance + 1
+    width = FINGERPRINT_BITS // count
+    bands = [(i * width, width) for i in range(count)]
+    last_shift = bands[-1][0]
+    bands[-1] = (last_shift, FINGERPRINT_BITS - last_shift)
+    return bands
+
+
+class NearDuplicateIndex(SQLiteStore):
+    """
+    SimHash fingerprints of the pages indexed so far, queried through LSH bands.
+
+    Thread-safe. With db_path, the index is an SQLite file that several processes can share;
+    `scope` (the corpus key) keeps corpora apart in one file. Without it, the SQLiteStore
+    connection is never opened.
+
+    Args:
+        max_distance (int): Largest Hamming distance (in bits, of 64) counted as a near-duplicate
+        db_path (str): SQLite file to keep the index in, or None to keep it in memory
+        scope (str): Key separating independent indexes in one db_path
+    """
+
+    SCHEMA_SQL = _SCHEMA_SQL
+
+    def __init__(self, max_distance: int = DEFAULT_MAX_DISTANCE, db_path: Optional[str] = None,
+                 scope: str = ""):
+        super().__init__(db_path)
+        self.max_distance = min(max(0, int(max_distance)), FINGERPRINT_BITS // 4 - 1)
+        self.scope = scope
+        self._bands = _bands(self.max_distance)
+        self._tables: List[Dict[int, List[str]]] = [{} for _ in self._bands]   # band value -> doc ids
+        self._docs: Dict[str, Tuple[str, int]] = {}   # doc id -> (url, fingerprint)
+        self.duplicates = 0
+
+    def _band_values(self, fingerprint: int) -> List[int]:
+        return [(fingerprint >> shift) & ((1 << width) - 1) for shift, width in self._bands]
+
+    def _candidates(self, band_values: List[int]) -> Dict[str, Tuple[str, int]]:
+        """{doc_id: (url, fingerprint)} of the indexed pages sharing at least one band value."""
+        if self.db_path is None:
+            doc_ids = {doc_id for table, value in zip(self._tables, band_values) for doc_id in table.get(value, ())}
+            return {doc_id: self._docs[doc_id] for doc_id in doc_ids}
+        clause = " OR ".join("(band=? AND value=?)" for _ in band_values)
+        params = [p for band, value in enumerate(band_values) for p in (band, format(value, "x"))]
+        rows = self._connection().execute(
+            f"SELECT doc_id, url, fingerprint FROM near_duplicate_docs WHERE scope=? AND ({clause})",
+            (self.scope, *params)).fetchall()
+        return {doc_id: (url, int(fingerprint, 16)) for doc_id, url, fingerprint in rows}
+
+    def _remove(self, doc_id: str) -> None:
+        if self.db_path is None:
+            old = self._docs.pop(doc_id, None)
+            if old is not None:
+                for table, value in zip(self._tables, self._band_values(old[1])):
+                    table[value].remove(doc_id)
+            return
+        self._connection().execute("DELETE FROM near_duplicate_docs WHERE scope=? AND doc_id=?",
+                                   (self.scope, doc_id))
+
+    def lookup(self, doc_id: str, text: str) -> Tuple[Optional[str], Optional[int]]:
+        """
+        (The URL of an indexed page other than doc_id that text nearly duplicates, or None;
+        the fingerprint of text to add() once it is indexed, None if text is too short to match.)
+        """
+        fingerprint = simhash(text)
+        if fingerprint is None:
+            return None, None
+        with self._lock:
+            candidates = self._candidates(self._band_values(fingerprint))
+            best = min(
+                ((hamming_distance(fingerprint, fp), url) for other, (url, fp) in candidates.items()
+                 if other != doc_id),
+                default=None)
+            if best is not None and best[0] <= self.max_distance:
+                self.duplicates += 1
+                return best[1], fingerprint
+        return None, fingerprint
+
+    def add(self, doc_id: str, url: str, fingerprint: int) -> None:
+        """Index doc_id (replacing its earlier fingerprint, if any) as a page later copies are matched against."""
+        band_values = self._band_values(fingerprint)
+        with self._lock:
+            self._remove(doc_id)
+            if self.db_path is None:
+                self._docs[doc_id] = (url, fingerprint)
+                for table, value in zip(self._tables, band_values):
+                    table.setdefault(value, []).append(doc_id)
+                return
+            conn = self._connection()
+            conn.executemany(
+                "INSERT OR REPLACE INTO near_duplicate_docs (scope, band, value, doc_id, url, fingerprint) "
+                "VALUES (?, ?, ?, ?, ?, ?)",
+                [(self.scope, band, format(value, "x"), doc_id, url, format(fingerprint, "x"))
+                 for band, value in enumerate(band_values)])
+            conn.commit()
+
+    def remove(self, doc_id: str) -> None:
+        """Forget doc_id, whose document was deleted from the corpus."""
+        with self._lock:
+            self._remove(doc_id)
+            if self.db_path is not None:
+                self._connection().commit()
@@ -0,0 +1,166 @@
+"""
+Waiting for a rendered page to settle before its content is read (vectara.page_settle).
+
+"fixed" waits `post_load_timeout` seconds after the DOM is loaded, then scrolls until the
+page stops growing, for up to 20 seconds. Every page pays the full wait, however fast it is.
+
+"adaptive" (the default) waits only as long as the page keeps changing:
+
+1. Load: a MutationObserver notes the time of the last node or text change in the DOM. The
+   page has settled once the network has gone idle (no request for 500 ms, as Playwright's
+   "networkidle") and the DOM has been quiet for `settle_quiet_ms`, or once the DOM has been
+   quiet three times that long while background requests go on. `post_load_timeout` is the
+   upper bound.
+2. Scroll: the page is scrolled to the bottom, and the scroll is repeated after the DOM has
+   been quiet for `settle_quiet_ms` since the last scroll, until the scroll height stops
+   growing or 20 seconds have passed.
+
+The time a page spent settling is logged at debug level and, with vectara.stage_stats, is
+reported as the "settle" stage, so post_load_timeout and settle_quiet_ms can be tuned from
+its percentiles. Attribute changes (animations, carousels) do not count as DOM changes.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Tuple
+
+logger = logging.getLogger(__name__)
+
+ADAPTIVE = "adaptive"
+FIXED = "fixed"
+
+DEFAULT_QUIET_MS = 500
+MAX_SCROLL_TIME = 20
+# With requests still in flight, the DOM must stay quiet this many times settle_quiet_ms
+_BUSY_NETWORK_FACTOR = 3
+# Longest single wait for lazy-loaded content after a scroll
+_MAX_SCROLL_WAIT_MS = 2000
+
+# Installs the observer (once per document) and starts a new quiet period
+OBSERVE_JS = """
+() => {
+    if (!window.__vectaraSettle) {
+        const state = window.__vectaraSettle = {last: performance.now()};
+        new MutationObserver(() => { state.last = performance.now(); })
+            .observe(document.documentElement || document, {childList: true, subtree: true, characterData: true});
+    }
+    window.__vectaraSettle.last = performance.now();
+}
+"""
+
+# Milliseconds since the last DOM change (or since the quiet period was restarted)
+QUIET_MS_JS = "() => window.__vectaraSettle ? performance.now() - window.__vectaraSettle.last : 1e9"
+
+# Scrolls to the bottom, restarts the quiet period and returns the scroll height before the scroll
+SCROLL_JS = """
+() => {
+    const height = document.body.scrollHeight;
+    window.scrollTo(0, height);
+    if (window.__vectaraSettle) window.__vectaraSettle.last = performance.now();
+    return height;
+}
+"""
+
+
+def settle_page(page, post_load_timeout: float, quiet_ms: int = DEFAULT_QUIET_MS) -> Tuple[float, str]:
+    """
+    Wait for a Playwright (sync API) page to settle adaptively. Returns (seconds waited, how
+    the load wait ended: "settled", "busy network" or "timeout").
+    """
+    start = time.monotonic()
+    outcome = "timeout"
+    try:
+        page.evaluate(OBSERVE_JS)
+        deadline = start + post_load_timeout
+        network_idle = False
+        while True:
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            if remaining_ms <= 0:
+                break
+            if not network_idle:
+                try:
+                    page.wait_for_load_state("networkidle", timeout=min(remaining_ms, quiet_ms))
+                    network_idle = True
+                except Exception:
+                    pass
+            quiet = page.evaluate(QUIET_MS_JS)
+            if quiet >= quiet_ms * (1 if network_idle else _BUSY_NETWORK_FACTOR):
+                outcome = "settled" if network_idle else "busy network"
+                break
+            if network_idle:
+                page.wait_for_timeout(max(1, min(quiet_ms - quiet, remaining_ms)))
+        _scroll_until_stable(page, quiet_ms)
+    except Exception as e:
+        logger.debug(f"Adaptive settle stopped early: {e}")
+    return time.monotonic() - start, outcome
+
+
+def _scroll_until_stable(page, quiet_ms: int) -> None:
+    start = time.monotonic()
+    height = None
+    while time.monotonic() - start < MAX_SCROLL_TIME:
+        previous, height = height, page.evaluate(SCROLL_JS)
+        if height == previous:
+            return
+        waited = 0
+        while waited < _MAX_SCROLL_WAIT_MS:
+            quiet = page.evaluate(QUIET_MS_JS)
+            if quiet >= quiet_ms:
+                break
+            step = max(1, min(quiet_ms - quiet, _MAX_SCROLL_WAIT_MS - waited))
+            page.wait_for_timeout(step)
+            waited += step
+    logger.info(f"Scroll timeout reached ({MAX_SCROLL_TIME}s), stopping scroll")
+
+
+async def settle_page_async(page, post_load_timeout: float, quiet_ms: int = DEFAULT_QUIET_MS) -> Tuple[float, str]:
+    """settle_page on the async Playwright API."""
+    start = time.monotonic()
+    outcome = "timeout"
+    try:
+        await page.evaluate(OBSERVE_JS)
+        deadline = start + post_load_timeout
+        network_idle = False
+        while True:
+            remaining_ms = (deadline - time.monotonic()) * 1000
+            if remaining_ms <= 0:
+                break
+            if not network_idle:
+                try:
+                    await page.wait_for_load_state("networkidle", timeout=min(remaining_ms, quiet_ms))
+                    network_idle = True
+                except asyncio.CancelledError:
+                    raise
+                except Exception:
+                    pass
+            quiet = await page.evaluate(QUIET_MS_JS)
+            if quiet >= quiet_ms * (1 if network_idle else _BUSY_NETWORK_FACTOR):
+                outcome = "settled" if network_idle else "busy network"
+                break
+            if network_idle:
+                await page.wait_for_timeout(max(1, min(quiet_ms - quiet, remaining_ms)))
+        await _scroll_until_stable_async(page, quiet_ms)
+    except asyncio.CancelledError:
+        raise
+    except Exception as e:
+        logger.debug(f"Adaptive settle stopped early: {e}")
+    return time.monotonic() - start, outcome
+
+
+async def _scroll_until_stable_async(page, quiet_ms: int) -> None:
+    start = time.monotonic()
+    height = None
+    while time.monotonic() - start < MAX_SCROLL_TIME:
+        previous, height = height, await page.evaluate(SCROLL_JS)
+        if height == previous:
+            return
+        waited = 0
+        while waited < _MAX_SCROLL_WAIT_MS:
+            quiet = await page.evaluate(QUIET_MS_JS)
+            if quiet >= quiet_ms:
+                break
+            step = max(1, min(quiet_ms - quiet, _MAX_SCROLL_WAIT_MS - waited))
+            await page.wait_for_timeout(step)
+            waited += step
+    logger.info(f"Scroll timeout reached ({MAX_SCROLL_TIME}s), stopping scroll")
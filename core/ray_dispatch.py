@@ -0,0 +1,62 @@
+"""
+Streaming task dispatch to a fixed set of Ray actors.
+
+`ActorPool.map` over fixed-size batches makes every batch wait for its slowest task (often a
+90 s navigation timeout) before any actor gets new work. stream_actor_tasks instead keeps a
+small, bounded queue of tasks on every actor, submits the next item as soon as one finishes,
+and hands each result back as it completes, so one slow item only holds up its own actor.
+"""
+
+from typing import Any, Callable, Iterable, Iterator, Optional, Sequence, Tuple
+
+import ray
+
+# One task running plus one queued, so an actor never idles waiting for the driver
+DEFAULT_TASKS_PER_ACTOR = 2
+
+
+def stream_actor_tasks(
+    actors: Sequence[Any],
+    items: Iterable[Any],
+    submit: Callable[[Any, Any], Any],
+    tasks_per_actor: int = DEFAULT_TASKS_PER_ACTOR,
+    check_shutdown: Optional[Callable[[], None]] = None,
+) -> Iterator[Tuple[Any, Any]]:
+    """
+    Run submit(actor, item) -> ObjectRef for every item and yield (item, result) in completion order.
+
+    Args:
+        actors: Ray actor handles
+        items: work items; consumed lazily, so this may be a generator
+        submit: starts the task for an item on an actor and returns its ObjectRef
+        tasks_per_actor: most tasks submitted to one actor and not yet finished
+        check_shutdown: called before each submission; raising from it stops the dispatch
+
+    A task that raises propagates its error from the generator, like ActorPool.map.
+    """
+    items = iter(items)
+    tasks_per_actor = max(1, tasks_per_actor)
+    in_flight = {}                 # ObjectRef -> (actor index, item)
+    load = [0] * len(actors)
+    exhausted = not actors
+    while True:
+        while not exhausted:
+            idx = min(range(len(actors)), key=load.__getitem__)
+            if load[idx] >= tasks_per_actor:
+                break
+            try:
+                item = next(items)
+            except StopIteration:
+                exhausted = True
+                break
+            if check_shutdown is not None:
+                check_shutdown()
+            in_flight[submit(actors[idx], item)] = (idx, item)
+            load[idx] += 1
+        if not in_flight:
+            return
+        ready, _ = ray.wait(list(in_flight), num_returns=1)
+        for ref in ready:
+            idx, item = in_flight.pop(ref)
+            load[idx] -= 1
+            yield item, ray.get(ref)
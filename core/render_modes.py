@@ -0,0 +1,185 @@
+"""
+Per-domain rendering mode learned during a crawl (<crawler>.learn_render_mode).
+
+WebContentExtractor fetches every page with a plain GET first and renders it in the browser
+only when the static HTML is too sparse. On a site that is all single-page app, every page
+pays for a GET and a parse it throws away; on a static site, a page that is merely short
+starts a browser it does not need.
+
+The first `render_mode_sample_pages` pages of each domain are fetched the usual way ("probe")
+and each one records which path it needed: the static HTML was enough, or the browser found
+the text the static HTML lacked. Once a domain has that many samples, its mode is decided:
+
+* "static" when every sample was served statically: pages are parsed from the static HTML
+  even when short, and the browser is only used when the GET fails or has no text at all.
+* "browser" when every sample needed the browser: the static GET is skipped.
+* "probe" otherwise: each page keeps trying static first.
+
+A single RenderModeBroker holds the samples and decisions of every domain. It runs as a Ray
+actor, or as a plain object in a single-process crawl, like the per-host rate limit broker
+(core/host_rate_limiter.py). Workers hold a RenderModes client, which keeps decided modes
+locally so a decided domain costs no round trip. With `render_mode_store`, decisions are kept
+in an SQLite file next to the crawl tracking DB and reused by later runs; delete the file to
+learn them again.
+"""
+
+import logging
+import os
+import sqlite3
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlparse
+
+logger = logging.getLogger(__name__)
+
+STATIC = "static"
+BROWSER = "browser"
+PROBE = "probe"
+
+DEFAULT_SAMPLE_PAGES = 10
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS render_modes (
+    domain        TEXT PRIMARY KEY,
+    mode          TEXT NOT NULL,
+    static_pages  INTEGER NOT NULL,
+    browser_pages INTEGER NOT NULL
+);
+"""
+
+
+def url_domain(url: str) -> str:
+    return urlparse(url).netloc.lower()
+
+
+class RenderModeBroker:
+    """
+    Rendering-mode samples and decisions of every domain in a crawl.
+
+    Args:
+        sample_pages (int): Pages sampled per domain before its mode is decided
+        db_path (str): SQLite file to load decisions from and save them to, or None
+    """
+
+    def __init__(self, sample_pages: int = DEFAULT_SAMPLE_PAGES, db_path: Optional[str] = None):
+        self.sample_pages = max(1, int(sample_pages))
+        self.db_path = db_path
+        self._samples: Dict[str, Dict[str, int]] = {}
+        self._decided: Dict[str, str] = {}
+        if db_path:
+            for domain, mode in self._load():
+                self._decided[domain] = mode
+
+    def _connect(self) -> sqlite3.Connection:
+        os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("PRAGMA busy_timeout=5000")
+        conn.executescript(_SCHEMA_SQL)
+        return conn
+
+    def _load(self):
+        conn = self._connect()
+        try:
+            return conn.execute("SELECT domain, mode FROM render_modes").fetchall()
+        finally:
+            conn.close()
+
+    def _save(self, domain: str, mode: str, samples: Dict[str, int]) -> None:
+        conn = self._connect()
+        try:
+            conn.execute("INSERT OR REPLACE INTO render_modes (domain, mode, static_pages, browser_pages) "
+                         "VALUES (?, ?, ?, ?)", (domain, mode, samples[STATIC], samples[BROWSER]))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def mode(self, domain: str) -> Tuple[str, bool]:
+        """(mode, decided) of domain; an undecided domain is probed."""
+        mode = self._decided.get(domain)
+        return (mode, True) if mode is not None else (PROBE, False)
+
+    def record(self, domain: str, needed: str) -> Tuple[str, bool]:
+        """Add a sample (STATIC or BROWSER: the path a probed page needed) and return mode(domain)."""
+        if domain in self._decided:
+            return self.mode(domain)
+        samples = self._samples.setdefault(domain, {STATIC: 0, BROWSER: 0})
+        samples[needed] += 1
+        if samples[STATIC] + samples[BROWSER] >= self.sample_pages:
+            mode = STATIC if not samples[BROWSER] else BROWSER if not samples[STATIC] else PROBE
+            self._decided[domain] = mode
+            logger.info(f"Rendering mode for {domain}: {mode} ({samples[STATIC]} of "
+                        f"{samples[STATIC] + samples[BROWSER]} sampled pages served statically)")
+            if self.db_path:
+                try:
+                    self._save(domain, mode, samples)
+                except sqlite3.Error as e:
+                    logger.warning(f"Could not save rendering mode for {domain}: {e}")
+        return self.mode(domain)
+
+    def decisions(self) -> Dict[str, str]:
+        return dict(self._decided)
+
+
+class RenderModes:
+    """
+    Worker-side client of a RenderModeBroker (a Ray actor handle or a local instance).
+    Thread-safe; picklable, so one instance can be passed to every Ray actor.
+    """
+
+    def __init__(self, broker):
+        self.broker = broker
+        self._decided: Dict[str, str] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        state["_lock"] = None
+        state["_decided"] = {}
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def _call(self, method: str, *args):
+        fn = getattr(self.broker, method)
+        if hasattr(fn, "remote"):
+            import ray
+            return ray.get(fn.remote(*args))
+        with self._lock:
+            return fn(*args)
+
+    def _remember(self, domain: str, answer: Tuple[str, bool]) -> str:
+        mode, decided = answer
+        if decided:
+            self._decided[domain] = mode
+        return mode
+
+    def mode(self, url: str) -> str:
+        """How url should be fetched: STATIC, BROWSER or PROBE."""
+        domain = url_domain(url)
+        mode = self._decided.get(domain)
+        if mode is None:
+            mode = self._remember(domain, self._call("mode", domain))
+        return mode
+
+    def record(self, url: str, needed: str) -> None:
+        """Record that a probed page of url's domain needed the STATIC or BROWSER path."""
+        domain = url_domain(url)
+        if domain not in self._decided:
+            self._remember(domain, self._call("record", domain, needed))
+
+
+def create_render_modes(section_cfg, db_dir: str, remote=None) -> Optional[RenderModes]:
+    """
+    The shared rendering-mode learner for a crawler config section, or None when its
+    `learn_render_mode` is off. Pass remote=ray.remote (after ray.init()) to run the broker
+    as a Ray actor that all workers share.
+    """
+    if not section_cfg.get("learn_render_mode", False):
+        return None
+    sample_pages = section_cfg.get("render_mode_sample_pages", DEFAULT_SAMPLE_PAGES)
+    db_path = os.path.join(db_dir, "render_modes.db") if section_cfg.get("render_mode_store", False) else None
+    broker = (remote(RenderModeBroker).remote(sample_pages, db_path) if remote
+              else RenderModeBroker(sample_pages, db_path))
+    return RenderModes(broker)
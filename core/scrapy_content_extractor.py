@@ -11,8 +11,9 @@ from urllib.parse import urljoin
 from bs4 import BeautifulSoup
 from omegaconf import OmegaConf
 
-from core.web_extractor_base import WebExtractorBase
+from core.web_extractor_base import WebExtractorBase, not_modified_page
 from core.utils import get_headers
+from core.validator_store import conditional_headers, response_validators
 
 logger = logging.getLogger(__name__)
 
@@ -69,9 +70,10 @@ class ScrapyContentExtractor(WebExtractorBase):
         extract_images: bool = False,
         remove_code: bool = False,
         html_processing: Optional[dict] = None,
-        debug: bool = False
+        debug: bool = False,
+        validators: Optional[dict] = None
     ) -> Dict:
-        """Synchronous fetch using requests+BeautifulSoup"""
+        """Synchronous fetch using requests+BeautifulSoup, conditional when validators are given"""
         result = {
             'text': '',
             'html': '',
@@ -84,8 +86,11 @@ class ScrapyContentExtractor(WebExtractorBase):
         
         try:
             # Make the request
-            response = self.session.get(url, timeout=self.timeout)
+            response = self.session.get(url, timeout=self.timeout, headers=conditional_headers(validators))
+            if response.status_code == 304 and validators:
+                return not_modified_page(response.url)
             response.raise_for_status()
+            result['validators'] = response_validators(response.headers)
             
             # Store response data
             result['html'] = response.text
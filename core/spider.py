@@ -1,9 +1,15 @@
 import re
-from typing import Set, Optional, List, Iterable
+from typing import Set, Optional, List, Iterator, Tuple
 import logging
 import multiprocessing
 import gzip
-from urllib.parse import urlparse, urljoin
+import io
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from contextlib import contextmanager, nullcontext
+from itertools import chain
+from urllib.parse import urlparse, urljoin, urldefrag
 import requests
 
 from pathlib import PurePosixPath
@@ -14,13 +20,15 @@ from scrapy.crawler import CrawlerProcess
 from scrapy.signalmanager import dispatcher
 from scrapy.downloadermiddlewares.redirect import RedirectMiddleware
 from scrapy.exceptions import IgnoreRequest
-from scrapy.utils.sitemap import Sitemap
-from scrapy.spiders.sitemap import iterloc
+from lxml import etree
+from lxml import html as lxml_html
 
 
 from core.indexer import Indexer
-from core.indexer_utils import auth_redirect_reason, is_auth_host
-from core.utils import img_extensions, audio_extensions, video_extensions, doc_extensions, archive_extensions, url_matches_patterns
+from core.host_rate_limiter import paced
+from core.render_modes import BROWSER
+from core.indexer_utils import auth_redirect_reason, is_auth_host, normalize_url_for_metadata
+from core.utils import img_extensions, audio_extensions, video_extensions, doc_extensions, archive_extensions, url_matches_patterns, get_headers
 
 # Configure logging
 logger = logging.getLogger(__name__)
@@ -31,66 +39,151 @@ def _url_is_relative(url: str) -> bool:
     parsed_url = urlparse(url)
     return not parsed_url.scheme and not parsed_url.netloc
 
-def recursive_crawl(url: str, depth: int, 
-                    pos_patterns: List[re.Pattern], neg_patterns: List[re.Pattern], 
-                    indexer: Indexer, visited: Optional[Set[str]]=None, 
-                    verbose: bool = False) -> Set[str]:
-    """
-    Recursively crawl a URL and extract all links from it.
-    """    
-    if visited is None:
-        visited = set()
+DEFAULT_CRAWL_WORKERS = 8
+# Pages whose server-rendered HTML has less text than this are SPAs that need the browser
+_MIN_STATIC_TEXT = 500
+_NOT_PAGE_EXTENSIONS = tuple(ext.lower() for ext in archive_extensions + img_extensions + audio_extensions + video_extensions)
+_NOT_LINK_EXTENSIONS = tuple(ext.lower() for ext in archive_extensions + img_extensions)
+_NOT_CRAWLED_EXTENSIONS = _NOT_PAGE_EXTENSIONS + tuple(ext.lower() for ext in doc_extensions)
+
+
+def _path_ends_with(url: str, extensions: Tuple[str, ...]) -> bool:
+    return urlparse(url).path.lower().endswith(extensions)
 
-    parsed_url = urlparse(url)
-    current_path_lower = parsed_url.path.lower()
-    
-    if any([current_path_lower.endswith(ext) for ext in (archive_extensions + img_extensions + audio_extensions + video_extensions)]):
-        return visited
-    
-    # add the current URL
-    visited.add(url)
 
-    # for document files (like PPT, DOCX, etc) we don't extract links from the URL, but the link itself is included. 
-    if any([current_path_lower.endswith(ext) for ext in doc_extensions]):
-        return visited
+def _crawl_key(url: str) -> str:
+    """Dedupe key of a discovered page: its normalized URL without the fragment."""
+    return normalize_url_for_metadata(urldefrag(url)[0])
 
-    # if we reached the maximum depth, stop and return the visited URLs
-    if depth <= 0:
-        return visited
 
+def _static_links(url: str, headers: dict, rate_limiter) -> Optional[Tuple[str, List[str]]]:
+    """
+    (final_url, links) of url from a plain HTTP fetch, or None when the page needs the
+    browser: the fetch failed, or its HTML has too little text to be server-rendered.
+    """
     try:
-        res = indexer.fetch_page_contents(url)
-        # If the fetch was bounced to a sign-in / IdP page, drop link extraction:
-        # the page we landed on is the IdP's login form, not real content, and
-        # following its links would pollute the discovery set with sign-in chrome.
-        auth_reason = auth_redirect_reason(url, res.get('url', url))
-        if auth_reason:
-            logger.warning(
-                f"Skipping discovery from {url}: {auth_reason} ({res.get('url')}). "
-                f"Configure website_crawler.google_auth / saml_auth to crawl it."
-            )
-            return visited
-        new_urls = [urljoin(url, u) if _url_is_relative(u) else u for u in res['links']]  # convert all new URLs to absolute URLs
-        new_urls = [u for u in new_urls 
-                    if      u not in visited and u.startswith('http') and 
-                    url_matches_patterns(u, pos_patterns, neg_patterns)
-                   ]
-        new_urls = list(set(new_urls))
-        new_urls = [u for u in new_urls if not any([u.endswith(ext) for ext in archive_extensions + img_extensions])]
-        visited.update(new_urls)
-
-        if len(new_urls) > 0:
-            logger.info(f"collected {len(visited)} URLs so far")
-            if verbose:
-                logger.info(f"URLs so far: {visited}")
-
-        for new_url in new_urls:
-            visited = recursive_crawl(new_url, depth-1, pos_patterns, neg_patterns, indexer, visited, verbose)
+        with paced(rate_limiter, url):
+            response = requests.get(url, headers=headers, timeout=30, allow_redirects=True, stream=True)
+        with response:
+            if not response.ok:
+                return None
+            if 'text/html' not in response.headers.get('content-type', '').lower():
+                return response.url, []
+            doc = lxml_html.document_fromstring(response.content)
     except Exception as e:
-        logger.error(f"recursive_crawl failed for {url} ({type(e).__name__}: {e}); "
+        logger.debug(f"Static fetch of {url} failed, using the browser: {e}")
+        return None
+    etree.strip_elements(doc, 'script', 'style', 'noscript', with_tail=False)
+    if len(doc.text_content().strip()) <= _MIN_STATIC_TEXT:
+        return None
+    return response.url, [str(href) for href in doc.xpath('//a/@href')]
+
+
+def _browser_links(url: str, indexer: Indexer, rate_limiter) -> Optional[Tuple[str, List[str]]]:
+    """(final_url, links) of url rendered by the indexer's browser, or None if that failed."""
+    try:
+        with paced(rate_limiter, url):
+            res = indexer.fetch_page_contents(url)
+    except Exception as e:
+        logger.error(f"Crawl of {url} failed ({type(e).__name__}: {e}); "
                      "links discovered from this page may be incomplete")
+        return None
+    return res.get('url', url), res.get('links', [])
 
-    return set(visited)
+
+def iter_crawl(url: str, depth: int,
+               pos_patterns: List[re.Pattern], neg_patterns: List[re.Pattern],
+               indexer: Indexer, workers: int = DEFAULT_CRAWL_WORKERS,
+               rate_limiter=None) -> Iterator[str]:
+    """
+    Crawl breadth-first from url and yield every page URL as soon as it is discovered.
+
+    Each level of the frontier is fetched by `workers` threads with plain HTTP requests;
+    only pages whose static HTML is too sparse (or every page, when the indexer's
+    extractor has `skip_static_prefetch` set for auth, and pages of domains the indexer
+    has learned to need the browser) are rendered by the indexer's browser, one at a time on the calling thread because Playwright is not thread-safe.
+    URLs are deduplicated on their normalized form, and links are followed `depth`
+    levels deep. Document links are yielded but not fetched.
+
+    Args:
+        rate_limiter: paces every fetch: a HostRateLimiter, a RateLimiter, or None for no pacing
+    """
+    if rate_limiter is None:
+        rate_limiter = nullcontext()
+    if _path_ends_with(url, _NOT_PAGE_EXTENSIONS):
+        return
+    seen = {_crawl_key(url)}
+    yield url
+
+    extractor = getattr(indexer, 'web_extractor', None)
+    static_first = not getattr(extractor, 'skip_static_prefetch', False)
+    headers = get_headers(indexer.cfg) if static_first else None
+    render_modes = getattr(indexer, 'render_modes', None)
+    pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="crawl")
+    frontier = [url]
+    try:
+        for level in range(1, depth + 1):
+            pages = [u for u in frontier if not _path_ends_with(u, _NOT_CRAWLED_EXTENSIONS)]
+            if static_first:
+                rendered = [u for u in pages if render_modes is not None and render_modes.mode(u) == BROWSER]
+                futures = {pool.submit(_static_links, u, headers, rate_limiter): u
+                           for u in pages if u not in rendered}
+                fetched = chain(((futures[f], f.result()) for f in as_completed(futures)),
+                                ((u, None) for u in rendered))
+            else:
+                fetched = ((u, None) for u in pages)
+
+            frontier = []
+            for page_url, page in fetched:
+                if page is None:
+                    page = _browser_links(page_url, indexer, rate_limiter)
+                    if page is None:
+                        continue
+                final_url, links = page
+                # If the fetch was bounced to a sign-in / IdP page, drop link extraction:
+                # the page we landed on is the IdP's login form, not real content, and
+                # following its links would pollute the discovery set with sign-in chrome.
+                auth_reason = auth_redirect_reason(page_url, final_url)
+                if auth_reason:
+                    logger.warning(
+                        f"Skipping discovery from {page_url}: {auth_reason} ({final_url}). "
+                        f"Configure website_crawler.google_auth / saml_auth to crawl it."
+                    )
+                    continue
+                for link in links:
+                    link = urljoin(final_url, link) if _url_is_relative(link) else link
+                    if not (link.startswith('http') and url_matches_patterns(link, pos_patterns, neg_patterns)):
+                        continue
+                    if _path_ends_with(link, _NOT_LINK_EXTENSIONS):
+                        continue
+                    key = _crawl_key(link)
+                    if key in seen:
+                        continue
+                    seen.add(key)
+                    frontier.append(link)
+                    yield link
+            logger.info(f"Crawled depth {level} from {url}: collected {len(seen)} URLs so far")
+            if not frontier:
+                break
+    finally:
+        pool.shutdown(wait=False, cancel_futures=True)
+
+
+def recursive_crawl(url: str, depth: int,
+                    pos_patterns: List[re.Pattern], neg_patterns: List[re.Pattern],
+                    indexer: Indexer, visited: Optional[Set[str]]=None,
+                    verbose: bool = False, workers: int = DEFAULT_CRAWL_WORKERS,
+                    rate_limiter=None) -> Set[str]:
+    """
+    Crawl a URL up to `depth` links deep and return every URL found (see iter_crawl),
+    together with any URLs already in `visited`.
+    """
+    visited = set() if visited is None else set(visited)
+    visited.update(iter_crawl(url, depth, pos_patterns, neg_patterns, indexer,
+                              workers=workers, rate_limiter=rate_limiter))
+    if verbose:
+        logger.info(f"URLs found from {url}: {visited}")
+    return visited
 
 DISALLOWED_REDIRECT_EXTENSIONS = tuple(
     ext.lower() for ext in (doc_extensions + archive_extensions + img_extensions)
@@ -379,62 +472,153 @@ def run_link_spider_isolated(
         raise error
     return results if results is not None else []
 
-def _download(url: str, session=None) -> bytes:
-    headers = {
-        "User-Agent": (
-            "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-            "AppleWebKit/537.36 (KHTML, like Gecko) "
-            "Chrome/124.0.0.0 Safari/537.36"
-        ),
-        "Accept": "application/xml,text/xml;q=0.9,*/*;q=0.8",
-    }
-    """GET *url* and transparently gunzip if needed."""
-    if session:
-        resp = session.get(url, headers=headers, timeout=15, allow_redirects=True)
-    else:
-        resp = requests.get(url, headers=headers, timeout=15, allow_redirects=True)
-    resp.raise_for_status()
-    data = resp.content
-
-    if url.endswith(".gz"):  
-        try:  
-            return gzip.decompress(data)  
-        except (OSError, gzip.BadGzipFile) as e:  
-            logger.error(f"Failed to decompress gzip data from URL {url}: {e}")  
-            return b""  # Return empty bytes or handle as needed  
-    return data
-
-def _walk(url: str, seen: Set[str] | None = None, session=None) -> Iterable[str]:
-    """Depth-first walk of a sitemap/sitemap-index."""
-    seen = seen or set()
-    sm = Sitemap(_download(url, session=session))              # auto-detects type
-    if sm.type == "urlset":                   # leaf file
-        for loc in iterloc(sm):
-            if loc not in seen:
-                seen.add(loc)
-                yield loc
-    elif sm.type == "sitemapindex":           # recurse into children
-        for child in iterloc(sm):
-            yield from _walk(child, seen, session=session)
-
-
-def _walk_with_meta(url: str, seen: Set[str] | None = None, session=None):
+DEFAULT_SITEMAP_WORKERS = 8
+_SITEMAP_HEADERS = {
+    "User-Agent": (
+        "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+        "AppleWebKit/537.36 (KHTML, like Gecko) "
+        "Chrome/124.0.0.0 Safari/537.36"
+    ),
+    "Accept": "application/xml,text/xml;q=0.9,*/*;q=0.8",
+}
+_GZIP_MAGIC = b"\x1f\x8b"
+# Entries handed from a fetch thread to the consumer at a time, and batches buffered between them
+_ENTRY_BATCH = 500
+_QUEUED_BATCHES = 64
+
+
+@contextmanager
+def _open_sitemap(url: str, session=None):
+    """Stream *url* as a binary file, transparently gunzipping a gzip body (.xml.gz)."""
+    get = session.get if session else requests.get
+    resp = get(url, headers=_SITEMAP_HEADERS, timeout=15, allow_redirects=True, stream=True)
+    try:
+        resp.raise_for_status()
+        resp.raw.decode_content = True           # undo Content-Encoding
+        stream = io.BufferedReader(resp.raw)
+        if stream.peek(2)[:2] == _GZIP_MAGIC:    # a gzip file, whatever its headers say
+            stream = gzip.GzipFile(fileobj=stream)
+        yield stream
+    finally:
+        resp.close()
+
+
+def _iter_sitemap_entries(stream) -> Iterator[Tuple[str, str, Optional[str]]]:
+    """
+    Parse a sitemap or sitemap index incrementally, yielding (kind, loc, lastmod) where kind is
+    'url' (a page) or 'sitemap' (a child sitemap). Each entry is dropped once read, so memory
+    stays flat however large the file is.
     """
-    Like _walk, but yields (loc, lastmod) tuples. `lastmod` is the sitemap <lastmod> string
-    when present, else None. Children reached via a sitemap-index carry no lastmod of their own
-    (their entries' lastmod is yielded from the leaf urlset they point to).
+    for _, elem in etree.iterparse(stream, events=("end",), resolve_entities=False, no_network=True,
+                                   huge_tree=True, remove_comments=True, recover=True):
+        if not isinstance(elem.tag, str):
+            continue
+        kind = etree.QName(elem).localname
+        if kind not in ("url", "sitemap"):
+            continue
+        loc = lastmod = None
+        for child in elem:
+            if not isinstance(child.tag, str):
+                continue
+            name = etree.QName(child).localname
+            if name == "loc":
+                loc = (child.text or "").strip()
+            elif name == "lastmod":
+                lastmod = (child.text or "").strip() or None
+        elem.clear()
+        while elem.getprevious() is not None:
+            del elem.getparent()[0]
+        if loc:
+            yield kind, loc, lastmod
+
+
+class _WalkStopped(Exception):
+    """The consumer of iter_sitemap went away."""
+
+
+def _is_sitemap_url(url: str) -> bool:
+    return PurePosixPath(urlparse(url).path.lower()).suffix in {".xml", ".gz"}
+
+
+def iter_sitemap(url: str, session=None, workers: int = DEFAULT_SITEMAP_WORKERS) -> Iterator[Tuple[str, Optional[str]]]:
     """
-    seen = seen or set()
-    sm = Sitemap(_download(url, session=session))
-    if sm.type == "urlset":
-        for entry in sm:                       # scrapy yields dicts: loc, lastmod, ...
-            loc = entry.get("loc")
-            if loc and loc not in seen:
-                seen.add(loc)
-                yield loc, entry.get("lastmod")
-    elif sm.type == "sitemapindex":
-        for child in iterloc(sm):
-            yield from _walk_with_meta(child, seen, session=session)
+    Yield (loc, lastmod) for every page listed under *url*, as soon as it is parsed.
+
+    - If *url* is a sitemap (ends with .xml / .xml.gz) ➟ walk it; a failure to read it raises.
+    - Otherwise treat it as a *site root* ➟ discover all sitemaps ➟ walk them all, skipping
+      the ones that fail.
+
+    Sitemaps (the children of an index included) are fetched `workers` at a time and parsed
+    while they stream in. `lastmod` is None when the sitemap does not declare one. De-duped on
+    loc, keeping the first lastmod seen; pages come in the order their sitemaps are read.
+    """
+    explicit = _is_sitemap_url(url)
+    roots = [url] if explicit else discover_sitemaps(url, session=session)
+    messages: "queue.Queue" = queue.Queue(maxsize=_QUEUED_BATCHES)
+    stop = threading.Event()
+
+    def put(message):
+        while not stop.is_set():
+            try:
+                messages.put(message, timeout=0.5)
+                return
+            except queue.Full:
+                continue
+        raise _WalkStopped()
+
+    def fetch(sm_url):
+        error = None
+        try:
+            with _open_sitemap(sm_url, session=session) as stream:
+                batch = []
+                for entry in _iter_sitemap_entries(stream):
+                    batch.append(entry)
+                    if len(batch) >= _ENTRY_BATCH:
+                        put(("entries", sm_url, batch))
+                        batch = []
+                put(("entries", sm_url, batch))
+        except _WalkStopped:
+            return
+        except Exception as exc:
+            error = exc
+        try:
+            put(("done", sm_url, error))
+        except _WalkStopped:
+            pass
+
+    pool = ThreadPoolExecutor(max(1, workers), thread_name_prefix="sitemap")
+    seen_sitemaps: Set[str] = set()
+    seen_locs: Set[str] = set()
+    pending = 0
+
+    def submit(sm_url):
+        nonlocal pending
+        if sm_url not in seen_sitemaps:
+            seen_sitemaps.add(sm_url)
+            pending += 1
+            pool.submit(fetch, sm_url)
+
+    try:
+        for root in roots:
+            submit(root)
+        while pending:
+            kind, sm_url, payload = messages.get()
+            if kind == "done":
+                pending -= 1
+                if payload is not None:
+                    if explicit and sm_url == url:
+                        raise payload
+                    logger.warning(f"[iter_sitemap] -- skipping {sm_url}: {payload}")
+                continue
+            for entry_kind, loc, lastmod in payload:
+                if entry_kind == "sitemap":
+                    submit(loc)
+                elif loc not in seen_locs:
+                    seen_locs.add(loc)
+                    yield loc, lastmod
+    finally:
+        stop.set()
+        pool.shutdown(wait=False, cancel_futures=True)
 
 
 COMMON_SITEMAP_FILENAMES = (
@@ -487,53 +671,19 @@ def discover_sitemaps(site_root: str, extra_candidates: list[str] | None = None,
             seen.add(u)
     return uniq
 
-def sitemap_to_urls(url: str, session=None) -> list[str]:
-    """
-    - If the caller passes *the sitemap URL* (ends with .xml / .xml.gz) ➟ parse it.
-    - Otherwise treat it as a *site root* ➟ discover all sitemaps ➟ parse them all.
-    """
-    parsed_path = PurePosixPath(urlparse(url).path.lower())
-    is_explicit_sitemap = parsed_path.suffix in {".xml", ".gz"}
-
-    if is_explicit_sitemap:
-        return list(_walk(url, session=session))
-
-    # Autodiscover mode
-    all_urls: list[str] = []
-    for sm_url in discover_sitemaps(url, session=session):
-        try:
-            all_urls.extend(_walk(sm_url, session=session))
-        except Exception as exc:
-            # Swallow individual sitemap failures but record what happened
-            logger.warning(f"[sitemap_to_urls] -- skipping {sm_url}: {exc}")
-    return list(dict.fromkeys(all_urls))  # de-dupe while keeping order
+def sitemap_to_urls(url: str, session=None, workers: int = DEFAULT_SITEMAP_WORKERS) -> list[str]:
+    """Every page URL found by iter_sitemap, de-duped with order kept."""
+    return [loc for loc, _ in iter_sitemap(url, session=session, workers=workers)]
 
 
-def sitemap_to_urls_with_meta(url: str, session=None) -> list[tuple[str, Optional[str]]]:
+def sitemap_to_urls_with_meta(url: str, session=None,
+                              workers: int = DEFAULT_SITEMAP_WORKERS) -> list[tuple[str, Optional[str]]]:
     """
     Same discovery as sitemap_to_urls, but returns (loc, lastmod) tuples so incremental
     crawling can skip URLs whose sitemap <lastmod> is not newer than what is already indexed.
     `lastmod` is None when the sitemap does not declare one. De-duped on loc, order preserved.
     """
-    parsed_path = PurePosixPath(urlparse(url).path.lower())
-    is_explicit_sitemap = parsed_path.suffix in {".xml", ".gz"}
-
-    pairs: list[tuple[str, Optional[str]]] = []
-    if is_explicit_sitemap:
-        pairs = list(_walk_with_meta(url, session=session))
-    else:
-        for sm_url in discover_sitemaps(url, session=session):
-            try:
-                pairs.extend(_walk_with_meta(sm_url, session=session))
-            except Exception as exc:
-                logger.warning(f"[sitemap_to_urls_with_meta] -- skipping {sm_url}: {exc}")
-
-    # De-dupe on loc, keep first lastmod seen, preserve order
-    out: dict[str, Optional[str]] = {}
-    for loc, lastmod in pairs:
-        if loc not in out:
-            out[loc] = lastmod
-    return list(out.items())
+    return list(iter_sitemap(url, session=session, workers=workers))
 
 
 if __name__ == "__main__":
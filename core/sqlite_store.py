@@ -0,0 +1,64 @@
+"""
+Base class of the SQLite files the Indexer keeps next to the crawl tracking DB (upload
+outbox, corpus manifest, near-duplicate index, HTTP validators, image summary cache).
+
+Each store opens one connection on first use, in WAL mode with a busy timeout, so several
+processes (Ray workers) can share the file while SQLite serializes their writes. Calls
+within a process share that connection under the store's lock. Connections and locks do
+not pickle, so a store drops both when it is pickled with the Indexer and opens its
+connection again on first use in the Ray actor.
+"""
+
+import os
+import sqlite3
+import threading
+from typing import Any, Dict, Optional
+
+
+class SQLiteStore:
+    """
+    Lazily opened, lock-guarded SQLite connection shared by the methods of a store.
+
+    Subclasses set SCHEMA_SQL (run on open, so it must be idempotent) and may override
+    _migrate() to upgrade files written by older versions. Hold self._lock around every use
+    of self._connection().
+    """
+
+    SCHEMA_SQL = ""
+
+    def __init__(self, db_path: Optional[str]):
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA busy_timeout=5000")
+            conn.executescript(self.SCHEMA_SQL)
+            self._migrate(conn)
+            conn.commit()
+            self._conn = conn
+        return self._conn
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        """In-place upgrade of a file created by an older version; runs after SCHEMA_SQL."""
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.commit()
+                self._conn.close()
+                self._conn = None
+
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        state["_conn"] = None
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
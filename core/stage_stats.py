@@ -0,0 +1,330 @@
+"""
+Per-stage timing, byte and LLM token counters (vectara.stage_stats).
+
+Where does the time go for one document? With stage_stats on, every index_* call on
+the Indexer opens a *document scope*, and the pipeline stages inside it (static
+prefetch, browser render and its settle wait, parse, image / table summarization,
+contextual chunking, metadata extraction, document build, upload, conflict retry) are
+timed as *spans*:
+
+    with stage(PARSE, bytes_in=os.path.getsize(filename)) as span:
+        parsed = parser.parse(filename, uri)
+        span.add(bytes_out=...)
+
+A span records its exclusive wall time: a span opened inside another one on the same
+thread (e.g. image summarization inside a Docling parse) is subtracted from its parent,
+so the stages of a document add up to its wall time. A span opened inside a span of the
+same stage (a per-image call inside a parallel summarization region) is folded into it.
+LLM token usage reported by core/models.py is charged to the innermost open span. When a document scope ends, each stage's totals
+for that document become one sample; StageStats keeps totals and a bounded reservoir
+of samples per stage, from which it reports percentiles.
+
+The scope travels in a ContextVar, so components (FileProcessor, DocumentParser,
+ImageProcessor, the web extractor) need no handle on the stats object: stage() outside
+a scope, or with stage_stats off, returns a shared no-op span. Work handed to a thread
+pool keeps its attribution when the callable is wrapped with bind_scope().
+
+Counters are per process. With Ray workers each worker's Indexer logs its own summary
+when it is cleaned up.
+"""
+
+import logging
+import random
+import threading
+import time
+from array import array
+from contextvars import ContextVar
+from functools import wraps
+from typing import Any, Callable, Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+STATIC_PREFETCH = "static_prefetch"
+RENDER = "render"
+# Waiting for a rendered page to settle (see core/page_settle.py), inside RENDER
+SETTLE = "settle"
+PARSE = "parse"
+IMAGE_SUMMARY = "image_summary"
+TABLE_SUMMARY = "table_summary"
+CONTEXTUAL_CHUNKING = "contextual_chunking"
+EXTRACT_METADATA = "extract_metadata"
+DOCUMENT_BUILD = "document_build"
+UPLOAD = "upload"
+CONFLICT_RETRY = "conflict_retry"
+# Wall time of the whole document scope
+DOCUMENT = "document"
+
+# Samples kept per stage for percentiles (reservoir sampling beyond this)
+_RESERVOIR_SIZE = 10000
+# seconds, bytes_in, bytes_out, tokens_in, tokens_out
+_COUNTERS = 5
+
+
+class _Span:
+    """One timed stage inside a document scope."""
+    __slots__ = ("scope", "name", "parent", "bytes_in", "bytes_out", "tokens_in", "tokens_out",
+                 "_start", "_children", "_token", "_thread")
+
+    def __init__(self, scope: "_Scope", name: str, parent: Optional["_Span"]):
+        self.scope = scope
+        self.name = name
+        # Only a parent waiting on this thread loses the time; work on pool threads overlaps it
+        self.parent = parent if parent is not None and parent._thread == threading.get_ident() else None
+        self._thread = threading.get_ident()
+        self.bytes_in = self.bytes_out = self.tokens_in = self.tokens_out = 0
+        self._children = 0.0
+        self._start = time.perf_counter()
+        self._token = None
+
+    def add(self, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        with self.scope._lock:
+            self.bytes_in += bytes_in
+            self.bytes_out += bytes_out
+
+    def end(self) -> None:
+        elapsed = time.perf_counter() - self._start
+        if self._token is not None:
+            _current_span.reset(self._token)
+            self._token = None
+        if self.parent is not None:
+            self.parent._children += elapsed
+        self.scope.add(self.name, (max(0.0, elapsed - self._children), self.bytes_in, self.bytes_out,
+                                   self.tokens_in, self.tokens_out))
+
+    def __enter__(self) -> "_Span":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.end()
+
+
+class _NullSpan:
+    """Returned when no document scope is open (or stage_stats is off)."""
+    __slots__ = ()
+
+    def add(self, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        pass
+
+    def end(self) -> None:
+        pass
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Reentry(_NullSpan):
+    """A stage opened inside a span of the same stage: its bytes go to the outer span."""
+    __slots__ = ("span",)
+
+    def __init__(self, span: _Span):
+        self.span = span
+
+    def add(self, bytes_in: int = 0, bytes_out: int = 0) -> None:
+        self.span.add(bytes_in, bytes_out)
+
+
+class _Scope:
+    """Per-document accumulator; folded into its StageStats when the document is done."""
+
+    def __init__(self, stats: "StageStats"):
+        self.stats = stats
+        self.totals: Dict[str, list] = {}
+        self.closed = False
+        self._lock = threading.Lock()
+
+    def add(self, name: str, values) -> None:
+        with self._lock:
+            if self.closed:
+                # e.g. a queued upload finishing after its document scope ended
+                self.stats._fold({name: list(values)})
+                return
+            totals = self.totals.setdefault(name, [0.0] * _COUNTERS)
+            for i, v in enumerate(values):
+                totals[i] += v
+
+    def close(self, wall_seconds: float) -> None:
+        with self._lock:
+            self.closed = True
+            totals = self.totals
+            totals[DOCUMENT] = [wall_seconds] + [0] * (_COUNTERS - 1)
+        self.stats._fold(totals)
+
+
+_current_scope: ContextVar[Optional[_Scope]] = ContextVar("vectara_stage_scope", default=None)
+_current_span: ContextVar[Optional[_Span]] = ContextVar("vectara_stage_span", default=None)
+
+
+def stage(name: str, bytes_in: int = 0):
+    """Time a pipeline stage of the current document (a no-op outside a document scope).
+    Use as a context manager, or call .end() on the result."""
+    scope = _current_scope.get()
+    if scope is None:
+        return _NULL_SPAN
+    parent = _current_span.get()
+    if parent is not None and parent.name == name:
+        parent.add(bytes_in=bytes_in)
+        return _Reentry(parent)
+    span = _Span(scope, name, parent)
+    span.bytes_in = bytes_in
+    span._token = _current_span.set(span)
+    return span
+
+
+def record_elapsed(name: str, seconds: float) -> None:
+    """Record `seconds` of stage `name` timed off this thread (e.g. on an event loop) as if it
+    had been a span nested in the innermost open one."""
+    scope = _current_scope.get()
+    if scope is None:
+        return
+    parent = _current_span.get()
+    if parent is not None and parent._thread == threading.get_ident():
+        parent._children += seconds
+    scope.add(name, (seconds, 0, 0, 0, 0))
+
+
+def record_tokens(tokens_in: Any, tokens_out: Any) -> None:
+    """Charge LLM token usage to the innermost open stage. Non-integer values are ignored,
+    since providers and proxies do not always report usage."""
+    span = _current_span.get()
+    if span is None:
+        return
+    with span.scope._lock:   # pool threads bound to the same span report concurrently
+        if isinstance(tokens_in, int):
+            span.tokens_in += tokens_in
+        if isinstance(tokens_out, int):
+            span.tokens_out += tokens_out
+
+
+def bind_scope(fn: Callable) -> Callable:
+    """Wrap fn so that, run on another thread, it records into the caller's document scope
+    and stage. Returns fn unchanged when no scope is open."""
+    scope, span = _current_scope.get(), _current_span.get()
+    if scope is None:
+        return fn
+
+    @wraps(fn)
+    def bound(*args, **kwargs):
+        scope_token, span_token = _current_scope.set(scope), _current_span.set(span)
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_span.reset(span_token)
+            _current_scope.reset(scope_token)
+    return bound
+
+
+def measured_document(method: Callable) -> Callable:
+    """Decorator for Indexer.index_* methods: run the call in a document scope when the
+    indexer's stage_stats is on. Nested calls (index_url -> index_file -> index_segments)
+    share the outermost scope."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        stats = self.stage_stats
+        if stats is None or _current_scope.get() is not None:
+            return method(self, *args, **kwargs)
+        return stats.run_document(method, self, *args, **kwargs)
+    return wrapper
+
+
+def _percentile(values, pct: float) -> float:
+    k = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+class StageStats:
+    """
+    Totals and per-document samples of every stage, aggregated over a crawl.
+
+    Thread-safe; pickles without its lock, so it travels with the Indexer to Ray actors
+    (each actor then counts on its own).
+    """
+
+    def __init__(self, reservoir_size: int = _RESERVOIR_SIZE):
+        self.reservoir_size = reservoir_size
+        self._totals: Dict[str, list] = {}
+        self._docs: Dict[str, int] = {}
+        self._samples: Dict[str, array] = {}
+        self._random = random.Random(0)
+        self._lock = threading.Lock()
+
+    def run_document(self, fn: Callable, *args, **kwargs):
+        """Call fn inside a new document scope."""
+        scope = _Scope(self)
+        scope_token = _current_scope.set(scope)
+        span_token = _current_span.set(None)
+        st = time.perf_counter()
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            _current_span.reset(span_token)
+            _current_scope.reset(scope_token)
+            scope.close(time.perf_counter() - st)
+
+    def _fold(self, per_stage: Dict[str, list]) -> None:
+        with self._lock:
+            for name, values in per_stage.items():
+                totals = self._totals.setdefault(name, [0.0] * _COUNTERS)
+                for i, v in enumerate(values):
+                    totals[i] += v
+                seen = self._docs.get(name, 0) + 1
+                self._docs[name] = seen
+                samples = self._samples.setdefault(name, array("d"))
+                if len(samples) < self.reservoir_size:
+                    samples.append(values[0])
+                else:
+                    j = self._random.randrange(seen)
+                    if j < self.reservoir_size:
+                        samples[j] = values[0]
+
+    def documents(self) -> int:
+        with self._lock:
+            return self._docs.get(DOCUMENT, 0)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Per stage: docs it ran for, total seconds, p50/p90/p99/max ms per document,
+        bytes in/out and LLM tokens in/out."""
+        with self._lock:
+            snapshot = {name: (list(totals), self._docs[name], sorted(self._samples[name]))
+                        for name, totals in self._totals.items()}
+        result = {}
+        for name, (totals, docs, samples) in snapshot.items():
+            result[name] = {
+                'docs': docs,
+                'seconds': round(totals[0], 3),
+                'p50_ms': round(_percentile(samples, 50) * 1000, 1),
+                'p90_ms': round(_percentile(samples, 90) * 1000, 1),
+                'p99_ms': round(_percentile(samples, 99) * 1000, 1),
+                'max_ms': round(samples[-1] * 1000, 1),
+                'bytes_in': int(totals[1]),
+                'bytes_out': int(totals[2]),
+                'tokens_in': int(totals[3]),
+                'tokens_out': int(totals[4]),
+            }
+        return result
+
+    def format_summary(self) -> str:
+        """The summary as a fixed-width table, slowest stages first."""
+        summary = self.summary()
+        lines = [f"{'stage':<20}{'docs':>8}{'total s':>10}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}"
+                 f"{'max ms':>10}{'MB in':>9}{'MB out':>9}{'tok in':>10}{'tok out':>10}"]
+        for name, s in sorted(summary.items(), key=lambda kv: (kv[0] != DOCUMENT, -kv[1]['seconds'])):
+            lines.append(f"{name:<20}{s['docs']:>8}{s['seconds']:>10.1f}{s['p50_ms']:>10}{s['p90_ms']:>10}"
+                         f"{s['p99_ms']:>10}{s['max_ms']:>10}{s['bytes_in'] / 1e6:>9.1f}"
+                         f"{s['bytes_out'] / 1e6:>9.1f}{s['tokens_in']:>10}{s['tokens_out']:>10}")
+        return "\n".join(lines)
+
+    # Locks do not pickle; the Indexer (and so this object) is shipped to Ray actors.
+    def __getstate__(self) -> Dict[str, Any]:
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -8,6 +8,8 @@ from io import BytesIO
 import cairosvg
 import json
 from core.models import generate, generate_image_summary
+from core.image_summary_cache import get_image_summary_cache
+from core.stage_stats import EXTRACT_METADATA, IMAGE_SUMMARY, TABLE_SUMMARY, stage
 
 logger = logging.getLogger(__name__)
 
@@ -57,7 +59,9 @@ def get_attributes_from_text(cfg: OmegaConf, text: str, metadata_questions: list
     prompt += "Your response should be as concise and accurate as possible. Prioritize 1-2 word responses."
     prompt += "Your response should be as a dictionary of attribute/value pairs in JSON format, and include only the JSON output without any additional text."
     logger.info("get_attributes_from_text() - Calling generate")
-    res = generate(cfg, system_prompt, prompt, model_config)
+    with stage(EXTRACT_METADATA, bytes_in=len(text)) as span:
+        res = generate(cfg, system_prompt, prompt, model_config)
+        span.add(bytes_out=len(res))
     res = res.strip()
     if res.startswith("```json"):
         res = res.removeprefix("```json")
@@ -76,6 +80,8 @@ class ImageSummarizer():
     def __init__(self, cfg: OmegaConf, image_model_config: dict):
         self.image_model_config = image_model_config
         self.cfg = cfg
+        # Summaries of images seen before, on any page, worker or earlier run (None = off)
+        self.cache = get_image_summary_cache(cfg)
 
     def _load_image_b64(self, image_path: str, image_url: str) -> Optional[str]:
         """
@@ -174,13 +180,25 @@ class ImageSummarizer():
         if next_text:
             prompt += f"\nText after image: '{next_text}'"
 
+        cache_key = None
+        if self.cache is not None:
+            cache_key = self.cache.key(content_b64, self.image_model_config, prompt)
+            cached = self.cache.get(cache_key)
+            if cached is not None:
+                return cached
+
         try:
-            return generate_image_summary(
-                self.cfg,
-                prompt,
-                content_b64,
-                self.image_model_config
-            )
+            with stage(IMAGE_SUMMARY, bytes_in=len(content_b64) * 3 // 4) as span:
+                summary = generate_image_summary(
+                    self.cfg,
+                    prompt,
+                    content_b64,
+                    self.image_model_config
+                )
+                span.add(bytes_out=len(summary or ""))
+            if cache_key is not None and summary:
+                self.cache.put(cache_key, summary)
+            return summary
         except Exception as e:
             logger.error(f"Image summary generation failed for {image_url}: {e}")
             return None
@@ -204,7 +222,9 @@ Here is the table:
         """
         try:
             system_prompt = "You are a helpful assistant tasked with summarizing data tables. Each table is represented in markdown format."
-            summary = generate(self.cfg, system_prompt, prompt, self.table_model_config)
+            with stage(TABLE_SUMMARY, bytes_in=len(text) if isinstance(text, str) else 0) as span:
+                summary = generate(self.cfg, system_prompt, prompt, self.table_model_config)
+                span.add(bytes_out=len(summary or ""))
             # Ensure we always return a string, never None
             return summary if summary else ""
         except Exception as e:
@@ -0,0 +1,120 @@
+"""
+SQLite-backed upload outbox for crash-safe resume (vectara.upload_outbox).
+
+Building a document can cost a Docling parse, OCR and several LLM calls. If a run dies
+between building it and Vectara accepting it, that work is lost and the next run pays
+for it again. With the outbox on, the Indexer writes each serialized document to an
+`outbox` table before posting it and deletes the row once the POST is resolved, so the
+table only ever holds documents that may not have reached Vectara. On startup,
+ingest.py replays what is left before crawling. Each row also keeps the document's
+metadata in a column of its own, so the replay can record it in the manifest without
+parsing the stored body.
+
+The database lives next to the CrawlTracker DB (`upload_outbox.db` in the output dir).
+Rows are keyed by corpus, so several configs can share one output dir.
+"""
+
+import json
+import logging
+import sqlite3
+from typing import Any, Dict, Iterator, Optional, Tuple, Union
+
+from core.json_stream import StreamingJSONBody
+from core.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS outbox (
+    corpus_key    TEXT NOT NULL,
+    doc_id        TEXT NOT NULL,
+    crawler_type  TEXT NOT NULL,
+    body          BLOB NOT NULL,
+    metadata      TEXT,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    created_at    TEXT NOT NULL DEFAULT (datetime('now')),
+    PRIMARY KEY (corpus_key, doc_id)
+);
+"""
+
+
+class UploadOutbox(SQLiteStore):
+    """
+    Durable store of serialized documents that are built but not yet accepted by Vectara.
+    Thread-safe; several processes (Ray workers) can share the file.
+    """
+
+    SCHEMA_SQL = _SCHEMA_SQL
+
+    def __init__(self, db_path: str, corpus_key: str, crawler_type: str = ""):
+        super().__init__(db_path)
+        self.corpus_key = corpus_key
+        self.crawler_type = crawler_type
+
+    def _migrate(self, conn: sqlite3.Connection) -> None:
+        # Outboxes written before the metadata column existed
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(outbox)").fetchall()}
+        if "metadata" not in cols:
+            conn.execute("ALTER TABLE outbox ADD COLUMN metadata TEXT")
+
+    def put(self, doc_id: str, body: Union[str, bytes, StreamingJSONBody],
+            metadata: Optional[Dict[str, Any]] = None) -> None:
+        """Record a serialized document and its metadata before it is posted (replacing any older
+        version). A StreamingJSONBody is streamed into the row, so image payloads are never joined in memory."""
+        streaming = isinstance(body, StreamingJSONBody)
+        metadata_json = json.dumps(metadata, default=str) if metadata is not None else None
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        # A streamed body is written in place into a zero-filled blob of its exact size
+        value_sql, value = ("zeroblob(?)", len(body)) if streaming else ("?", body)
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                f"""INSERT INTO outbox (corpus_key, doc_id, crawler_type, body, metadata, attempts, created_at)
+                    VALUES (?, ?, ?, {value_sql}, ?, 0, datetime('now'))
+                    ON CONFLICT(corpus_key, doc_id) DO UPDATE SET
+                        crawler_type=excluded.crawler_type, body=excluded.body, metadata=excluded.metadata,
+                        attempts=0, created_at=datetime('now')""",
+                (self.corpus_key, doc_id, self.crawler_type, value, metadata_json),
+            )
+            if streaming:
+                rowid = conn.execute("SELECT rowid FROM outbox WHERE corpus_key=? AND doc_id=?",
+                                     (self.corpus_key, doc_id)).fetchone()[0]
+                with conn.blobopen("outbox", "body", rowid) as blob:
+                    for chunk in body:
+                        blob.write(chunk)
+            conn.commit()
+
+    def remove(self, doc_id: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute("DELETE FROM outbox WHERE corpus_key=? AND doc_id=?", (self.corpus_key, doc_id))
+            conn.commit()
+
+    def mark_attempt(self, doc_id: str) -> None:
+        """Count a replay that did not get through; the row stays for the next run."""
+        with self._lock:
+            conn = self._connection()
+            conn.execute("UPDATE outbox SET attempts = attempts + 1 WHERE corpus_key=? AND doc_id=?",
+                         (self.corpus_key, doc_id))
+            conn.commit()
+
+    def pending(self) -> Iterator[Tuple[str, bytes, Optional[Dict[str, Any]]]]:
+        """Yield (doc_id, JSON body, metadata or None) for every document of this corpus still in the
+        outbox, oldest first. Rows are fetched one at a time, so large outboxes are not loaded into memory."""
+        with self._lock:
+            ids = [r[0] for r in self._connection().execute(
+                "SELECT doc_id FROM outbox WHERE corpus_key=? ORDER BY created_at", (self.corpus_key,))]
+        for doc_id in ids:
+            with self._lock:
+                row = self._connection().execute(
+                    "SELECT body, metadata FROM outbox WHERE corpus_key=? AND doc_id=?", (self.corpus_key, doc_id)
+                ).fetchone()
+            if row is not None:
+                yield doc_id, row[0], json.loads(row[1]) if row[1] is not None else None
+
+    def count(self) -> int:
+        with self._lock:
+            return self._connection().execute(
+                "SELECT COUNT(*) FROM outbox WHERE corpus_key=?", (self.corpus_key,)).fetchone()[0]
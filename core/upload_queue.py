@@ -0,0 +1,177 @@
+"""
+Bounded background upload queue for the Indexer.
+
+Without it every crawler worker blocks inside the Vectara POST until it returns, so
+document parsing (Docling, OCR, LLM summaries) and network upload never overlap. With
+`vectara.upload_threads > 0` the Indexer hands each fully built document to a small pool
+of uploader threads and returns to the crawler immediately; the crawler parses the next
+file while the previous one uploads.
+
+The queue is bounded (`vectara.upload_queue_size`): once that many documents are waiting
+or in flight, submit() blocks the producer. That backpressure keeps memory flat when
+uploads are slower than parsing, and makes the worst case equal to today's synchronous
+behavior rather than an unbounded pile of built documents.
+
+Results are grouped per source item (a file, a URL) in an UploadTicket, because one
+index_file() call can produce several documents (image sub-docs, split PDF parts). The
+crawler holds the ticket and reports the item to the CrawlTracker once it resolves.
+"""
+
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# An upload job returns (succeeded, error_message). error_message is None on success.
+UploadOutcome = Tuple[bool, Optional[str]]
+
+
+class UploadTicket:
+    """All background uploads submitted on behalf of one source item.
+
+    A ticket with no uploads (e.g. the item was skipped as unchanged, or failed before
+    anything was built) is immediately done and reports the synchronous outcome.
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self.doc_ids: List[str] = []
+        self._futures: List[Future] = []
+
+    def add(self, doc_id: str, future: Future) -> None:
+        self.doc_ids.append(doc_id)
+        self._futures.append(future)
+
+    def extend(self, other: "UploadTicket") -> None:
+        for doc_id, future in zip(other.doc_ids, other._futures):
+            self.add(doc_id, future)
+
+    def __len__(self) -> int:
+        return len(self._futures)
+
+    def when_done(self, callback: Callable[[bool], None]) -> None:
+        """Call callback(True iff all succeeded) once the uploads added so far have finished,
+        on the uploader thread that finishes last (at once when there are none)."""
+        futures = list(self._futures)
+        if not futures:
+            callback(True)
+            return
+        lock = threading.Lock()
+        pending = [len(futures)]
+
+        def _finished(_):
+            with lock:
+                pending[0] -= 1
+                last = pending[0] == 0
+            if last:
+                callback(all(_succeeded(f) for f in futures))
+
+        for future in futures:
+            future.add_done_callback(_finished)
+
+    def done(self) -> bool:
+        return all(f.done() for f in self._futures)
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        """Block until every upload finishes; True iff all of them succeeded."""
+        ok = True
+        for f in self._futures:
+            try:
+                succeeded, _ = f.result(timeout=timeout)
+            except Exception:
+                succeeded = False
+            ok = ok and succeeded
+        return ok
+
+    def errors(self) -> List[str]:
+        """Error strings of the finished uploads that failed (in submission order)."""
+        out = []
+        for doc_id, f in zip(self.doc_ids, self._futures):
+            if not f.done():
+                continue
+            try:
+                succeeded, error = f.result()
+            except Exception as e:
+                succeeded, error = False, f"upload raised: {e}"
+            if not succeeded:
+                out.append(f"{doc_id}: {error or 'upload failed'}")
+        return out
+
+
+def _succeeded(future: Future) -> bool:
+    try:
+        return bool(future.result()[0])
+    except Exception:
+        return False
+
+
+class UploadQueue:
+    """
+    Fixed pool of uploader threads fed through a bounded queue.
+
+    Args:
+        num_threads (int): Number of concurrent uploader threads.
+        max_pending (int): Maximum number of documents queued or in flight. submit()
+            blocks once this many are outstanding.
+    """
+
+    def __init__(self, num_threads: int, max_pending: Optional[int] = None):
+        self.num_threads = max(int(num_threads), 1)
+        self.max_pending = max(int(max_pending or 2 * self.num_threads), self.num_threads)
+        self._executor = ThreadPoolExecutor(max_workers=self.num_threads,
+                                            thread_name_prefix="vectara-upload")
+        self._slots = threading.BoundedSemaphore(self.max_pending)
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.succeeded = 0
+        self.failed = 0
+        self.upload_seconds = 0.0
+        self.blocked_seconds = 0.0   # producer time spent waiting for a free slot
+
+    def submit(self, fn: Callable[[], UploadOutcome]) -> Future:
+        """Queue an upload job; blocks while the queue is full."""
+        st = time.monotonic()
+        self._slots.acquire()
+        waited = time.monotonic() - st
+        with self._lock:
+            self.submitted += 1
+            self.blocked_seconds += waited
+        try:
+            return self._executor.submit(self._run, fn)
+        except Exception:
+            self._slots.release()
+            raise
+
+    def _run(self, fn: Callable[[], UploadOutcome]) -> UploadOutcome:
+        st = time.monotonic()
+        try:
+            outcome = fn()
+        except Exception as e:
+            logger.error(f"Background upload raised: {e}")
+            outcome = (False, f"upload raised: {e}")
+        finally:
+            self._slots.release()
+        with self._lock:
+            self.upload_seconds += time.monotonic() - st
+            if outcome[0]:
+                self.succeeded += 1
+            else:
+                self.failed += 1
+        return outcome
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "succeeded": self.succeeded,
+                "failed": self.failed,
+                "upload_seconds": round(self.upload_seconds, 2),
+                "blocked_seconds": round(self.blocked_seconds, 2),
+            }
+
+    def close(self, wait: bool = True) -> None:
+        """Stop accepting work; with wait=True, let queued uploads finish first."""
+        self._executor.shutdown(wait=wait)
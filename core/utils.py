@@ -10,6 +10,7 @@ import sys
 import threading
 import time
 import xml.etree.ElementTree as ET
+from collections import OrderedDict
 from io import StringIO
 from pathlib import Path
 from typing import List, Set, Any, Dict
@@ -47,6 +48,59 @@ def release_memory():
     if _libc:
         _libc.malloc_trim(0)
 
+
+class LRUCache:
+    """
+    Bounded, thread-safe mapping that evicts the least recently used key when full.
+    Picklable (the lock is recreated), since the objects holding one are shipped to Ray actors.
+    """
+
+    def __init__(self, max_size: int = 1000):
+        self.max_size = max(1, int(max_size))
+        self._data: "OrderedDict[Any, Any]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key not in self._data:
+                return default
+            self._data.move_to_end(key)
+            return self._data[key]
+
+    def __setitem__(self, key, value) -> None:
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+    def __getstate__(self) -> Dict[str, Any]:
+        with self._lock:
+            state = self.__dict__.copy()
+            state["_data"] = self._data.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: Dict[str, Any]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
 # =============================================================================
 # CONSTANTS
 # =============================================================================
@@ -0,0 +1,91 @@
+"""
+HTTP validators of indexed pages, for conditional re-crawls (<crawler>.conditional_requests).
+
+An incremental crawl normally downloads every page again and hashes its text before it can
+tell the page is unchanged. With conditional requests on, the Indexer keeps the `ETag` and
+`Last-Modified` of every page it fetched statically in an SQLite file next to the crawl
+tracking DB, together with what the incremental fingerprint was computed from: the content
+hash of the extracted text, the metadata taken from the page itself (final URL, last
+updated date) and a signature of the extraction options.
+
+On the next run, index_url first checks whether that record, with this run's source
+metadata and processing config, still reproduces the fingerprint the corpus holds for the
+page. Only then is the static request sent with `If-None-Match` / `If-Modified-Since`, and
+a `304 Not Modified` answer is an "unchanged" skip without parsing or rendering anything.
+Otherwise the page is fetched in full as before.
+"""
+
+import json
+import logging
+from typing import Any, Dict, Optional
+
+from core.sqlite_store import SQLiteStore
+
+logger = logging.getLogger(__name__)
+
+_SCHEMA_SQL = """
+CREATE TABLE IF NOT EXISTS http_validators (
+    corpus_key    TEXT NOT NULL,
+    url           TEXT NOT NULL,
+    etag          TEXT,
+    last_modified TEXT,
+    content_hash  TEXT NOT NULL,
+    page_metadata TEXT NOT NULL,
+    fetch_sig     TEXT NOT NULL,
+    PRIMARY KEY (corpus_key, url)
+);
+"""
+
+
+def response_validators(headers) -> Optional[Dict[str, str]]:
+    """{'etag', 'last_modified'} from response headers, or None when the response has neither."""
+    validators = {'etag': headers.get('etag'), 'last_modified': headers.get('last-modified')}
+    return validators if any(validators.values()) else None
+
+
+def conditional_headers(validators: Optional[Dict[str, Any]]) -> Dict[str, str]:
+    """The If-None-Match / If-Modified-Since request headers for stored validators."""
+    headers = {}
+    if validators:
+        if validators.get('etag'):
+            headers['If-None-Match'] = validators['etag']
+        if validators.get('last_modified'):
+            headers['If-Modified-Since'] = validators['last_modified']
+    return headers
+
+
+class ValidatorStore(SQLiteStore):
+    """
+    SQLite-backed map from normalized URL to its validators and fingerprint inputs, for one corpus.
+    Thread-safe; several processes (Ray workers) can write through to the same file.
+    """
+
+    SCHEMA_SQL = _SCHEMA_SQL
+
+    def __init__(self, db_path: str, corpus_key: str):
+        super().__init__(db_path)
+        self.corpus_key = corpus_key
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        """The stored {'etag', 'last_modified', 'content_hash', 'page_metadata', 'fetch_sig'} of url, or None."""
+        with self._lock:
+            row = self._connection().execute(
+                "SELECT etag, last_modified, content_hash, page_metadata, fetch_sig FROM http_validators "
+                "WHERE corpus_key=? AND url=?", (self.corpus_key, url)).fetchone()
+        if row is None:
+            return None
+        return {'etag': row[0], 'last_modified': row[1], 'content_hash': row[2],
+                'page_metadata': json.loads(row[3]), 'fetch_sig': row[4]}
+
+    def put(self, url: str, validators: Dict[str, Optional[str]], content_hash: str,
+            page_metadata: Dict[str, Any], fetch_sig: str) -> None:
+        with self._lock:
+            conn = self._connection()
+            conn.execute(
+                "INSERT INTO http_validators (corpus_key, url, etag, last_modified, content_hash, page_metadata, "
+                "fetch_sig) VALUES (?, ?, ?, ?, ?, ?, ?) ON CONFLICT(corpus_key, url) DO UPDATE SET "
+                "etag=excluded.etag, last_modified=excluded.last_modified, content_hash=excluded.content_hash, "
+                "page_metadata=excluded.page_metadata, fetch_sig=excluded.fetch_sig",
+                (self.corpus_key, url, validators.get('etag'), validators.get('last_modified'), content_hash,
+                 json.dumps(page_metadata, sort_keys=True, default=str), fetch_sig))
+            conn.commit()
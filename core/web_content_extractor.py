@@ -1,23 +1,274 @@
 import json
 import logging
+import os
+import re
+import shutil
+import tempfile
 import time
-from typing import Dict, List, Optional
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import unquote, urlparse
 import requests
 from playwright.sync_api import sync_playwright, TimeoutError as PlaywrightTimeoutError
 from omegaconf import OmegaConf
 from core.utils import get_headers
-from core.web_extractor_base import WebExtractorBase
+from core.browser_memory import DISCONNECTED, FAILURES, FORCED, BrowserRecycler
+from core.browser_pool import BrowserPool
+from core.render_modes import BROWSER, PROBE, STATIC, RenderModes
+from core.validator_store import conditional_headers, response_validators
+from core.web_extractor_base import WebExtractorBase, not_modified_page
+from core.page_settle import ADAPTIVE, DEFAULT_QUIET_MS, FIXED, settle_page
+from core.stage_stats import RENDER, SETTLE, STATIC_PREFETCH, stage
 
 logger = logging.getLogger(__name__)
 
+# Stable Chromium configuration for Docker, with memory limits
+CHROMIUM_ARGS = [
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-setuid-sandbox',
+    '--no-zygote',
+    '--disable-gpu',
+    '--disable-web-security',
+    '--disable-features=site-per-process',
+    '--disable-blink-features=AutomationControlled',
+    '--disable-extensions',
+    '--js-flags=--max-old-space-size=512',
+    '--memory-pressure-off',
+    '--max_old_space_size=512'
+]
+
+# Resources not needed to extract a page's text
+BLOCKED_RESOURCE_TYPES = ("image", "font", "media")
+BLOCKED_DOMAINS = ("google-analytics", "doubleclick", "facebook.com/tr")
+
+# application/* types the browser renders as text rather than downloading
+_RENDERED_APPLICATION_TYPES = ("json", "xml", "javascript", "ecmascript")
+
+# Static HTML with no more visible text than this is taken for an SPA that needs rendering
+MIN_STATIC_TEXT = 500
+# Rendered text longer than static text * ratio + slack means the page needed the browser
+_RENDERED_TEXT_RATIO = 1.2
+_RENDERED_TEXT_SLACK = 10
+
+
+def _response_kind(headers) -> Optional[str]:
+    """'html', 'pdf' or 'download' from response headers, or None when only the browser can tell."""
+    if 'attachment' in (headers.get('content-disposition') or '').lower():
+        return "download"
+    content_type = (headers.get('content-type') or '').split(';')[0].strip().lower()
+    if content_type == 'application/pdf':
+        return "pdf"
+    if content_type in ('text/html', 'application/xhtml+xml'):
+        return "html"
+    if content_type.startswith('application/') and not any(t in content_type for t in _RENDERED_APPLICATION_TYPES):
+        return "download"
+    return None
+
+
+class _FileDownload:
+    """
+    A download already saved to a temp file, with the save_as() of a Playwright Download.
+
+    Playwright deletes downloads when their browser context closes, and a streamed
+    response must be read before it is released, so both are saved right away.
+    """
+
+    def __init__(self, url: str, suggested_filename: Optional[str], path: str):
+        self.url = url
+        self.suggested_filename = suggested_filename
+        self.path = path
+        self.size = os.path.getsize(path)
+
+    @classmethod
+    def from_response(cls, response) -> "_FileDownload":
+        filename = None
+        match = re.search(r'filename\*?=(?:UTF-8\'\')?["\']?([^"\';]+)', response.headers.get('content-disposition', ''),
+                          re.IGNORECASE)
+        if match:
+            filename = os.path.basename(unquote(match.group(1).strip()))
+        else:
+            filename = os.path.basename(urlparse(response.url).path) or None
+        fd, path = tempfile.mkstemp(prefix="vectara_download_")
+        with os.fdopen(fd, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=65536):
+                f.write(chunk)
+        return cls(response.url, filename, path)
+
+    @classmethod
+    def from_playwright(cls, download) -> "_FileDownload":
+        fd, path = tempfile.mkstemp(prefix="vectara_download_")
+        os.close(fd)
+        download.save_as(path)
+        return cls(download.url, download.suggested_filename, path)
+
+    def save_as(self, path: str) -> None:
+        shutil.move(self.path, path)
+
+
+# ---------------------------------------------------------------------------
+# Page scripts, shared by the sync extractor and the asyncio engine
+# (core/async_web_content_extractor.py)
+# ---------------------------------------------------------------------------
+
+CONTENT_INDICATORS_JS = """
+    ({
+        textLength: document.body.innerText.length,
+        imageCount: document.images.length,
+        linkCount: document.links.length
+    })
+"""
+
+
+def removal_js(html_processing: dict) -> Optional[str]:
+    """Script removing the html_processing ids / classes / tags, or None if there are none."""
+    ids_to_remove = list(html_processing.get('ids_to_remove', []))
+    classes_to_remove = list(html_processing.get('classes_to_remove', []))
+    tags_to_remove = list(html_processing.get('tags_to_remove', []))
+
+    if not ids_to_remove and not classes_to_remove and not tags_to_remove:
+        return None
+
+    return """
+        (function(ids, classes, tags) {
+            var results = {ids: {}, classes: {}, tags: {}};
+            ids.forEach(function(id) {
+                var el = document.getElementById(id);
+                results.ids[id] = !!el;
+                if (el) el.remove();
+            });
+            classes.forEach(function(cls) {
+                var els = document.querySelectorAll('.' + cls);
+                results.classes[cls] = els.length;
+                els.forEach(function(el) { el.remove(); });
+            });
+            tags.forEach(function(tag) {
+                var els = document.querySelectorAll(tag);
+                results.tags[tag] = els.length;
+                els.forEach(function(el) { el.remove(); });
+            });
+            return results;
+        })(%s, %s, %s);
+    """ % (
+        json.dumps(ids_to_remove),
+        json.dumps(classes_to_remove),
+        json.dumps(tags_to_remove)
+    )
+
+
+def text_content_js(remove_code: bool = False) -> str:
+    """Script returning the page text (shadow DOM included) without common boilerplate."""
+    # Build selectors to remove as a second pass for common boilerplate
+    remove_selectors = [
+        'header', 'footer', 'nav', 'aside', '.sidebar', '#comments', '.advertisement'
+    ]
+    if remove_code:
+        remove_selectors.extend(['code', 'pre'])
+
+    return f"""() => {{
+        // Remove common boilerplate elements
+        const selectorsToRemove = {json.dumps(remove_selectors)};
+        selectorsToRemove.forEach(selector => {{
+            document.querySelectorAll(selector).forEach(el => el.remove());
+        }});
+
+        // Extract text from remaining content
+        let content = document.body.innerText || '';
+
+        // Extract shadow DOM content
+        function extractShadowText(root) {{
+            let text = "";
+            if (root.shadowRoot) {{
+                text += root.shadowRoot.textContent || '';
+                root.shadowRoot.querySelectorAll('*').forEach(child => {{
+                    text += extractShadowText(child);
+                }});
+            }}
+            return text;
+        }}
+
+        document.querySelectorAll('*').forEach(el => {{
+            content += extractShadowText(el);
+        }});
+
+        return content.replace(/\\s{{2,}}/g, ' ').trim();
+    }}"""
+
+
+LINKS_JS = """
+    () => {
+        let links = [];
+        
+        function extractLinks(root) {
+            root.querySelectorAll('a').forEach(a => {
+                if (a.href) links.push(a.href);
+            });
+            root.querySelectorAll('*').forEach(el => {
+                if (el.shadowRoot) {
+                    extractLinks(el.shadowRoot);
+                }
+            });
+        }
+        
+        extractLinks(document);
+        return [...new Set(links)];
+    }
+"""
+
+TABLES_JS = """
+    () => {
+        let tables = [];
+        
+        function extractTables(root) {
+            root.querySelectorAll("table").forEach(t => {
+                tables.push(t.outerHTML);
+            });
+            root.querySelectorAll("*").forEach(el => {
+                if (el.shadowRoot) {
+                    extractTables(el.shadowRoot);
+                }
+            });
+        }
+        
+        extractTables(document);
+        return tables;
+    }
+"""
+
+IMAGES_JS = """
+    () => {
+        let images = [];
+        
+        function extractImages(root) {
+            root.querySelectorAll("img").forEach(img => {
+                const src = img.src;
+                if (!src || src.startsWith('data:') || src.startsWith('blob:')) return;
+                const w = parseInt(img.getAttribute('width') || '0');
+                const h = parseInt(img.getAttribute('height') || '0');
+                if ((w > 0 && w < 10) || (h > 0 && h < 10)) return;
+                images.push({ src: src, alt: img.alt || "" });
+            });
+            root.querySelectorAll("*").forEach(el => {
+                if (el.shadowRoot) {
+                    extractImages(el.shadowRoot);
+                }
+            });
+        }
+        
+        extractImages(document);
+        return images;
+    }
+"""
+
 
 class WebContentExtractor(WebExtractorBase):
     """Handles web content extraction using Playwright"""
     
-    def __init__(self, cfg: OmegaConf, timeout: int = 90, post_load_timeout: int = 5, browser=None):
+    def __init__(self, cfg: OmegaConf, timeout: int = 90, post_load_timeout: int = 5, browser=None,
+                 browser_pool: Optional[BrowserPool] = None):
         super().__init__(cfg, timeout, post_load_timeout)
-        # Reduce browser reuse limit to prevent memory buildup
-        self.browser_use_limit = 20  # Reduced from 100
+        # Recycle the browser when its processes outgrow vectara.browser_memory_mb, or after
+        # vectara.browser_use_limit pages at the latest (see core/browser_memory.py)
+        self.recycler = BrowserRecycler.from_config(cfg.vectara)
         self.browser_use_count = 0
         self.browser = browser
         self.p = None
@@ -31,9 +282,32 @@ class WebContentExtractor(WebExtractorBase):
         # redirects to the IdP sign-in page, returns >500 chars, and
         # short-circuits the authenticated browser path.
         self.skip_static_prefetch = False
+        # Per-domain static / browser / probe decision learned from the first pages of
+        # each domain (see core/render_modes.py); None = always probe.
+        self.render_modes: Optional[RenderModes] = None
+        # How long a rendered page is waited on before it is read (see core/page_settle.py):
+        # "adaptive" until network and DOM are quiet, or "fixed" post_load_timeout + scroll.
+        self.page_settle = cfg.vectara.get("page_settle", ADAPTIVE)
+        if self.page_settle not in (ADAPTIVE, FIXED):
+            logger.warning(f"Unknown vectara.page_settle '{self.page_settle}', using '{ADAPTIVE}'")
+            self.page_settle = ADAPTIVE
+        self.settle_quiet_ms = cfg.vectara.get("settle_quiet_ms", DEFAULT_QUIET_MS)
+        # Shared Chromium servers to attach to instead of launching a browser (see core/browser_pool.py)
+        self.browser_pool = browser_pool
+        self._browser_lease = None   # (endpoint, pages) assigned by browser_pool
+        if browser_pool is not None:
+            self.recycler.memory_budget = 0   # the pool watches its servers' memory
 
         if browser is None:
             self._setup_browser()
+
+    @property
+    def browser_use_limit(self) -> int:
+        return self.recycler.use_limit
+
+    @browser_use_limit.setter
+    def browser_use_limit(self, value: int) -> None:
+        self.recycler.use_limit = value
     
     def _ensure_browser_ready(self):
         """Ensure browser is initialized and ready"""
@@ -49,6 +323,7 @@ class WebContentExtractor(WebExtractorBase):
                     self.browser.close()
                 except Exception:
                     pass
+            self._release_browser_lease()
             if self.p:
                 try:
                     self.p.stop()
@@ -57,48 +332,54 @@ class WebContentExtractor(WebExtractorBase):
 
             # Create fresh instances with better configuration
             self.p = sync_playwright().start()
-            # Launch Chromium with stable configuration for Docker
-            self.browser = self.p.chromium.launch(
-                headless=True,
-                args=[
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-setuid-sandbox',
-                    '--no-zygote',
-                    '--disable-gpu',
-                    '--disable-web-security',
-                    '--disable-features=site-per-process',
-                    '--disable-blink-features=AutomationControlled',
-                    '--disable-extensions',
-                    '--js-flags=--max-old-space-size=512',
-                    '--memory-pressure-off',
-                    '--max_old_space_size=512'
-                ]
-            )
+            if self.browser_pool is not None:
+                endpoint = self.browser_pool.acquire(1)
+                self._browser_lease = (endpoint, 1)
+                self.browser = self.p.chromium.connect_over_cdp(endpoint)
+            else:
+                # Launch Chromium with stable configuration for Docker
+                before = self.recycler.launching()
+                self.browser = self.p.chromium.launch(headless=True, args=CHROMIUM_ARGS)
+                self.recycler.launched(before)
             self.browser_use_count = 0
             self.consecutive_failures = 0  # Reset failure counter on successful setup
             logger.debug("Browser instance created successfully with memory limits")
         except Exception as e:
             logger.error(f"Failed to setup browser: {e}")
+            self._release_browser_lease()
             self.browser = None
             self.p = None
             raise
+
+    def _release_browser_lease(self):
+        """Tell browser_pool this extractor no longer renders on its shared browser"""
+        if self._browser_lease is None:
+            return
+        (endpoint, pages), self._browser_lease = self._browser_lease, None
+        try:
+            self.browser_pool.release(endpoint, pages)
+        except Exception as e:
+            logger.debug(f"Error releasing shared browser {endpoint}: {e}")
         
-    def _reset_browser_if_needed(self, force_reset=False):
-        """Reset browser if usage limit reached or forced"""
-        should_reset = (
-            force_reset or 
-            self.browser_use_count >= self.browser_use_limit or
-            self.consecutive_failures >= self.max_consecutive_failures or
-            (self.browser and not self.browser.is_connected())
-        )
-        
-        if should_reset:
+    def _reset_browser_if_needed(self, force_reset=False, url=None):
+        """Recycle the browser when forced, failing, disconnected, over its memory budget or use limit"""
+        rss = 0
+        if force_reset:
+            reason = FORCED
+        elif self.consecutive_failures >= self.max_consecutive_failures:
+            reason = FAILURES
+        elif self.browser and not self.browser.is_connected():
+            reason = DISCONNECTED
+        else:
+            reason, rss = self.recycler.check(self.browser_use_count)
+
+        if reason:
             try:
                 if self.browser:
                     self.browser.close()
             except Exception:
                 pass
+            self._release_browser_lease()
             
             try:
                 if self.p:
@@ -106,12 +387,11 @@ class WebContentExtractor(WebExtractorBase):
             except Exception:
                 pass
             
+            self.recycler.recycled(reason, self.browser_use_count, rss, url)
             # Reinitialize browser
             self.p = None
             self.browser = None
             self._setup_browser()
-            reason = "forced" if force_reset else f"after {self.browser_use_limit} uses or {self.consecutive_failures} failures"
-            logger.info(f"Browser reset {reason} to avoid memory issues")
     
     def url_triggers_download(self, url: str) -> bool:
         """Check if URL triggers a download"""
@@ -173,13 +453,7 @@ class WebContentExtractor(WebExtractorBase):
         while time.time() - start_time < max_scroll_time:
             # Get multiple content indicators for stability check
             current_height = page.evaluate("document.body.scrollHeight")
-            content_indicators = page.evaluate("""
-                ({
-                    textLength: document.body.innerText.length,
-                    imageCount: document.images.length,
-                    linkCount: document.links.length
-                })
-            """)
+            content_indicators = page.evaluate(CONTENT_INDICATORS_JS)
             
             # Check if content is stable across multiple indicators
             content_stable = (prev_height == current_height and 
@@ -218,152 +492,101 @@ class WebContentExtractor(WebExtractorBase):
         else:
             logger.debug(f"Smart scroll completed in {total_time:.1f}s")
     
+    def _settle(self, page, url: str) -> None:
+        """Wait for a rendered page to settle (vectara.page_settle), timed as the SETTLE stage."""
+        start = time.monotonic()
+        with stage(SETTLE):
+            if self.page_settle == FIXED:
+                page.wait_for_timeout(self.post_load_timeout * 1000)
+                self._scroll_to_bottom(page)
+                outcome = FIXED
+            else:
+                _, outcome = settle_page(page, self.post_load_timeout, self.settle_quiet_ms)
+        logger.debug(f"{url} settled in {time.monotonic() - start:.2f}s ({outcome})")
+
     def _remove_elements(self, page, html_processing: dict):
         """Remove specified elements from page"""
-        ids_to_remove = list(html_processing.get('ids_to_remove', []))
-        classes_to_remove = list(html_processing.get('classes_to_remove', []))
-        tags_to_remove = list(html_processing.get('tags_to_remove', []))
-
-        if not ids_to_remove and not classes_to_remove and not tags_to_remove:
+        removal_script = removal_js(html_processing)
+        if removal_script is None:
             return
-
-        removal_script = """
-            (function(ids, classes, tags) {
-                var results = {ids: {}, classes: {}, tags: {}};
-                ids.forEach(function(id) {
-                    var el = document.getElementById(id);
-                    results.ids[id] = !!el;
-                    if (el) el.remove();
-                });
-                classes.forEach(function(cls) {
-                    var els = document.querySelectorAll('.' + cls);
-                    results.classes[cls] = els.length;
-                    els.forEach(function(el) { el.remove(); });
-                });
-                tags.forEach(function(tag) {
-                    var els = document.querySelectorAll(tag);
-                    results.tags[tag] = els.length;
-                    els.forEach(function(el) { el.remove(); });
-                });
-                return results;
-            })(%s, %s, %s);
-        """ % (
-            json.dumps(ids_to_remove),
-            json.dumps(classes_to_remove),
-            json.dumps(tags_to_remove)
-        )
         results = page.evaluate(removal_script)
         logger.debug("html_processing removal results: %s", results)
     
     def _extract_text_content(self, page, remove_code: bool = False) -> str:
         """Extract text content from page"""
-        # Build selectors to remove as a second pass for common boilerplate
-        remove_selectors = [
-            'header', 'footer', 'nav', 'aside', '.sidebar', '#comments', '.advertisement'
-        ]
-        if remove_code:
-            remove_selectors.extend(['code', 'pre'])
-
-        return page.evaluate(f"""() => {{
-            // Remove common boilerplate elements
-            const selectorsToRemove = {json.dumps(remove_selectors)};
-            selectorsToRemove.forEach(selector => {{
-                document.querySelectorAll(selector).forEach(el => el.remove());
-            }});
-
-            // Extract text from remaining content
-            let content = document.body.innerText || '';
-
-            // Extract shadow DOM content
-            function extractShadowText(root) {{
-                let text = "";
-                if (root.shadowRoot) {{
-                    text += root.shadowRoot.textContent || '';
-                    root.shadowRoot.querySelectorAll('*').forEach(child => {{
-                        text += extractShadowText(child);
-                    }});
-                }}
-                return text;
-            }}
-
-            document.querySelectorAll('*').forEach(el => {{
-                content += extractShadowText(el);
-            }});
-
-            return content.replace(/\\s{{2,}}/g, ' ').trim();
-        }}""")
+        return page.evaluate(text_content_js(remove_code))
     
     def _extract_links(self, page) -> List[str]:
         """Extract links from page including shadow DOM"""
-        return page.evaluate("""
-            () => {
-                let links = [];
-                
-                function extractLinks(root) {
-                    root.querySelectorAll('a').forEach(a => {
-                        if (a.href) links.push(a.href);
-                    });
-                    root.querySelectorAll('*').forEach(el => {
-                        if (el.shadowRoot) {
-                            extractLinks(el.shadowRoot);
-                        }
-                    });
-                }
-                
-                extractLinks(document);
-                return [...new Set(links)];
-            }
-        """)
+        return page.evaluate(LINKS_JS)
     
     def _extract_tables(self, page) -> List[str]:
         """Extract tables from page including shadow DOM"""
-        return page.evaluate("""
-            () => {
-                let tables = [];
-                
-                function extractTables(root) {
-                    root.querySelectorAll("table").forEach(t => {
-                        tables.push(t.outerHTML);
-                    });
-                    root.querySelectorAll("*").forEach(el => {
-                        if (el.shadowRoot) {
-                            extractTables(el.shadowRoot);
-                        }
-                    });
-                }
-                
-                extractTables(document);
-                return tables;
-            }
-        """)
+        return page.evaluate(TABLES_JS)
     
     def _extract_images(self, page) -> List[Dict[str, str]]:
         """Extract images from page including shadow DOM"""
-        return page.evaluate("""
-            () => {
-                let images = [];
-                
-                function extractImages(root) {
-                    root.querySelectorAll("img").forEach(img => {
-                        const src = img.src;
-                        if (!src || src.startsWith('data:') || src.startsWith('blob:')) return;
-                        const w = parseInt(img.getAttribute('width') || '0');
-                        const h = parseInt(img.getAttribute('height') || '0');
-                        if ((w > 0 && w < 10) || (h > 0 && h < 10)) return;
-                        images.push({ src: src, alt: img.alt || "" });
-                    });
-                    root.querySelectorAll("*").forEach(el => {
-                        if (el.shadowRoot) {
-                            extractImages(el.shadowRoot);
-                        }
-                    });
-                }
-                
-                extractImages(document);
-                return images;
-            }
-        """)
+        return page.evaluate(IMAGES_JS)
     
+    def _render_mode(self, url: str) -> str:
+        return self.render_modes.mode(url) if self.render_modes is not None else PROBE
+
+    def _learn_render_mode(self, url: str, mode: str, needed: Optional[str]) -> None:
+        """Record the path (STATIC or BROWSER) a probed page needed."""
+        if mode == PROBE and needed is not None and self.render_modes is not None:
+            self.render_modes.record(url, needed)
+
+    @staticmethod
+    def _rendered_need(result: Dict, static_chars: int) -> Optional[str]:
+        """The path a page whose static HTML was sparse (static_chars of text) needed: BROWSER
+        if rendering found materially more text, STATIC if about the same, None if rendering failed."""
+        text = (result.get('text') or '').strip()
+        if not text:
+            return None
+        return BROWSER if len(text) > static_chars * _RENDERED_TEXT_RATIO + _RENDERED_TEXT_SLACK else STATIC
+
+    def _static_page(self, url: str, html: str, final_url: str,
+                     min_text: int = MIN_STATIC_TEXT) -> Tuple[Optional[Dict], int]:
+        """(page contents from statically fetched HTML, or None if it has no more than min_text
+        characters of text (an SPA that needs JS rendering); the characters of text it has)."""
+        from bs4 import BeautifulSoup
+        from urllib.parse import urljoin
+
+        soup = BeautifulSoup(html, 'html.parser')
+        static_text = soup.get_text(separator=' ', strip=True)
+        if len(static_text.strip()) <= min_text:
+            logger.debug(f"Static fetch for {url} too sparse ({len(static_text)} chars), falling back to browser")
+            return None, len(static_text.strip())
+        result = {
+            'text': static_text,
+            'html': html,
+            'title': soup.title.string if soup.title else '',
+            'url': final_url,
+            'links': [a['href'] for a in soup.find_all('a', href=True)],
+            'images': [],
+            'tables': []
+        }
+        # Extract images with same filtering as the browser path
+        for img_tag in soup.find_all('img'):
+            src = img_tag.get('src', '')
+            if not src or src.startswith('data:') or src.startswith('blob:'):
+                continue
+            try:
+                w = int(img_tag.get('width', '0') or '0')
+            except (ValueError, TypeError):
+                w = 0
+            try:
+                h = int(img_tag.get('height', '0') or '0')
+            except (ValueError, TypeError):
+                h = 0
+            if (w > 0 and w < 10) or (h > 0 and h < 10):
+                continue
+            result['images'].append({'src': urljoin(url, src), 'alt': img_tag.get('alt', '')})
+        logger.info(f"Static fetch used for {url}: {len(static_text)} chars")
+        logger.info(f"For crawled page {url}: images = {len(result['images'])}, "
+                    f"tables = {len(result['tables'])}, links = {len(result['links'])}")
+        return result, len(static_text)
+
     def fetch_page_contents(
         self,
         url: str,
@@ -371,27 +594,19 @@ class WebContentExtractor(WebExtractorBase):
         extract_images: bool = False,
         remove_code: bool = False,
         html_processing: Optional[dict] = None,
-        debug: bool = False
+        debug: bool = False,
+        validators: Optional[dict] = None
     ) -> Dict:
         """
         Fetch content from URL with timeout, including Shadow DOM content.
-        
+
+        validators ({'etag', 'last_modified'} of an earlier fetch) make the static request
+        conditional; a 304 answer returns not_modified_page(url) without rendering.
+
         Returns:
             dict with 'text', 'html', 'title', 'url', 'links', 'images', 'tables'
+            (and 'validators' when the static response had an ETag or Last-Modified)
         """
-        if html_processing is None:
-            html_processing = {}
-
-        result = {
-            'text': '',
-            'html': '',
-            'title': '',
-            'url': url,
-            'links': [],
-            'images': [],
-            'tables': []
-        }
-
         # Static pre-fetch: try requests.get() first. SSR pages (forums, documentation
         # sites) return clean HTML that Docling parses well. The live browser DOM is SPA-
         # structured (Angular/React elements) which Docling cannot parse into content —
@@ -402,60 +617,154 @@ class WebContentExtractor(WebExtractorBase):
         # entirely — unauthenticated requests.get follows redirects to the IdP
         # sign-in page, which passes the 500-char threshold and would otherwise
         # prevent the authenticated Playwright context from ever running.
-        if not self.skip_static_prefetch:
+        # A domain learned to be "browser" skips the static fetch, one learned to be
+        # "static" accepts any static text (see core/render_modes.py).
+        mode = self._render_mode(url)
+        sparse_chars = None   # text length of sparse static HTML, to learn what rendering added
+        if not self.skip_static_prefetch and mode != BROWSER:
             try:
-                from bs4 import BeautifulSoup
-                static_resp = requests.get(url, headers=get_headers(self.cfg), timeout=30, allow_redirects=True)
+                headers = {**get_headers(self.cfg), **conditional_headers(validators)}
+                with stage(STATIC_PREFETCH) as span:
+                    static_resp = requests.get(url, headers=headers, timeout=30, allow_redirects=True)
+                    span.add(bytes_in=len(static_resp.content))
+                if static_resp.status_code == 304 and validators:
+                    return not_modified_page(static_resp.url)
                 static_resp.raise_for_status()
                 if 'text/html' in static_resp.headers.get('content-type', '').lower():
-                    soup = BeautifulSoup(static_resp.text, 'html.parser')
-                    static_text = soup.get_text(separator=' ', strip=True)
-                    if len(static_text.strip()) > 500:
-                        result['html'] = static_resp.text
-                        result['url'] = static_resp.url
-                        result['title'] = soup.title.string if soup.title else ''
-                        result['text'] = static_text
-                        result['links'] = [a['href'] for a in soup.find_all('a', href=True)]
-                        # Extract images with same filtering as the browser path
-                        from urllib.parse import urljoin
-                        for img_tag in soup.find_all('img'):
-                            src = img_tag.get('src', '')
-                            if not src or src.startswith('data:') or src.startswith('blob:'):
-                                continue
-                            try:
-                                w = int(img_tag.get('width', '0') or '0')
-                            except (ValueError, TypeError):
-                                w = 0
-                            try:
-                                h = int(img_tag.get('height', '0') or '0')
-                            except (ValueError, TypeError):
-                                h = 0
-                            if (w > 0 and w < 10) or (h > 0 and h < 10):
-                                continue
-                            result['images'].append({'src': urljoin(url, src), 'alt': img_tag.get('alt', '')})
-                        logger.info(f"Static fetch used for {url}: {len(static_text)} chars")
-                        logger.info(f"For crawled page {url}: images = {len(result['images'])}, "
-                                    f"tables = {len(result['tables'])}, links = {len(result['links'])}")
+                    result, static_chars = self._static_page(url, static_resp.text, static_resp.url,
+                                                             min_text=0 if mode == STATIC else MIN_STATIC_TEXT)
+                    if result is not None:
+                        self._learn_render_mode(url, mode, STATIC)
+                        result['validators'] = response_validators(static_resp.headers)
                         return result
-                    logger.debug(f"Static fetch for {url} too sparse ({len(static_text)} chars), falling back to browser")
+                    sparse_chars = static_chars
+            except Exception as e:
+                logger.debug(f"Static pre-fetch failed for {url}, using browser: {e}")
+
+        result, _ = self._render(url, extract_tables, extract_images, remove_code, html_processing, debug)
+        if sparse_chars is not None:
+            self._learn_render_mode(url, mode, self._rendered_need(result, sparse_chars))
+        return result
+
+    def fetch_url(
+        self,
+        url: str,
+        extract_tables: bool = False,
+        extract_images: bool = False,
+        remove_code: bool = False,
+        html_processing: Optional[dict] = None,
+        debug: bool = False,
+        validators: Optional[dict] = None
+    ) -> Dict:
+        """
+        Classify a URL and fetch it with a single request, plus at most one browser
+        navigation (see WebExtractorBase.fetch_url for the returned shapes).
+
+        The static GET is streamed, so its headers decide what it is before the body is
+        read: a PDF is read into memory, an attachment or other document type is streamed
+        to a temp file, and HTML with enough text is parsed as is. Everything else (sparse
+        HTML, errors, skip_static_prefetch, or a domain learned to need the browser) goes
+        to one browser navigation that watches for a download and a PDF response while it
+        renders the page.
+        """
+        mode = self._render_mode(url)
+        sparse_chars = None   # text length of sparse static HTML, to learn what rendering added
+        if not self.skip_static_prefetch and mode != BROWSER:
+            static_resp = None
+            try:
+                headers = {**get_headers(self.cfg), **conditional_headers(validators)}
+                with stage(STATIC_PREFETCH) as span:
+                    static_resp = requests.get(url, headers=headers, timeout=30,
+                                               allow_redirects=True, stream=True)
+                    if static_resp.status_code == 304 and validators:
+                        return {"type": "not_modified", "url": static_resp.url}
+                    kind = _response_kind(static_resp.headers) if static_resp.ok else None
+                    if kind == "pdf":
+                        content = static_resp.content
+                        span.add(bytes_in=len(content))
+                        return {"type": "pdf", "url": static_resp.url, "content": content,
+                                "headers": dict(static_resp.headers)}
+                    if kind == "download":
+                        download = _FileDownload.from_response(static_resp)
+                        span.add(bytes_in=download.size)
+                        logger.info(f"{url} is a download ({static_resp.headers.get('content-type', '')}), "
+                                    f"fetched without the browser")
+                        return {"type": "download", "url": static_resp.url,
+                                "filename": download.suggested_filename, "download": download}
+                    if kind == "html":
+                        html = static_resp.text
+                        span.add(bytes_in=len(static_resp.content))
+                if kind == "html":
+                    result, static_chars = self._static_page(url, html, static_resp.url,
+                                                             min_text=0 if mode == STATIC else MIN_STATIC_TEXT)
+                    if result is not None:
+                        self._learn_render_mode(url, mode, STATIC)
+                        return {"type": "html", **result, "validators": response_validators(static_resp.headers)}
+                    sparse_chars = static_chars
             except Exception as e:
                 logger.debug(f"Static pre-fetch failed for {url}, using browser: {e}")
+            finally:
+                if static_resp is not None:
+                    static_resp.close()
+
+        result, other = self._render(url, extract_tables, extract_images, remove_code, html_processing,
+                                     debug, classify=True)
+        if other is not None:
+            return other
+        if sparse_chars is not None:
+            self._learn_render_mode(url, mode, self._rendered_need(result, sparse_chars))
+        return {"type": "html", **result}
+
+    def _render(
+        self,
+        url: str,
+        extract_tables: bool = False,
+        extract_images: bool = False,
+        remove_code: bool = False,
+        html_processing: Optional[dict] = None,
+        debug: bool = False,
+        classify: bool = False
+    ):
+        """
+        Render url in the browser and extract its contents.
+
+        Returns (page contents, None), or with classify=True (empty page contents, a
+        'pdf' / 'download' result) when the navigation turned out not to be a page.
+        """
+        if html_processing is None:
+            html_processing = {}
+
+        result = {
+            'text': '',
+            'html': '',
+            'title': '',
+            'url': url,
+            'links': [],
+            'images': [],
+            'tables': []
+        }
+        other = None
+        downloads = []
 
         page = context = None
         # Cap at 90s: OS-level Chromium crash (SIGKILL) leaves websocket open, causing
         # Playwright's goto() to hang until TCP keepalive timeout (~2 min). 90s fails fast.
         nav_timeout = min(self.timeout * 1000, 90000)
 
+        render = stage(RENDER)
         try:
             self._ensure_browser_ready()
             # Create context with resource limits
             context = self.browser.new_context(
                 viewport={'width': 1920, 'height': 1080},
                 ignore_https_errors=True,
-                java_script_enabled=True
+                java_script_enabled=True,
+                accept_downloads=True
             )
             page = context.new_page()
             page.set_extra_http_headers(get_headers(self.cfg))
+            if classify:
+                page.on('download', downloads.append)
             
             # Block unnecessary resources for performance and stability
             # Use a more selective approach to avoid breaking some sites
@@ -464,10 +773,10 @@ class WebContentExtractor(WebExtractorBase):
                     resource_type = route.request.resource_type
                     url = route.request.url
                     # Block images, fonts, and media but allow critical resources
-                    if resource_type in ["image", "font", "media"]:
+                    if resource_type in BLOCKED_RESOURCE_TYPES:
                         route.abort()
                     # Block known tracking/ad domains
-                    elif any(domain in url for domain in ["google-analytics", "doubleclick", "facebook.com/tr"]):
+                    elif any(domain in url for domain in BLOCKED_DOMAINS):
                         route.abort()
                     else:
                         route.continue_()
@@ -484,27 +793,45 @@ class WebContentExtractor(WebExtractorBase):
                 page.on('console', lambda msg: logger.info(f"playwright debug: {msg.text}"))
             
             logger.debug(f"Starting browser navigation to {url} (timeout={nav_timeout}ms)")
-            page.goto(url, timeout=nav_timeout, wait_until="domcontentloaded")
-            logger.debug(f"Navigation complete for {url}, starting post-load processing")
-            page.wait_for_timeout(self.post_load_timeout * 1000)
-            self._scroll_to_bottom(page)
+            try:
+                response = page.goto(url, timeout=nav_timeout, wait_until="domcontentloaded")
+            except Exception:
+                # A navigation that turns into a download aborts goto ("Download is starting")
+                if not downloads:
+                    raise
+                response = None
+            if downloads:
+                # Downloads are deleted with their context: save it before the context closes
+                other = {"type": "download", "url": downloads[0].url,
+                         "filename": downloads[0].suggested_filename,
+                         "download": _FileDownload.from_playwright(downloads[0])}
+                render.add(bytes_in=other["download"].size)
+            elif classify and response is not None and \
+                    'application/pdf' in (response.headers.get('content-type') or '').lower():
+                content = response.body()
+                other = {"type": "pdf", "url": response.url, "content": content,
+                         "headers": dict(response.headers)}
+                render.add(bytes_in=len(content))
+            else:
+                logger.debug(f"Navigation complete for {url}, starting post-load processing")
+                self._settle(page, url)
 
-            result['title'] = page.title()
-            result['url'] = page.url
+                result['title'] = page.title()
+                result['url'] = page.url
 
-            # Remove specified elements BEFORE capturing HTML snapshot
-            self._remove_elements(page, html_processing)
-            result['html'] = page.content()
+                # Remove specified elements BEFORE capturing HTML snapshot
+                self._remove_elements(page, html_processing)
+                result['html'] = page.content()
 
-            # Extract content
-            result['text'] = self._extract_text_content(page, remove_code)
-            result['links'] = self._extract_links(page)
+                # Extract content
+                result['text'] = self._extract_text_content(page, remove_code)
+                result['links'] = self._extract_links(page)
 
-            if extract_tables:
-                result['tables'] = self._extract_tables(page)
+                if extract_tables:
+                    result['tables'] = self._extract_tables(page)
 
-            if extract_images:
-                result['images'] = self._extract_images(page)
+                if extract_images:
+                    result['images'] = self._extract_images(page)
 
         except PlaywrightTimeoutError:
             logger.info(f"Page loading timed out for {url} after {nav_timeout}ms")
@@ -514,7 +841,7 @@ class WebContentExtractor(WebExtractorBase):
             self.consecutive_failures += 1
             # Force browser reset on crash-related errors
             if "crashed" in str(e).lower() or (self.browser and not self.browser.is_connected()):
-                self._reset_browser_if_needed(force_reset=True)
+                self._reset_browser_if_needed(force_reset=True, url=url)
         else:
             # Reset failure counter on success and count usage
             self.consecutive_failures = 0
@@ -530,7 +857,12 @@ class WebContentExtractor(WebExtractorBase):
                     context.close()
                 except Exception:
                     pass
-            self._reset_browser_if_needed()
+            self._reset_browser_if_needed(url=url)
+            render.add(bytes_in=len(result['html'] or ''))
+            render.end()
+
+        if other is not None:
+            return result, other
 
         # If browser also failed, log it — static pre-fetch already ran above.
         if not result['html']:
@@ -539,7 +871,7 @@ class WebContentExtractor(WebExtractorBase):
         logger.info(f"For crawled page {url}: images = {len(result['images'])}, "
                    f"tables = {len(result['tables'])}, links = {len(result['links'])}")
         
-        return result
+        return result, None
     
     def check_download_or_pdf(self, url: str, headers: dict = None, timeout: int = 5000):
         """Check if URL triggers download or serves PDF content directly"""
@@ -649,7 +981,7 @@ class WebContentExtractor(WebExtractorBase):
                     retry_delay *= 2  # Exponential backoff
                     # Force browser reset for fresh instance
                     self.consecutive_failures += 1
-                    self._reset_browser_if_needed(force_reset=True)
+                    self._reset_browser_if_needed(force_reset=True, url=url)
                 else:
                     logger.error(f"Failed to navigate to {url} after {max_retries} attempts: {e}")
                     raise
@@ -679,6 +1011,7 @@ class WebContentExtractor(WebExtractorBase):
                     logger.debug(f"Error closing browser: {e}")
                 finally:
                     self.browser = None
+            self._release_browser_lease()
                     
             if hasattr(self, 'p') and self.p is not None:
                 try:
@@ -690,6 +1023,7 @@ class WebContentExtractor(WebExtractorBase):
                     
             self.browser_use_count = 0
             self.consecutive_failures = 0
+            self.recycler.log_summary()
             logger.info("Browser resources cleaned up successfully")
         except Exception as e:
             logger.error(f"Error during cleanup: {e}")
\ No newline at end of file
@@ -10,6 +10,15 @@ from omegaconf import OmegaConf
 
 logger = logging.getLogger(__name__)
 
+# Pages in flight per extractor with scrape_method playwright_async (vectara.render_concurrency)
+DEFAULT_RENDER_CONCURRENCY = 8
+
+
+def not_modified_page(url: str) -> Dict:
+    """The fetch_page_contents result for a conditional request answered with 304 Not Modified."""
+    return {'text': '', 'html': '', 'title': '', 'url': url, 'links': [], 'images': [], 'tables': [],
+            'not_modified': True}
+
 
 class WebExtractorBase(ABC):
     """Abstract base class for web content extractors"""
@@ -46,7 +55,45 @@ class WebExtractorBase(ABC):
     def url_triggers_download(self, url: str) -> bool:
         """Check if URL triggers a download"""
         pass
-    
+
+    def fetch_url(
+        self,
+        url: str,
+        extract_tables: bool = False,
+        extract_images: bool = False,
+        remove_code: bool = False,
+        html_processing: Optional[dict] = None,
+        debug: bool = False,
+        validators: Optional[dict] = None
+    ) -> Dict:
+        """
+        Classify a URL and fetch it in one step.
+
+        Returns one of:
+            {'type': 'html', plus the fetch_page_contents fields}
+            {'type': 'pdf', 'url', 'content', 'headers'}
+            {'type': 'download', 'url', 'filename', 'download'} (download has save_as(path))
+            {'type': 'not_modified', 'url'} (only with validators, see core/validator_store.py)
+
+        An html result may carry 'validators', the ETag / Last-Modified of the response
+        it was parsed from, for the next conditional fetch of the page.
+
+        Backends that can tell the kind of a URL from the response they fetch it with
+        should override this; the default composes check_download_or_pdf and
+        fetch_page_contents.
+        """
+        result = self.check_download_or_pdf(url, None)
+        if result.get("type") in ("pdf", "download"):
+            return result
+        if validators:
+            page = self.fetch_page_contents(url, extract_tables, extract_images, remove_code, html_processing,
+                                            debug, validators=validators)
+        else:
+            page = self.fetch_page_contents(url, extract_tables, extract_images, remove_code, html_processing, debug)
+        if page.get('not_modified'):
+            return {"type": "not_modified", "url": page['url']}
+        return {"type": "html", **page}
+
     @abstractmethod
     def cleanup(self):
         """Clean up resources"""
@@ -59,7 +106,7 @@ def create_web_extractor(cfg: OmegaConf, scrape_method: str = None, **kwargs) ->
     
     Args:
         cfg: Configuration object
-        scrape_method: Override extraction method ('playwright' or 'scrapy')
+        scrape_method: Override extraction method ('playwright', 'playwright_async' or 'scrapy')
         **kwargs: Additional arguments for the specific backend
         
     Returns:
@@ -72,9 +119,13 @@ def create_web_extractor(cfg: OmegaConf, scrape_method: str = None, **kwargs) ->
         from core.web_content_extractor import WebContentExtractor
         return WebContentExtractor(cfg, **kwargs)
     
+    elif backend == "playwright_async":
+        from core.async_web_content_extractor import AsyncWebContentExtractor
+        return AsyncWebContentExtractor(cfg, **kwargs)
+
     elif backend == "scrapy":
         from core.scrapy_content_extractor import ScrapyContentExtractor
         return ScrapyContentExtractor(cfg, **kwargs)
     
     else:
-        raise ValueError(f"Unknown scrape_method: {backend}. Supported: playwright, scrapy")
\ No newline at end of file
+        raise ValueError(f"Unknown scrape_method: {backend}. Supported: playwright, playwright_async, scrapy")
\ No newline at end of file
@@ -1248,14 +1248,16 @@ class BoxCrawler(Crawler):
         delete_success = 0
         delete_not_found = 0
 
+        planned = []
         for row in files_to_delete:
-            file_id = row.get("file_id", "")
-            name = row.get("name", "")
-            url = row.get("url", f"https://app.box.com/file/{file_id}")
-            doc_id = slugify(url)
+            url = row.get("url", f"https://app.box.com/file/{row.get('file_id', '')}")
+            planned.append((row, url, slugify(url)))
+            logging.info(f"[DELETE] Removing from Vectara: {row.get('name', '')} (doc_id: {slugify(url)})")
+        outcomes = self.indexer.delete_docs([doc_id for _, _, doc_id in planned])
 
-            logging.info(f"[DELETE] Removing from Vectara: {name} (doc_id: {doc_id})")
-            if self.indexer.delete_doc(doc_id):
+        for row, url, doc_id in planned:
+            name = row.get("name", "")
+            if outcomes[doc_id]:
                 delete_success += 1
                 continue
 
@@ -15,18 +15,21 @@ from core.utils import (
     create_session_with_retries, binary_extensions, RateLimiter, setup_logging,
     configure_session_for_ssl, get_docker_or_local_path, get_headers
 )
+from core.host_rate_limiter import create_host_rate_limiter, paced
+from core.ray_dispatch import stream_actor_tasks
 from core.spider import run_link_spider_isolated
 from core.indexer import Indexer
 from core.indexer_utils import normalize_url_for_metadata
-from core.incremental import build_manifest, plan_deletions
+from core.incremental import build_manifest, fingerprint_map, plan_deletions
 
 import ray
 
 class UrlCrawlWorker(object):
-    def __init__(self, indexer: Indexer, crawler: Crawler, num_per_second: int):
+    def __init__(self, indexer: Indexer, crawler: Crawler, num_per_second: int, rate_limiter=None):
         self.indexer = indexer
         self.crawler = crawler
-        self.rate_limiter = RateLimiter(num_per_second)
+        # The crawl-wide per-host limiter when shared_rate_limit is on, else this worker's own
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter(num_per_second)
 
     def setup(self):
         self.indexer.setup()
@@ -45,7 +48,7 @@ class UrlCrawlWorker(object):
         prior_fingerprint = self.crawler.prior_fingerprints.get(normalize_url_for_metadata(url))
         logger.info(f"Crawling and indexing {url}")
         try:
-            with self.rate_limiter:
+            with paced(self.rate_limiter, url):
                 succeeded = self.indexer.index_url(
                     url, metadata=metadata, html_processing=self.crawler.html_processing,
                     prior_fingerprint=prior_fingerprint)
@@ -220,7 +223,7 @@ class DocsCrawler(Crawler):
             manifest = build_manifest(self.indexer, key="url", source=manifest_source)
             logger.info(f"Loaded corpus manifest: {len(manifest)} existing documents")
         if self.incremental:
-            self.prior_fingerprints = {k: e.fingerprint for k, e in manifest.items() if e.fingerprint}
+            self.prior_fingerprints = fingerprint_map(manifest)
 
         if ray_workers == -1:
             ray_workers = psutil.cpu_count(logical=True)
@@ -232,23 +235,24 @@ class DocsCrawler(Crawler):
                 logger.info(f"Using {ray_workers} ray workers")
                 self.indexer.p = self.indexer.browser = None
                 ray.init(num_cpus=ray_workers, log_to_driver=True, include_dashboard=False)
-                actors = [ray.remote(UrlCrawlWorker).remote(self.indexer, self, num_per_second) for _ in range(ray_workers)]
+                rate_limiter = create_host_rate_limiter(
+                    self.cfg.docs_crawler, num_per_second, get_headers(self.cfg)["User-Agent"], remote=ray.remote)
+                actors = [ray.remote(UrlCrawlWorker).remote(self.indexer, self, num_per_second, rate_limiter)
+                          for _ in range(ray_workers)]
                 for a in actors:
                     a.setup.remote()
-                pool = ray.util.ActorPool(actors)
-                # Batch like the other crawlers so check_shutdown can interrupt mid-run and the
-                # full result vector isn't buffered at once.
-                batch_size = max(ray_workers * 4, 20)
-                for batch_start in range(0, len(all_urls), batch_size):
-                    self.check_shutdown()
-                    batch = all_urls[batch_start:batch_start + batch_size]
-                    list(pool.map(lambda a, u: a.process.remote(u, source=source), batch))
+                for inx, _ in enumerate(stream_actor_tasks(
+                        actors, all_urls, lambda a, u: a.process.remote(u, source=source),
+                        check_shutdown=self.check_shutdown)):
+                    if (inx + 1) % 100 == 0:
+                        logger.info(f"Crawled {inx+1} out of {len(all_urls)} URLs")
                 # Cleanup Ray workers
                 for a in actors:
                     ray.get(a.cleanup.remote())
 
             else:
-                crawl_worker = UrlCrawlWorker(self.indexer, self, num_per_second)
+                crawl_worker = UrlCrawlWorker(self.indexer, self, num_per_second, create_host_rate_limiter(
+                    self.cfg.docs_crawler, num_per_second, get_headers(self.cfg)["User-Agent"]))
                 for inx, url in enumerate(all_urls):
                     self.check_shutdown()
                     if inx % 100 == 0:
@@ -276,11 +280,9 @@ class DocsCrawler(Crawler):
             to_delete, refused = plan_deletions(manifest, present_keys, listing_complete, ratio)
             removed_urls = []
             if not refused:
-                to_delete_set = set(to_delete)
-                for entry in manifest.values():
-                    if entry.doc_id in to_delete_set:
-                        if self.indexer.delete_doc(entry.doc_id) and entry.url:
-                            removed_urls.append(entry.url)
+                outcomes = self.indexer.delete_docs(to_delete)
+                removed_urls = [entry.url for entry in manifest.values()
+                                if outcomes.get(entry.doc_id) and entry.url]
             logger.info(f"Removed {len(removed_urls)} of {len(to_delete)} docs that are not "
                         f"included in the crawl but are in the corpus.")
             if self.cfg.docs_crawler.get("crawl_report", False):
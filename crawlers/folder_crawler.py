@@ -11,7 +11,8 @@ from slugify import slugify
 from core.crawler import Crawler
 from core.indexer import Indexer
 from core.utils import setup_logging, get_docker_or_local_path, release_memory, AUDIO_EXTENSIONS, VIDEO_EXTENSIONS
-from core.incremental import build_manifest, plan_deletions, prefilter_unchanged
+from core.incremental import build_manifest, fingerprint_map, plan_deletions, prefilter_unchanged
+from core.ray_dispatch import stream_actor_tasks
 from core.summary import TableSummarizer
 from omegaconf import DictConfig
 from core.dataframe_parser import (
@@ -33,10 +34,19 @@ def _doc_id_for_file(file_name: str) -> str:
     return f"{slugify(file_name)}-{path_hash}"
 
 class FileCrawlWorker(object):
+    # Return codes from process(). RESULT_QUEUED means the file was parsed and its documents
+    # handed to the indexer's background uploader (vectara.upload_threads); the final
+    # indexed/failed outcome is reported later by collect_uploads().
+    RESULT_INDEXED = 0
+    RESULT_FAILED = 1
+    RESULT_SKIPPED = 2
+    RESULT_QUEUED = 3
+
     def __init__(self, cfg: DictConfig, crawler_config: DictConfig, indexer: Indexer, num_per_second: int):
         self.indexer = indexer
         self.cfg = cfg
         self.crawler_config = crawler_config
+        self._pending_uploads = []   # (file_path, file_name, UploadTicket) still uploading
 
     def setup(self):
         self.indexer.setup()
@@ -51,6 +61,40 @@ class FileCrawlWorker(object):
         release_memory()
 
     def process(self, file_path: str, file_name: str, metadata: dict, prior_fingerprint: str = None):
+        with self.indexer.upload_ticket(file_path) as ticket:
+            result = self._process(file_path, file_name, metadata, prior_fingerprint)
+        if result == self.RESULT_INDEXED and len(ticket):
+            self._pending_uploads.append((file_path, file_name, ticket))
+            return self.RESULT_QUEUED
+        return result
+
+    def process_and_collect(self, file_path: str, file_name: str, metadata: dict,
+                            prior_fingerprint: str = None) -> tuple:
+        """process() then collect_uploads() in one call, so a streaming dispatcher learns about
+        finished uploads without queueing a separate call behind this actor's work."""
+        return self.process(file_path, file_name, metadata, prior_fingerprint), self.collect_uploads()
+
+    def collect_uploads(self, wait: bool = False) -> list:
+        """
+        Resolve files whose background uploads have finished (all of them with wait=True).
+
+        Returns:
+            list of (file_path, file_name, result, error) with result RESULT_INDEXED or
+            RESULT_FAILED; error is the joined per-document upload errors ('' on success).
+        """
+        finished, still_pending = [], []
+        for file_path, file_name, ticket in self._pending_uploads:
+            if wait or ticket.done():
+                ok = ticket.wait()
+                finished.append((file_path, file_name,
+                                 self.RESULT_INDEXED if ok else self.RESULT_FAILED,
+                                 "; ".join(ticket.errors())))
+            else:
+                still_pending.append((file_path, file_name, ticket))
+        self._pending_uploads = still_pending
+        return finished
+
+    def _process(self, file_path: str, file_name: str, metadata: dict, prior_fingerprint: str = None):
         extension = pathlib.Path(file_path).suffix.lower()
         succeeded = False
         # Media and dataframe docs are stored under doc_ids unrelated to _doc_id_for_file
@@ -108,8 +152,8 @@ class FileCrawlWorker(object):
         finally:
             release_memory()
         if succeeded and self.indexer.was_skipped():
-            return 2  # unchanged — skipped
-        return 0 if succeeded else 1
+            return self.RESULT_SKIPPED  # unchanged — skipped
+        return self.RESULT_INDEXED if succeeded else self.RESULT_FAILED
 
 
 class FolderCrawler(Crawler):
@@ -182,7 +226,7 @@ class FolderCrawler(Crawler):
 
         prior_fingerprints = {}
         if incremental and manifest:
-            prior_fingerprints = {k: e.fingerprint for k, e in manifest.items() if e.fingerprint}
+            prior_fingerprints = fingerprint_map(manifest)
             # Layer 1: skip files whose mtime (file_metadata['last_updated']) is not newer
             # than what we indexed — without reading/parsing them. Gated on the stored
             # config_sig so a processing-config change re-indexes files whose mtime is unchanged.
@@ -207,15 +251,21 @@ class FolderCrawler(Crawler):
             files_to_process = [(fp, fn, fm) for fp, fn, fm in files_to_process if fp not in indexed]
             logger.info(f"Skipping {before - len(files_to_process)} already-indexed files ({len(files_to_process)} remaining)")
 
-        def _track(file_path, file_name, result):
-            if not self.tracker:
-                return
-            if result == 0:
+        def _track(file_path, file_name, result, error=""):
+            if not self.tracker or result == FileCrawlWorker.RESULT_QUEUED:
+                return   # queued files are tracked when collect_uploads() resolves them
+            if result == FileCrawlWorker.RESULT_INDEXED:
                 self.tracker.track_indexed(file_path, title=file_name)
-            elif result == 2:
+            elif result == FileCrawlWorker.RESULT_SKIPPED:
                 self.tracker.track_skipped(file_path, title=file_name)
             else:
-                self.tracker.track_failed(file_path, title=file_name)
+                self.tracker.track_failed(file_path, title=file_name, error=error)
+
+        def _track_uploads(finished):
+            for file_path, file_name, result, error in finished:
+                if result != FileCrawlWorker.RESULT_INDEXED:
+                    logger.error(f"Background upload failed for {file_path}: {error}")
+                _track(file_path, file_name, result, error)
 
         if ray_workers == -1:
             ray_workers = psutil.cpu_count(logical=True)
@@ -233,19 +283,18 @@ class FolderCrawler(Crawler):
                     for _ in range(ray_workers)
                 ]
                 ray.get([a.setup.remote() for a in actors])
-                pool = ray.util.ActorPool(actors)
-                batch_size = ray_workers * 4
-                for batch_start in range(0, len(files_to_process), batch_size):
-                    self.check_shutdown()
-                    batch = files_to_process[batch_start:batch_start + batch_size]
-                    results = list(pool.map(
-                        lambda a, u: a.process.remote(
+                for inx, ((file_path, file_name, _fm), (result, finished)) in enumerate(stream_actor_tasks(
+                        actors, files_to_process,
+                        lambda a, u: a.process_and_collect.remote(
                             u[0], u[1], u[2],
                             prior_fingerprint=prior_fingerprints.get(doc_id_by_name[u[1]])),
-                        batch))
-                    for (file_path, file_name, _fm), result in zip(batch, results):
-                        _track(file_path, file_name, result)
-                    logger.info(f"Processed {min(batch_start + batch_size, len(files_to_process))}/{len(files_to_process)} files")
+                        check_shutdown=self.check_shutdown)):
+                    _track(file_path, file_name, result)
+                    _track_uploads(finished)
+                    if (inx + 1) % 100 == 0 or inx + 1 == len(files_to_process):
+                        logger.info(f"Processed {inx+1}/{len(files_to_process)} files")
+                for finished in ray.get([a.collect_uploads.remote(wait=True) for a in actors]):
+                    _track_uploads(finished)
                 ray.get([a.cleanup.remote() for a in actors])
             else:
                 crawl_worker = FileCrawlWorker(self.cfg, df_parser_config, self.indexer, num_per_second)
@@ -258,6 +307,8 @@ class FolderCrawler(Crawler):
                         file_path, file_name, file_metadata,
                         prior_fingerprint=prior_fingerprints.get(doc_id_by_name[file_name]))
                     _track(file_path, file_name, result)
+                    _track_uploads(crawl_worker.collect_uploads())
+                _track_uploads(crawl_worker.collect_uploads(wait=True))
                 crawl_worker.cleanup()
         finally:
             # Always release Ray, even if a batch raised mid-crawl — otherwise the cluster
@@ -277,5 +328,5 @@ class FolderCrawler(Crawler):
             ratio = folder_config.get("deletion_safety_ratio", 0.5)
             to_delete, refused = plan_deletions(manifest, present_keys, True, ratio)
             if not refused:
-                deleted = sum(1 for doc_id in to_delete if self.indexer.delete_doc(doc_id))
+                deleted = sum(self.indexer.delete_docs(to_delete).values())
                 logger.info(f"Removed {deleted} of {len(to_delete)} docs not present in the source folder.")
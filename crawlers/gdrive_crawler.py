@@ -26,7 +26,7 @@ from core.dataframe_parser import (
     process_dataframe_file,
 )
 from core.indexer import Indexer
-from core.incremental import build_manifest
+from core.incremental import build_manifest, fingerprint_map
 from core.summary import TableSummarizer
 from core.utils import setup_logging, safe_remove_file, get_docker_or_local_path
 
@@ -1405,7 +1405,7 @@ class GdriveCrawler(Crawler):
         if self.cfg.gdrive_crawler.get("incremental", False):
             manifest = build_manifest(
                 self.indexer, key="id", source=self.indexer.source_tag)
-            self.prior_fingerprints = {k: e.fingerprint for k, e in manifest.items() if e.fingerprint}
+            self.prior_fingerprints = fingerprint_map(manifest)
             logger.info(f"Incremental: loaded {len(self.prior_fingerprints)} prior fingerprints "
                         f"from {len(manifest)} corpus docs")
 
@@ -3,9 +3,11 @@ logger = logging.getLogger(__name__)
 from core.crawler import Crawler
 from datasets import load_dataset
 import psutil
+from itertools import islice
 import ray
 
 from core.indexer import Indexer
+from core.ray_dispatch import stream_actor_tasks
 from core.utils import setup_logging, release_memory
 
 class RowIndexer(object):
@@ -74,7 +76,6 @@ class HfdatasetCrawler(Crawler):
         if ray_workers == -1:
             ray_workers = psutil.cpu_count(logical=True)
 
-        batch_size = 256
         if ray_workers > 0:
             logger.info(f"Using {ray_workers} ray workers")
             self.indexer.p = self.indexer.browser = None
@@ -82,19 +83,11 @@ class HfdatasetCrawler(Crawler):
             actors = [ray.remote(RowIndexer).remote(self.indexer, self) for _ in range(ray_workers)]
             for a in actors:
                 a.setup.remote()
-            pool = ray.util.ActorPool(actors)
-            batch = []
-            for inx, row in enumerate(ds):
-                if num_rows and inx >= num_rows:
-                    break  # Ensure we stop when num_rows is reached                
-                batch.append((inx,row))
-                if len(batch) >= batch_size:
-                    _ = list(pool.map(lambda a, args_inx: a.process.remote(args_inx[0], args_inx[1], id_column, text_columns, metadata_columns, title_column),
-                                      batch))
-                    batch = []
-            if batch:
-                _ = list(pool.map(lambda a, args_inx: a.process.remote(args_inx[0], args_inx[1], id_column, text_columns, metadata_columns, title_column), 
-                                  batch))
+            rows = islice(enumerate(ds), num_rows) if num_rows else enumerate(ds)
+            for _ in stream_actor_tasks(
+                    actors, rows,
+                    lambda a, args_inx: a.process.remote(args_inx[0], args_inx[1], id_column, text_columns, metadata_columns, title_column)):
+                pass
             ray.shutdown()
         else:
             crawl_worker = RowIndexer(self.indexer, self)
@@ -212,10 +212,8 @@ class NotionCrawler(Crawler):
             to_delete, refused = plan_deletions(manifest, present_keys, listing_complete, ratio)
             removed = []
             if not refused:
-                to_delete_set = set(to_delete)
-                for entry in manifest.values():
-                    if entry.doc_id in to_delete_set and self.indexer.delete_doc(entry.doc_id):
-                        removed.append(entry)
+                outcomes = self.indexer.delete_docs(to_delete)
+                removed = [entry for entry in manifest.values() if outcomes.get(entry.doc_id)]
             logger.info(f"Removed {len(removed)} of {len(to_delete)} docs that are not "
                         f"included in the crawl but are in the corpus.")
             if self.cfg.notion_crawler.get("crawl_report", False):
@@ -6,7 +6,8 @@ import psutil
 from core.crawler import Crawler
 from core.indexer import Indexer
 from core.indexer_utils import normalize_url_for_metadata
-from core.incremental import build_manifest, plan_deletions, prefilter_unchanged
+from core.incremental import build_manifest, fingerprint_map, plan_deletions, prefilter_unchanged
+from core.ray_dispatch import stream_actor_tasks
 from core.utils import setup_logging
 import feedparser
 from datetime import datetime, timedelta
@@ -126,7 +127,7 @@ class RssCrawler(Crawler):
                                       source=(self.indexer.source_tag if self.incremental else None))
             logger.info(f"Loaded corpus manifest: {len(manifest)} existing documents")
         if self.incremental and manifest:
-            prior_fingerprints = {k: e.fingerprint for k, e in manifest.items() if e.fingerprint}
+            prior_fingerprints = fingerprint_map(manifest)
             kept = []
             skipped = 0
             for url, title, pub_date in unique_urls:
@@ -165,8 +166,8 @@ class RssCrawler(Crawler):
                 ]
                 for a in actors:
                     a.setup.remote()
-                pool = ray.util.ActorPool(actors)
-                results = list(pool.map(lambda a, u: a.process.remote(u), unique_urls))
+                results = [result for _, result in stream_actor_tasks(
+                    actors, unique_urls, lambda a, u: a.process.remote(u))]
 
                 # Log summary
                 successful = sum(1 for r in results if r == 1)
@@ -209,7 +210,7 @@ class RssCrawler(Crawler):
             ratio = self.cfg.rss_crawler.get("deletion_safety_ratio", 0.5)
             to_delete, refused = plan_deletions(manifest, present_keys, listing_complete, ratio)
             if not refused:
-                deleted = sum(1 for doc_id in to_delete if self.indexer.delete_doc(doc_id))
+                deleted = sum(self.indexer.delete_docs(to_delete).values())
                 logger.info(f"Removed {deleted} of {len(to_delete)} docs that are no longer "
                             f"present in the RSS feeds.")
 
@@ -9,7 +9,8 @@ logger = logging.getLogger(__name__)
 from core.crawler import Crawler
 from core.indexer import Indexer
 from core.utils import RateLimiter, setup_logging, release_memory, AUDIO_EXTENSIONS, VIDEO_EXTENSIONS
-from core.incremental import build_manifest, plan_deletions, prefilter_unchanged
+from core.incremental import build_manifest, fingerprint_map, plan_deletions, prefilter_unchanged
+from core.ray_dispatch import stream_actor_tasks
 
 from slugify import slugify
 import pandas as pd
@@ -218,7 +219,7 @@ class S3Crawler(Crawler):
 
         prior_fingerprints = {}
         if incremental and manifest:
-            prior_fingerprints = {k: e.fingerprint for k, e in manifest.items() if e.fingerprint}
+            prior_fingerprints = fingerprint_map(manifest)
             # Layer 1: skip objects whose LastModified is not newer than what we indexed.
             # Gated on the stored config_sig so a processing-config change re-indexes objects
             # whose LastModified is unchanged.
@@ -265,20 +266,16 @@ class S3Crawler(Crawler):
                 ray.init(num_cpus=ray_workers, log_to_driver=True, include_dashboard=False)
                 actors = [ray.remote(FileCrawlWorker).remote(self.indexer, num_per_second, bucket, self.cfg) for _ in range(ray_workers)]
                 ray.get([a.setup.remote() for a in actors])
-                pool = ray.util.ActorPool(actors)
-                batch_size = max(ray_workers * 4, 20)
-                for batch_start in range(0, len(files_to_process), batch_size):
-                    self.check_shutdown()
-                    batch = files_to_process[batch_start:batch_start + batch_size]
-                    results = list(pool.map(
+                for inx, (s3_file, result) in enumerate(stream_actor_tasks(
+                        actors, files_to_process,
                         lambda a, u: a.process.remote(
                             u, metadata=metadata, source=source,
                             prior_fingerprint=prior_fingerprints.get(doc_id_by_file[u]),
                             last_modified=lastmod_by_file.get(u)),
-                        batch))
-                    for s3_file, result in zip(batch, results):
-                        _track(s3_file, result)
-                    logger.info(f"Processed {min(batch_start + batch_size, len(files_to_process))}/{len(files_to_process)} S3 files")
+                        check_shutdown=self.check_shutdown)):
+                    _track(s3_file, result)
+                    if (inx + 1) % 100 == 0 or inx + 1 == len(files_to_process):
+                        logger.info(f"Processed {inx+1}/{len(files_to_process)} S3 files")
                 ray.get([a.cleanup.remote() for a in actors])
             else:
                 crawl_worker = FileCrawlWorker(self.indexer, num_per_second, bucket, self.cfg)
@@ -309,5 +306,5 @@ class S3Crawler(Crawler):
             ratio = self.cfg.s3_crawler.get("deletion_safety_ratio", 0.5)
             to_delete, refused = plan_deletions(manifest, present_keys, True, ratio)
             if not refused:
-                deleted = sum(1 for doc_id in to_delete if self.indexer.delete_doc(doc_id))
+                deleted = sum(self.indexer.delete_docs(to_delete).values())
                 logger.info(f"Removed {deleted} of {len(to_delete)} S3 docs not present in the source bucket.")
@@ -3,17 +3,28 @@ import requests
 import logging
 import psutil
 import os
+from contextlib import nullcontext
+from itertools import islice
+from typing import Iterable, Iterator, Optional
 
 from core.crawler import Crawler
 from core.crawl_tracker import CrawlShutdownException
 from core.utils import (
     clean_urls, archive_extensions, img_extensions, get_file_extension, RateLimiter, 
-    setup_logging, get_docker_or_local_path, url_matches_patterns, normalize_vectara_endpoint
+    setup_logging, get_docker_or_local_path, url_matches_patterns, normalize_vectara_endpoint, get_headers
 )
+from core.host_rate_limiter import create_host_rate_limiter, paced
+from core.ray_dispatch import stream_actor_tasks
+from core.render_modes import create_render_modes
+from core.browser_pool import create_browser_pool
 from core.indexer import Indexer
 from core.indexer_utils import normalize_url_for_metadata
-from core.incremental import build_manifest, plan_deletions, prefilter_unchanged
-from core.spider import run_link_spider_isolated, recursive_crawl, sitemap_to_urls, sitemap_to_urls_with_meta
+from core.incremental import build_manifest, fingerprint_map, plan_deletions, prefilter_unchanged
+from core.spider import (
+    DEFAULT_CRAWL_WORKERS, DEFAULT_SITEMAP_WORKERS, iter_sitemap, run_link_spider_isolated, recursive_crawl, sitemap_to_urls,
+    sitemap_to_urls_with_meta
+)
+from core.web_extractor_base import DEFAULT_RENDER_CONCURRENCY, WebExtractorBase
 from crawlers.auth.saml_manager import SAMLAuthManager
 from crawlers.auth.google_manager import GoogleAuthManager
 
@@ -39,10 +50,57 @@ def _pick_google_target_url(cfg) -> str | None:
     return first if isinstance(first, str) and first else None
 
 
-def _transfer_session_to_context(context, session):
-    """Forward cookies from a `requests.Session` to a Playwright context."""
+def _batched(urls: Iterable[str], size: int) -> Iterator[list]:
+    """Consecutive lists of `size` URLs (the last one shorter), consuming `urls` lazily."""
+    urls = iter(urls)
+    while True:
+        batch = list(islice(urls, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _is_crawlable(url: str, pos_patterns: list, neg_patterns: list) -> bool:
+    """Whether a discovered URL is a page to index: http(s), not an archive or image, and
+    matching the URL patterns."""
+    excluded_extensions = archive_extensions + img_extensions
+    return (url.startswith('http') and
+            not any(url.lower().endswith(ext) for ext in excluded_extensions) and
+            url_matches_patterns(url, pos_patterns, neg_patterns))
+
+
+def _write_crawl_report(cfg, urls: list):
+    """Store URLS in crawl_report if needed, and log the file types found."""
+    if cfg.website_crawler.get("crawl_report", False):
+        logger.info(f"Collected {len(urls)} URLs to crawl and index. See urls_indexed.txt for a full report.")
+        output_dir = cfg.vectara.get("output_dir", "vectara_ingest_output")
+        docker_path = f'/home/vectara/{output_dir}/urls_indexed.txt'
+        filename = os.path.basename(docker_path)  # Extract just the filename
+        file_path = get_docker_or_local_path(
+            docker_path=docker_path,
+            output_dir=output_dir
+        )
+
+        if not file_path.endswith(filename):
+            file_path = os.path.join(file_path, filename)
+
+        with open(file_path, 'w') as f:
+            for url in sorted(urls):
+                f.write(url + '\n')
+    else:
+        logger.info(f"Collected {len(urls)} URLs to crawl and index.")
+
+    # Print some file types
+    file_types = list(set([get_file_extension(u) for u in urls]))
+    file_types = [t for t in file_types if t != ""]
+    logger.info(f"Note: file types = {file_types}")
+
+
+def _session_cookies(session) -> list:
+    """The cookies of a `requests.Session` as Playwright cookie dicts."""
     if not session or not hasattr(session, 'cookies'):
-        return
+        return []
+    cookies = []
     for cookie in session.cookies:
         attrs = {
             'name': cookie.name,
@@ -54,10 +112,17 @@ def _transfer_session_to_context(context, session):
             attrs['secure'] = True
         if getattr(cookie, 'expires', None):
             attrs['expires'] = cookie.expires
+        cookies.append(attrs)
+    return cookies
+
+
+def _transfer_session_to_context(context, session):
+    """Forward cookies from a `requests.Session` to a Playwright context."""
+    for attrs in _session_cookies(session):
         try:
             context.add_cookies([attrs])
         except Exception as e:
-            logger.warning(f"Failed to add cookie {cookie.name} to Playwright context: {e}")
+            logger.warning(f"Failed to add cookie {attrs['name']} to Playwright context: {e}")
 
 
 def _apply_auth_to_indexer(
@@ -107,6 +172,14 @@ def _apply_auth_to_indexer(
         return
 
     indexer._init_processors()
+    extractor = getattr(indexer, 'web_extractor', None)
+    if isinstance(extractor, WebExtractorBase) and hasattr(extractor, 'use_auth'):
+        # The asyncio engine creates its contexts on its own event loop: hand it the
+        # storage_state / cookies instead of wrapping browser.new_context.
+        extractor.use_auth(storage_state=google_storage_state_path, cookies=_session_cookies(saml_session))
+        extractor.skip_static_prefetch = True
+        logger.info("Configured web extractor to inject authenticated cookies")
+        return
     if hasattr(indexer, 'web_extractor') and indexer.web_extractor:
         original_new_context = indexer.web_extractor.browser.new_context
 
@@ -130,9 +203,15 @@ def _apply_auth_to_indexer(
 
 class PageCrawlWorker(object):
     def __init__(self, cfg: dict, num_per_second: int, prior_fingerprints: dict = None,
-                 sitemap_lastmods: dict = None):
+                 sitemap_lastmods: dict = None, rate_limiter=None, render_modes=None, browser_pool=None):
         self.cfg = cfg
-        self.rate_limiter = RateLimiter(num_per_second)
+        # The crawl-wide per-host limiter when shared_rate_limit is on, else this worker's own
+        self.rate_limiter = rate_limiter if rate_limiter is not None else RateLimiter(num_per_second)
+        # The crawl-wide rendering-mode learner when learn_render_mode is on (Ray workers);
+        # None leaves the indexer with its own
+        self.render_modes = render_modes
+        # The crawl's shared Chromium servers when browser_pool_size is set; None = own browser
+        self.browser_pool = browser_pool
         self.indexer = None
         self.session = None
         # {normalized_url: fingerprint} from the prior corpus state. Lets index_url skip an
@@ -147,6 +226,7 @@ class PageCrawlWorker(object):
         self.saml_config = website_crawler_cfg.get('saml_auth')
         self.google_config = website_crawler_cfg.get('google_auth')
         self.scrape_method = website_crawler_cfg.get('scrape_method', 'playwright')
+        self._pending_uploads = []   # (url, UploadTicket) still uploading in the background
 
     def setup(self):
         """
@@ -161,6 +241,9 @@ class PageCrawlWorker(object):
         api_key = vectara_cfg['api_key']
         
         self.indexer = Indexer(self.cfg, api_url, corpus_key, api_key, scrape_method=self.scrape_method)
+        if self.render_modes is not None:
+            self.indexer.render_modes = self.render_modes
+        self.indexer.browser_pool = self.browser_pool
         self.indexer.setup()
 
         # Initialize SAML session if configured
@@ -246,12 +329,61 @@ class PageCrawlWorker(object):
     RESULT_FAILED = 1
     RESULT_AUTH_REQUIRED = 2
     RESULT_SKIPPED = 3
+    # The page was rendered and its documents handed to the indexer's background uploader
+    # (vectara.upload_threads); collect_uploads() reports the final indexed/failed outcome.
+    RESULT_QUEUED = 4
 
-    def process(self, url: str, source: str):
+    def process(self, url: str, source: str, rate_limiter=None):
         if not self.indexer:
             logging.error(f"[Worker {os.getpid()}] Indexer not set up. Call setup() before process().")
             return self.RESULT_FAILED
 
+        with self.indexer.upload_ticket(url) as ticket:
+            result = self._process(url, source, rate_limiter if rate_limiter is not None else self.rate_limiter)
+        if result == self.RESULT_INDEXED and len(ticket):
+            self._pending_uploads.append((url, ticket))
+            return self.RESULT_QUEUED
+        return result
+
+    def process_batch(self, urls: list, source: str, lastmods: dict = None) -> list:
+        """
+        process() for a batch of URLs; returns their results in order. With scrape_method
+        playwright_async the indexer's extractor fetches the batch ahead (up to
+        vectara.render_concurrency pages in flight), so the next pages render while the
+        current one is parsed and uploaded. lastmods adds {normalized_url: sitemap lastmod}
+        entries for these URLs to sitemap_lastmods.
+        """
+        if lastmods:
+            self.sitemap_lastmods.update(lastmods)
+        if not self.indexer:
+            return [self.process(url, source) for url in urls]
+        with self.indexer.prefetching(urls, self.html_processing, rate_limiter=self.rate_limiter) as prefetched:
+            # Prefetches are started through the rate limiter already
+            limiter = nullcontext() if prefetched else self.rate_limiter
+            return [self.process(url, source, rate_limiter=limiter) for url in urls]
+
+    def process_and_collect(self, urls: list, source: str, lastmods: dict = None) -> tuple:
+        """process_batch() then collect_uploads() in one call, so a streaming dispatcher learns
+        about finished uploads without queueing a separate call behind this actor's work."""
+        return self.process_batch(urls, source, lastmods), self.collect_uploads()
+
+    def collect_uploads(self, wait: bool = False) -> list:
+        """Resolve URLs whose background uploads have finished (all of them with wait=True).
+        Returns a list of (url, RESULT_INDEXED | RESULT_FAILED)."""
+        finished, still_pending = [], []
+        for url, ticket in self._pending_uploads:
+            if wait or ticket.done():
+                ok = ticket.wait()
+                if not ok:
+                    logging.error(f"[Worker {os.getpid()}] Background upload failed for {url}: "
+                                  f"{'; '.join(ticket.errors())}")
+                finished.append((url, self.RESULT_INDEXED if ok else self.RESULT_FAILED))
+            else:
+                still_pending.append((url, ticket))
+        self._pending_uploads = still_pending
+        return finished
+
+    def _process(self, url: str, source: str, rate_limiter):
         nu = normalize_url_for_metadata(url)
         metadata = {"source": source, "url": url}
         # Record the sitemap lastmod (if any) so next run's Layer-1 compares like-for-like.
@@ -262,7 +394,7 @@ class PageCrawlWorker(object):
         logging.info(f"[Worker {os.getpid()}] Crawling and indexing {url}")
         succeeded = False
         try:
-            with self.rate_limiter:
+            with paced(rate_limiter, url):
                 succeeded = self.indexer.index_url(
                     url, metadata=metadata, html_processing=self.html_processing,
                     prior_fingerprint=prior_fingerprint)
@@ -390,7 +522,12 @@ class WebsiteCrawler(Crawler):
         """Main crawl orchestration method."""
         # 1. Configuration and setup
         self._configure_indexer_session()
-        
+
+        if self.cfg.website_crawler.get("pipeline_discovery", False):
+            urls_to_crawl = self._crawl_pipelined()
+            self._remove_old_content_if_needed(urls_to_crawl)
+            return
+
         # 2. Discover all URLs using the chosen method
         all_urls = self._discover_urls()
 
@@ -424,18 +561,83 @@ class WebsiteCrawler(Crawler):
             google_storage_state_path=self.google_storage_state_path,
         )
 
+    def _load_url_patterns(self):
+        self.pos_regex = self.cfg.website_crawler.get("pos_regex", [])
+        self.pos_patterns = [re.compile(r) for r in self.pos_regex]
+        self.neg_regex = self.cfg.website_crawler.get("neg_regex", [])
+        self.neg_patterns = [re.compile(r) for r in self.neg_regex]
+        self.html_processing = self.cfg.website_crawler.get('html_processing', {})
+
+    def _crawl_pipelined(self) -> list:
+        """
+        pipeline_discovery: index URLs while discovery is still finding them. Each discovered
+        URL goes through the same filter, dedupe and incremental pre-filters as a batch crawl
+        and on to the workers straight away. Returns the full filtered discovery set for
+        _remove_old_content_if_needed, and marks the crawl interrupted (so nothing is deleted)
+        unless discovery ran to completion.
+        """
+        discovered = {}                 # normalized URL -> first-seen URL
+        discovery = {"complete": False}
+
+        def stream():
+            for url in self._iter_discovered_urls():
+                if not _is_crawlable(url, self.pos_patterns, self.neg_patterns):
+                    continue
+                nu = normalize_url_for_metadata(url)
+                if nu in discovered:
+                    continue
+                discovered[nu] = url
+                yield url
+            discovery["complete"] = True
+
+        try:
+            self._dispatch_crawl_jobs(stream())
+        except CrawlShutdownException:
+            self._crawl_interrupted = True
+            raise
+        urls = list(discovered.values())
+        if not discovery["complete"] or not urls:
+            self._crawl_interrupted = True
+        _write_crawl_report(self.cfg, urls)
+        return urls
+
+    def _iter_discovered_urls(self) -> Iterator[str]:
+        """
+        Discovered URLs as they are found. Only sitemap discovery with the internal crawl
+        method streams; the link crawlers use the indexer's browser, which the workers take
+        over, so for those every URL is discovered first.
+        """
+        if (self.cfg.website_crawler.get("pages_source", "crawl") != "sitemap"
+                or self.cfg.website_crawler.get("crawl_method", "internal") == "scrapy"):
+            logger.info("pipeline_discovery streams sitemap discovery only; discovering all URLs first")
+            yield from self._discover_urls()
+            return
+        self._load_url_patterns()
+        sitemap_workers = self.cfg.website_crawler.get("sitemap_workers", DEFAULT_SITEMAP_WORKERS)
+        for homepage in self.cfg.website_crawler.urls:
+            found = 0
+            for url, lastmod in iter_sitemap(homepage, session=self.indexer.session, workers=sitemap_workers):
+                if self._accept_sitemap_entry(url, lastmod):
+                    found += 1
+                    yield url
+            logger.info(f"Found {found} URLs on {homepage}")
+
+    def _accept_sitemap_entry(self, url: str, lastmod: Optional[str]) -> bool:
+        """Whether a sitemap URL passes the URL patterns; records its <lastmod> when incremental."""
+        if not (url.startswith('http') and url_matches_patterns(url, self.pos_patterns, self.neg_patterns)):
+            return False
+        if self.incremental and lastmod:
+            self._sitemap_lastmod[normalize_url_for_metadata(url)] = lastmod
+        return True
+
     def _discover_urls(self) -> list:
         """
         Discover URLs using the chosen crawl method.
         Returns list of discovered URLs.
         """
         base_urls = self.cfg.website_crawler.urls
-        self.pos_regex = self.cfg.website_crawler.get("pos_regex", [])
-        self.pos_patterns = [re.compile(r) for r in self.pos_regex]
-        self.neg_regex = self.cfg.website_crawler.get("neg_regex", [])
-        self.neg_patterns = [re.compile(r) for r in self.neg_regex]
+        self._load_url_patterns()
         keep_query_params = self.cfg.website_crawler.get('keep_query_params', False)
-        self.html_processing = self.cfg.website_crawler.get('html_processing', {})
         max_depth = self.cfg.website_crawler.get("max_depth", 3)
 
         # Determine crawl method and handle SAML / Google auth for Scrapy.
@@ -511,6 +713,14 @@ class WebsiteCrawler(Crawler):
         all_urls = []
         pages_source = self.cfg.website_crawler.get("pages_source", "crawl")
         
+        sitemap_workers = self.cfg.website_crawler.get("sitemap_workers", DEFAULT_SITEMAP_WORKERS)
+        crawl_workers = self.cfg.website_crawler.get("crawl_workers", DEFAULT_CRAWL_WORKERS)
+        crawl_rate_limiter = None
+        if pages_source == "crawl":
+            num_per_second = max(self.cfg.website_crawler.get("num_per_second", 10), 1)
+            crawl_rate_limiter = create_host_rate_limiter(
+                self.cfg.website_crawler, num_per_second, get_headers(self.cfg)["User-Agent"]
+            ) or RateLimiter(num_per_second)
         for homepage in base_urls:
             urls = []
             
@@ -522,15 +732,11 @@ class WebsiteCrawler(Crawler):
                 if self.incremental:
                     # Capture <lastmod> alongside each URL so the dispatcher can skip
                     # pages that have not changed since the last index — without fetching them.
-                    pairs = sitemap_to_urls_with_meta(homepage, session=self.indexer.session)
-                    urls = []
-                    for url, lastmod in pairs:
-                        if url.startswith('http') and url_matches_patterns(url, self.pos_patterns, self.neg_patterns):
-                            urls.append(url)
-                            if lastmod:
-                                self._sitemap_lastmod[normalize_url_for_metadata(url)] = lastmod
+                    pairs = sitemap_to_urls_with_meta(homepage, session=self.indexer.session,
+                                                      workers=sitemap_workers)
+                    urls = [url for url, lastmod in pairs if self._accept_sitemap_entry(url, lastmod)]
                 else:
-                    urls = sitemap_to_urls(homepage, session=self.indexer.session)
+                    urls = sitemap_to_urls(homepage, session=self.indexer.session, workers=sitemap_workers)
                     urls = [
                         url for url in urls
                         if url.startswith('http') and url_matches_patterns(url, self.pos_patterns, self.neg_patterns)
@@ -539,7 +745,8 @@ class WebsiteCrawler(Crawler):
                 urls_set = recursive_crawl(
                     homepage, max_depth,
                     pos_patterns=self.pos_patterns, neg_patterns=self.neg_patterns,
-                    indexer=self.indexer, visited=set(), verbose=self.indexer.verbose
+                    indexer=self.indexer, visited=set(), verbose=self.indexer.verbose,
+                    workers=crawl_workers, rate_limiter=crawl_rate_limiter
                 )
                 urls = clean_urls(urls_set, keep_query_params)
             else:
@@ -557,13 +764,7 @@ class WebsiteCrawler(Crawler):
         Returns the final list of URLs to crawl.
         """
         # Filter and deduplicate URLs
-        excluded_extensions = archive_extensions + img_extensions
-        urls = [
-            url for url in all_urls
-            if (url.startswith('http') and
-                not any(url.lower().endswith(ext) for ext in excluded_extensions) and
-                url_matches_patterns(url, self.pos_patterns, self.neg_patterns))
-        ]
+        urls = [url for url in all_urls if _is_crawlable(url, self.pos_patterns, self.neg_patterns)]
         # Deduplicate on the normalized URL — the same form used for doc ids
         # and remove_old_content comparisons — so encoding variants of one
         # page are crawled once. Keep the first-seen original URL for fetching.
@@ -571,32 +772,7 @@ class WebsiteCrawler(Crawler):
         for url in urls:
             unique_urls.setdefault(normalize_url_for_metadata(url), url)
         urls = list(unique_urls.values())
-
-        # Store URLS in crawl_report if needed
-        if self.cfg.website_crawler.get("crawl_report", False):
-            logger.info(f"Collected {len(urls)} URLs to crawl and index. See urls_indexed.txt for a full report.")
-            output_dir = self.cfg.vectara.get("output_dir", "vectara_ingest_output")
-            docker_path = f'/home/vectara/{output_dir}/urls_indexed.txt'
-            filename = os.path.basename(docker_path)  # Extract just the filename
-            file_path = get_docker_or_local_path(
-                docker_path=docker_path,
-                output_dir=output_dir
-            )
-
-            if not file_path.endswith(filename):
-                file_path = os.path.join(file_path, filename)
-
-            with open(file_path, 'w') as f:
-                for url in sorted(urls):
-                    f.write(url + '\n')
-        else:
-            logger.info(f"Collected {len(urls)} URLs to crawl and index.")
-
-        # Print some file types
-        file_types = list(set([get_file_extension(u) for u in urls]))
-        file_types = [t for t in file_types if t != ""]
-        logger.info(f"Note: file types = {file_types}")
-        
+        _write_crawl_report(self.cfg, urls)
         return urls
 
     def _ensure_manifest(self):
@@ -621,10 +797,15 @@ class WebsiteCrawler(Crawler):
         source)."""
         if not self._sitemap_lastmod or not self._manifest:
             return urls
-        kept, skipped = [], 0
+        return list(self._iter_lastmod_prefilter(urls))
+
+    def _iter_lastmod_prefilter(self, urls: Iterable[str]) -> Iterator[str]:
+        """_lastmod_prefilter over a stream of URLs (pipeline_discovery), whose lastmods are
+        recorded while the stream is consumed."""
+        kept, skipped = 0, 0
         for u in urls:
             nu = normalize_url_for_metadata(u)
-            entry = self._manifest.get(nu)
+            entry = self._manifest.get(nu) if self._manifest else None
             lastmod = self._sitemap_lastmod.get(nu)
             if lastmod and prefilter_unchanged(entry, lastmod, "sitemap_lastmod",
                                                self.indexer.config_sig):
@@ -635,33 +816,38 @@ class WebsiteCrawler(Crawler):
                     # create a second, never-matching tracker entry for resume/stats.
                     self.tracker.track_skipped(u, url=u)
             else:
-                kept.append(u)
+                kept += 1
+                yield u
         if skipped:
             logger.info(f"Incremental: skipped {skipped} unchanged URLs via sitemap lastmod "
-                        f"({len(kept)} remaining to crawl)")
-        return kept
+                        f"({kept} remaining to crawl)")
 
-    def _dispatch_crawl_jobs(self, urls: list):
+    def _dispatch_crawl_jobs(self, urls: Iterable[str]):
         """
-        Dispatch crawl jobs to Ray workers or process sequentially.
+        Dispatch crawl jobs to Ray workers or process sequentially. `urls` is a list, or with
+        pipeline_discovery an iterator fed by discovery while the workers run.
         """
         self._ensure_manifest()
+        streaming = not isinstance(urls, list)
 
         if self.incremental and self._manifest is not None:
             # Layer 1: skip unchanged pages before fetching, using sitemap <lastmod>.
-            urls = self._lastmod_prefilter(urls)
+            urls = self._iter_lastmod_prefilter(urls) if streaming else self._lastmod_prefilter(urls)
             # Layer 2: give workers the prior fingerprint so index_url can skip an
             # unchanged page after fetching (and before the upload / LLM work).
-            prior_fingerprints = {k: e.fingerprint for k, e in self._manifest.items() if e.fingerprint}
+            prior_fingerprints = fingerprint_map(self._manifest)
         else:
             prior_fingerprints = {}
             # Legacy blind crash-recovery pre-filter — suppressed under incremental, where the
             # manifest + fingerprint decide (so a changed page is not wrongly skipped).
             if self.tracker and not self.cfg.vectara.get("reindex", False):
                 indexed = self.tracker.get_indexed_ids()
-                before = len(urls)
-                urls = [u for u in urls if u not in indexed]
-                logger.info(f"Skipping {before - len(urls)} already-indexed URLs ({len(urls)} remaining)")
+                if streaming:
+                    urls = (u for u in urls if u not in indexed)
+                else:
+                    before = len(urls)
+                    urls = [u for u in urls if u not in indexed]
+                    logger.info(f"Skipping {before - len(urls)} already-indexed URLs ({len(urls)} remaining)")
 
         num_per_second = max(self.cfg.website_crawler.get("num_per_second", 10), 1)
         ray_workers = self.cfg.website_crawler.get("ray_workers", 0)            # -1: use ray with ALL cores, 0: dont use ray
@@ -678,10 +864,17 @@ class WebsiteCrawler(Crawler):
             self._dispatch_to_single_process(urls, num_per_second, source,
                                              prior_fingerprints, sitemap_lastmods)
 
+    def _urls_per_task(self) -> int:
+        """URLs handed to a worker per call: with the asyncio engine, enough to keep its
+        render_concurrency pages in flight while one is indexed; otherwise one."""
+        if self.cfg.website_crawler.get("scrape_method", "playwright") != "playwright_async":
+            return 1
+        return 2 * max(1, int(self.cfg.vectara.get("render_concurrency", DEFAULT_RENDER_CONCURRENCY)))
+
     def _track_result(self, url: str, result: int):
         """Record a worker outcome to the crawl tracker (no-op if tracking disabled)."""
-        if not self.tracker:
-            return
+        if not self.tracker or result == PageCrawlWorker.RESULT_QUEUED:
+            return   # queued pages are tracked once collect_uploads() resolves them
         if result == PageCrawlWorker.RESULT_INDEXED:
             self.tracker.track_indexed(url, url=url)
         elif result == PageCrawlWorker.RESULT_SKIPPED:
@@ -691,7 +884,17 @@ class WebsiteCrawler(Crawler):
         else:
             self.tracker.track_failed(url, url=url)
 
-    def _dispatch_to_ray_workers(self, urls: list, ray_workers: int, num_per_second: int, source: str,
+    def _task_lastmods(self, task: list, sitemap_lastmods: dict) -> dict:
+        """The sitemap lastmods of one task's URLs, sent along with it: with pipeline_discovery
+        they are still being discovered when the workers start."""
+        lastmods = {}
+        for url in task:
+            nu = normalize_url_for_metadata(url)
+            if nu in sitemap_lastmods:
+                lastmods[nu] = sitemap_lastmods[nu]
+        return lastmods
+
+    def _dispatch_to_ray_workers(self, urls: Iterable[str], ray_workers: int, num_per_second: int, source: str,
                                  prior_fingerprints: dict = None, sitemap_lastmods: dict = None):
         """Dispatch jobs to Ray workers for parallel processing."""
         logger.info(f"Using {ray_workers} ray workers")
@@ -706,38 +909,69 @@ class WebsiteCrawler(Crawler):
                     logger.warning(f"Failed to stop Playwright: {e}")
         self.indexer.web_extractor = None
         ray.init(num_cpus=ray_workers, log_to_driver=True, include_dashboard=False)
+        browser_pool = None
         try:
             # Broadcast the per-url maps once via the object store (zero-copied per node, not
             # duplicated per actor). Ray dereferences the ObjectRef into the dict in each actor.
             pf_ref = ray.put(prior_fingerprints or {})
-            lm_ref = ray.put(sitemap_lastmods or {})
+            sitemap_lastmods = sitemap_lastmods if sitemap_lastmods is not None else {}
+            # One broker actor paces each host across all workers
+            rate_limiter = create_host_rate_limiter(
+                self.cfg.website_crawler, num_per_second, get_headers(self.cfg)["User-Agent"], remote=ray.remote)
+            # One broker actor learns each domain's rendering mode from all workers' pages
+            render_modes = create_render_modes(
+                self.cfg.website_crawler,
+                get_docker_or_local_path(docker_path=f'/home/vectara/{self.indexer.output_dir}',
+                                         output_dir=self.indexer.output_dir),
+                remote=ray.remote)
+            # Browsers shared by all workers, as many as needed for the pages rendering at once
+            if self.cfg.website_crawler.get("scrape_method", "playwright") in ('playwright', 'playwright_async'):
+                browser_pool = create_browser_pool(self.cfg.website_crawler, remote=ray.remote)
 
             # Create workers with serializable config
             actors = [ray.remote(PageCrawlWorker).remote(
                 self.cfg,
                 num_per_second,
                 pf_ref,
-                lm_ref
+                None,
+                rate_limiter,
+                render_modes,
+                browser_pool
             ) for _ in range(ray_workers)]
             ray.get([a.setup.remote() for a in actors])
-            pool = ray.util.ActorPool(actors)
-            batch_size = max(ray_workers * 4, 20)
-            for batch_start in range(0, len(urls), batch_size):
-                self.check_shutdown()
-                batch = urls[batch_start:batch_start + batch_size]
-                results = list(pool.map(lambda a, u: a.process.remote(u, source=source), batch))
-                for url, result in zip(batch, results):
+            total = f"/{len(urls)}" if isinstance(urls, list) else ""
+            done = 0
+            for task, (results, finished) in stream_actor_tasks(
+                    actors, _batched(urls, self._urls_per_task()),
+                    lambda a, task: a.process_and_collect.remote(
+                        task, source=source, lastmods=self._task_lastmods(task, sitemap_lastmods)),
+                    check_shutdown=self.check_shutdown):
+                for url, result in zip(task, results):
+                    self._track_result(url, result)
+                for url, result in finished:
+                    self._track_result(url, result)
+                done += len(task)
+                if done // 100 != (done - len(task)) // 100:
+                    logger.info(f"Processed {done}{total} URLs")
+            logger.info(f"Processed {done}{total} URLs")
+            for finished in ray.get([a.collect_uploads.remote(wait=True) for a in actors]):
+                for url, result in finished:
                     self._track_result(url, result)
-                logger.info(f"Processed {min(batch_start + batch_size, len(urls))}/{len(urls)} URLs")
             # Cleanup Ray workers
             for a in actors:
                 ray.get(a.cleanup.remote())
         finally:
+            # The broker's Chromium servers are not Ray processes; stop them before Ray goes
+            if browser_pool is not None:
+                try:
+                    browser_pool.shutdown()
+                except Exception as e:
+                    logger.warning(f"Failed to stop the shared browser servers: {e}")
             # Always release Ray, even if check_shutdown() or a worker task raised mid-crawl —
             # otherwise the cluster and its worker processes leak into subsequent runs.
             ray.shutdown()
 
-    def _dispatch_to_single_process(self, urls: list, num_per_second: int, source: str,
+    def _dispatch_to_single_process(self, urls: Iterable[str], num_per_second: int, source: str,
                                     prior_fingerprints: dict = None, sitemap_lastmods: dict = None):
         """Process URLs sequentially in a single process."""
         # Stop Playwright from URL discovery to close its asyncio event loop
@@ -755,15 +989,25 @@ class WebsiteCrawler(Crawler):
             self.cfg,
             num_per_second,
             prior_fingerprints,
-            sitemap_lastmods
+            None,             # sitemap lastmods go out with each task
+            create_host_rate_limiter(self.cfg.website_crawler, num_per_second, get_headers(self.cfg)["User-Agent"])
         )
         crawl_worker.setup()
-        for inx, url in enumerate(urls):
+        per_task = self._urls_per_task()
+        total = f" out of {len(urls)}" if isinstance(urls, list) else ""
+        inx = 0
+        for task in _batched(urls, per_task):
             self.check_shutdown()
-            if inx % 100 == 0:
-                logger.info(f"Crawling URL number {inx+1} out of {len(urls)}")
-            result = crawl_worker.process(url, source=source)
-            self._track_result(url, result)
+            if inx % 100 < per_task:
+                logger.info(f"Crawling URL number {inx+1}{total}")
+            inx += len(task)
+            lastmods = self._task_lastmods(task, sitemap_lastmods or {})
+            for url, result in zip(task, crawl_worker.process_batch(task, source=source, lastmods=lastmods)):
+                self._track_result(url, result)
+            for done_url, done_result in crawl_worker.collect_uploads():
+                self._track_result(done_url, done_result)
+        for done_url, done_result in crawl_worker.collect_uploads(wait=True):
+            self._track_result(done_url, done_result)
         # Cleanup worker
         crawl_worker.cleanup()
 
@@ -791,12 +1035,9 @@ class WebsiteCrawler(Crawler):
         if refused:
             return
 
-        removed_urls = []
-        to_delete_set = set(to_delete)
-        for entry in manifest.values():
-            if entry.doc_id in to_delete_set:
-                if self.indexer.delete_doc(entry.doc_id) and entry.url:
-                    removed_urls.append(entry.url)
+        outcomes = self.indexer.delete_docs(to_delete)
+        removed_urls = [entry.url for entry in manifest.values()
+                        if outcomes.get(entry.doc_id) and entry.url]
         logger.info(f"Removed {len(removed_urls)} of {len(to_delete)} docs that are not "
                     f"included in the crawl but are in the corpus.")
 
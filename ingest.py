@@ -394,9 +394,16 @@ def run_ingest(config_file: str, profile: str, secrets_path: Optional[str] = Non
             reset_corpus_apikey(api_url, corpus_key, api_key)
         time.sleep(5)   # wait 5 seconds to allow reset_corpus enough time to complete on the backend
 
+    # Documents built by an interrupted run but never accepted by Vectara are uploaded
+    # from the outbox (vectara.upload_outbox) instead of being parsed again.
+    crawler.indexer.drain_outbox()
+
     logger.info(f"Starting crawl of type {crawler_type}...")
     try:
         crawler.crawl()
+        # Uploads queued on the crawler's own indexer (vectara.upload_threads) must land
+        # before the crawl is reported complete.
+        crawler.indexer.wait_for_uploads()
         if tracker:
             tracker.mark_completed()
         logger.info(f"Finished crawl of type {crawler_type}...")
@@ -0,0 +1,39 @@
+"""Shared factory for Indexers built without their real __init__, for tests of the upload path."""
+from unittest.mock import MagicMock
+
+from omegaconf import OmegaConf
+
+from core.indexer import Indexer
+from core.utils import LRUCache, create_session_with_retries
+
+
+def make_indexer(api_url="https://api.example.test", corpus_key="c", session=None, **attrs):
+    """
+    An Indexer wired up only with what index_document / index_segments / _upload_file read:
+    no crawler config, parsers or models. `session` defaults to a real requests session with
+    retries (pass a MagicMock to stub the API); any other keyword is set as an attribute,
+    overriding the defaults below.
+    """
+    ix = Indexer.__new__(Indexer)
+    ix.cfg = OmegaConf.create({'vectara': {}, 'crawling': {'crawler_type': 'test'},
+                               'doc_processing': {}})
+    ix.api_url = api_url
+    ix.corpus_key = corpus_key
+    ix.api_key = "k"
+    ix.x_source = "vectara-ingest-test"
+    ix.session = session if session is not None else create_session_with_retries()
+    ix.verbose = False
+    ix.store_docs = False
+    ix.reindex = False
+    ix.incremental = False
+    ix.parse_tables = False
+    ix.static_metadata = None
+    ix.use_core_indexing = False
+    ix.add_image_bytes = False
+    ix.last_error = None
+    ix.last_skip_reason = None
+    ix._doc_exists_cache = LRUCache()
+    ix._init_processors = MagicMock()
+    for name, value in attrs.items():
+        setattr(ix, name, value)
+    return ix
@@ -0,0 +1,261 @@
+"""
+End-to-end throughput benchmark for the indexer and crawlers, fully offline.
+
+Starts the mock services from tests/loadtest/mock_vectara.py, then runs the website,
+folder and csv crawlers against them, each in its own subprocess so peak RSS is
+measured per crawler. For every run it reports:
+
+- docs/sec: documents the mock Vectara API accepted (201) divided by crawl wall time
+- p50 / p99 per-document latency: wall time of the outermost Indexer call per document
+  (index_url / index_file / index_segments / index_document), measured in the crawler
+  process. With ray_workers > 0 the work happens in Ray actors and latency is n/a.
+- peak RSS of the crawler process, and of its reaped children (e.g. the browser)
+
+Usage:
+
+    python -m tests.loadtest.benchmark run --docs 200
+    python -m tests.loadtest.benchmark run --crawlers folder,csv --upload-threads 4 --latency-ms 20
+    python -m tests.loadtest.benchmark run --json-out results.json   # for regression tracking
+
+The website crawler renders pages with Playwright, so it needs the browsers installed
+(`playwright install chromium`).
+"""
+
+import json
+import logging
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from functools import wraps
+from typing import Any, Dict, List, Optional
+
+import typer
+from omegaconf import OmegaConf
+
+from tests.loadtest.mock_vectara import MockServices, MockVectaraStore
+
+logger = logging.getLogger(__name__)
+
+app = typer.Typer(help="Offline throughput benchmark for vectara-ingest crawlers.")
+
+CRAWLERS = ("website", "folder", "csv")
+API_KEY = "mock-api-key"
+
+
+def _percentile(values: List[float], pct: float) -> Optional[float]:
+    if not values:
+        return None
+    values = sorted(values)
+    k = min(len(values) - 1, max(0, int(round(pct / 100.0 * (len(values) - 1)))))
+    return values[k]
+
+
+def _peak_rss_mb(who: int) -> float:
+    # ru_maxrss is KiB on Linux and bytes on macOS
+    rss = resource.getrusage(who).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def _write_folder_docs(folder: str, docs: int) -> None:
+    os.makedirs(folder, exist_ok=True)
+    paragraph = ("Vectara ingest benchmark content. " * 40).strip()
+    for i in range(docs):
+        with open(os.path.join(folder, f"doc-{i:05d}.md"), "w") as f:
+            f.write(f"# Benchmark document {i}\n\n" + "\n\n".join([paragraph] * 5) + "\n")
+
+
+def _write_csv(path: str, docs: int, rows_per_doc: int = 20) -> None:
+    with open(path, "w") as f:
+        f.write("doc,category,text\n")
+        for i in range(docs):
+            for r in range(rows_per_doc):
+                f.write(f"{i},cat-{i % 7},Row {r} of benchmark document {i} with some descriptive text\n")
+
+
+def build_config(crawler: str, vectara_url: str, llm_url: str, site_url: str, workdir: str,
+                 docs: int, upload_threads: int = 0, ray_workers: int = 0,
+                 compress_uploads: bool = False) -> Dict[str, Any]:
+    """Crawler config for one benchmark scenario, pointed at the mock services."""
+    model = {'provider': 'private', 'model_name': 'mock-llm', 'base_url': llm_url}
+    cfg: Dict[str, Any] = {
+        'vectara': {
+            'endpoint': vectara_url,
+            'corpus_key': f"bench-{crawler}",
+            'api_key': API_KEY,
+            'private_api_key': API_KEY,
+            'reindex': False,
+            'verbose': False,
+            'output_dir': os.path.join(workdir, "output"),
+            'upload_threads': upload_threads,
+            'compress_uploads': compress_uploads,
+        },
+        'crawling': {'crawler_type': crawler},
+        'doc_processing': {
+            'model_config': {'text': model, 'vision': model, 'image': model},
+        },
+    }
+    if crawler == "website":
+        cfg['website_crawler'] = {
+            'urls': [site_url],
+            'pages_source': 'sitemap',
+            'pos_regex': [f"{site_url}/page/.*"],
+            'num_per_second': 1000,
+            'ray_workers': ray_workers,
+        }
+    elif crawler == "folder":
+        folder = os.path.join(workdir, "folder")
+        _write_folder_docs(folder, docs)
+        cfg['folder_crawler'] = {
+            'path': folder,
+            'extensions': ['.md'],
+            'source': 'benchmark',
+            'num_per_second': 1000,
+            'ray_workers': ray_workers,
+        }
+    elif crawler == "csv":
+        csv_path = os.path.join(workdir, "benchmark.csv")
+        _write_csv(csv_path, docs)
+        cfg['csv_crawler'] = {
+            'file_path': csv_path,
+            'mode': 'element',
+            'doc_id_columns': ['doc'],
+            'text_columns': ['text'],
+            'metadata_columns': ['category'],
+        }
+    else:
+        raise ValueError(f"Unknown crawler '{crawler}', expected one of {CRAWLERS}")
+    return cfg
+
+
+def _instrument_indexer(latencies: List[float]) -> None:
+    """Record the wall time of the outermost Indexer entry point for each document."""
+    from core.indexer import Indexer
+
+    depth = threading.local()
+
+    def timed(fn):
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            level = getattr(depth, "level", 0)
+            depth.level = level + 1
+            st = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                depth.level = level
+                if level == 0:
+                    latencies.append(time.perf_counter() - st)
+        return wrapper
+
+    for name in ("index_url", "index_file", "index_segments", "index_document"):
+        setattr(Indexer, name, timed(getattr(Indexer, name)))
+
+
+def run_crawler(cfg_dict: Dict[str, Any]) -> Dict[str, Any]:
+    """Run one crawl in this process and return wall time, latencies and peak RSS."""
+    from core.crawler import Crawler
+    from core.utils import config_defaults
+    from ingest import instantiate_crawler
+
+    cfg = OmegaConf.merge(OmegaConf.create(config_defaults), OmegaConf.create(cfg_dict))
+    crawler_type = cfg.crawling.crawler_type
+    latencies: List[float] = []
+    _instrument_indexer(latencies)
+
+    crawler = instantiate_crawler(Crawler, 'crawlers', f'{crawler_type.capitalize()}Crawler',
+                                  cfg, cfg.vectara.endpoint, cfg.vectara.corpus_key, cfg.vectara.api_key)
+    st = time.perf_counter()
+    crawler.crawl()
+    crawler.indexer.wait_for_uploads()
+    elapsed = time.perf_counter() - st
+    return {
+        "crawler": crawler_type,
+        "elapsed_sec": elapsed,
+        "latencies": latencies,
+        "peak_rss_mb": _peak_rss_mb(resource.RUSAGE_SELF),
+        "peak_child_rss_mb": _peak_rss_mb(resource.RUSAGE_CHILDREN),
+    }
+
+
+def summarize(result: Dict[str, Any], accepted_docs: int) -> Dict[str, Any]:
+    """Reduce a raw run result plus the server-side document count to the reported metrics."""
+    latencies = result.get("latencies", [])
+    elapsed = result["elapsed_sec"]
+    p50, p99 = _percentile(latencies, 50), _percentile(latencies, 99)
+    return {
+        "crawler": result["crawler"],
+        "docs": accepted_docs,
+        "elapsed_sec": round(elapsed, 2),
+        "docs_per_sec": round(accepted_docs / elapsed, 2) if elapsed > 0 else None,
+        "p50_ms": round(p50 * 1000, 1) if p50 is not None else None,
+        "p99_ms": round(p99 * 1000, 1) if p99 is not None else None,
+        "peak_rss_mb": round(result["peak_rss_mb"], 1),
+        "peak_child_rss_mb": round(result["peak_child_rss_mb"], 1),
+    }
+
+
+@app.command("run-one", hidden=True)
+def run_one(config_json: str = typer.Argument(..., help="Path to a JSON crawler config")) -> None:
+    """Internal: run a single crawl and print the raw result as one JSON line."""
+    logging.basicConfig(level=logging.WARNING)
+    with open(config_json) as f:
+        cfg_dict = json.load(f)
+    print("BENCHMARK_RESULT " + json.dumps(run_crawler(cfg_dict)))
+
+
+@app.command()
+def run(
+    crawlers: str = typer.Option(",".join(CRAWLERS), help="Comma-separated crawlers to benchmark"),
+    docs: int = typer.Option(100, help="Documents (pages / files / csv groups) per crawler"),
+    upload_threads: int = typer.Option(0, help="vectara.upload_threads for the crawl"),
+    ray_workers: int = typer.Option(0, help="ray_workers for the website and folder crawlers"),
+    compress_uploads: bool = typer.Option(False, help="vectara.compress_uploads (gzip upload bodies)"),
+    latency_ms: float = typer.Option(0, help="Artificial latency per Vectara API request"),
+    rate_limit_every: int = typer.Option(0, help="Mock API answers every N-th write with 429 (0 = never)"),
+    json_out: Optional[str] = typer.Option(None, help="Also write the results to this JSON file"),
+) -> None:
+    """Run the selected crawlers against local mock services and report throughput."""
+    logging.basicConfig(level=logging.WARNING)
+    store = MockVectaraStore(latency_ms=latency_ms, rate_limit_every=rate_limit_every)
+    results = []
+    with MockServices(store, num_pages=docs) as services, tempfile.TemporaryDirectory() as workdir:
+        for crawler in [c.strip() for c in crawlers.split(",") if c.strip()]:
+            scenario_dir = os.path.join(workdir, crawler)
+            os.makedirs(scenario_dir)
+            cfg = build_config(crawler, services.vectara_url, services.llm_url, services.site_url,
+                               scenario_dir, docs, upload_threads, ray_workers, compress_uploads)
+            cfg_path = os.path.join(scenario_dir, "config.json")
+            with open(cfg_path, "w") as f:
+                json.dump(cfg, f)
+
+            typer.echo(f"Running {crawler} crawler ({docs} docs)...")
+            proc = subprocess.run([sys.executable, "-m", "tests.loadtest.benchmark", "run-one", cfg_path],
+                                  capture_output=True, text=True)
+            raw = next((line[len("BENCHMARK_RESULT "):] for line in proc.stdout.splitlines()
+                        if line.startswith("BENCHMARK_RESULT ")), None)
+            if proc.returncode != 0 or raw is None:
+                typer.echo(f"  {crawler} failed (exit {proc.returncode}):\n{proc.stderr[-2000:]}", err=True)
+                continue
+            accepted = len(store.documents(cfg['vectara']['corpus_key']))
+            results.append(summarize(json.loads(raw), accepted))
+
+    header = f"{'crawler':<10}{'docs':>7}{'sec':>9}{'docs/s':>9}{'p50 ms':>9}{'p99 ms':>9}{'RSS MB':>9}{'child MB':>10}"
+    typer.echo(header)
+    for r in results:
+        na = lambda v: "n/a" if v is None else v  # noqa: E731
+        typer.echo(f"{r['crawler']:<10}{r['docs']:>7}{r['elapsed_sec']:>9}{na(r['docs_per_sec']):>9}"
+                   f"{na(r['p50_ms']):>9}{na(r['p99_ms']):>9}{r['peak_rss_mb']:>9}{r['peak_child_rss_mb']:>10}")
+    server = store.stats()
+    typer.echo(f"Mock API: {server['created']} documents created, {server['bytes_received']} bytes received, "
+               f"status counts {server['status_counts']}; mock LLM calls: {services.llm_calls}")
+    if json_out:
+        with open(json_out, "w") as f:
+            json.dump({"results": results, "server": server}, f, indent=2)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,148 @@
+"""
+Memory benchmark for the incremental-crawl corpus manifest, fully offline.
+
+Builds the manifest of a synthetic corpus the way a crawler does at the start of an
+incremental run (list the corpus -> build_manifest -> fingerprint map for the workers),
+in two layouts, each in its own subprocess:
+
+- legacy: _list_docs returns a list of dicts, ManifestEntry is a plain dataclass with hex
+  strings, and workers get a {url: fingerprint} dict. The list and the manifest are alive
+  at the same time.
+- compact: _list_docs is a generator, ManifestEntry is slotted with 16-byte digests, and
+  workers get a FingerprintMap.
+
+For each layout it reports the peak Python heap while building (tracemalloc), what stays
+allocated afterwards, and the pickled size of what is shipped to the workers (what ray.put
+stores). Per-document figures are linear in the corpus size, so a run on a corpus that fits
+in memory can be projected to a larger one with --project-docs.
+
+Usage:
+
+    python -m tests.loadtest.manifest_memory run --docs 200000
+    python -m tests.loadtest.manifest_memory run --docs 500000 --project-docs 5000000
+"""
+
+import json
+import pickle
+import subprocess
+import sys
+import time
+import tracemalloc
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, Optional
+
+import typer
+
+from core.incremental import build_manifest, fingerprint_map
+from core.indexer_utils import md5_hex, normalize_url_for_metadata
+from core.manifest_store import manifest_record
+
+app = typer.Typer(help="Memory benchmark for the incremental-crawl corpus manifest.")
+
+LAYOUTS = ("legacy", "compact")
+
+
+def _corpus(docs: int) -> Iterator[Dict[str, Any]]:
+    """Synthetic listing records shaped like the documents API returns them: every string is
+    a fresh object per document, as it would be after JSON decoding."""
+    config_sig = md5_hex("config")
+    for i in range(docs):
+        yield manifest_record(f"doc-{i:08d}", {
+            'url': f"https://docs.example.com/section-{i % 997}/page-{i}.html",
+            'source': "".join(["web", "site"]),
+            'fingerprint': md5_hex(f"fp-{i}"),
+            'content_hash': md5_hex(f"content-{i}"),
+            'config_sig': "".join([config_sig[:16], config_sig[16:]]),
+            # Per-document timestamps; sitemap dates shared by sections of a site
+            'last_updated': f"2025-01-01T{i // 3600 % 24:02d}:{i // 60 % 60:02d}:{i % 60:02d}",
+            'sitemap_lastmod': f"2025-{i % 12 + 1:02d}-{i % 28 + 1:02d}",
+        })
+
+
+@dataclass
+class _LegacyManifestEntry:
+    doc_id: str
+    fingerprint: Optional[str] = None
+    content_hash: Optional[str] = None
+    config_sig: Optional[str] = None
+    last_updated: Optional[str] = None
+    parent_doc_id: Optional[str] = None
+    url: Optional[str] = None
+    sitemap_lastmod: Optional[str] = None
+    pub_date: Optional[str] = None
+
+
+def _legacy(docs: int):
+    listed = list(_corpus(docs))  # _list_docs used to return the whole listing as a list
+    manifest = {}
+    for d in listed:
+        if d.get("source") != "website" or not d.get("url"):
+            continue
+        manifest[normalize_url_for_metadata(d["url"])] = _LegacyManifestEntry(
+            doc_id=d["id"], fingerprint=d["fingerprint"], content_hash=d["content_hash"],
+            config_sig=d["config_sig"], last_updated=d["last_updated"], parent_doc_id=d["parent_doc_id"],
+            url=d["url"], sitemap_lastmod=d["sitemap_lastmod"], pub_date=d["pub_date"])
+    del listed  # freed when build_manifest returned; it only counts towards the peak
+    shipped = {k: e.fingerprint for k, e in manifest.items() if e.fingerprint}
+    return manifest, shipped
+
+
+class _Listing:
+    def __init__(self, docs: int):
+        self.docs = docs
+
+    def _list_docs(self) -> Iterator[Dict[str, Any]]:
+        return _corpus(self.docs)
+
+
+def _compact(docs: int):
+    manifest = build_manifest(_Listing(docs), key="url", source="website")
+    return manifest, fingerprint_map(manifest)
+
+
+@app.command("run-one", hidden=True)
+def run_one(layout: str, docs: int) -> None:
+    tracemalloc.start()
+    st = time.time()
+    kept, shipped = (_legacy if layout == "legacy" else _compact)(docs)
+    elapsed = time.time() - st
+    current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(json.dumps({'layout': layout, 'docs': docs, 'elapsed_sec': round(elapsed, 1),
+                      'peak_bytes': peak, 'retained_bytes': current,
+                      'shipped_bytes': len(pickle.dumps(shipped, protocol=pickle.HIGHEST_PROTOCOL))}))
+
+
+@app.command()
+def run(
+    docs: int = typer.Option(200000, help="Documents in the synthetic corpus"),
+    project_docs: int = typer.Option(5000000, help="Corpus size to project the per-document figures to"),
+    json_out: Optional[str] = typer.Option(None, help="Also write the results to this JSON file"),
+) -> None:
+    """Measure both manifest layouts on a synthetic corpus and project them to --project-docs."""
+    results = []
+    for layout in LAYOUTS:
+        proc = subprocess.run([sys.executable, "-m", "tests.loadtest.manifest_memory", "run-one", layout, str(docs)],
+                              capture_output=True, text=True)
+        if proc.returncode != 0:
+            typer.echo(f"{layout}: failed\n{proc.stderr[-2000:]}", err=True)
+            continue
+        results.append(json.loads(proc.stdout.strip().splitlines()[-1]))
+
+    mb = 1024 * 1024
+    typer.echo(f"{docs} docs measured, projected to {project_docs}:")
+    typer.echo(f"{'layout':<9}{'B/doc peak':>11}{'B/doc kept':>11}{'B/doc sent':>11}"
+               f"{'peak MB':>10}{'kept MB':>10}{'sent MB':>10}{'sec':>7}")
+    for r in results:
+        per_doc = {k: r[f"{k}_bytes"] / docs for k in ("peak", "retained", "shipped")}
+        r['projected_mb'] = {k: round(v * project_docs / mb) for k, v in per_doc.items()}
+        typer.echo(f"{r['layout']:<9}{per_doc['peak']:>11.0f}{per_doc['retained']:>11.0f}{per_doc['shipped']:>11.0f}"
+                   f"{r['projected_mb']['peak']:>10}{r['projected_mb']['retained']:>10}"
+                   f"{r['projected_mb']['shipped']:>10}{r['elapsed_sec']:>7}")
+    if json_out:
+        with open(json_out, "w") as f:
+            json.dump({'docs': docs, 'project_docs': project_docs, 'results': results}, f, indent=2)
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,423 @@
+"""
+Local stand-ins for the services a crawl talks to, for offline load testing.
+
+MockServices starts three small HTTP servers on 127.0.0.1 (ephemeral ports):
+
+- a Vectara v2 API emulating the endpoints Indexer uses: create/reset corpus,
+  documents POST / GET / DELETE, paginated list with page_key, compute_size and
+  upload_file (multipart). Duplicate ids answer 409 (or `conflict_status`, e.g. 412), documents
+  larger than `max_document_bytes` answer 400, and every `rate_limit_every`-th
+  write answers 429 with a Retry-After header. gzip request bodies are decoded
+  (or refused with 415 when `accept_gzip` is off).
+- an OpenAI-compatible chat completions endpoint (`provider: private`) that returns a
+  canned answer, so summarization / metadata extraction paths run without a real LLM.
+- a static website with N interlinked pages, a sitemap.xml and robots.txt.
+
+Everything is in memory and thread-safe; the Vectara store also records what it saw
+(requests by status, bytes received, document creation times) so a benchmark can
+compute throughput from the server's point of view.
+
+Run standalone to point a real `ingest.py` run at it:
+
+    python -m tests.loadtest.mock_vectara --pages 200
+"""
+
+import base64
+import gzip
+import json
+import logging
+import random
+import threading
+import time
+import urllib.parse
+from collections import Counter, OrderedDict, defaultdict
+from email.parser import BytesParser
+from email.policy import HTTP
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+import typer
+
+logger = logging.getLogger(__name__)
+
+_WORDS = (
+    "vector search retrieval grounded generation corpus document index query embedding "
+    "semantic hybrid lexical rerank chunk summary metadata filter tenant latency throughput "
+    "crawler ingest pipeline parser table image section title paragraph answer citation"
+).split()
+
+
+class MockVectaraStore:
+    """
+    In-memory corpora plus the fault-injection knobs of the mock Vectara API.
+
+    Args:
+        latency_ms (float): Artificial service time added to every API request.
+        rate_limit_every (int): Answer every N-th write (POST/DELETE) with 429. 0 disables.
+        retry_after (int): Retry-After seconds sent with a 429.
+        conflict_status (int): Status for a duplicate document id (409 or 412).
+        max_document_bytes (int): Reject POST /documents bodies larger than this with 400.
+        accept_gzip (bool): Decode `Content-Encoding: gzip` bodies; when False, answer 415.
+    """
+
+    def __init__(self, latency_ms: float = 0, rate_limit_every: int = 0, retry_after: int = 0,
+                 conflict_status: int = 409, max_document_bytes: Optional[int] = None,
+                 accept_gzip: bool = True):
+        self.latency_ms = latency_ms
+        self.rate_limit_every = rate_limit_every
+        self.retry_after = retry_after
+        self.conflict_status = conflict_status
+        self.max_document_bytes = max_document_bytes
+        self.accept_gzip = accept_gzip
+        self._lock = threading.Lock()
+        self.corpora: Dict[str, "OrderedDict[str, Dict[str, Any]]"] = defaultdict(OrderedDict)
+        self.status_counts: Counter = Counter()
+        self.bytes_received = 0
+        self._writes = 0
+        self.list_pages = 0
+        self.created_at: List[float] = []
+
+    def documents(self, corpus_key: str) -> "OrderedDict[str, Dict[str, Any]]":
+        with self._lock:
+            return OrderedDict(self.corpora[corpus_key])
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "documents": sum(len(c) for c in self.corpora.values()),
+                "created": len(self.created_at),
+                "bytes_received": self.bytes_received,
+                "list_pages": self.list_pages,
+                "status_counts": dict(self.status_counts),
+            }
+
+    # -- operations; each returns (status, payload) ---------------------------
+
+    def _throttled(self) -> bool:
+        with self._lock:
+            self._writes += 1
+            return bool(self.rate_limit_every) and self._writes % self.rate_limit_every == 0
+
+    def _conflict(self, doc_id: str) -> Tuple[int, Dict[str, Any]]:
+        return self.conflict_status, {
+            "messages": [f"Document already exists for document id '{doc_id}' in the corpus"],
+        }
+
+    def _store(self, corpus_key: str, doc_id: str, doc: Dict[str, Any]) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            corpus = self.corpora[corpus_key]
+            if doc_id in corpus:
+                return self._conflict(doc_id)
+            corpus[doc_id] = doc
+            self.created_at.append(time.monotonic())
+        return 201, {"id": doc_id}
+
+    def create_document(self, corpus_key: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if self.max_document_bytes and len(body) > self.max_document_bytes:
+            return 400, {"messages": [f"Document part exceeds the maximum size of {self.max_document_bytes} bytes"]}
+        try:
+            doc = json.loads(body)
+        except ValueError as e:
+            return 400, {"messages": [f"Invalid JSON: {e}"]}
+        if not isinstance(doc, dict) or not doc.get("id") or doc.get("type") not in ("core", "structured"):
+            return 400, {"messages": ["Document must have an id and a type of 'core' or 'structured'"]}
+        stored = {"id": doc["id"], "metadata": doc.get("metadata", {}) or {}, "type": doc["type"]}
+        return self._store(corpus_key, doc["id"], stored)
+
+    def upload_file(self, corpus_key: str, content_type: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        parts = _parse_multipart(content_type, body)
+        if "file" not in parts:
+            return 400, {"messages": ["Missing 'file' part"]}
+        filename, data = parts["file"]
+        metadata = {}
+        if "metadata" in parts:
+            try:
+                metadata = json.loads(parts["metadata"][1] or b"{}")
+            except ValueError as e:
+                return 400, {"messages": [f"Invalid metadata: {e}"]}
+        doc_id = filename or "upload"
+        return self._store(corpus_key, doc_id, {"id": doc_id, "metadata": metadata, "size": len(data)})
+
+    def get_document(self, corpus_key: str, doc_id: str) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            doc = self.corpora[corpus_key].get(doc_id)
+        if doc is None:
+            return 404, {"messages": [f"Document '{doc_id}' not found"]}
+        return 200, doc
+
+    def delete_document(self, corpus_key: str, doc_id: str) -> Tuple[int, Optional[Dict[str, Any]]]:
+        with self._lock:
+            if self.corpora[corpus_key].pop(doc_id, None) is None:
+                return 404, {"messages": [f"Document '{doc_id}' not found"]}
+        return 204, None
+
+    def list_documents(self, corpus_key: str, limit: int, page_key: Optional[str]) -> Tuple[int, Dict[str, Any]]:
+        offset = int(base64.urlsafe_b64decode(page_key.encode()).decode()) if page_key else 0
+        limit = max(1, min(limit, 1000))
+        with self._lock:
+            self.list_pages += 1
+            docs = list(self.corpora[corpus_key].values())
+        page = docs[offset:offset + limit]
+        next_offset = offset + len(page)
+        next_key = base64.urlsafe_b64encode(str(next_offset).encode()).decode() if next_offset < len(docs) else None
+        return 200, {
+            "documents": [{"id": d["id"], "metadata": d.get("metadata", {})} for d in page],
+            "metadata": {"page_key": next_key},
+        }
+
+    def compute_size(self, corpus_key: str) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            docs = len(self.corpora[corpus_key])
+        return 200, {"used_docs": docs, "used_parts": docs, "used_characters": 0}
+
+    def reset(self, corpus_key: str) -> Tuple[int, Dict[str, Any]]:
+        with self._lock:
+            self.corpora[corpus_key].clear()
+        return 200, {}
+
+
+def _parse_multipart(content_type: str, body: bytes) -> Dict[str, Tuple[Optional[str], bytes]]:
+    """Parse a multipart/form-data body into {field name: (filename, bytes)}."""
+    msg = BytesParser(policy=HTTP).parsebytes(
+        b"Content-Type: " + content_type.encode() + b"\r\n\r\n" + body)
+    parts = {}
+    for part in msg.iter_parts():
+        name = part.get_param("name", header="content-disposition")
+        if name:
+            parts[name] = (part.get_filename(), part.get_payload(decode=True) or b"")
+    return parts
+
+
+class _JsonHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):   # keep benchmark output readable
+        logger.debug("%s - %s", self.address_string(), format % args)
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length", 0) or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _send(self, status: int, payload: Any = None, content_type: str = "application/json",
+              headers: Optional[Dict[str, str]] = None) -> None:
+        if payload is None:
+            data = b""
+        elif isinstance(payload, (bytes, str)):
+            data = payload.encode() if isinstance(payload, str) else payload
+        else:
+            data = json.dumps(payload).encode()
+        self.send_response(status)
+        if data:
+            self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        if data and self.command != "HEAD":
+            self.wfile.write(data)
+
+
+class _VectaraHandler(_JsonHandler):
+    def _route(self, method: str) -> None:
+        store = self.server.store
+        parsed = urllib.parse.urlsplit(self.path)
+        parts = [urllib.parse.unquote(p) for p in parsed.path.strip("/").split("/")]
+        body = self._body() if method in ("POST", "PUT") else b""
+        with store._lock:
+            store.bytes_received += len(body)
+        if store.latency_ms:
+            time.sleep(store.latency_ms / 1000.0)
+
+        status, payload, headers = 404, {"messages": [f"No route for {method} {parsed.path}"]}, {}
+        gzipped = self.headers.get("Content-Encoding", "").lower() == "gzip"
+        if gzipped and not store.accept_gzip:
+            status, payload = 415, {"messages": ["Unsupported Content-Encoding: gzip"]}
+        elif method in ("POST", "DELETE") and store._throttled():
+            status, payload = 429, {"messages": ["Too many requests"]}
+            headers = {"Retry-After": str(store.retry_after)}
+        elif parts[:2] == ["v2", "corpora"]:
+            if gzipped:
+                body = gzip.decompress(body)
+            if len(parts) == 2 and method == "POST":
+                status, payload = 201, {"key": json.loads(body or b"{}").get("key")}
+            elif len(parts) == 4 and parts[3] == "reset" and method == "POST":
+                status, payload = store.reset(parts[2])
+            elif len(parts) == 4 and parts[3] == "compute_size" and method == "POST":
+                status, payload = store.compute_size(parts[2])
+            elif len(parts) == 4 and parts[3] == "upload_file" and method == "POST":
+                status, payload = store.upload_file(parts[2], self.headers.get("Content-Type", ""), body)
+            elif len(parts) == 4 and parts[3] == "documents":
+                if method == "POST":
+                    status, payload = store.create_document(parts[2], body)
+                elif method == "GET":
+                    query = urllib.parse.parse_qs(parsed.query)
+                    status, payload = store.list_documents(
+                        parts[2], int(query.get("limit", ["100"])[0]), query.get("page_key", [None])[0])
+            elif len(parts) == 5 and parts[3] == "documents":
+                if method == "GET":
+                    status, payload = store.get_document(parts[2], parts[4])
+                elif method == "DELETE":
+                    status, payload = store.delete_document(parts[2], parts[4])
+
+        with store._lock:
+            store.status_counts[status] += 1
+        self._send(status, payload, headers=headers)
+
+    def do_GET(self):
+        self._route("GET")
+
+    def do_POST(self):
+        self._route("POST")
+
+    def do_DELETE(self):
+        self._route("DELETE")
+
+
+class _LLMHandler(_JsonHandler):
+    """OpenAI-compatible /v1/chat/completions returning a canned answer."""
+
+    def do_GET(self):
+        if self.path.rstrip("/").endswith("/models"):
+            self._send(200, {"object": "list", "data": [{"id": "mock-llm", "object": "model"}]})
+        else:
+            self._send(404, {"error": {"message": "not found"}})
+
+    def do_POST(self):
+        body = self._body()
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self._send(404, {"error": {"message": "not found"}})
+            return
+        request = json.loads(body or b"{}")
+        self.server.calls += 1
+        if self.server.latency_ms:
+            time.sleep(self.server.latency_ms / 1000.0)
+        prompt = json.dumps(request.get("messages", [])).lower()
+        # Metadata extraction asks for JSON back; everything else gets plain prose.
+        content = "{}" if "json" in prompt else "This is a mock summary of the provided content."
+        self._send(200, {
+            "id": f"chatcmpl-mock-{self.server.calls}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": request.get("model", "mock-llm"),
+            "choices": [{"index": 0, "finish_reason": "stop",
+                         "message": {"role": "assistant", "content": content}}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": 10,
+                      "total_tokens": len(prompt) // 4 + 10},
+        })
+
+
+class _SiteHandler(_JsonHandler):
+    """Serves the generated static website."""
+
+    def do_HEAD(self):
+        self.do_GET()
+
+    def do_GET(self):
+        path = urllib.parse.urlsplit(self.path).path
+        page = self.server.pages.get(path)
+        if page is None:
+            self._send(404, "<html><body>Not found</body></html>", content_type="text/html")
+        else:
+            self._send(200, page[1], content_type=page[0])
+
+
+def build_site(base_url: str, num_pages: int, paragraphs: int = 5, seed: int = 0) -> Dict[str, Tuple[str, str]]:
+    """Generate {path: (content type, body)} for a deterministic interlinked site."""
+    rng = random.Random(seed)
+    pages = {}
+    for i in range(num_pages):
+        links = "".join(f'<li><a href="/page/{(i + k) % num_pages}.html">Page {(i + k) % num_pages}</a></li>'
+                        for k in (1, 2, 7))
+        body = "".join("<p>" + " ".join(rng.choice(_WORDS) for _ in range(80)) + ".</p>"
+                       for _ in range(paragraphs))
+        pages[f"/page/{i}.html"] = ("text/html", (
+            f"<html><head><title>Test page {i}</title></head><body>"
+            f"<nav><ul>{links}</ul></nav><main><h1>Test page {i}</h1>{body}</main></body></html>"))
+    index_links = "".join(f'<li><a href="/page/{i}.html">Page {i}</a></li>' for i in range(num_pages))
+    pages["/"] = ("text/html", f"<html><head><title>Test site</title></head><body><ul>{index_links}</ul></body></html>")
+    urls = "".join(f"<url><loc>{base_url}/page/{i}.html</loc><lastmod>2024-01-01</lastmod></url>"
+                   for i in range(num_pages))
+    pages["/sitemap.xml"] = ("application/xml", (
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        f'<urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{urls}</urlset>'))
+    pages["/robots.txt"] = ("text/plain", f"User-agent: *\nAllow: /\nSitemap: {base_url}/sitemap.xml\n")
+    return pages
+
+
+class MockServices:
+    """
+    Start the mock Vectara API, LLM endpoint and static site; use as a context manager.
+
+    Args:
+        store (MockVectaraStore): Vectara store / fault-injection settings (default: a clean store).
+        num_pages (int): Number of pages on the static site.
+        llm_latency_ms (float): Artificial latency of each chat completion.
+    """
+
+    def __init__(self, store: Optional[MockVectaraStore] = None, num_pages: int = 50,
+                 llm_latency_ms: float = 0):
+        self.store = store or MockVectaraStore()
+        self.num_pages = num_pages
+        self.llm_latency_ms = llm_latency_ms
+        self._servers: List[ThreadingHTTPServer] = []
+
+    def _serve(self, handler) -> ThreadingHTTPServer:
+        server = ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        server.daemon_threads = True
+        threading.Thread(target=server.serve_forever, kwargs={"poll_interval": 0.05},
+                         name=f"mock-{handler.__name__}", daemon=True).start()
+        self._servers.append(server)
+        return server
+
+    def start(self) -> "MockServices":
+        vectara = self._serve(_VectaraHandler)
+        vectara.store = self.store
+        self.vectara_url = f"http://127.0.0.1:{vectara.server_address[1]}"
+
+        llm = self._serve(_LLMHandler)
+        llm.calls, llm.latency_ms = 0, self.llm_latency_ms
+        self._llm = llm
+        self.llm_url = f"http://127.0.0.1:{llm.server_address[1]}/v1"
+
+        site = self._serve(_SiteHandler)
+        self.site_url = f"http://127.0.0.1:{site.server_address[1]}"
+        site.pages = build_site(self.site_url, self.num_pages)
+        return self
+
+    @property
+    def llm_calls(self) -> int:
+        return self._llm.calls
+
+    def stop(self) -> None:
+        for server in self._servers:
+            server.shutdown()
+            server.server_close()
+        self._servers = []
+
+    def __enter__(self) -> "MockServices":
+        return self.start()
+
+    def __exit__(self, *exc) -> None:
+        self.stop()
+
+
+def main(
+    pages: int = typer.Option(50, help="Number of pages on the static test site"),
+    latency_ms: float = typer.Option(0, help="Artificial latency per Vectara API request"),
+    rate_limit_every: int = typer.Option(0, help="Answer every N-th write with 429 (0 = never)"),
+) -> None:
+    """Run the mock services in the foreground and print their URLs."""
+    store = MockVectaraStore(latency_ms=latency_ms, rate_limit_every=rate_limit_every)
+    with MockServices(store, num_pages=pages) as services:
+        print(f"Vectara API : {services.vectara_url}")
+        print(f"LLM (OpenAI): {services.llm_url}")
+        print(f"Static site : {services.site_url}/  (sitemap: {services.site_url}/sitemap.xml)")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            pass
+
+
+if __name__ == "__main__":
+    typer.run(main)
@@ -128,7 +128,7 @@ class TestFix1IndexSegmentsForcesCore(unittest.TestCase):
 
         self.assertTrue(ok)
         ix.session.post.assert_called_once()
-        body = json.loads(ix.session.post.call_args.kwargs['data'])
+        body = json.loads(b"".join(ix.session.post.call_args.kwargs['data']))
         self.assertEqual(body['type'], 'core')
         self.assertIn('images', body)
         self.assertEqual(body['images'][0]['id'], image_id)
@@ -163,7 +163,7 @@ class TestFix1IndexSegmentsForcesCore(unittest.TestCase):
         )
 
         self.assertTrue(ok)
-        body = json.loads(ix.session.post.call_args.kwargs['data'])
+        body = json.loads(b"".join(ix.session.post.call_args.kwargs['data']))
         self.assertEqual(body['type'], 'core')
         # Every part must be within the core size limit.
         for part in body['document_parts']:
@@ -197,9 +197,7 @@ class TestFix3WebRouting(unittest.TestCase):
         ix.model_config = MagicMock()
         ix.file_processor = MagicMock()
         ix.file_processor.inline_images = True
-        ix.url_triggers_download = MagicMock(return_value=False)
-        ix.check_download_or_pdf = MagicMock(return_value={"type": "page"})
-        ix.fetch_page_contents = MagicMock(return_value=res)
+        ix.fetch_url = MagicMock(return_value={"type": "html", **res})
         ix.index_file = MagicMock(return_value=True)
         ix.index_segments = MagicMock(return_value=True)
         return ix
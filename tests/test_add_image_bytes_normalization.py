@@ -67,7 +67,7 @@ class TestAddImageBytesNormalization(unittest.TestCase):
             image_bytes=image_bytes,
         )
         self.assertTrue(ok)
-        return json.loads(ix.session.post.call_args.kwargs['data'])
+        return json.loads(b"".join(ix.session.post.call_args.kwargs['data']))
 
     def test_image_part_and_description_are_normalized(self):
         image_id = "web_page_image_0"
@@ -0,0 +1,267 @@
+"""Tests for the asyncio Playwright engine (scrape_method: playwright_async, core/async_web_content_extractor.py)."""
+
+import asyncio
+import importlib.machinery
+import sys
+import threading
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+_pw_mock = MagicMock()
+_pw_mock.__spec__ = importlib.machinery.ModuleSpec("playwright", None)
+sys.modules.setdefault("playwright", _pw_mock)
+sys.modules.setdefault("playwright.sync_api", MagicMock())
+sys.modules.setdefault("playwright.async_api", SimpleNamespace(
+    async_playwright=MagicMock(), TimeoutError=type("TimeoutError", (Exception,), {})))
+
+from core.async_web_content_extractor import AsyncWebContentExtractor  # noqa: E402
+from core.web_content_extractor import CONTENT_INDICATORS_JS, LINKS_JS  # noqa: E402
+
+
+class _FakeBrowser:
+    """Async Playwright browser double: tracks contexts and how many navigations overlap."""
+
+    def __init__(self, goto_seconds=0.0, failing=()):
+        self.goto_seconds = goto_seconds
+        self.failing = set(failing)
+        self.created = []   # every context, open or closed
+        self.context_kwargs = []
+        self.in_flight = 0
+        self.max_in_flight = 0
+        self.closed = False
+        self._lock = threading.Lock()
+
+    async def new_context(self, **kwargs):
+        context = _FakeContext(self)
+        self.created.append(context)
+        self.context_kwargs.append(kwargs)
+        return context
+
+    @property
+    def contexts(self):
+        return [c for c in self.created if not c.closed]
+
+    def is_connected(self):
+        return True
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakeContext:
+    def __init__(self, browser):
+        self.browser = browser
+        self.closed = False
+        self.navigations = 0
+
+    async def add_cookies(self, cookies):
+        pass
+
+    async def route(self, pattern, handler):
+        pass
+
+    async def new_page(self):
+        return _FakePage(self)
+
+    async def close(self):
+        self.closed = True
+
+
+class _FakePage:
+    def __init__(self, context):
+        self.context = context
+        self.url = None
+        self.listeners = {}
+
+    def on(self, event, fn):
+        self.listeners.setdefault(event, []).append(fn)
+
+    def remove_listener(self, event, fn):
+        self.listeners[event].remove(fn)
+
+    async def set_extra_http_headers(self, headers):
+        pass
+
+    async def goto(self, url, timeout=None, wait_until=None):
+        browser = self.context.browser
+        with browser._lock:
+            browser.in_flight += 1
+            browser.max_in_flight = max(browser.max_in_flight, browser.in_flight)
+        try:
+            await asyncio.sleep(browser.goto_seconds)
+        finally:
+            with browser._lock:
+                browser.in_flight -= 1
+        if url in browser.failing:
+            raise Exception("net::ERR_CONNECTION_RESET")
+        self.url = url
+        self.context.navigations += 1
+        return SimpleNamespace(headers={'content-type': 'text/html'}, url=url)
+
+    async def wait_for_timeout(self, ms):
+        pass
+
+    async def wait_for_load_state(self, state, timeout=None):
+        pass
+
+    async def title(self):
+        return "title"
+
+    async def content(self):
+        return f"<html>{self.url}</html>"
+
+    async def evaluate(self, script):
+        if script == "document.body.scrollHeight":
+            return 100
+        if script == CONTENT_INDICATORS_JS:
+            return {'textLength': 1}
+        if script == LINKS_JS:
+            return []
+        return f"text of {self.url}"
+
+
+def _make_extractor(browser, concurrency):
+    cfg = SimpleNamespace(vectara=SimpleNamespace(get=lambda key, default=None: default))
+    extractor = AsyncWebContentExtractor(cfg, post_load_timeout=0, browser=browser, concurrency=concurrency)
+    extractor.skip_static_prefetch = True
+    return extractor
+
+
+class TestAsyncWebContentExtractor(unittest.TestCase):
+    def test_prefetched_batch_renders_concurrently_from_warm_contexts(self):
+        browser = _FakeBrowser(goto_seconds=0.2)
+        extractor = _make_extractor(browser, concurrency=4)
+        try:
+            urls = [f"https://docs.example.com/p{i}" for i in range(8)]
+            extractor.prefetch(urls)
+            results = [extractor.fetch_url(u) for u in urls]
+        finally:
+            extractor.cleanup()
+        self.assertEqual([r['text'] for r in results], [f"text of {u}" for u in urls])
+        self.assertTrue(all(r['type'] == 'html' for r in results))
+        self.assertEqual(browser.max_in_flight, 4)
+        self.assertEqual(len(browser.created), 4)   # same origin: contexts are reused
+
+    def test_failed_context_is_recycled(self):
+        browser = _FakeBrowser(failing={"https://a.example.com/bad"})
+        extractor = _make_extractor(browser, concurrency=1)
+        try:
+            self.assertEqual(extractor.fetch_url("https://a.example.com/bad")['html'], '')
+            self.assertTrue(browser.created[0].closed)
+            self.assertEqual(extractor.fetch_url("https://a.example.com/ok")['text'], "text of https://a.example.com/ok")
+            extractor.fetch_url("https://a.example.com/ok2")
+            self.assertEqual(len(browser.created), 2)
+            self.assertEqual(browser.created[1].navigations, 2)
+        finally:
+            extractor.cleanup()
+
+    def test_other_origin_evicts_idle_context_when_full(self):
+        browser = _FakeBrowser()
+        extractor = _make_extractor(browser, concurrency=1)
+        try:
+            extractor.fetch_url("https://a.example.com/1")
+            extractor.fetch_url("https://b.example.com/1")
+        finally:
+            extractor.cleanup()
+        self.assertEqual(len(browser.created), 2)
+        self.assertTrue(browser.created[0].closed)
+
+    def test_contexts_are_recycled_after_use_limit(self):
+        browser = _FakeBrowser()
+        extractor = _make_extractor(browser, concurrency=1)
+        extractor.browser_use_limit = 2
+        try:
+            for i in range(3):
+                extractor.fetch_url(f"https://a.example.com/{i}")
+        finally:
+            extractor.cleanup()
+        self.assertEqual([c.navigations for c in browser.created], [2, 1])
+
+    def test_auth_is_applied_to_new_contexts(self):
+        from crawlers.website_crawler import _apply_auth_to_indexer
+
+        browser = _FakeBrowser()
+        extractor = _make_extractor(browser, concurrency=1)
+        extractor.skip_static_prefetch = False
+        indexer = MagicMock()
+        indexer.web_extractor = extractor
+        try:
+            _apply_auth_to_indexer(indexer, google_storage_state_path="/tmp/state.json")
+            extractor.fetch_url("https://sites.google.com/x")
+        finally:
+            extractor.cleanup()
+        self.assertTrue(extractor.skip_static_prefetch)
+        self.assertEqual(browser.context_kwargs[0]['storage_state'], "/tmp/state.json")
+
+
+class _SlowChromium:
+    """playwright.chromium double whose launches take a while, so renders overlap them."""
+
+    def __init__(self):
+        self.launched = []
+
+    async def launch(self, **kwargs):
+        await asyncio.sleep(0.2)
+        browser = _FakeBrowser(goto_seconds=0.05)
+        self.launched.append(browser)
+        return browser
+
+
+class TestBrowserRotation(unittest.TestCase):
+    def test_rotation_with_renders_in_flight_launches_one_browser(self):
+        from core.browser_memory import MEMORY
+
+        old = _FakeBrowser(goto_seconds=0.05)
+        extractor = _make_extractor(old, concurrency=4)
+        chromium = _SlowChromium()
+        extractor.p = SimpleNamespace(chromium=chromium, stop=MagicMock())
+        extractor.recycler.launching = MagicMock(return_value=set())
+        extractor.recycler.launched = MagicMock()
+        checks = iter([(MEMORY, 900)])
+        extractor.recycler.check = MagicMock(side_effect=lambda uses: next(checks, (None, 0)))
+        try:
+            urls = [f"https://docs.example.com/p{i}" for i in range(12)]
+            extractor.prefetch(urls)
+            results = [extractor.fetch_url(u) for u in urls]
+        finally:
+            extractor.cleanup()
+        self.assertEqual([r['text'] for r in results], [f"text of {u}" for u in urls])
+        self.assertEqual(len(chromium.launched), 1)
+        self.assertTrue(old.closed)
+        self.assertEqual(old.contexts, [])
+
+
+class TestProcessBatch(unittest.TestCase):
+    def test_prefetched_batch_skips_the_per_page_rate_limit(self):
+        from contextlib import contextmanager
+        from crawlers.website_crawler import PageCrawlWorker
+
+        worker = PageCrawlWorker.__new__(PageCrawlWorker)
+        worker.html_processing = {}
+        worker.prior_fingerprints = {}
+        worker.sitemap_lastmods = {}
+        worker._pending_uploads = []
+        worker.rate_limiter = MagicMock()
+        worker.indexer = MagicMock()
+        worker.indexer.index_url.side_effect = lambda url, **kw: not url.endswith("bad")
+        worker.indexer.was_skipped.return_value = False
+        worker.indexer.last_skip_reason = None
+        prefetched = []
+
+        @contextmanager
+        def _prefetching(urls, html_processing, rate_limiter=None):
+            prefetched.extend(urls)
+            yield True
+        worker.indexer.prefetching = _prefetching
+
+        results = worker.process_batch(["https://x/a", "https://x/bad"], source="website")
+        self.assertEqual(results, [PageCrawlWorker.RESULT_INDEXED, PageCrawlWorker.RESULT_FAILED])
+        self.assertEqual(prefetched, ["https://x/a", "https://x/bad"])
+        worker.rate_limiter.__enter__.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
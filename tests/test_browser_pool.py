@@ -0,0 +1,127 @@
+"""Tests for the shared browser servers (core/browser_pool.py) and extractors attached to them."""
+
+import importlib.machinery
+import pickle
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+_pw_mock = MagicMock()
+_pw_mock.__spec__ = importlib.machinery.ModuleSpec("playwright", None)
+sys.modules.setdefault("playwright", _pw_mock)
+sys.modules.setdefault("playwright.sync_api", MagicMock())
+
+from core import browser_pool  # noqa: E402
+from core.browser_pool import BrowserPool, BrowserPoolBroker, _Server, create_browser_pool  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class _FakeProcess:
+    _next_pid = 100
+
+    def __init__(self):
+        _FakeProcess._next_pid += 1
+        self.pid = _FakeProcess._next_pid
+        self.returncode = None
+
+    def poll(self):
+        return self.returncode
+
+
+def _fake_launch(executable, args=()):
+    process = _FakeProcess()
+    return _Server(process, f"http://127.0.0.1:{process.pid}", "/tmp/unused")
+
+
+def _broker(size, memory_mb=0):
+    return BrowserPoolBroker(size, memory_mb, executable="chromium")
+
+
+class TestBrowserPoolBroker(unittest.TestCase):
+    def setUp(self):
+        patches = [patch.object(browser_pool, "launch_browser_server", side_effect=_fake_launch),
+                   patch.object(browser_pool, "_stop")]
+        for p in patches:
+            p.start()
+            self.addCleanup(p.stop)
+
+    def test_servers_start_on_demand_and_share_by_load(self):
+        broker = _broker(size=2)
+        first = broker.acquire(1)
+        second = broker.acquire(1)
+        self.assertNotEqual(first, second)
+        # At size, the least loaded server gets the next worker
+        self.assertEqual(broker.acquire(4), first)
+        self.assertEqual(broker.acquire(1), second)
+        broker.release(first, 4)
+        self.assertEqual(broker.acquire(1), first)
+        self.assertEqual([s["pages"] for s in broker.stats()], [2, 2])
+        # An idle server is reused before another one is started
+        one = _broker(size=4)
+        endpoint = one.acquire(1)
+        one.release(endpoint, 1)
+        self.assertEqual(one.acquire(1), endpoint)
+        self.assertEqual(len(one.stats()), 1)
+
+    def test_exited_server_is_restarted(self):
+        broker = _broker(size=1)
+        endpoint = broker.acquire(1)
+        broker._servers[0].process.returncode = -9
+        replacement = broker.acquire(1)
+        self.assertNotEqual(replacement, endpoint)
+        broker.release(endpoint, 1)   # from a worker of the old server: ignored
+        self.assertEqual(broker.stats(), [{"endpoint": replacement, "pages": 1, "draining": False}])
+        self.assertEqual(broker.restarts, {"exited": 1})
+
+    def test_server_over_budget_is_drained_then_restarted(self):
+        broker = _broker(size=2, memory_mb=100)
+        heavy = broker.acquire(2)
+        with patch.object(browser_pool, "browser_tree_rss", return_value=300 * MB):
+            light = broker.acquire(1)   # 300 MB > 100 MB, whatever the pages assigned
+        self.assertNotEqual(light, heavy)
+        self.assertTrue(broker.stats()[0]["draining"])
+        with patch.object(browser_pool, "browser_tree_rss", return_value=0):
+            self.assertEqual(broker.acquire(1), light)
+            broker.release(heavy, 2)
+        self.assertEqual(broker.restarts, {"memory": 1})
+        self.assertNotIn(heavy, [s["endpoint"] for s in broker.stats()])
+
+
+class TestBrowserPool(unittest.TestCase):
+    def test_client_is_picklable_and_off_by_default(self):
+        pool = pickle.loads(pickle.dumps(BrowserPool(_broker(size=1))))
+        self.assertIsNotNone(pool._lock)
+        with patch.object(browser_pool, "launch_browser_server", side_effect=_fake_launch):
+            endpoint = pool.acquire(8)
+        self.assertEqual(pool.broker.stats(), [{"endpoint": endpoint, "pages": 8, "draining": False}])
+        self.assertIsNone(create_browser_pool({}))
+        pool = create_browser_pool({"browser_pool_size": 2, "browser_pool_memory_mb": 2048})
+        self.assertEqual(pool.broker.memory_budget, 2048 * MB)
+
+
+class TestExtractorAttachesToPool(unittest.TestCase):
+    def test_extractor_connects_over_cdp_and_releases_its_lease(self):
+        from core.web_content_extractor import WebContentExtractor
+
+        cfg = SimpleNamespace(vectara=SimpleNamespace(get=lambda key, default=None: default))
+        pool = MagicMock()
+        pool.acquire.return_value = "http://127.0.0.1:9222"
+        playwright = MagicMock()
+        with patch("core.web_content_extractor.sync_playwright") as sync_playwright:
+            sync_playwright.return_value.start.return_value = playwright
+            extractor = WebContentExtractor(cfg=cfg, browser_pool=pool)
+            playwright.chromium.connect_over_cdp.assert_called_once_with("http://127.0.0.1:9222")
+            playwright.chromium.launch.assert_not_called()
+            extractor._reset_browser_if_needed(force_reset=True)
+            extractor.cleanup()
+        self.assertEqual(pool.acquire.call_count, 2)
+        self.assertEqual(pool.release.call_count, 2)
+        self.assertEqual(extractor.recycler.memory_budget, 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,130 @@
+"""Tests for memory-driven browser recycling (core/browser_memory.py, WebContentExtractor._reset_browser_if_needed)."""
+
+import importlib.machinery
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+import psutil
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+_pw_mock = MagicMock()
+_pw_mock.__spec__ = importlib.machinery.ModuleSpec("playwright", None)
+sys.modules.setdefault("playwright", _pw_mock)
+sys.modules.setdefault("playwright.sync_api", MagicMock())
+
+from core import browser_memory  # noqa: E402
+from core.browser_memory import FORCED, MEMORY, USE_LIMIT, BrowserRecycler, browser_roots, browser_tree_rss  # noqa: E402
+
+MB = 1024 * 1024
+
+
+class _FakeProcess:
+    """A psutil.Process double in a process table of pid -> (name, parent pid, rss in MB)."""
+
+    def __init__(self, table, pid):
+        if pid not in table:
+            raise psutil.NoSuchProcess(pid)
+        self.table = table
+        self.pid = pid
+
+    def name(self):
+        return self.table[self.pid][0]
+
+    def ppid(self):
+        return self.table[self.pid][1]
+
+    def memory_info(self):
+        return SimpleNamespace(rss=self.table[self.pid][2] * MB)
+
+    def children(self, recursive=False):
+        found, parents = [], {self.pid}
+        for pid, (_, parent, _) in sorted(self.table.items()):
+            if parent in parents:
+                found.append(_FakeProcess(self.table, pid))
+                if recursive:
+                    parents.add(pid)
+        return found
+
+
+def _processes(table):
+    return patch.object(browser_memory.psutil, "Process",
+                        side_effect=lambda pid: _FakeProcess(table, pid))
+
+
+# This process (1) runs the Playwright driver (2), which launched two browsers
+_TABLE = {
+    1: ("python", 0, 200),
+    2: ("node", 1, 50),
+    10: ("chrome", 2, 300), 11: ("chrome", 10, 400), 12: ("chrome_crashpad", 10, 10),
+    20: ("headless_shell", 2, 100), 21: ("headless_shell", 20, 100),
+}
+
+
+class TestBrowserMemory(unittest.TestCase):
+    def test_browser_tree_rss(self):
+        with _processes(_TABLE), patch.object(browser_memory.os, "getpid", return_value=1):
+            self.assertEqual(browser_roots(), {10, 20})
+            self.assertEqual(browser_tree_rss({10}), 710 * MB)
+            self.assertEqual(browser_tree_rss(), 910 * MB)
+            self.assertEqual(browser_tree_rss({99}), 0)
+
+    def test_check_reasons(self):
+        recycler = BrowserRecycler(memory_mb=500, use_limit=3)
+        recycler.pids = {10}
+        with _processes(_TABLE):
+            self.assertEqual(recycler.check(1), (MEMORY, 710 * MB))
+            recycler.pids = {20}
+            self.assertEqual(recycler.check(2), (None, 200 * MB))
+            self.assertEqual(recycler.check(3), (USE_LIMIT, 200 * MB))
+        # Without a budget only the use limit applies, and nothing is measured
+        with patch.object(browser_memory, "browser_tree_rss") as rss:
+            self.assertEqual(BrowserRecycler(memory_mb=0, use_limit=3).check(3), (USE_LIMIT, 0))
+        rss.assert_not_called()
+
+    def test_recycles_are_counted_by_reason_and_site(self):
+        recycler = BrowserRecycler()
+        with self.assertLogs(browser_memory.logger, level="INFO") as logs:
+            recycler.recycled(MEMORY, 30, 1100 * MB, "https://Heavy.example.com/a")
+            recycler.recycled(MEMORY, 10, 1200 * MB, "https://heavy.example.com/b")
+            recycler.recycled(FORCED, 2)
+            recycler.log_summary()
+        self.assertEqual(recycler.reasons, {MEMORY: 2, FORCED: 1})
+        self.assertEqual(recycler.sites, {"heavy.example.com": 2})
+        self.assertIn("Recycling browser (memory) after 30 pages, 1100 MB of 1024 MB", logs.output[0])
+        self.assertIn("14.0 pages per browser", logs.output[-1])
+
+
+class TestExtractorRecycling(unittest.TestCase):
+    def _extractor(self, **vectara):
+        from core.web_content_extractor import WebContentExtractor
+
+        cfg = SimpleNamespace(vectara=SimpleNamespace(get=lambda key, default=None: vectara.get(key, default)))
+        extractor = WebContentExtractor(cfg=cfg, browser=MagicMock(name="browser"))
+        extractor._setup_browser = MagicMock()
+        return extractor
+
+    def test_browser_is_recycled_over_its_memory_budget(self):
+        extractor = self._extractor(browser_memory_mb=512, browser_use_limit=50)
+        extractor.browser_use_count = 5
+        with patch.object(browser_memory, "browser_tree_rss", return_value=400 * MB):
+            extractor._reset_browser_if_needed(url="https://ex.com/a")
+            extractor._setup_browser.assert_not_called()
+        with patch.object(browser_memory, "browser_tree_rss", return_value=600 * MB):
+            extractor._reset_browser_if_needed(url="https://ex.com/b")
+        extractor._setup_browser.assert_called_once()
+        self.assertEqual(extractor.recycler.reasons, {MEMORY: 1})
+        self.assertEqual(extractor.browser_use_limit, 50)
+
+    def test_use_limit_is_a_safety_cap(self):
+        extractor = self._extractor()
+        extractor.browser_use_count = extractor.browser_use_limit
+        with patch.object(browser_memory, "browser_tree_rss", return_value=0):
+            extractor._reset_browser_if_needed()
+        self.assertEqual(extractor.recycler.reasons, {USE_LIMIT: 1})
+
+
+if __name__ == "__main__":
+    unittest.main()
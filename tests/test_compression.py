@@ -0,0 +1,135 @@
+"""Tests for gzip upload bodies (vectara.compress_uploads, core/compression.py)."""
+import gzip
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from email.parser import BytesParser
+from email.policy import HTTP
+from unittest.mock import MagicMock
+
+sys.modules.setdefault('cairosvg', MagicMock())
+
+from core.compression import CompressionStats, GzipBody, is_gzip_rejection, iter_multipart
+from core.json_stream import Base64Bytes, StreamingJSONBody
+from tests.indexer_factory import make_indexer
+from tests.loadtest.mock_vectara import MockServices, MockVectaraStore
+
+
+class TestGzipBody(unittest.TestCase):
+    def test_roundtrip_and_sizes(self):
+        chunks = [b"abc" * 1000, b"", b"xyz" * 1000]
+        with GzipBody(chunks) as body:
+            data = body.read()
+            self.assertEqual(gzip.decompress(data), b"".join(chunks))
+            self.assertEqual(body.raw_size, 6000)
+            self.assertEqual(len(body), len(data))
+            self.assertLess(len(body), 200)
+            body.seek(0)   # rewindable for retries
+            self.assertEqual(b"".join(body), data)
+
+    def test_compresses_a_streaming_json_body(self):
+        stream = StreamingJSONBody({'id': 'd', 'images': [Base64Bytes(b"\x00" * 100000)]})
+        with GzipBody(stream) as body:
+            self.assertEqual(gzip.decompress(body.read()), b"".join(stream))
+
+
+class TestMultipart(unittest.TestCase):
+    def test_parses_like_a_form_upload(self):
+        with tempfile.TemporaryFile() as fh:
+            fh.write(b"file contents")
+            fh.seek(0)
+            files = {'metadata': (None, '{"a": 1}', 'application/json'),
+                     'file': ('na"me.txt', fh, 'application/octet-stream')}
+            body = b"".join(iter_multipart(files, "BOUNDARY"))
+        msg = BytesParser(policy=HTTP).parsebytes(
+            b"Content-Type: multipart/form-data; boundary=BOUNDARY\r\n\r\n" + body)
+        parts = {p.get_param("name", header="content-disposition"): p for p in msg.iter_parts()}
+        self.assertEqual(parts['metadata'].get_payload(decode=True), b'{"a": 1}')
+        self.assertEqual(parts['file'].get_payload(decode=True), b"file contents")
+        self.assertEqual(parts['file'].get_filename(), "na%22me.txt")
+
+
+class TestRejectionAndStats(unittest.TestCase):
+    def test_is_gzip_rejection(self):
+        self.assertTrue(is_gzip_rejection(MagicMock(status_code=415, text="")))
+        self.assertTrue(is_gzip_rejection(MagicMock(status_code=400, text="Unsupported Content-Encoding: gzip")))
+        self.assertFalse(is_gzip_rejection(MagicMock(status_code=400, text="Could not parse metadata")))
+        self.assertFalse(is_gzip_rejection(MagicMock(status_code=400, text="Malformed JSON body")))
+        self.assertFalse(is_gzip_rejection(MagicMock(status_code=400, text="Document part too large")))
+        self.assertFalse(is_gzip_rejection(MagicMock(status_code=201, text="")))
+
+    def test_stats_pickle(self):
+        stats = CompressionStats()
+        stats.record(1000, 100)
+        clone = pickle.loads(pickle.dumps(stats))
+        clone.record(1000, 300)
+        self.assertEqual(clone.summary()['saved_pct'], 80.0)
+
+
+def _make_indexer(api_url):
+    return make_indexer(api_url, compress_uploads=True)
+
+
+def _doc(doc_id):
+    return {'id': doc_id, 'type': 'structured', 'metadata': {'title': 'x'},
+            'sections': [{'text': "compressible text " * 500}]}
+
+
+class TestIndexerGzipUploads(unittest.TestCase):
+    def test_document_and_file_uploads_are_gzipped(self):
+        store = MockVectaraStore()
+        with MockServices(store, num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url)
+            self.assertTrue(ix.index_document(_doc("d1")))
+            with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+                f.write("spreadsheet-like text, " * 2000)
+            try:
+                ok, error = ix._upload_file(f.name, uri="https://x.test/f.txt", metadata={'k': 'v'}, id="f1")
+            finally:
+                os.unlink(f.name)
+            self.assertTrue(ok, error)
+            self.assertEqual(set(store.documents("c")), {"d1", "f1"})
+            self.assertEqual(store.documents("c")["f1"]['metadata'], {'k': 'v'})
+            self.assertEqual(store.documents("c")["f1"]['size'], len("spreadsheet-like text, " * 2000))
+
+            summary = ix._compression_stats.summary()
+            self.assertEqual(summary['uploads'], 2)
+            self.assertGreater(summary['saved_pct'], 80)
+            self.assertLess(store.stats()['bytes_received'], summary['raw_bytes'])
+
+    def test_falls_back_to_identity_when_gzip_is_refused(self):
+        store = MockVectaraStore(accept_gzip=False)
+        with MockServices(store, num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url)
+            self.assertTrue(ix.index_document(_doc("d1")))
+            self.assertFalse(ix.compress_uploads)
+            self.assertTrue(ix.index_document(_doc("d2")))
+            counts = store.stats()['status_counts']
+            self.assertEqual((counts.get(415), counts.get(201)), (1, 2))
+
+    def test_file_fallback_rewinds_the_file(self):
+        store = MockVectaraStore(accept_gzip=False)
+        with MockServices(store, num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url)
+            with tempfile.NamedTemporaryFile("w", suffix=".txt", delete=False) as f:
+                f.write("hello")
+            try:
+                ok, _ = ix._upload_file(f.name, uri="https://x.test/f.txt", metadata={}, id="f1")
+            finally:
+                os.unlink(f.name)
+            self.assertTrue(ok)
+            self.assertEqual(store.documents("c")["f1"]['size'], 5)
+
+    def test_rejected_document_is_not_resent_uncompressed(self):
+        ix = _make_indexer("https://api.example.test")
+        ix.session = MagicMock()
+        ix.session.post.return_value = MagicMock(status_code=400, text="Could not parse field 'foo'")
+        self.assertFalse(ix.index_document(_doc("d1")))
+        self.assertEqual(ix.session.post.call_count, 1)
+        self.assertTrue(ix.compress_uploads)
+
+
+if __name__ == "__main__":
+    unittest.main()
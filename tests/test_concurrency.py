@@ -0,0 +1,149 @@
+"""Tests for adaptive Vectara API concurrency (vectara.adaptive_concurrency, core/concurrency.py)."""
+import pickle
+import sys
+import threading
+import time
+import unittest
+from email.utils import formatdate
+from unittest.mock import MagicMock
+
+sys.modules.setdefault('cairosvg', MagicMock())
+
+from omegaconf import OmegaConf
+
+import core.concurrency as concurrency
+from core.concurrency import (
+    AIMDState, AdaptiveConcurrencyAdapter, AdaptiveConcurrencyController,
+    ConcurrencyControllerActor, concurrency_settings, get_controller, parse_retry_after,
+)
+from core.utils import create_session_with_retries
+from tests.indexer_factory import make_indexer
+from tests.loadtest.mock_vectara import MockServices, MockVectaraStore
+
+SETTINGS = {'initial': 2, 'min_limit': 1, 'max_limit': 8, 'latency_target': None}
+
+
+class TestAIMDState(unittest.TestCase):
+    def test_additive_increase_is_about_one_per_round(self):
+        state = AIMDState(initial=4, min_limit=1, max_limit=100)
+        state.on_success(4)
+        self.assertAlmostEqual(state.limit, 4.9, delta=0.1)
+
+    def test_throttle_halves_once_per_cooldown_and_blocks(self):
+        state = AIMDState(initial=8, min_limit=1, max_limit=16, cooldown=1.0)
+        state.on_throttle(3, now=100.0)
+        state.on_throttle(None, now=100.5)
+        self.assertEqual(state.limit, 4.0)
+        self.assertEqual(state.blocked_until, 103.0)
+        state.on_throttle(None, now=101.5)
+        self.assertEqual(state.limit, 2.0)
+
+    def test_bounds_and_latency_target(self):
+        state = AIMDState(initial=1, min_limit=1, max_limit=2, latency_target=0.5, cooldown=0)
+        state.on_success(50)
+        self.assertEqual(state.limit, 2.0)
+        self.assertEqual(state.observe(201, 0.9, None, now=1.0), 'slow')
+        self.assertAlmostEqual(state.limit, 1.8)
+        for now in range(2, 20):
+            state.on_throttle(None, now=float(now))
+        self.assertEqual(state.limit, 1.0)
+        self.assertEqual(state.observe(500, 0.1, None, now=30.0), 'error')
+
+
+class TestHelpers(unittest.TestCase):
+    def test_parse_retry_after(self):
+        self.assertEqual(parse_retry_after("7"), 7.0)
+        self.assertIsNone(parse_retry_after(None))
+        self.assertIsNone(parse_retry_after("soon"))
+        self.assertAlmostEqual(parse_retry_after(formatdate(time.time() + 60, usegmt=True)), 60, delta=2)
+
+    def test_settings_from_config(self):
+        self.assertIsNone(concurrency_settings(OmegaConf.create({})))
+        settings = concurrency_settings(OmegaConf.create({'adaptive_concurrency': True, 'max_concurrency': 3}))
+        self.assertEqual(settings, {'initial': 3, 'min_limit': 1, 'max_limit': 3, 'latency_target': None})
+
+
+class TestActor(unittest.TestCase):
+    def test_limit_is_shared_between_active_clients(self):
+        actor = ConcurrencyControllerActor(initial=8, min_limit=1, max_limit=16)
+        actor.report("a", 0, 0, 0, None)
+        limit, clients, _ = actor.report("b", 0, 2, 0, 5.0)
+        self.assertEqual((limit, clients), (4.0, 2))
+        self.assertEqual(actor.stats()['throttles'], 2)
+        self.assertGreater(actor.state.blocked_until, time.time())
+
+
+class TestController(unittest.TestCase):
+    def test_limits_in_flight_requests(self):
+        controller = AdaptiveConcurrencyController(initial=2, min_limit=1, max_limit=2)
+        peak, active, lock = [0], [0], threading.Lock()
+
+        def work():
+            with controller.slot():
+                with lock:
+                    active[0] += 1
+                    peak[0] = max(peak[0], active[0])
+                time.sleep(0.02)
+                with lock:
+                    active[0] -= 1
+
+        threads = [threading.Thread(target=work) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        self.assertEqual(peak[0], 2)
+
+    def test_retry_after_pauses_acquire(self):
+        controller = AdaptiveConcurrencyController(initial=4)
+        controller.record(429, 0.01, retry_after=0.2)
+        self.assertEqual(controller.limit, 2)
+        st = time.monotonic()
+        with controller.slot():
+            pass
+        self.assertGreaterEqual(time.monotonic() - st, 0.15)
+
+    def test_syncs_with_actor(self):
+        actor = MagicMock()
+        controller = AdaptiveConcurrencyController(initial=8, max_limit=16, actor=actor, sync_interval=0)
+        with unittest.mock.patch.object(concurrency.ray, "get", return_value=(6.0, 3, 0.0)):
+            controller.record(201, 0.01)
+        self.assertEqual(actor.report.remote.call_args.args[1:], (1, 0, 0, None))
+        self.assertEqual(controller.limit, 2)
+
+
+def _make_indexer(api_url):
+    ix = make_indexer(api_url, concurrency_settings=SETTINGS)
+    ix.session.mount(api_url, AdaptiveConcurrencyAdapter(SETTINGS))
+    return ix
+
+
+class TestAdapterAgainstMockVectara(unittest.TestCase):
+    def setUp(self):
+        concurrency._controllers.clear()
+
+    def test_throttled_uploads_are_retried_and_cut_the_limit(self):
+        store = MockVectaraStore(rate_limit_every=3, retry_after=0)
+        with MockServices(store, num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url)
+            for i in range(6):
+                self.assertTrue(ix.index_document({'id': f"d{i}", 'type': 'structured', 'metadata': {},
+                                                   'sections': [{'text': f"text {i}"}]}))
+            self.assertEqual(len(store.documents("c")), 6)
+            self.assertGreaterEqual(store.stats()['status_counts'].get(429, 0), 2)
+            stats = get_controller(SETTINGS).stats()
+            self.assertGreaterEqual(stats['throttles'], 2)
+            self.assertGreaterEqual(stats['decreases'], 1)
+            self.assertEqual(ix.wait_for_uploads(), {})
+
+    def test_session_with_adapter_pickles(self):
+        session = create_session_with_retries()
+        session.mount("https://api.example.test", AdaptiveConcurrencyAdapter(SETTINGS))
+        clone = pickle.loads(pickle.dumps(session))
+        adapter = clone.get_adapter("https://api.example.test/v2/corpora")
+        self.assertIsInstance(adapter, AdaptiveConcurrencyAdapter)
+        self.assertIs(adapter.controller, get_controller(SETTINGS))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,160 @@
+"""Tests for single-request URL classification (WebContentExtractor.fetch_url, Indexer.index_url)."""
+
+import importlib.machinery
+import os
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+_pw_mock = MagicMock()
+_pw_mock.__spec__ = importlib.machinery.ModuleSpec("playwright", None)
+sys.modules.setdefault("playwright", _pw_mock)
+sys.modules.setdefault("playwright.sync_api", MagicMock())
+
+from core.web_content_extractor import _response_kind  # noqa: E402
+
+
+def _make_extractor():
+    from core.web_content_extractor import WebContentExtractor
+
+    cfg = SimpleNamespace(vectara=SimpleNamespace(get=lambda key, default=None: default))
+    extractor = WebContentExtractor(cfg=cfg, browser=MagicMock(name="browser"))
+    extractor.p = MagicMock(name="playwright_runner")
+    return extractor
+
+
+def _response(content_type, body=b"", url="https://example.com/x", disposition=None, status=200):
+    resp = MagicMock()
+    resp.headers = {"content-type": content_type}
+    if disposition:
+        resp.headers["content-disposition"] = disposition
+    resp.url = url
+    resp.ok = status < 400
+    resp.content = body
+    resp.text = body.decode("utf-8", "replace")
+    resp.iter_content.side_effect = lambda chunk_size: iter([body])
+    return resp
+
+
+def _browser_page(extractor, url="https://example.com/x"):
+    page = MagicMock()
+    page.title.return_value = "rendered"
+    page.url = url
+    page.content.return_value = "<html>rendered</html>"
+    context = MagicMock()
+    context.new_page.return_value = page
+    extractor.browser.new_context.return_value = context
+    return page
+
+
+class TestResponseKind(unittest.TestCase):
+    def test_kinds(self):
+        self.assertEqual(_response_kind({"content-type": "text/html; charset=utf-8"}), "html")
+        self.assertEqual(_response_kind({"content-type": "application/pdf"}), "pdf")
+        self.assertEqual(_response_kind({"content-type": "application/vnd.ms-excel"}), "download")
+        self.assertEqual(_response_kind({"content-type": "text/html", "content-disposition": "attachment"}), "download")
+        self.assertIsNone(_response_kind({"content-type": "application/json"}))
+        self.assertIsNone(_response_kind({}))
+
+
+class TestFetchUrl(unittest.TestCase):
+    def test_static_html_needs_no_browser(self):
+        extractor = _make_extractor()
+        html = ("<html><title>T</title><body>" + "hello world " * 100 + "</body></html>").encode()
+        with patch("core.web_content_extractor.requests.get", return_value=_response("text/html", html)) as get:
+            result = extractor.fetch_url("https://example.com/x")
+        get.assert_called_once()
+        self.assertTrue(get.call_args.kwargs["stream"])
+        extractor.browser.new_context.assert_not_called()
+        self.assertEqual(result["type"], "html")
+        self.assertEqual(result["title"], "T")
+        self.assertGreater(len(result["text"]), 500)
+
+    def test_pdf_is_read_from_the_same_response(self):
+        extractor = _make_extractor()
+        with patch("core.web_content_extractor.requests.get",
+                   return_value=_response("application/pdf", b"%PDF-1.4")) as get:
+            result = extractor.fetch_url("https://example.com/x")
+        get.assert_called_once()
+        extractor.browser.new_context.assert_not_called()
+        self.assertEqual((result["type"], result["content"]), ("pdf", b"%PDF-1.4"))
+
+    def test_attachment_is_streamed_to_a_file(self):
+        extractor = _make_extractor()
+        resp = _response("application/octet-stream", b"data", disposition='attachment; filename="report.docx"')
+        with patch("core.web_content_extractor.requests.get", return_value=resp):
+            result = extractor.fetch_url("https://example.com/x")
+        self.assertEqual((result["type"], result["filename"]), ("download", "report.docx"))
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "report.docx")
+            result["download"].save_as(path)
+            with open(path, "rb") as f:
+                self.assertEqual(f.read(), b"data")
+        extractor.browser.new_context.assert_not_called()
+
+    def test_sparse_html_renders_once(self):
+        extractor = _make_extractor()
+        page = _browser_page(extractor)
+        page.goto.return_value.headers = {"content-type": "text/html"}
+        with patch("core.web_content_extractor.requests.get", return_value=_response("text/html", b"<html></html>")), \
+             patch.object(extractor, "_extract_text_content", return_value="rendered text"), \
+             patch.object(extractor, "_extract_links", return_value=[]), \
+             patch.object(extractor, "_remove_elements"), \
+             patch.object(extractor, "_scroll_to_bottom"):
+            result = extractor.fetch_url("https://example.com/x")
+        self.assertEqual(extractor.browser.new_context.call_count, 1)
+        self.assertEqual(page.goto.call_count, 1)
+        self.assertEqual((result["type"], result["text"]), ("html", "rendered text"))
+
+    def test_navigation_that_downloads_is_saved_before_the_context_closes(self):
+        extractor = _make_extractor()
+        extractor.skip_static_prefetch = True
+        page = _browser_page(extractor)
+        handlers = {}
+        page.on.side_effect = lambda event, fn: handlers.setdefault(event, fn)
+        download = MagicMock(url="https://example.com/file.xlsx", suggested_filename="file.xlsx")
+        download.save_as.side_effect = lambda path: open(path, "wb").write(b"xlsx")
+
+        def _goto(*args, **kwargs):
+            handlers["download"](download)
+            raise Exception("Download is starting")
+        page.goto.side_effect = _goto
+
+        with patch("core.web_content_extractor.requests.get",
+                   side_effect=AssertionError("static prefetch must be skipped")):
+            result = extractor.fetch_url("https://example.com/file.xlsx")
+        self.assertEqual((result["type"], result["filename"]), ("download", "file.xlsx"))
+        self.assertEqual(result["download"].size, 4)
+        self.assertEqual(extractor.consecutive_failures, 0)
+        os.remove(result["download"].path)
+
+
+class TestIndexUrlUsesOneFetch(unittest.TestCase):
+    def test_download_goes_to_index_file(self):
+        from core.indexer import Indexer
+
+        ix = Indexer.__new__(Indexer)
+        ix.last_skip_reason = None
+        ix.parse_tables = False
+        ix.remove_code = True
+        download = MagicMock()
+        ix.fetch_url = MagicMock(return_value={"type": "download", "url": "https://example.com/r.docx",
+                                               "filename": "r.docx", "download": download})
+        ix.url_triggers_download = MagicMock(side_effect=AssertionError("no separate download check"))
+        ix.check_download_or_pdf = MagicMock(side_effect=AssertionError("no separate download check"))
+        ix.index_file = MagicMock(return_value=True)
+
+        metadata = {'url': "https://example.com/r"}
+        self.assertTrue(ix.index_url("https://example.com/r", metadata=metadata))
+        ix.fetch_url.assert_called_once()
+        download.save_as.assert_called_once()
+        self.assertEqual(ix.index_file.call_args.args[1], "https://example.com/r.docx")
+        self.assertEqual(metadata['url'], "https://example.com/r.docx")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,153 @@
+"""Tests for cluster-wide per-host pacing (core/host_rate_limiter.py)."""
+
+import pickle
+import sys
+import threading
+import unittest
+from contextlib import nullcontext
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+from core.host_rate_limiter import (
+    HostRateBroker, HostRateLimiter, create_host_rate_limiter, paced, robots_crawl_delay
+)
+
+
+class TestHostRateBroker(unittest.TestCase):
+    def test_burst_then_spaced_per_host(self):
+        broker = HostRateBroker(rate=2, burst=2)
+        slots, interval = broker.reserve("a.com", 4, now=100.0)
+        self.assertEqual(interval, 0.5)
+        self.assertEqual(slots, [100.0, 100.0, 100.5, 101.0])
+        # Another host has its own bucket
+        self.assertEqual(broker.reserve("b.com", 1, now=100.0)[0], [100.0])
+        # Reservations continue where the last lease ended
+        self.assertEqual(broker.reserve("a.com", 1, now=100.0)[0], [101.5])
+
+    def test_crawl_delay_slows_host_and_removes_burst(self):
+        broker = HostRateBroker(rate=10)
+        broker.set_crawl_delay("a.com", 3)
+        slots, interval = broker.reserve("a.com", 3, now=0.0)
+        self.assertEqual(interval, 3.0)
+        self.assertEqual(slots, [0.0, 3.0, 6.0])
+
+    def test_idle_host_does_not_accumulate_more_than_burst(self):
+        broker = HostRateBroker(rate=1, burst=2)
+        broker.reserve("a.com", 1, now=0.0)
+        slots, _ = broker.reserve("a.com", 4, now=1000.0)
+        self.assertEqual(slots, [1000.0, 1000.0, 1001.0, 1002.0])
+
+
+class TestHostRateLimiter(unittest.TestCase):
+    def test_workers_share_one_pace_and_lease_in_batches(self):
+        limiter = HostRateLimiter(HostRateBroker(rate=4, burst=1), max_lease=4, respect_crawl_delay=False)
+        workers = [pickle.loads(pickle.dumps(limiter)) for _ in range(2)]
+        broker = limiter.broker
+        broker.reserve = MagicMock(wraps=broker.reserve)
+        for w in workers:
+            w.broker = broker          # a Ray actor handle is shared the same way
+        clock = [0.0]
+        starts = []
+
+        def _sleep(seconds):
+            clock[0] += seconds
+        with patch("core.host_rate_limiter.time.time", side_effect=lambda: clock[0]), \
+             patch("core.host_rate_limiter.time.sleep", side_effect=_sleep):
+            for i in range(12):
+                workers[i % 2].acquire("https://docs.example.com/p")
+                starts.append(clock[0])
+        # 4/s across both workers: a slot used up to one interval late may meet the next one,
+        # but no one-second window holds more than rate + 1 starts
+        self.assertTrue(all(sum(t <= s < t + 1 for s in starts) <= 5 for t in starts))
+        self.assertGreaterEqual(starts[-1], 2.5)
+        self.assertLess(broker.reserve.call_count, 12)
+
+    def test_expired_slots_are_dropped_and_lease_shrinks(self):
+        broker = HostRateBroker(rate=10, burst=1)
+        limiter = HostRateLimiter(broker, max_lease=8, respect_crawl_delay=False)
+        with patch("core.host_rate_limiter.time.time", return_value=0.0):
+            limiter.acquire("https://a.com/1")
+            limiter.acquire("https://a.com/2")
+        lease = limiter._leases["a.com"]
+        self.assertEqual(lease.size, 4)
+        with patch("core.host_rate_limiter.time.time", return_value=5.0):
+            limiter.acquire("https://a.com/3")       # the worker was busy: old slots are stale
+        self.assertEqual(lease.size, 2)
+
+    def test_robots_crawl_delay_is_read_once_per_host(self):
+        broker = HostRateBroker(rate=10)
+        limiter = HostRateLimiter(broker, user_agent="vectara-bot")
+        with patch("core.host_rate_limiter.robots_crawl_delay", return_value=2.0) as robots, \
+             patch("core.host_rate_limiter.time.sleep"):
+            limiter.acquire("https://a.com/1")
+            limiter.acquire("https://a.com/2")
+        robots.assert_called_once_with("https://a.com", "vectara-bot")
+        self.assertEqual(broker.interval("a.com"), 2.0)
+
+    def test_robots_is_read_once_per_host_across_workers(self):
+        limiter = HostRateLimiter(HostRateBroker(rate=10), user_agent="vectara-bot")
+        workers = [pickle.loads(pickle.dumps(limiter)) for _ in range(3)]
+        broker = limiter.broker
+        for w in workers:
+            w.broker = broker
+        with patch("core.host_rate_limiter.robots_crawl_delay", return_value=2.0) as robots, \
+             patch("core.host_rate_limiter.time.sleep"):
+            for w in workers:
+                w.acquire("https://a.com/1")
+        robots.assert_called_once_with("https://a.com", "vectara-bot")
+        self.assertEqual(broker.interval("a.com"), 2.0)
+
+    def test_slow_reserve_for_one_host_does_not_block_others(self):
+        broker = HostRateBroker(rate=100)
+        reserve = broker.reserve
+        release = threading.Event()
+
+        def _reserve(host, count, now=None):
+            if host == "slow.com":
+                release.wait(5)
+            return reserve(host, count, now)
+        # A MagicMock would look like a Ray actor method; wrap the remote call path instead
+        remote = SimpleNamespace(reserve=SimpleNamespace(remote=_reserve),
+                                 claim_robots=SimpleNamespace(remote=broker.claim_robots))
+        limiter = HostRateLimiter(remote, respect_crawl_delay=False)
+        ray = SimpleNamespace(get=lambda value: value)
+        with patch.dict(sys.modules, {"ray": ray}):
+            slow = threading.Thread(target=limiter.acquire, args=("https://slow.com/1",))
+            slow.start()
+            fast = threading.Thread(target=limiter.acquire, args=("https://fast.com/1",))
+            fast.start()
+            fast.join(2)
+            self.assertFalse(fast.is_alive())
+            self.assertTrue(slow.is_alive())
+            release.set()
+            slow.join(5)
+        self.assertFalse(slow.is_alive())
+
+    def test_paced_passes_other_limiters_through(self):
+        ctx = nullcontext()
+        self.assertIs(paced(ctx, "https://a.com"), ctx)
+
+    def test_disabled_by_config(self):
+        cfg = {"shared_rate_limit": False}
+        self.assertIsNone(create_host_rate_limiter(cfg, 10))
+        limiter = create_host_rate_limiter({"rate_limit_lease": 3}, 10)
+        self.assertEqual(limiter.max_lease, 3)
+
+
+class TestRobotsCrawlDelay(unittest.TestCase):
+    def _session(self, text, status=200):
+        return SimpleNamespace(get=MagicMock(return_value=SimpleNamespace(status_code=status, text=text)))
+
+    def test_agent_group_and_request_rate(self):
+        robots = ("User-agent: *\nCrawl-delay: 1\n\n"
+                  "User-agent: vectara\nCrawl-delay: 2\nRequest-rate: 1/5\n")
+        self.assertEqual(robots_crawl_delay("https://a.com", "vectara-bot/1.0", self._session(robots)), 5.0)
+        self.assertEqual(robots_crawl_delay("https://a.com", "other", self._session(robots)), 1.0)
+
+    def test_missing_robots(self):
+        self.assertIsNone(robots_crawl_delay("https://a.com", "*", self._session("", status=404)))
+        self.assertIsNone(robots_crawl_delay("https://a.com", "*", self._session("User-agent: *\nDisallow:\n")))
+
+
+if __name__ == "__main__":
+    unittest.main()
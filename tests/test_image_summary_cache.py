@@ -0,0 +1,99 @@
+"""Tests for the persistent image summary cache (core/image_summary_cache.py, ImageSummarizer)."""
+
+import io
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+
+from omegaconf import OmegaConf  # noqa: E402
+from PIL import Image  # noqa: E402
+
+import core.image_summary_cache as image_summary_cache  # noqa: E402
+from core.image_summary_cache import ImageSummaryCache  # noqa: E402
+
+_VISION = {"provider": "openai", "model_name": "gpt-4o", "api_key": "sk-1"}
+
+
+def _png(color):
+    buf = io.BytesIO()
+    Image.new("RGB", (64, 64), color).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class TestImageSummaryCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.db_path = os.path.join(self.tmp.name, "image_summary_cache.db")
+
+    def test_key_covers_image_model_and_context_but_not_credentials(self):
+        key = ImageSummaryCache.key("aW1n", _VISION, "prompt")
+        self.assertEqual(key, ImageSummaryCache.key("aW1n", OmegaConf.create(dict(_VISION, api_key="sk-2")), "prompt"))
+        self.assertNotEqual(key, ImageSummaryCache.key("aW1o", _VISION, "prompt"))
+        self.assertNotEqual(key, ImageSummaryCache.key("aW1n", dict(_VISION, model_name="gpt-4.1"), "prompt"))
+        self.assertNotEqual(key, ImageSummaryCache.key("aW1n", _VISION, "prompt\nText before image: 'a'"))
+
+    def test_least_recently_used_entries_are_evicted(self):
+        cache = ImageSummaryCache(self.db_path, max_bytes=300)
+        with patch("core.image_summary_cache.time.time", side_effect=[1.0, 2.0, 3.0, 4.0]):
+            cache.put("a", "x" * 100)
+            cache.put("b", "y" * 100)
+            self.assertEqual(cache.get("a"), "x" * 100)     # a is now more recent than b
+            cache.put("c", "z" * 150)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "x" * 100)
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 1, 2))
+
+    def test_shared_through_the_file(self):
+        cache = ImageSummaryCache(self.db_path)
+        cache.put("k", "a diagram")
+        worker = pickle.loads(pickle.dumps(cache))
+        self.assertEqual(worker.get("k"), "a diagram")
+        cache.close()
+
+
+class TestImageSummarizerUsesCache(unittest.TestCase):
+    def setUp(self):
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.cfg = OmegaConf.create({"vectara": {"output_dir": os.path.join(tmp.name, "out")},
+                                     "doc_processing": {"image_summary_cache": True}})
+        patcher = patch.dict(image_summary_cache._caches, clear=True)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_repeated_image_is_summarized_once(self):
+        from core.summary import ImageSummarizer
+
+        logo, chart = _png("red"), _png("blue")
+        with patch("core.summary.generate_image_summary", side_effect=["a red logo", "a blue chart"]) as llm:
+            first = ImageSummarizer(self.cfg, _VISION)
+            self.assertEqual(first.summarize_image("", "https://ex.com/logo.png", image_bytes=logo), "a red logo")
+            # Another page, another summarizer in the same process
+            second = ImageSummarizer(self.cfg, _VISION)
+            self.assertEqual(second.summarize_image("", "https://ex.com/p2/logo.png", image_bytes=logo), "a red logo")
+            self.assertEqual(second.summarize_image("", "https://ex.com/chart.png", image_bytes=chart), "a blue chart")
+        self.assertEqual(llm.call_count, 2)
+        self.assertIs(first.cache, second.cache)
+        self.assertEqual(first.cache.stats()["hit_rate"], round(1 / 3, 3))
+
+    def test_failed_summary_is_not_cached(self):
+        from core.summary import ImageSummarizer
+
+        summarizer = ImageSummarizer(self.cfg, _VISION)
+        content = _png("green")
+        with patch("core.summary.generate_image_summary", side_effect=[None, "a green square"]):
+            self.assertIsNone(summarizer.summarize_image("", "https://ex.com/g.png", image_bytes=content))
+            self.assertEqual(summarizer.summarize_image("", "https://ex.com/g.png", image_bytes=content),
+                             "a green square")
+
+
+if __name__ == "__main__":
+    unittest.main()
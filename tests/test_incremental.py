@@ -5,8 +5,11 @@ the cheap-signal comparator, the deletion safety guard (partial-crawl / sub-doc
 the always-on content hash, _list_docs surfacing + source scoping, the indexer skip/stamp
 hook, and the sitemap <lastmod> parser.
 """
+import io
+import pickle
 import sys
 import unittest
+from contextlib import nullcontext
 from unittest.mock import MagicMock
 
 sys.modules.setdefault('cairosvg', MagicMock())
@@ -14,7 +17,7 @@ sys.modules.setdefault('cairosvg', MagicMock())
 from core.incremental import (
     compute_fingerprint, config_signature, build_manifest, source_is_newer,
     plan_deletions, ManifestEntry, content_hash_from_text, source_tag_for,
-    prefilter_unchanged,
+    prefilter_unchanged, FingerprintMap, fingerprint_map,
 )
 from core.indexer_utils import extract_last_modified, md5_hex
 
@@ -523,7 +526,7 @@ class TestIndexerIncrementalHook(unittest.TestCase):
             "metadata": {"page_key": None},
         }
         ix.session.get.return_value = resp
-        docs = ix._list_docs()
+        docs = list(ix._list_docs())
         self.assertEqual(docs[0]["fingerprint"], "f1")
         self.assertEqual(docs[0]["source"], "website")
         self.assertEqual(docs[0]["config_sig"], "sig1")
@@ -599,6 +602,39 @@ class TestBuildManifest(unittest.TestCase):
         self.assertEqual(len(m_all), 3)
 
 
+class TestCompactManifest(unittest.TestCase):
+    def test_entry_stores_md5_fields_as_digests(self):
+        fp, sig = md5_hex("content"), md5_hex("config")
+        entry = ManifestEntry(doc_id="d1", fingerprint=fp, config_sig=sig, content_hash="not-md5")
+        self.assertEqual(entry._fingerprint, bytes.fromhex(fp))
+        self.assertEqual(entry.fingerprint, fp)
+        self.assertEqual(entry.content_hash, "not-md5")   # kept as given
+        self.assertFalse(hasattr(entry, "__dict__"))
+        # config_sig is the same for every document under one config: one shared digest
+        self.assertIs(ManifestEntry(doc_id="d2", config_sig=sig)._config_sig, entry._config_sig)
+        self.assertEqual(pickle.loads(pickle.dumps(entry)), entry)
+
+    def test_fingerprint_map(self):
+        fps = {f"https://ex.com/{i}": md5_hex(str(i)) for i in range(100)}
+        m = FingerprintMap(list(fps.items()) + [("https://ex.com/legacy", "f1"), ("https://ex.com/none", None)])
+        self.assertEqual(len(m), 100)
+        for key, fp in fps.items():
+            self.assertEqual(m.get(key), fp)
+        self.assertNotIn("https://ex.com/legacy", m)
+        self.assertIsNone(m.get("https://ex.com/missing"))
+        self.assertEqual(pickle.loads(pickle.dumps(m)).get("https://ex.com/7"), fps["https://ex.com/7"])
+
+    def test_fingerprint_map_from_manifest(self):
+        ix = MagicMock()
+        ix._list_docs.return_value = iter([
+            {"id": "d1", "url": "https://ex.com/a", "source": "website", "fingerprint": md5_hex("a")},
+            {"id": "d2", "url": "https://ex.com/b", "source": "website", "fingerprint": None},
+        ])
+        m = fingerprint_map(build_manifest(ix, key="url", source="website"))
+        self.assertEqual(m.get("https://ex.com/a"), md5_hex("a"))
+        self.assertNotIn("https://ex.com/b", m)
+
+
 class TestSitemapLastmod(unittest.TestCase):
     def test_parses_lastmod_pairs(self):
         import core.spider as spider
@@ -609,12 +645,12 @@ class TestSitemapLastmod(unittest.TestCase):
             b'<url><loc>https://ex.com/b</loc></url>'
             b'</urlset>'
         )
-        orig = spider._download
-        spider._download = lambda url, session=None: xml
+        orig = spider._open_sitemap
+        spider._open_sitemap = lambda url, session=None: nullcontext(io.BytesIO(xml))
         try:
             pairs = spider.sitemap_to_urls_with_meta("https://ex.com/sitemap.xml")
         finally:
-            spider._download = orig
+            spider._open_sitemap = orig
         d = dict(pairs)
         self.assertEqual(d["https://ex.com/a"], "2024-01-01")
         self.assertIsNone(d["https://ex.com/b"])
@@ -8,8 +8,9 @@ It must instead log the failure and return False so the caller can skip the
 doc and continue.
 """
 import sys
+import threading
+import time
 import unittest
-from collections import OrderedDict
 from http.client import RemoteDisconnected
 from unittest.mock import MagicMock
 
@@ -17,7 +18,10 @@ import requests
 
 sys.modules.setdefault('cairosvg', MagicMock())
 
+from omegaconf import OmegaConf
+
 from core.indexer import Indexer
+from core.utils import LRUCache
 
 
 def _make_indexer():
@@ -30,7 +34,8 @@ def _make_indexer():
     ix.api_key = "test_key"
     ix.x_source = "vectara-ingest-test"
     ix.session = MagicMock()
-    ix._doc_exists_cache = OrderedDict()
+    ix._doc_exists_cache = LRUCache()
+    ix.cfg = OmegaConf.create({'vectara': {}})
     return ix
 
 
@@ -66,6 +71,77 @@ class TestDeleteDoc(unittest.TestCase):
 
         self.assertFalse(ix.delete_doc("doc-1"))
 
+    def test_cache_lookups_race_deletes_on_other_threads(self):
+        ix = _make_indexer()
+        ix.session.delete.return_value = MagicMock(status_code=204)
+        ix.session.get.return_value = MagicMock(status_code=200)
+        doc_ids = [f"d{i}" for i in range(200)]
+        done, errors = threading.Event(), []
+
+        def _lookups():
+            try:
+                while not done.is_set():
+                    for doc_id in doc_ids:
+                        ix._does_doc_exist(doc_id)
+            except Exception as e:
+                errors.append(e)
+
+        reader = threading.Thread(target=_lookups)
+        reader.start()
+        try:
+            for _ in range(5):
+                self.assertTrue(all(ix.delete_docs(doc_ids, num_threads=8, max_per_second=0).values()))
+        finally:
+            done.set()
+            reader.join()
+        self.assertEqual(errors, [])
+        self.assertLessEqual(len(ix._doc_exists_cache), ix._doc_exists_cache.max_size)
+
+
+class TestDeleteDocs(unittest.TestCase):
+    """Indexer.delete_docs: the bulk path used by the remove_old_content passes."""
+
+    def test_returns_per_id_outcomes_in_order(self):
+        ix = _make_indexer()
+        ix.delete_doc = MagicMock(side_effect=lambda doc_id: doc_id != "bad")
+        outcomes = ix.delete_docs(["a", "bad", "b", "a"])
+        self.assertEqual(outcomes, {"a": True, "bad": False, "b": True})
+        self.assertEqual(list(outcomes), ["a", "bad", "b"])
+        self.assertEqual(ix.delete_doc.call_count, 3)   # duplicates deleted once
+
+    def test_runs_deletes_concurrently_up_to_num_threads(self):
+        ix = _make_indexer()
+        active, peak, lock = [0], [0], threading.Lock()
+
+        def _delete(doc_id):
+            with lock:
+                active[0] += 1
+                peak[0] = max(peak[0], active[0])
+            time.sleep(0.02)
+            with lock:
+                active[0] -= 1
+            return True
+
+        ix.delete_doc = _delete
+        outcomes = ix.delete_docs([f"d{i}" for i in range(20)], num_threads=4, max_per_second=0)
+        self.assertTrue(all(outcomes.values()))
+        self.assertEqual(peak[0], 4)
+
+    def test_rate_limit_and_unexpected_errors(self):
+        ix = _make_indexer()
+
+        def _delete(doc_id):
+            if doc_id == "boom":
+                raise RuntimeError("unexpected")
+            return True
+
+        ix.delete_doc = _delete
+        st = time.monotonic()
+        outcomes = ix.delete_docs(["a", "b", "c", "boom"], num_threads=4, max_per_second=2)
+        self.assertGreaterEqual(time.monotonic() - st, 0.9)
+        self.assertEqual(outcomes["boom"], False)
+        self.assertEqual(ix.delete_docs([]), {})
+
 
 if __name__ == "__main__":
     unittest.main()
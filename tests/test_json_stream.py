@@ -0,0 +1,87 @@
+"""Tests for streaming JSON request bodies (core/json_stream.py)."""
+import base64
+import json
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+sys.modules.setdefault('cairosvg', MagicMock())
+
+from core.json_stream import Base64Bytes, StreamingJSONBody
+from tests.indexer_factory import make_indexer
+
+
+class TestStreamingJSONBody(unittest.TestCase):
+    def test_matches_json_dumps_without_binary(self):
+        doc = {'id': 'd', 'type': 'core', 'metadata': {'title': 'Café ☃', 'n': 3, 'f': 1.5,
+                                                         'ok': True, 'none': None, 1: 'int key'},
+               'document_parts': [{'text': 'line "one"\n'}, {'text': ''}], 'empty': {}, 'list': []}
+        body = StreamingJSONBody(doc, chunk_size=8)
+        expected = json.dumps(doc).encode()
+        self.assertEqual(b"".join(body), expected)
+        self.assertEqual(len(body), len(expected))
+
+    def test_base64_leaves_are_encoded_in_slices(self):
+        raw = bytes(range(256)) * 1000 + b"xy"   # not a multiple of 3, spans several slices
+        doc = {'id': 'd', 'images': [{'id': 'img', 'image_data': {'data': Base64Bytes(raw), 'mime_type': 'image/png'}}]}
+        body = StreamingJSONBody(doc, chunk_size=1024)
+        chunks = list(body)
+        self.assertGreater(len(chunks), 1)
+        parsed = json.loads(b"".join(chunks))
+        self.assertEqual(base64.b64decode(parsed['images'][0]['image_data']['data']), raw)
+        self.assertEqual(len(body), sum(len(c) for c in chunks))
+        self.assertEqual(body.bytes_streamed, len(body))
+
+    def test_body_is_reiterable_for_retries(self):
+        body = StreamingJSONBody({'images': [Base64Bytes(b"abc")]})
+        self.assertEqual(b"".join(body), b"".join(body))
+
+    def test_unserializable_value_raises_on_size(self):
+        with self.assertRaises(TypeError):
+            len(StreamingJSONBody({'x': object()}))
+
+
+class TestIndexerStreamsImageDocuments(unittest.TestCase):
+    def _make_indexer(self):
+        ix = make_indexer(session=MagicMock(), add_image_bytes=True)
+        ix.session.post.return_value = MagicMock(status_code=201)
+        return ix
+
+    def _index(self, ix, image=b"\x89PNG\r\n\x1a\n" + b"\x00" * 5000):
+        return ix.index_segments(
+            doc_id="doc1", texts=["a picture of a cat"],
+            metadatas=[{'element_type': 'image', 'image_id': 'img0'}],
+            doc_metadata={'url': 'https://example.test/p'}, doc_title="Page",
+            image_bytes=[('img0', image)],
+        )
+
+    def test_image_document_is_posted_as_streaming_body(self):
+        ix = self._make_indexer()
+        image = b"\x89PNG\r\n\x1a\n" + b"\x00" * 5000
+        self.assertTrue(self._index(ix, image))
+        data = ix.session.post.call_args.kwargs['data']
+        self.assertIsInstance(data, StreamingJSONBody)
+        body = json.loads(b"".join(data))
+        self.assertEqual(base64.b64decode(body['images'][0]['image_data']['data']), image)
+
+    def test_store_docs_writes_streamed_json(self):
+        ix = self._make_indexer()
+        with tempfile.TemporaryDirectory() as d:
+            ix.store_docs = True
+            ix.store_docs_folder = d
+            self.assertTrue(self._index(ix))
+            with open(f"{d}/doc1.json") as f:
+                stored = json.load(f)
+        self.assertEqual(stored['images'][0]['id'], 'img0')
+
+    def test_text_document_still_posts_a_string(self):
+        ix = self._make_indexer()
+        self.assertTrue(ix.index_segments(doc_id="doc2", texts=["hello"],
+                                          metadatas=[{'element_type': 'text'}],
+                                          doc_metadata={'url': 'https://example.test/p'}))
+        self.assertIsInstance(ix.session.post.call_args.kwargs['data'], str)
+
+
+if __name__ == "__main__":
+    unittest.main()
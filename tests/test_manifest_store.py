@@ -0,0 +1,128 @@
+"""Tests for the persistent local corpus manifest (vectara.manifest_cache, core/manifest_store.py)."""
+import os
+import pickle
+import sys
+import tempfile
+import time
+import unittest
+from unittest.mock import MagicMock
+
+sys.modules.setdefault('cairosvg', MagicMock())
+
+from core.incremental import build_manifest
+from core.manifest_store import ManifestStore, manifest_record
+from tests.indexer_factory import make_indexer
+from tests.loadtest.mock_vectara import MockServices, MockVectaraStore
+
+
+class TestManifestStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ManifestStore(os.path.join(self.tmp.name, "corpus_manifest.db"), "c")
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_freshness_needs_a_listing_within_ttl_and_matching_count(self):
+        self.assertFalse(self.store.is_fresh(3600, 0))
+        self.store.replace_all([manifest_record("a", {'url': 'https://x/a', 'last_updated': 1700000000})])
+        self.assertTrue(self.store.is_fresh(3600, 1))
+        self.assertFalse(self.store.is_fresh(3600, 2))
+        self.assertFalse(self.store.is_fresh(3600, None))
+        self.store.upsert("b", {})
+        self.assertTrue(self.store.is_fresh(3600, 2))
+        self.assertFalse(self.store.is_fresh(1e-9, 2))
+        self.assertTrue(self.store.is_fresh(0, 2))   # ttl 0: no age limit
+
+    def test_records_round_trip_types(self):
+        self.store.replace_all([manifest_record("a", {'url': 'https://x/a', 'fingerprint': 'f',
+                                                      'last_updated': 1700000000, 'other': 'dropped'})])
+        [record] = list(self.store.records())
+        self.assertEqual(record['fingerprint'], 'f')
+        self.assertEqual(record['last_updated'], 1700000000)
+        self.assertIsNone(record['pub_date'])
+        self.assertNotIn('other', record)
+
+    def test_interrupted_refresh_is_not_fresh(self):
+        def _listing():
+            yield manifest_record("a", {})
+            raise RuntimeError("listing failed")
+
+        with self.assertRaises(RuntimeError):
+            self.store.replace_all(_listing(), batch_size=1)
+        self.assertIsNone(self.store.listed_at())
+
+    def test_pickles(self):
+        self.store.upsert("a", {})
+        self.assertEqual(pickle.loads(pickle.dumps(self.store)).count(), 1)
+
+
+def _make_indexer(api_url, store):
+    return make_indexer(api_url, manifest_store=store, manifest_ttl_seconds=3600)
+
+
+def _doc(doc_id):
+    return {'id': doc_id, 'type': 'structured',
+            'metadata': {'url': f"https://example.test/{doc_id}", 'source': 'test', 'fingerprint': f"fp-{doc_id}"},
+            'sections': [{'text': f"text of {doc_id}"}]}
+
+
+class TestIndexerManifestCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.store = ManifestStore(os.path.join(self.tmp.name, "corpus_manifest.db"), "c")
+
+    def tearDown(self):
+        self.store.close()
+        self.tmp.cleanup()
+
+    def test_lists_once_then_serves_write_through_store(self):
+        vectara = MockVectaraStore()
+        with MockServices(vectara, num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url, self.store)
+            for doc_id in ("a", "b"):
+                self.assertTrue(ix.index_document(_doc(doc_id)))
+            self.assertEqual(len(list(ix._list_docs())), 2)          # first run: full listing
+            self.assertEqual(vectara.stats()['list_pages'], 1)
+
+            self.assertTrue(ix.index_document(_doc("c")))
+            self.assertTrue(ix.delete_doc("a"))
+            manifest = build_manifest(ix, key="url", source="test")
+            self.assertEqual(vectara.stats()['list_pages'], 1)  # served locally
+            self.assertEqual(sorted(e.doc_id for e in manifest.values()), ["b", "c"])
+            self.assertEqual(manifest["https://example.test/c"].fingerprint, "fp-c")
+
+    def test_count_mismatch_triggers_relisting(self):
+        vectara = MockVectaraStore()
+        with MockServices(vectara, num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url, self.store)
+            self.assertTrue(ix.index_document(_doc("a")))
+            list(ix._list_docs())
+            # Another tool adds a document behind our back
+            other = _make_indexer(services.vectara_url, None)
+            self.assertTrue(other.index_document(_doc("z")))
+            self.assertEqual({d['id'] for d in ix._list_docs()}, {"a", "z"})
+            self.assertEqual(vectara.stats()['list_pages'], 2)
+
+    def test_failed_listing_leaves_store_unfilled(self):
+        ix = _make_indexer("https://api.example.test", self.store)
+        ix.session = MagicMock()
+        ix.session.post.return_value = MagicMock(status_code=200, json=lambda: {'used_docs': 0})
+        ix.session.get.return_value = MagicMock(status_code=500)
+        self.assertEqual(list(ix._list_docs()), [])
+        self.assertIsNone(self.store.listed_at())
+
+    def test_expired_store_is_relisted(self):
+        vectara = MockVectaraStore()
+        with MockServices(vectara, num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url, self.store)
+            list(ix._list_docs())
+            ix.manifest_ttl_seconds = 1e-6
+            time.sleep(0.01)
+            list(ix._list_docs())
+            self.assertEqual(vectara.stats()['list_pages'], 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,132 @@
+"""Tests for the offline load-test harness (tests/loadtest).
+
+The mock Vectara API is only useful if the real Indexer request code behaves against it
+the way it does against Vectara, so these drive Indexer's HTTP methods (with a real
+retrying session) at a live mock server rather than asserting on handler internals.
+"""
+import os
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock
+
+sys.modules.setdefault('cairosvg', MagicMock())
+
+import requests
+
+from tests.indexer_factory import make_indexer
+from tests.loadtest.benchmark import build_config, summarize
+from tests.loadtest.mock_vectara import MockServices, MockVectaraStore
+
+
+def _make_indexer(api_url, reindex=False):
+    return make_indexer(api_url, corpus_key="bench", reindex=reindex)
+
+
+def _doc(doc_id, text="hello world"):
+    return {'id': doc_id, 'type': 'structured', 'metadata': {'url': f'https://x.test/{doc_id}'},
+            'sections': [{'text': text}]}
+
+
+class TestMockVectaraApi(unittest.TestCase):
+    def setUp(self):
+        self.store = MockVectaraStore()
+        self.services = MockServices(self.store, num_pages=3).start()
+        self.ix = _make_indexer(self.services.vectara_url)
+
+    def tearDown(self):
+        self.services.stop()
+
+    def test_index_get_list_delete_roundtrip(self):
+        for i in range(5):
+            self.assertTrue(self.ix.index_document(_doc(f"doc-{i}")))
+        self.assertTrue(self.ix._does_doc_exist("doc-3"))
+        self.assertEqual(len(list(self.ix._list_docs())), 5)
+        self.assertTrue(self.ix.delete_doc("doc-3"))
+        self.assertFalse(self.ix.delete_doc("doc-3"))   # 404 the second time
+        self.assertEqual(sorted(self.store.documents("bench")),
+                         ["doc-0", "doc-1", "doc-2", "doc-4"])
+
+    def test_list_paginates_with_page_key(self):
+        for i in range(7):
+            self.store.create_document("bench", f'{{"id": "d{i}", "type": "core"}}'.encode())
+        first = requests.get(f"{self.services.vectara_url}/v2/corpora/bench/documents",
+                             params={"limit": 3}).json()
+        self.assertEqual(len(first['documents']), 3)
+        self.assertTrue(first['metadata']['page_key'])
+        self.assertEqual(len(list(self.ix._list_docs())), 7)   # Indexer follows page_key to the end
+
+    def test_conflict_is_replaced_only_with_reindex(self):
+        self.assertTrue(self.ix.index_document(_doc("dup")))
+        self.assertTrue(self.ix.index_document(_doc("dup", "changed")))   # 409 -> treated as indexed
+        self.assertEqual(self.store.stats()['status_counts'].get(409), 1)
+
+        reindexer = _make_indexer(self.services.vectara_url, reindex=True)
+        self.store.conflict_status = 412
+        self.assertTrue(reindexer.index_document(_doc("dup", "changed")))
+        counts = self.store.stats()['status_counts']
+        self.assertEqual((counts.get(412), counts.get(204)), (1, 1))
+
+    def test_oversized_document_is_rejected_with_400(self):
+        self.store.max_document_bytes = 200
+        self.assertFalse(self.ix.index_document(_doc("big", "x" * 500)))
+        self.assertEqual(self.ix._last_response_status, 400)
+
+    def test_429_is_retried_by_the_session(self):
+        self.store.rate_limit_every = 2
+        self.assertTrue(self.ix.index_document(_doc("a")))
+        self.assertTrue(self.ix.index_document(_doc("b")))   # 429 first, then 201 on retry
+        self.assertEqual(self.store.stats()['status_counts'].get(429), 1)
+        self.assertEqual(len(self.store.documents("bench")), 2)
+
+    def test_upload_file_multipart(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".md", delete=False) as f:
+            f.write("# Title\n\nbody")
+        try:
+            ok, error = self.ix._upload_file(f.name, uri="https://x.test/a.md",
+                                             metadata={'source': 'bench'}, id="file-1")
+        finally:
+            os.unlink(f.name)
+        self.assertTrue(ok, error)
+        doc = self.store.documents("bench")["file-1"]
+        self.assertEqual(doc['metadata'], {'source': 'bench'})
+        self.assertEqual(doc['size'], len("# Title\n\nbody"))
+
+
+class TestMockLLMAndSite(unittest.TestCase):
+    def test_llm_and_static_site(self):
+        with MockServices(num_pages=4) as services:
+            r = requests.post(f"{services.llm_url}/chat/completions",
+                              json={"model": "m", "messages": [{"role": "user", "content": "Summarize"}]})
+            self.assertEqual(r.status_code, 200)
+            self.assertTrue(r.json()['choices'][0]['message']['content'])
+            self.assertEqual(services.llm_calls, 1)
+
+            sitemap = requests.get(f"{services.site_url}/sitemap.xml").text
+            self.assertEqual(sitemap.count("<loc>"), 4)
+            page = requests.get(f"{services.site_url}/page/2.html")
+            self.assertIn("Test page 2", page.text)
+            self.assertEqual(requests.get(f"{services.site_url}/missing").status_code, 404)
+
+
+class TestBenchmarkHelpers(unittest.TestCase):
+    def test_build_config_writes_inputs(self):
+        with tempfile.TemporaryDirectory() as d:
+            cfg = build_config("folder", "http://v", "http://l/v1", "http://s", d, docs=3)
+            self.assertEqual(len(os.listdir(cfg['folder_crawler']['path'])), 3)
+            cfg = build_config("csv", "http://v", "http://l/v1", "http://s", d, docs=3)
+            with open(cfg['csv_crawler']['file_path']) as f:
+                self.assertEqual(len(f.readlines()), 1 + 3 * 20)
+        self.assertEqual(cfg['doc_processing']['model_config']['text']['base_url'], "http://l/v1")
+
+    def test_summarize(self):
+        result = {"crawler": "csv", "elapsed_sec": 2.0, "latencies": [0.01 * i for i in range(1, 101)],
+                  "peak_rss_mb": 100.0, "peak_child_rss_mb": 0.0}
+        s = summarize(result, accepted_docs=100)
+        self.assertEqual(s['docs_per_sec'], 50.0)
+        self.assertEqual(s['p50_ms'], 510.0)
+        self.assertEqual(s['p99_ms'], 990.0)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,142 @@
+"""Tests for near-duplicate page detection (core/near_duplicates.py, Indexer.index_url)."""
+
+import importlib.machinery
+import os
+import pickle
+import random
+import sys
+import tempfile
+import unittest
+from concurrent.futures import Future
+from unittest.mock import MagicMock, patch
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+_pw_mock = MagicMock()
+_pw_mock.__spec__ = importlib.machinery.ModuleSpec("playwright", None)
+sys.modules.setdefault("playwright", _pw_mock)
+sys.modules.setdefault("playwright.sync_api", MagicMock())
+
+from core.near_duplicates import NearDuplicateIndex, _bands, hamming_distance, simhash  # noqa: E402
+from core.utils import LRUCache  # noqa: E402
+
+_VOCABULARY = [f"word{i}" for i in range(2000)]
+
+
+def _article(seed, words=600):
+    rng = random.Random(seed)
+    return " ".join(rng.choice(_VOCABULARY) for _ in range(words))
+
+
+class TestSimhash(unittest.TestCase):
+    def test_small_edits_stay_close_and_other_pages_are_far(self):
+        page = _article(1)
+        print_view = "Print this page. " + page.replace("word7 ", "word8 ", 1) + " Back to top."
+        self.assertLessEqual(hamming_distance(simhash(page), simhash(print_view)), 3)
+        self.assertGreater(hamming_distance(simhash(page), simhash(_article(2))), 10)
+
+    def test_case_and_whitespace_do_not_matter(self):
+        page = _article(3)
+        self.assertEqual(simhash(page), simhash("\n  " + page.upper().replace(" ", "\t")))
+
+    def test_short_text_has_no_fingerprint(self):
+        self.assertIsNone(simhash("Sign in to continue"))
+
+    def test_bands_cover_all_bits(self):
+        for distance in range(8):
+            bands = _bands(distance)
+            self.assertEqual(len(bands), distance + 1)
+            self.assertEqual(sum(width for _, width in bands), 64)
+
+
+class TestNearDuplicateIndex(unittest.TestCase):
+    def test_copy_is_matched_to_first_page(self):
+        index = NearDuplicateIndex(max_distance=3)
+        page = _article(1)
+        duplicate_of, fingerprint = index.lookup("a", page)
+        self.assertIsNone(duplicate_of)
+        # Nothing is matched until the page is added (after its upload succeeded)
+        self.assertIsNone(index.lookup("a-utm", page)[0])
+        index.add("a", "https://ex.com/a", fingerprint)
+        index.add("b", "https://ex.com/b", index.lookup("b", _article(2))[1])
+        self.assertEqual(index.lookup("a-utm", page + " share")[0], "https://ex.com/a")
+        # A page is never a duplicate of its own earlier fingerprint
+        self.assertIsNone(index.lookup("a", page + " updated")[0])
+        self.assertEqual(index.duplicates, 1)
+        index.remove("a")
+        self.assertIsNone(index.lookup("a-utm", page)[0])
+
+    def test_store_is_shared_across_processes_and_runs(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "out", "near_duplicates.db")
+            first = NearDuplicateIndex(db_path=db_path, scope="corpus")
+            first.add("a", "https://ex.com/a", simhash(_article(1)))
+            # A pickled copy (a Ray worker) or a later run reads the same file
+            second = pickle.loads(pickle.dumps(first))
+            self.assertEqual(second.lookup("print-a", _article(1))[0], "https://ex.com/a")
+            other_corpus = NearDuplicateIndex(db_path=db_path, scope="other")
+            self.assertIsNone(other_corpus.lookup("print-a", _article(1))[0])
+            second.remove("a")
+            self.assertIsNone(first.lookup("print-a", _article(1))[0])
+
+
+class TestIndexUrlSkipsNearDuplicates(unittest.TestCase):
+    def _indexer(self):
+        from core.indexer import Indexer
+
+        ix = Indexer.__new__(Indexer)
+        ix.last_skip_reason = None
+        ix.parse_tables = False
+        ix.remove_code = True
+        ix.process_locally = False
+        ix.near_duplicates = NearDuplicateIndex()
+        ix._incremental_skip = MagicMock(side_effect=AssertionError("no work after a duplicate is found"))
+        return ix
+
+    def test_duplicate_skipped_before_any_processing(self):
+        ix = self._indexer()
+        page = _article(1)
+        ix.near_duplicates.add("ex-com-a", "https://ex.com/a", simhash(page))
+        ix.fetch_url = MagicMock(return_value={"type": "html", "url": "https://ex.com/a?print=1",
+                                               "html": "<html></html>", "text": page, "title": "A"})
+        self.assertTrue(ix.index_url("https://ex.com/a?print=1", metadata={"url": "https://ex.com/a?print=1"}))
+        self.assertEqual(ix.last_skip_reason, "near_duplicate")
+        self.assertTrue(ix.was_skipped())
+
+    def test_page_is_added_only_after_its_upload_succeeded(self):
+        page = _article(1)
+
+        def _index(uploads):
+            """An _index_url that found no duplicate and uploaded (or queued) with the given outcomes."""
+            def _index_url(ix, *args, **kwargs):
+                ix._near_duplicate_candidate = ("ex-com-a", "https://ex.com/a", simhash(page))
+                for ok in uploads:
+                    future = Future()
+                    ix._upload_ticket.add("ex-com-a", future)
+                    pending.append((future, ok))
+                return uploads != [False]
+            return _index_url
+
+        for uploads, indexed in (([False], False), ([True], True), ([True, False], False)):
+            ix, pending = self._indexer(), []
+            with patch.object(type(ix), "_index_url", _index(uploads)):
+                ix.index_url("https://ex.com/a", metadata={"url": "https://ex.com/a"})
+            self.assertIsNone(ix.near_duplicates.lookup("copy", page)[0])   # uploads still in flight
+            for future, ok in pending:
+                future.set_result((ok, None))
+            self.assertEqual(ix.near_duplicates.lookup("copy", page)[0], "https://ex.com/a" if indexed else None)
+
+    def test_deleted_doc_is_forgotten(self):
+        ix = self._indexer()
+        ix.manifest_store = None
+        ix._doc_exists_cache = LRUCache()
+        ix.api_key, ix.api_url, ix.corpus_key, ix.x_source = "k", "https://api", "c", "t"
+        ix.session = MagicMock()
+        ix.session.delete.return_value = MagicMock(status_code=204)
+        ix.near_duplicates.add("ex-com-a", "https://ex.com/a", simhash(_article(1)))
+        self.assertTrue(ix.delete_doc("ex-com-a"))
+        self.assertIsNone(ix.near_duplicates.lookup("copy", _article(1))[0])
+
+
+if __name__ == "__main__":
+    unittest.main()
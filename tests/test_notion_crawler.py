@@ -63,7 +63,7 @@ class TestNotionFetchFailureNotDeleted(unittest.TestCase):
         indexer.source_tag = "notion"
         indexer._list_docs.return_value = [_corpus_doc("p_ok"), _corpus_doc("p_fail")]
         indexer.was_skipped.return_value = False
-        indexer.delete_doc.return_value = True
+        indexer.delete_docs.side_effect = lambda ids: {i: True for i in ids}
 
         def _blocks_list(page_id):
             if page_id == "p_fail":
@@ -80,7 +80,7 @@ class TestNotionFetchFailureNotDeleted(unittest.TestCase):
                    return_value=[_page("p_ok"), _page("p_fail")]):
             crawler.crawl()
 
-        indexer.delete_doc.assert_not_called()
+        self.assertEqual([i for c in indexer.delete_docs.call_args_list for i in c.args[0]], [])
 
     def test_page_gone_from_source_is_deleted(self):
         # Sanity check the deletion pass still works: a corpus doc absent from Notion is removed.
@@ -88,7 +88,7 @@ class TestNotionFetchFailureNotDeleted(unittest.TestCase):
         indexer.source_tag = "notion"
         indexer._list_docs.return_value = [_corpus_doc("p_ok"), _corpus_doc("p_gone")]
         indexer.was_skipped.return_value = False
-        indexer.delete_doc.return_value = True
+        indexer.delete_docs.side_effect = lambda ids: {i: True for i in ids}
 
         notion = MagicMock()
         notion.blocks.children.list.return_value = {
@@ -100,7 +100,7 @@ class TestNotionFetchFailureNotDeleted(unittest.TestCase):
              patch("crawlers.notion_crawler.list_all_pages", return_value=[_page("p_ok")]):
             crawler.crawl()
 
-        indexer.delete_doc.assert_called_once_with("p_gone")
+        indexer.delete_docs.assert_called_once_with(["p_gone"])
 
 
 if __name__ == "__main__":
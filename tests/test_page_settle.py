@@ -0,0 +1,122 @@
+"""Tests for adaptive page settling (core/page_settle.py, WebContentExtractor._settle)."""
+
+import importlib.machinery
+import sys
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+_pw_mock = MagicMock()
+_pw_mock.__spec__ = importlib.machinery.ModuleSpec("playwright", None)
+sys.modules.setdefault("playwright", _pw_mock)
+sys.modules.setdefault("playwright.sync_api", MagicMock())
+
+from core import page_settle  # noqa: E402
+from core.page_settle import OBSERVE_JS, QUIET_MS_JS, SCROLL_JS, settle_page  # noqa: E402
+from core.stage_stats import SETTLE, StageStats  # noqa: E402
+
+
+class _FakePage:
+    """A page on a simulated clock (ms): the network goes idle at idle_at, the DOM changes
+    at each time in mutations, and each scroll makes the page heights[i] tall."""
+
+    def __init__(self, idle_at=100, mutations=(), heights=(1000,)):
+        self.now = 0.0
+        self.idle_at = idle_at
+        self.mutations = sorted(mutations)
+        self.heights = list(heights)
+        self.scrolls = 0
+        self.restarted = 0.0
+
+    def clock(self):
+        return self.now / 1000
+
+    def _last_change(self):
+        return max([self.restarted] + [t for t in self.mutations if t <= self.now])
+
+    def evaluate(self, script):
+        if script == OBSERVE_JS:
+            self.restarted = self.now
+            return None
+        if script == QUIET_MS_JS:
+            return self.now - self._last_change()
+        if script == SCROLL_JS:
+            height = self.heights[min(self.scrolls, len(self.heights) - 1)]
+            self.scrolls += 1
+            self.restarted = self.now
+            return height
+        raise AssertionError(script)
+
+    def wait_for_load_state(self, state, timeout):
+        if self.idle_at is not None and self.now + timeout >= self.idle_at:
+            self.now = max(self.now, self.idle_at)
+            return
+        self.now += timeout
+        raise TimeoutError("networkidle")
+
+    def wait_for_timeout(self, ms):
+        self.now += ms
+
+
+def _settle(page, post_load_timeout=5, quiet_ms=500):
+    with patch.object(page_settle.time, "monotonic", page.clock):
+        return settle_page(page, post_load_timeout, quiet_ms)
+
+
+class TestSettlePage(unittest.TestCase):
+    def test_quiet_page_settles_without_the_full_wait(self):
+        page = _FakePage(idle_at=100, mutations=[50, 300])
+        seconds, outcome = _settle(page)
+        self.assertEqual(outcome, "settled")
+        # 300ms last change + 500ms quiet, then one scroll and a quiet period to see it does not grow
+        self.assertAlmostEqual(seconds, 1.3, places=2)
+        self.assertEqual(page.scrolls, 2)
+
+    def test_changing_page_waits_up_to_post_load_timeout(self):
+        page = _FakePage(idle_at=100, mutations=range(0, 60000, 200))
+        seconds, outcome = _settle(page, post_load_timeout=3)
+        self.assertEqual(outcome, "timeout")
+        self.assertGreaterEqual(seconds, 3)
+
+    def test_busy_network_settles_on_a_longer_quiet_period(self):
+        page = _FakePage(idle_at=None)
+        _, outcome = _settle(page)
+        self.assertEqual(outcome, "busy network")
+
+    def test_scrolls_until_the_page_stops_growing(self):
+        page = _FakePage(heights=[1000, 2000, 3000, 3000])
+        _settle(page)
+        self.assertEqual(page.scrolls, 4)
+
+
+class TestExtractorSettle(unittest.TestCase):
+    def _extractor(self, **vectara):
+        from core.web_content_extractor import WebContentExtractor
+
+        cfg = SimpleNamespace(vectara=SimpleNamespace(get=lambda key, default=None: vectara.get(key, default)))
+        return WebContentExtractor(cfg=cfg, post_load_timeout=2, browser=MagicMock(name="browser"))
+
+    def test_settle_time_is_a_stage(self):
+        extractor = self._extractor()
+        stats = StageStats()
+        with patch("core.web_content_extractor.settle_page", return_value=(0.8, "settled")) as settle:
+            stats.run_document(extractor._settle, MagicMock(), "https://ex.com/")
+        settle.assert_called_once()
+        self.assertEqual(settle.call_args.args[1:], (2, 500))
+        self.assertEqual(stats.summary()[SETTLE]["docs"], 1)
+
+    def test_fixed_mode_waits_post_load_timeout(self):
+        extractor = self._extractor(page_settle="fixed")
+        page = MagicMock()
+        with patch.object(extractor, "_scroll_to_bottom") as scroll, \
+                patch("core.web_content_extractor.settle_page") as settle:
+            extractor._settle(page, "https://ex.com/")
+        page.wait_for_timeout.assert_called_once_with(2000)
+        scroll.assert_called_once_with(page)
+        settle.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+"""Tests for streaming dispatch to Ray actors (core/ray_dispatch.py)."""
+
+import unittest
+from unittest.mock import MagicMock, patch
+
+from core.ray_dispatch import stream_actor_tasks
+
+
+class _FakeCluster:
+    """Stands in for ray.wait / ray.get: each actor runs its tasks one after another on a virtual
+    clock, item durations given by `durations`."""
+
+    def __init__(self, durations):
+        self.durations = durations
+        self.clock = 0.0
+        self.actor_free_at = {}
+        self.finish = {}
+        self.max_queued = {}
+        self.queued = {}
+
+    def submit(self, actor, item):
+        start = max(self.clock, self.actor_free_at.get(actor, 0.0))
+        self.actor_free_at[actor] = start + self.durations[item]
+        ref = (actor, item)
+        self.finish[ref] = self.actor_free_at[actor]
+        self.queued[actor] = self.queued.get(actor, 0) + 1
+        self.max_queued[actor] = max(self.max_queued.get(actor, 0), self.queued[actor])
+        return ref
+
+    def wait(self, refs, num_returns=1):
+        ref = min(refs, key=self.finish.__getitem__)
+        self.clock = self.finish[ref]
+        self.queued[ref[0]] -= 1
+        return [ref], [r for r in refs if r != ref]
+
+    def get(self, ref):
+        return f"done {ref[1]}"
+
+
+class TestStreamActorTasks(unittest.TestCase):
+    def _run(self, durations, actors=("a0", "a1"), **kwargs):
+        cluster = _FakeCluster(durations)
+        fake_ray = MagicMock(wait=cluster.wait, get=cluster.get)
+        completed = []
+        with patch("core.ray_dispatch.ray", fake_ray):
+            for item, result in stream_actor_tasks(list(actors), iter(durations), cluster.submit, **kwargs):
+                completed.append((item, result, cluster.clock))
+        return cluster, completed
+
+    def test_slow_task_does_not_hold_up_other_actors(self):
+        durations = {"slow": 90.0, **{f"p{i}": 1.0 for i in range(10)}}
+        cluster, completed = self._run(durations)
+        finished_at = {item: t for item, _, t in completed}
+        self.assertEqual(len(completed), 11)
+        self.assertEqual(completed[0][1], "done p0")
+        # Only the page queued behind the slow one on its actor waits for it; the rest finish
+        # on the other actor long before the 90s navigation does
+        late = [item for item, t in finished_at.items() if t > 20]
+        self.assertEqual(sorted(late), ["p1", "slow"])
+        self.assertLessEqual(max(cluster.max_queued.values()), 2)
+
+    def test_shutdown_check_runs_before_each_submission(self):
+        check = MagicMock(side_effect=[None, None, RuntimeError("stop")])
+        with self.assertRaises(RuntimeError):
+            self._run({f"p{i}": 1.0 for i in range(5)}, check_shutdown=check)
+        self.assertEqual(check.call_count, 3)
+
+    def test_no_items(self):
+        self.assertEqual(self._run({})[1], [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Tests for per-domain rendering modes (core/render_modes.py, WebContentExtractor.fetch_url)."""
+
+import importlib.machinery
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+_pw_mock = MagicMock()
+_pw_mock.__spec__ = importlib.machinery.ModuleSpec("playwright", None)
+sys.modules.setdefault("playwright", _pw_mock)
+sys.modules.setdefault("playwright.sync_api", MagicMock())
+
+from core.render_modes import (  # noqa: E402
+    BROWSER, PROBE, STATIC, RenderModeBroker, RenderModes, create_render_modes
+)
+
+
+class TestRenderModeBroker(unittest.TestCase):
+    def test_mode_is_decided_after_sample_pages(self):
+        broker = RenderModeBroker(sample_pages=3)
+        for needed in (BROWSER, BROWSER):
+            self.assertEqual(broker.record("spa.ex.com", needed), (PROBE, False))
+        self.assertEqual(broker.record("spa.ex.com", BROWSER), (BROWSER, True))
+        for needed in (STATIC, STATIC, STATIC):
+            broker.record("docs.ex.com", needed)
+        for needed in (STATIC, BROWSER, STATIC):
+            broker.record("mixed.ex.com", needed)
+        self.assertEqual(broker.decisions(), {"spa.ex.com": BROWSER, "docs.ex.com": STATIC, "mixed.ex.com": PROBE})
+        # A decision is final for the run
+        self.assertEqual(broker.record("docs.ex.com", BROWSER), (STATIC, True))
+
+    def test_decisions_are_persisted(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            cfg = {"learn_render_mode": True, "render_mode_sample_pages": 1, "render_mode_store": True}
+            create_render_modes(cfg, tmp).record("https://spa.ex.com/a", BROWSER)
+            self.assertTrue(os.path.exists(os.path.join(tmp, "render_modes.db")))
+            self.assertEqual(create_render_modes(cfg, tmp).mode("https://spa.ex.com/b"), BROWSER)
+            self.assertIsNone(create_render_modes({}, tmp))
+
+
+class TestRenderModes(unittest.TestCase):
+    def test_decided_domains_need_no_broker_call(self):
+        broker = MagicMock(wraps=RenderModeBroker(sample_pages=1))
+        modes = RenderModes(broker)
+        self.assertEqual(modes.mode("https://ex.com/a"), PROBE)
+        modes.record("https://ex.com/a", STATIC)
+        broker.reset_mock()
+        self.assertEqual(modes.mode("https://EX.com/b"), STATIC)
+        broker.mode.assert_not_called()
+        # A worker's copy asks the broker again, then remembers
+        worker = pickle.loads(pickle.dumps(RenderModes(RenderModeBroker(sample_pages=1))))
+        self.assertEqual(worker.mode("https://ex.com/a"), PROBE)
+
+
+def _make_extractor(modes):
+    from core.web_content_extractor import WebContentExtractor
+
+    cfg = SimpleNamespace(vectara=SimpleNamespace(get=lambda key, default=None: default))
+    extractor = WebContentExtractor(cfg=cfg, browser=MagicMock(name="browser"))
+    extractor.render_modes = modes
+    return extractor
+
+
+def _html_response(text):
+    body = f"<html><title>T</title><body>{text}</body></html>".encode()
+    resp = MagicMock(status_code=200, ok=True, url="https://spa.ex.com/x", content=body,
+                     text=body.decode(), headers={"content-type": "text/html"})
+    return resp
+
+
+def _rendered(text):
+    return {"text": text, "html": "<html></html>", "title": "T", "url": "https://spa.ex.com/x",
+            "links": [], "images": [], "tables": []}, None
+
+
+class TestExtractorUsesRenderModes(unittest.TestCase):
+    def test_sparse_pages_teach_browser_mode_then_skip_the_static_get(self):
+        extractor = _make_extractor(RenderModes(RenderModeBroker(sample_pages=2)))
+        extractor._render = MagicMock(return_value=_rendered("rendered app text " * 100))
+        with patch("core.web_content_extractor.requests.get", return_value=_html_response("Loading...")) as get:
+            for _ in range(2):
+                self.assertEqual(extractor.fetch_url("https://spa.ex.com/x")["type"], "html")
+            self.assertEqual(get.call_count, 2)
+            extractor.fetch_url("https://spa.ex.com/y")
+            self.assertEqual(get.call_count, 2)
+        self.assertEqual(extractor._render.call_count, 3)
+
+    def test_static_mode_parses_short_pages_without_the_browser(self):
+        broker = RenderModeBroker(sample_pages=1)
+        broker.record("spa.ex.com", STATIC)
+        extractor = _make_extractor(RenderModes(broker))
+        extractor._render = MagicMock(side_effect=AssertionError("not rendered"))
+        with patch("core.web_content_extractor.requests.get", return_value=_html_response("Contact us")):
+            result = extractor.fetch_page_contents("https://spa.ex.com/contact")
+        self.assertIn("Contact us", result["text"])
+
+    def test_short_page_rendered_short_counts_as_static(self):
+        broker = RenderModeBroker(sample_pages=1)
+        extractor = _make_extractor(RenderModes(broker))
+        extractor._render = MagicMock(return_value=_rendered("Contact us"))
+        with patch("core.web_content_extractor.requests.get", return_value=_html_response("Contact us")):
+            extractor.fetch_url("https://spa.ex.com/contact")
+        self.assertEqual(broker.decisions(), {"spa.ex.com": STATIC})
+
+    def test_short_spa_page_counts_as_browser(self):
+        broker = RenderModeBroker(sample_pages=1)
+        extractor = _make_extractor(RenderModes(broker))
+        extractor._render = MagicMock(return_value=_rendered("Pricing plans for teams and enterprises " * 5))
+        with patch("core.web_content_extractor.requests.get", return_value=_html_response("")):
+            extractor.fetch_url("https://spa.ex.com/pricing")
+        self.assertEqual(broker.decisions(), {"spa.ex.com": BROWSER})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,111 @@
+"""Tests for the breadth-first link crawler (core.spider.iter_crawl / recursive_crawl)."""
+
+import sys
+import threading
+import time
+import unittest
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+
+import core.spider as spider  # noqa: E402
+
+_FILLER = "<p>" + "server rendered text " * 40 + "</p>"
+
+
+def _page(*links, text=_FILLER):
+    anchors = "".join(f'<a href="{link}">l</a>' for link in links)
+    return f"<html><body>{text}{anchors}</body></html>"
+
+
+class _FakeSite:
+    """Serves static HTML from a dict, tracking how many fetches overlap."""
+
+    def __init__(self, pages, delay=0.0):
+        self.pages = pages
+        self.delay = delay
+        self.fetched = []
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    def get(self, url, **kwargs):
+        with self.lock:
+            self.fetched.append(url)
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+        finally:
+            with self.lock:
+                self.active -= 1
+        body = self.pages.get(url)
+        response = MagicMock(ok=body is not None, url=url, content=(body or "").encode(),
+                             headers={"content-type": "text/html; charset=utf-8"})
+        response.__enter__.return_value = response
+        return response
+
+
+def _indexer(skip_static=False, rendered=None):
+    rendered = rendered or {}
+    return SimpleNamespace(
+        cfg=SimpleNamespace(vectara={}),
+        web_extractor=SimpleNamespace(skip_static_prefetch=skip_static),
+        fetch_page_contents=MagicMock(side_effect=lambda url: {"url": url, "links": rendered.get(url, [])}),
+    )
+
+
+class TestIterCrawl(unittest.TestCase):
+    def _crawl(self, site, indexer, depth, **kwargs):
+        with patch.object(spider.requests, "get", site.get):
+            return list(spider.iter_crawl("https://ex.com/", depth, [], [], indexer, **kwargs))
+
+    def test_levels_are_fetched_concurrently_and_deduplicated(self):
+        children = [f"https://ex.com/p{i}" for i in range(6)]
+        pages = {"https://ex.com/": _page(*children, "/p0#top", "https://ex.com/p%31", "guide.pdf")}
+        for i, child in enumerate(children):
+            pages[child] = _page(f"/deep{i}", "/")
+        site = _FakeSite(pages, delay=0.2)
+        urls = self._crawl(site, _indexer(), depth=2, workers=6)
+        self.assertEqual(urls[0], "https://ex.com/")
+        self.assertEqual(len(urls), 1 + 6 + 1 + 6)   # root, children, the pdf, one deep page each
+        self.assertIn("https://ex.com/guide.pdf", urls)
+        self.assertEqual(site.max_active, 6)
+        # depth 2: the deep pages are discovered but never fetched, nor is the pdf
+        self.assertNotIn("https://ex.com/deep0", site.fetched)
+        self.assertNotIn("https://ex.com/guide.pdf", site.fetched)
+
+    def test_sparse_pages_fall_back_to_the_browser(self):
+        site = _FakeSite({"https://ex.com/": _page("/static"),
+                          "https://ex.com/static": _page(text="<div id=app></div>")})
+        indexer = _indexer(rendered={"https://ex.com/static": ["/from-js"]})
+        urls = self._crawl(site, indexer, depth=2)
+        self.assertEqual(urls, ["https://ex.com/", "https://ex.com/static", "https://ex.com/from-js"])
+        indexer.fetch_page_contents.assert_called_once_with("https://ex.com/static")
+
+    def test_skip_static_prefetch_renders_every_page(self):
+        site = _FakeSite({})
+        indexer = _indexer(skip_static=True, rendered={"https://ex.com/": ["/a", "/b"]})
+        urls = self._crawl(site, indexer, depth=1)
+        self.assertEqual(urls, ["https://ex.com/", "https://ex.com/a", "https://ex.com/b"])
+        self.assertEqual(site.fetched, [])
+
+    def test_start_url_is_yielded_before_any_fetch(self):
+        site = _FakeSite({"https://ex.com/": _page("/a")})
+        with patch.object(spider.requests, "get", site.get):
+            crawl = spider.iter_crawl("https://ex.com/", 3, [], [], _indexer())
+            self.assertEqual(next(crawl), "https://ex.com/")
+            self.assertEqual(site.fetched, [])
+            crawl.close()
+
+    def test_recursive_crawl_returns_a_set(self):
+        site = _FakeSite({"https://ex.com/": _page("/a", "/a")})
+        with patch.object(spider.requests, "get", site.get):
+            found = spider.recursive_crawl("https://ex.com/", 1, [], [], _indexer(), visited={"https://ex.com/x"})
+        self.assertEqual(found, {"https://ex.com/", "https://ex.com/a", "https://ex.com/x"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,105 @@
+"""Tests for the concurrent, streaming sitemap walker (core.spider.iter_sitemap)."""
+
+import gzip
+import io
+import sys
+import threading
+import time
+import unittest
+from contextlib import contextmanager
+from unittest.mock import MagicMock, patch
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+
+import core.spider as spider  # noqa: E402
+
+NS = 'xmlns="http://www.sitemaps.org/schemas/sitemap/0.9"'
+
+
+def _urlset(*entries):
+    body = "".join(f"<url><loc>{loc}</loc>{f'<lastmod>{lm}</lastmod>' if lm else ''}</url>"
+                   for loc, lm in entries)
+    return f'<?xml version="1.0"?><urlset {NS}>{body}</urlset>'.encode()
+
+
+def _index(*children):
+    body = "".join(f"<sitemap><loc>{c}</loc></sitemap>" for c in children)
+    return f'<?xml version="1.0"?><sitemapindex {NS}>{body}</sitemapindex>'.encode()
+
+
+class _FakeSite:
+    """Serves sitemap bodies from a dict, tracking how many fetches overlap."""
+
+    def __init__(self, files, delay=0.0):
+        self.files = files
+        self.delay = delay
+        self.active = 0
+        self.max_active = 0
+        self.lock = threading.Lock()
+
+    @contextmanager
+    def open(self, url, session=None):
+        with self.lock:
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            if url not in self.files:
+                raise IOError(f"404 {url}")
+            yield io.BytesIO(self.files[url])
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+class TestIterSitemap(unittest.TestCase):
+    def test_children_of_an_index_are_fetched_concurrently(self):
+        children = [f"https://ex.com/sm{i}.xml" for i in range(8)]
+        files = {"https://ex.com/sitemap.xml": _index(*children)}
+        for i, child in enumerate(children):
+            files[child] = _urlset((f"https://ex.com/{i}", "2024-01-01"), ("https://ex.com/shared", None))
+        site = _FakeSite(files, delay=0.2)
+        with patch.object(spider, "_open_sitemap", site.open):
+            started = time.monotonic()
+            pairs = list(spider.iter_sitemap("https://ex.com/sitemap.xml", workers=8))
+            elapsed = time.monotonic() - started
+        self.assertEqual(len(pairs), 9)                       # "shared" is yielded once
+        self.assertEqual(dict(pairs)["https://ex.com/3"], "2024-01-01")
+        self.assertEqual(site.max_active, 8)
+        self.assertLess(elapsed, 1.0)
+
+    def test_failed_child_is_skipped_but_explicit_root_failure_raises(self):
+        files = {"https://ex.com/sitemap.xml": _index("https://ex.com/gone.xml", "https://ex.com/ok.xml"),
+                 "https://ex.com/ok.xml": _urlset(("https://ex.com/a", None))}
+        site = _FakeSite(files)
+        with patch.object(spider, "_open_sitemap", site.open):
+            self.assertEqual(spider.sitemap_to_urls("https://ex.com/sitemap.xml"), ["https://ex.com/a"])
+            with self.assertRaises(IOError):
+                spider.sitemap_to_urls("https://ex.com/missing.xml")
+
+    def test_consumer_can_stop_early(self):
+        children = [f"https://ex.com/sm{i}.xml" for i in range(4)]
+        files = {"https://ex.com/sitemap.xml": _index(*children)}
+        for i, child in enumerate(children):
+            files[child] = _urlset(*[(f"https://ex.com/{i}/{j}", None) for j in range(2000)])
+        with patch.object(spider, "_open_sitemap", _FakeSite(files).open), \
+             patch.object(spider, "_QUEUED_BATCHES", 1):
+            walker = spider.iter_sitemap("https://ex.com/sitemap.xml", workers=4)
+            self.assertTrue(next(walker)[0].startswith("https://ex.com/"))
+            walker.close()
+
+    def test_open_sitemap_gunzips_by_content(self):
+        body = _urlset(("https://ex.com/a", None))
+        resp = MagicMock()
+        resp.raw = io.BytesIO(gzip.compress(body))
+        session = MagicMock()
+        session.get.return_value = resp
+        with spider._open_sitemap("https://ex.com/sitemap.xml.gz", session=session) as stream:
+            self.assertEqual(stream.read(), body)
+        self.assertTrue(session.get.call_args.kwargs["stream"])
+        resp.close.assert_called_once()
+
+
+if __name__ == "__main__":
+    unittest.main()
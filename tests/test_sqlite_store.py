@@ -0,0 +1,49 @@
+"""Tests for the shared base of the Indexer's SQLite stores (core/sqlite_store.py)."""
+import os
+import pickle
+import tempfile
+import unittest
+
+from core.sqlite_store import SQLiteStore
+
+
+class _Store(SQLiteStore):
+    SCHEMA_SQL = "CREATE TABLE IF NOT EXISTS items (k TEXT PRIMARY KEY);"
+
+    def _migrate(self, conn):
+        cols = {r[1] for r in conn.execute("PRAGMA table_info(items)").fetchall()}
+        if "v" not in cols:
+            conn.execute("ALTER TABLE items ADD COLUMN v TEXT")
+
+    def put(self, k, v):
+        with self._lock:
+            conn = self._connection()
+            conn.execute("INSERT OR REPLACE INTO items (k, v) VALUES (?, ?)", (k, v))
+            conn.commit()
+
+    def get(self, k):
+        with self._lock:
+            row = self._connection().execute("SELECT v FROM items WHERE k=?", (k,)).fetchone()
+        return row[0] if row else None
+
+
+class TestSQLiteStore(unittest.TestCase):
+    def test_opens_lazily_migrates_and_pickles(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sub", "store.db")
+            store = _Store(path)
+            self.assertFalse(os.path.exists(path))
+            store.put("a", "1")
+            self.assertEqual(store._connection().execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            clone = pickle.loads(pickle.dumps(store))
+            self.assertIsNone(clone._conn)
+            self.assertEqual(clone.get("a"), "1")
+            clone.put("b", "2")
+            self.assertEqual(store.get("b"), "2")
+            clone.close()
+            store.close()
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
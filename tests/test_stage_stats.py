@@ -0,0 +1,137 @@
+"""Tests for per-stage timing / byte / token counters (vectara.stage_stats, core/stage_stats.py)."""
+import pickle
+import sys
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
+sys.modules.setdefault('cairosvg', MagicMock())
+
+from core.models import _record_usage
+from core.stage_stats import (
+    DOCUMENT, IMAGE_SUMMARY, PARSE, StageStats, bind_scope, record_tokens, stage
+)
+from tests.indexer_factory import make_indexer
+from tests.loadtest.mock_vectara import MockServices, MockVectaraStore
+
+
+class TestStageStats(unittest.TestCase):
+    def test_nested_stage_is_subtracted_from_its_parent(self):
+        stats = StageStats()
+
+        def _document():
+            with stage(PARSE, bytes_in=100) as span:
+                time.sleep(0.05)
+                with stage(IMAGE_SUMMARY):
+                    time.sleep(0.05)
+                    with stage(IMAGE_SUMMARY) as inner:   # same stage: folded into the outer span
+                        inner.add(bytes_out=7)
+                        record_tokens(10, 3)
+                span.add(bytes_out=40)
+
+        stats.run_document(_document)
+        summary = stats.summary()
+        self.assertAlmostEqual(summary[PARSE]['seconds'], 0.05, delta=0.03)
+        self.assertAlmostEqual(summary[IMAGE_SUMMARY]['seconds'], 0.05, delta=0.03)
+        self.assertAlmostEqual(summary[DOCUMENT]['seconds'], 0.1, delta=0.04)
+        self.assertEqual((summary[PARSE]['bytes_in'], summary[PARSE]['bytes_out']), (100, 40))
+        self.assertEqual(summary[IMAGE_SUMMARY]['docs'], 1)
+        self.assertEqual(summary[IMAGE_SUMMARY]['bytes_out'], 7)
+        self.assertEqual((summary[IMAGE_SUMMARY]['tokens_in'], summary[IMAGE_SUMMARY]['tokens_out']), (10, 3))
+
+    def test_outside_a_document_stages_are_free_no_ops(self):
+        with stage(PARSE) as span:
+            span.add(bytes_in=1)
+            record_tokens(5, 5)
+        fn = lambda: None  # noqa: E731
+        self.assertIs(bind_scope(fn), fn)
+
+    def test_pool_threads_charge_tokens_to_the_callers_stage(self):
+        stats = StageStats()
+
+        def _document():
+            with stage(IMAGE_SUMMARY):
+                with ThreadPoolExecutor(4) as pool:
+                    list(pool.map(bind_scope(lambda _: record_tokens(2, 1)), range(8)))
+            with ThreadPoolExecutor(1) as pool:   # unbound work is not attributed
+                pool.submit(record_tokens, 100, 100).result()
+
+        stats.run_document(_document)
+        self.assertEqual(stats.summary()[IMAGE_SUMMARY]['tokens_in'], 16)
+
+    def test_percentiles_and_reservoir(self):
+        stats = StageStats(reservoir_size=50)
+        for i in range(200):
+            stats._fold({PARSE: [i / 1000.0, 0, 0, 0, 0]})
+        summary = stats.summary()[PARSE]
+        self.assertEqual(summary['docs'], 200)
+        self.assertAlmostEqual(summary['seconds'], sum(range(200)) / 1000.0, places=6)
+        self.assertLessEqual(summary['p50_ms'], summary['p99_ms'])
+        self.assertEqual(len(stats._samples[PARSE]), 50)
+        self.assertIn(PARSE, stats.format_summary())
+
+    def test_pickles(self):
+        stats = StageStats()
+        stats.run_document(lambda: stage(PARSE).end())
+        clone = pickle.loads(pickle.dumps(stats))
+        self.assertEqual(clone.documents(), 1)
+        self.assertIsInstance(clone._lock, type(threading.Lock()))
+
+    def test_llm_usage_is_read_per_provider(self):
+        stats = StageStats()
+        openai_resp = MagicMock()
+        openai_resp.usage.prompt_tokens, openai_resp.usage.completion_tokens = 11, 4
+        anthropic_resp = MagicMock()
+        anthropic_resp.usage.input_tokens, anthropic_resp.usage.output_tokens = 20, 5
+
+        def _document():
+            with stage(PARSE):
+                _record_usage(openai_resp, 'openai')
+                _record_usage(anthropic_resp, 'anthropic')
+                _record_usage(MagicMock(), 'private')   # no integer usage reported: ignored
+
+        stats.run_document(_document)
+        self.assertEqual((stats.summary()[PARSE]['tokens_in'], stats.summary()[PARSE]['tokens_out']), (31, 9))
+
+
+def _make_indexer(api_url, upload_threads=0):
+    return make_indexer(api_url, reindex=True, upload_threads=upload_threads, stage_stats=StageStats())
+
+
+def _doc(doc_id, text="hello"):
+    return {'id': doc_id, 'type': 'structured', 'metadata': {'title': doc_id},
+            'sections': [{'text': text}]}
+
+
+class TestIndexerStageStats(unittest.TestCase):
+    def test_build_upload_and_conflict_retry_are_counted(self):
+        with MockServices(MockVectaraStore(), num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url)
+            self.assertTrue(ix.index_document(_doc("a")))
+            self.assertTrue(ix.index_document(_doc("a", "changed")))   # 409 -> delete + retry
+        summary = ix.stage_summary()
+        self.assertEqual(summary[DOCUMENT]['docs'], 2)
+        self.assertEqual(summary['document_build']['docs'], 2)
+        self.assertGreater(summary['upload']['bytes_out'], 0)
+        self.assertEqual(summary['conflict_retry']['docs'], 1)
+
+    def test_queued_uploads_still_count(self):
+        with MockServices(MockVectaraStore(), num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url, upload_threads=2)
+            for i in range(3):
+                self.assertTrue(ix.index_segments(f"d{i}", texts=[f"text {i}"], doc_title="t"))
+            ix.wait_for_uploads()
+        summary = ix.stage_summary()
+        self.assertEqual(summary[DOCUMENT]['docs'], 3)
+        self.assertEqual(summary['upload']['docs'], 3)
+
+    def test_disabled_is_empty(self):
+        ix = _make_indexer("http://127.0.0.1:9")
+        ix.stage_stats = None
+        self.assertEqual(ix.stage_summary(), {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,156 @@
+"""Tests for the crash-safe upload outbox (vectara.upload_outbox, core/upload_outbox.py)."""
+import json
+import os
+import pickle
+import sqlite3
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+sys.modules.setdefault('cairosvg', MagicMock())
+
+from core.json_stream import Base64Bytes, StreamingJSONBody
+from core.upload_outbox import UploadOutbox
+from core.utils import create_session_with_retries
+from tests.indexer_factory import make_indexer
+from tests.loadtest.mock_vectara import MockServices, MockVectaraStore
+
+
+class TestUploadOutbox(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.tmp.name, "upload_outbox.db")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_put_remove_and_corpus_scoping(self):
+        outbox = UploadOutbox(self.db_path, "c1", "folder")
+        other = UploadOutbox(self.db_path, "c2", "folder")
+        outbox.put("a", '{"id": "a"}')
+        outbox.put("b", b'{"id": "b"}')
+        outbox.put("a", '{"id": "a", "v": 2}')
+        other.put("a", '{"id": "other"}')
+        self.assertEqual(outbox.count(), 2)
+        self.assertEqual({d: b for d, b, _ in outbox.pending()}["a"], b'{"id": "a", "v": 2}')
+        outbox.remove("a")
+        self.assertEqual([d for d, _, _ in outbox.pending()], ["b"])
+        self.assertEqual(other.count(), 1)
+        outbox.close()
+        other.close()
+
+    def test_streaming_body_is_written_in_place(self):
+        outbox = UploadOutbox(self.db_path, "c1")
+        body = StreamingJSONBody({'id': 'img', 'images': [Base64Bytes(b"\x01" * 100000)]}, chunk_size=4096)
+        outbox.put("img", body)
+        self.assertEqual({d: b for d, b, _ in outbox.pending()}["img"], b"".join(body))
+
+    def test_metadata_is_kept_beside_the_body(self):
+        # An outbox from before the metadata column gets it on open
+        conn = sqlite3.connect(self.db_path)
+        conn.execute("CREATE TABLE outbox (corpus_key TEXT NOT NULL, doc_id TEXT NOT NULL, crawler_type TEXT NOT NULL,"
+                     " body BLOB NOT NULL, attempts INTEGER NOT NULL DEFAULT 0,"
+                     " created_at TEXT NOT NULL DEFAULT (datetime('now')), PRIMARY KEY (corpus_key, doc_id))")
+        conn.execute("INSERT INTO outbox (corpus_key, doc_id, crawler_type, body) VALUES ('c1', 'old', '', '{}')")
+        conn.commit()
+        conn.close()
+        outbox = UploadOutbox(self.db_path, "c1")
+        outbox.put("new", "{}", {"url": "https://ex.com/new", "title": "New"})
+        self.assertEqual({d: m for d, _, m in outbox.pending()},
+                         {"old": None, "new": {"url": "https://ex.com/new", "title": "New"}})
+        outbox.close()
+
+    def test_pickles_without_connection_and_survives_reopen(self):
+        outbox = UploadOutbox(self.db_path, "c1")
+        outbox.put("a", "{}")
+        clone = pickle.loads(pickle.dumps(outbox))
+        self.assertEqual(clone.count(), 1)
+        outbox.close()
+        self.assertEqual(UploadOutbox(self.db_path, "c1").count(), 1)
+
+
+def _make_indexer(api_url, outbox):
+    return make_indexer(api_url, session=create_session_with_retries(retries=0), upload_outbox=outbox)
+
+
+def _doc(doc_id):
+    return {'id': doc_id, 'type': 'structured', 'metadata': {'title': doc_id},
+            'sections': [{'text': f"text of {doc_id}"}]}
+
+
+class TestIndexerOutbox(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.outbox = UploadOutbox(os.path.join(self.tmp.name, "upload_outbox.db"), "c", "test")
+
+    def tearDown(self):
+        self.outbox.close()
+        self.tmp.cleanup()
+
+    def test_accepted_and_rejected_documents_leave_the_outbox(self):
+        store = MockVectaraStore(max_document_bytes=200)
+        with MockServices(store, num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url, self.outbox)
+            self.assertTrue(ix.index_document(_doc("ok")))
+            big = _doc("big")
+            big['sections'][0]['text'] = "x" * 1000
+            self.assertFalse(ix.index_document(big))   # 400: permanent, nothing to replay
+        self.assertEqual(self.outbox.count(), 0)
+
+    def test_unreachable_api_keeps_document_and_drain_replays_it(self):
+        ix = _make_indexer("http://127.0.0.1:9", self.outbox)
+        self.assertFalse(ix.index_document(_doc("d1")))
+        self.assertEqual(self.outbox.count(), 1)
+
+        store = MockVectaraStore()
+        with MockServices(store, num_pages=1) as services:
+            ix = _make_indexer(services.vectara_url, self.outbox)
+            self.assertEqual(ix.drain_outbox(), ["d1"])
+        self.assertEqual(self.outbox.count(), 0)
+        self.assertEqual(store.documents("c")["d1"]['metadata'], {'title': 'd1'})
+
+    def test_queued_documents_are_in_the_outbox_before_they_are_posted(self):
+        ix = _make_indexer("http://127.0.0.1:9", self.outbox)
+        ix.upload_threads, ix.upload_queue_size = 1, None
+        release = threading.Event()
+
+        def _stuck_send(document, data):
+            release.wait(10)
+            return False, None, "connection error"
+
+        ix._send_document = _stuck_send
+        for doc_id in ("d1", "d2", "d3"):
+            self.assertTrue(ix._enqueue_document(_doc(doc_id), None, {'use_core_indexing': False}))
+        # The run dies here: one upload in flight, two never started. The next run's outbox has all three.
+        after_crash = UploadOutbox(self.outbox.db_path, "c")
+        self.assertEqual(sorted(d for d, _, _ in after_crash.pending()), ["d1", "d2", "d3"])
+        after_crash.close()
+        release.set()
+        ix.wait_for_uploads()
+        self.assertEqual(self.outbox.count(), 3)   # transient failures stay for the replay
+
+    def test_drain_records_the_stored_metadata_in_the_manifest(self):
+        ix = _make_indexer("http://127.0.0.1:9", self.outbox)
+        ix.manifest_store = MagicMock()
+        # The body is not parsed: the manifest gets the metadata column
+        self.outbox.put("d1", b"not json", {'title': 'd1', 'url': 'https://ex.com/d1'})
+        ix._send_document = MagicMock(return_value=(True, 201, None))
+        self.assertEqual(ix.drain_outbox(), ["d1"])
+        ix._send_document.assert_called_once_with({'id': 'd1', 'metadata': {'title': 'd1', 'url': 'https://ex.com/d1'}},
+                                                  b"not json")
+
+    def test_drain_keeps_documents_on_transient_failure(self):
+        self.outbox.put("d1", json.dumps(_doc("d1")))
+        ix = _make_indexer("http://127.0.0.1:9", self.outbox)
+        self.assertEqual(ix.drain_outbox(), [])
+        self.assertEqual(self.outbox.count(), 1)
+
+    def test_disabled_outbox_is_a_no_op(self):
+        ix = _make_indexer("http://127.0.0.1:9", None)
+        self.assertEqual(ix.drain_outbox(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
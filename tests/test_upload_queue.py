@@ -0,0 +1,181 @@
+"""Tests for the pipelined background upload queue (vectara.upload_threads).
+
+With upload_threads > 0, index_segments / _index_file return as soon as the built
+document is queued; the POST runs on an uploader thread and its outcome is reported
+through an UploadTicket. These tests pin down the queue mechanics, the Indexer's
+queued paths (including the split_oversized retry and file staging), and the crawler
+workers' deferred tracking.
+"""
+import os
+import sys
+import tempfile
+import threading
+import unittest
+from unittest.mock import MagicMock
+
+sys.modules.setdefault('cairosvg', MagicMock())
+
+from core.document_builder import MAX_SECTION_CHARS
+from core.upload_queue import UploadQueue, UploadTicket
+from tests.indexer_factory import make_indexer
+
+
+def _make_indexer(upload_threads=2):
+    return make_indexer(corpus_key="test_corpus", session=MagicMock(), upload_threads=upload_threads,
+                        upload_queue_size=None, upload_queue=None, _upload_ticket=None)
+
+
+class TestUploadQueue(unittest.TestCase):
+    def test_runs_jobs_and_counts_outcomes(self):
+        q = UploadQueue(num_threads=2)
+        futures = [q.submit(lambda: (True, None)), q.submit(lambda: (False, "boom"))]
+        q.close()
+        self.assertEqual([f.result() for f in futures], [(True, None), (False, "boom")])
+        stats = q.stats()
+        self.assertEqual((stats['submitted'], stats['succeeded'], stats['failed']), (2, 1, 1))
+
+    def test_exception_in_job_becomes_failure(self):
+        q = UploadQueue(num_threads=1)
+        def _raise():
+            raise RuntimeError("connection reset")
+        ok, error = q.submit(_raise).result()
+        q.close()
+        self.assertFalse(ok)
+        self.assertIn("connection reset", error)
+
+    def test_submit_blocks_when_queue_is_full(self):
+        q = UploadQueue(num_threads=1, max_pending=1)
+        release = threading.Event()
+        q.submit(lambda: (release.wait(5), None))
+
+        second_submitted = threading.Event()
+        def _producer():
+            q.submit(lambda: (True, None))
+            second_submitted.set()
+        t = threading.Thread(target=_producer)
+        t.start()
+        # The only slot is held by the first (blocked) upload.
+        self.assertFalse(second_submitted.wait(0.2))
+        release.set()
+        self.assertTrue(second_submitted.wait(5))
+        t.join()
+        q.close()
+
+
+class TestUploadTicket(unittest.TestCase):
+    def test_empty_ticket_is_done(self):
+        ticket = UploadTicket("a.pdf")
+        self.assertEqual(len(ticket), 0)
+        self.assertTrue(ticket.done())
+        self.assertTrue(ticket.wait())
+
+    def test_ticket_aggregates_outcomes(self):
+        q = UploadQueue(num_threads=2)
+        ticket = UploadTicket("a.pdf")
+        ticket.add("doc-1", q.submit(lambda: (True, None)))
+        ticket.add("doc-2", q.submit(lambda: (False, "upload returned HTTP 400: bad")))
+        q.close()
+        self.assertFalse(ticket.wait())
+        self.assertEqual(ticket.errors(), ["doc-2: upload returned HTTP 400: bad"])
+
+
+class TestIndexerQueuedUploads(unittest.TestCase):
+    def test_index_segments_queues_and_reports_through_ticket(self):
+        ix = _make_indexer()
+        ix.session.post.return_value = MagicMock(status_code=201)
+        with ix.upload_ticket("https://example.test/p") as ticket:
+            ok = ix.index_segments(doc_id="doc1", texts=["hello world"],
+                                   metadatas=[{'element_type': 'text'}],
+                                   doc_metadata={'url': 'https://example.test/p'}, doc_title="Page")
+        self.assertTrue(ok)
+        self.assertEqual(ticket.doc_ids, ["doc1"])
+        self.assertTrue(ticket.wait())
+        ix.wait_for_uploads()
+        ix.session.post.assert_called_once()
+
+    def test_failed_upload_surfaces_on_ticket_not_return_value(self):
+        ix = _make_indexer()
+        ix.session.post.return_value = MagicMock(status_code=403, text="forbidden")
+        with ix.upload_ticket("u") as ticket:
+            ok = ix.index_segments(doc_id="doc1", texts=["hello"],
+                                   metadatas=[{'element_type': 'text'}],
+                                   doc_metadata={'url': 'https://example.test/p'})
+        self.assertTrue(ok)  # queued
+        self.assertFalse(ticket.wait())
+        self.assertIn("403", ticket.errors()[0])
+        stats = ix.wait_for_uploads()
+        self.assertEqual(stats['failed'], 1)
+
+    def test_oversized_400_retry_runs_on_uploader_thread(self):
+        ix = _make_indexer()
+        ix.delete_doc = MagicMock(return_value=True)
+        ix.session.post.side_effect = [MagicMock(status_code=400, text="too big"),
+                                       MagicMock(status_code=201)]
+        with ix.upload_ticket("u") as ticket:
+            ix.index_segments(doc_id="doc2", texts=["a" * (MAX_SECTION_CHARS + 5000)],
+                              metadatas=[{'element_type': 'text'}],
+                              doc_metadata={'url': 'https://example.test/p'})
+        self.assertTrue(ticket.wait())
+        self.assertEqual(ix.session.post.call_count, 2)
+        ix.delete_doc.assert_called_once_with("doc2")
+        ix.wait_for_uploads()
+
+    def test_synchronous_when_upload_threads_is_zero(self):
+        ix = _make_indexer(upload_threads=0)
+        ix.session.post.return_value = MagicMock(status_code=500, text="oops")
+        with ix.upload_ticket("u") as ticket:
+            ok = ix.index_segments(doc_id="doc1", texts=["hello"],
+                                   metadatas=[{'element_type': 'text'}],
+                                   doc_metadata={'url': 'https://example.test/p'})
+        self.assertFalse(ok)
+        self.assertEqual(len(ticket), 0)
+        self.assertIsNone(ix.upload_queue)
+
+    def test_queued_file_upload_survives_caller_deleting_the_file(self):
+        ix = _make_indexer()
+        fd, path = tempfile.mkstemp(suffix=".pdf")
+        with os.fdopen(fd, 'wb') as f:
+            f.write(b"%PDF-1.4 stub")
+
+        release = threading.Event()
+        uploaded = []
+        def _request(method, url, headers=None, files=None):
+            release.wait(5)
+            uploaded.append(files['file'][1].read())
+            return MagicMock(status_code=201)
+        ix.session.request.side_effect = _request
+
+        with ix.upload_ticket(path) as ticket:
+            self.assertTrue(ix._index_file(path, uri="https://example.test/a.pdf", metadata={}))
+        os.unlink(path)   # e.g. index_url's safe_remove_file of a temp download
+        release.set()
+        self.assertTrue(ticket.wait())
+        self.assertEqual(uploaded, [b"%PDF-1.4 stub"])
+        ix.wait_for_uploads()
+
+
+class TestFileCrawlWorkerDeferredTracking(unittest.TestCase):
+    def test_queued_file_is_resolved_by_collect_uploads(self):
+        from crawlers.folder_crawler import FileCrawlWorker
+
+        ix = _make_indexer()
+        ix.session.post.return_value = MagicMock(status_code=201)
+        worker = FileCrawlWorker(ix.cfg, {}, ix, 1)
+
+        def _index_file(filename, uri, metadata, id=None, prior_fingerprint=None):
+            return ix.index_segments(doc_id=id, texts=["body"], metadatas=[{'element_type': 'text'}],
+                                     doc_metadata={})
+        ix.index_file = _index_file
+        ix.was_skipped = MagicMock(return_value=False)
+
+        result = worker.process("/data/a.txt", "a.txt", {})
+        self.assertEqual(result, FileCrawlWorker.RESULT_QUEUED)
+        finished = worker.collect_uploads(wait=True)
+        self.assertEqual(len(finished), 1)
+        self.assertEqual(finished[0][:3], ("/data/a.txt", "a.txt", FileCrawlWorker.RESULT_INDEXED))
+        self.assertEqual(worker.collect_uploads(wait=True), [])
+        ix.wait_for_uploads()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,121 @@
+"""Tests for conditional re-crawls (core/validator_store.py, Indexer.index_url, WebContentExtractor)."""
+
+import importlib.machinery
+import os
+import pickle
+import sys
+import tempfile
+import unittest
+from unittest.mock import MagicMock, patch
+
+for _mod in ["cairosvg", "whisper", "pdf2image"]:
+    sys.modules.setdefault(_mod, MagicMock())
+_pw_mock = MagicMock()
+_pw_mock.__spec__ = importlib.machinery.ModuleSpec("playwright", None)
+sys.modules.setdefault("playwright", _pw_mock)
+sys.modules.setdefault("playwright.sync_api", MagicMock())
+
+from core.incremental import compute_fingerprint, content_hash_from_text  # noqa: E402
+from core.validator_store import ValidatorStore, conditional_headers, response_validators  # noqa: E402
+
+_TEXT = "Release notes for version 2. " * 40
+_VALIDATORS = {"etag": '"v2"', "last_modified": "Tue, 06 Oct 2026 10:00:00 GMT"}
+
+
+class TestValidatorStore(unittest.TestCase):
+    def test_headers_round_trip(self):
+        validators = response_validators({"etag": '"v2"', "last-modified": _VALIDATORS["last_modified"]})
+        self.assertEqual(validators, _VALIDATORS)
+        self.assertEqual(conditional_headers(validators),
+                         {"If-None-Match": '"v2"', "If-Modified-Since": _VALIDATORS["last_modified"]})
+        self.assertIsNone(response_validators({"content-type": "text/html"}))
+        self.assertEqual(conditional_headers(None), {})
+
+    def test_shared_through_the_file_and_scoped_by_corpus(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "out", "http_validators.db")
+            store = ValidatorStore(db_path, "corpus")
+            store.put("https://ex.com/a", _VALIDATORS, "h1", {"url": "https://ex.com/a"}, "sig")
+            worker = pickle.loads(pickle.dumps(store))
+            self.assertEqual(worker.get("https://ex.com/a"),
+                             dict(_VALIDATORS, content_hash="h1", page_metadata={"url": "https://ex.com/a"},
+                                  fetch_sig="sig"))
+            worker.put("https://ex.com/a", {"etag": '"v3"'}, "h2", {"url": "https://ex.com/a"}, "sig")
+            self.assertEqual(store.get("https://ex.com/a")["etag"], '"v3"')
+            self.assertIsNone(ValidatorStore(db_path, "other").get("https://ex.com/a"))
+            store.close()
+            worker.close()
+
+
+class TestIndexUrlConditionalFetch(unittest.TestCase):
+    def setUp(self):
+        from core.indexer import Indexer
+
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        ix = Indexer.__new__(Indexer)
+        ix.last_skip_reason = None
+        ix.verbose = False
+        ix.parse_tables = False
+        ix.remove_code = True
+        ix.process_locally = False
+        ix.add_image_bytes = False
+        ix.incremental = True
+        ix.config_sig = "cfg"
+        ix.source_tag = "website"
+        ix.validator_store = ValidatorStore(os.path.join(tmp.name, "http_validators.db"), "corpus")
+        self.addCleanup(ix.validator_store.close)
+        self.ix = ix
+        self.url = "https://ex.com/notes"
+        # The fingerprint the first run stamped into the corpus
+        self.fingerprint = compute_fingerprint(content_hash_from_text(_TEXT), {"url": self.url}, "cfg")
+
+    def _first_fetch(self):
+        # No validators stored yet: a full fetch, which records them (and skips on the fingerprint)
+        self.ix.fetch_url = MagicMock(return_value={"type": "html", "url": self.url, "html": "<p></p>",
+                                                    "text": _TEXT, "title": "Notes", "validators": _VALIDATORS})
+        self.assertTrue(self.ix.index_url(self.url, metadata={"url": self.url}, prior_fingerprint=self.fingerprint))
+        self.assertIsNone(self.ix.fetch_url.call_args.kwargs["validators"])
+
+    def test_not_modified_page_is_skipped(self):
+        self._first_fetch()
+        self.ix.fetch_url = MagicMock(return_value={"type": "not_modified", "url": self.url})
+        self.assertTrue(self.ix.index_url(self.url, metadata={"url": self.url}, prior_fingerprint=self.fingerprint))
+        self.assertEqual(self.ix.fetch_url.call_args.kwargs["validators"]["etag"], '"v2"')
+        self.assertEqual(self.ix.last_skip_reason, "unchanged")
+        self.assertTrue(self.ix.was_skipped())
+
+    def test_no_validators_when_fingerprint_would_differ(self):
+        self._first_fetch()
+        self.ix.fetch_url = MagicMock(return_value={"type": "not_modified", "url": self.url})
+        # Source metadata changed since the page was indexed
+        self.ix.index_url(self.url, metadata={"url": self.url, "lang": "fr"}, prior_fingerprint=self.fingerprint)
+        self.assertIsNone(self.ix.fetch_url.call_args.kwargs["validators"])
+        # Extraction options changed
+        self.ix.index_url(self.url, metadata={"url": self.url}, html_processing={"tags_to_remove": ["nav"]},
+                          prior_fingerprint=self.fingerprint)
+        self.assertIsNone(self.ix.fetch_url.call_args.kwargs["validators"])
+
+
+class TestWebContentExtractorConditionalGet(unittest.TestCase):
+    def _response(self, status, headers=None):
+        resp = MagicMock(status_code=status, ok=status < 400, url="https://ex.com/notes",
+                         headers=headers or {}, content=b"")
+        return resp
+
+    def test_304_is_not_modified_without_rendering(self):
+        from omegaconf import OmegaConf
+        from core.web_content_extractor import WebContentExtractor
+
+        extractor = WebContentExtractor(OmegaConf.create({"vectara": {}}))
+        extractor._render = MagicMock(side_effect=AssertionError("a 304 is never rendered"))
+        with patch("core.web_content_extractor.requests.get", return_value=self._response(304)) as get:
+            result = extractor.fetch_url("https://ex.com/notes", validators=_VALIDATORS)
+        self.assertEqual(result, {"type": "not_modified", "url": "https://ex.com/notes"})
+        headers = get.call_args.kwargs["headers"]
+        self.assertEqual((headers["If-None-Match"], headers["If-Modified-Since"]),
+                         ('"v2"', _VALIDATORS["last_modified"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -10,10 +10,14 @@ local envs), so it is stubbed here — the real rasterization is covered by the
 end-to-end Docker run. These tests assert the branching logic: SVG goes through
 svg2png, raster is read as-is.
 """
+import io
 import sys
 import tempfile
+import threading
+import time
 import unittest
-from unittest.mock import MagicMock
+from types import SimpleNamespace
+from unittest.mock import MagicMock, patch
 
 PNG_MAGIC = b'\x89PNG\r\n\x1a\n'
 # A minimal valid 1x1 PNG, used as the stubbed svg2png output and the raster input.
@@ -54,5 +58,65 @@ class TestReadRenderableImageBytes(unittest.TestCase):
         self.assertEqual(data, _TINY_PNG)
 
 
+def _png_bytes(size):
+    from PIL import Image
+    buf = io.BytesIO()
+    Image.new("RGB", (size, size), "white").save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class TestProcessWebImages(unittest.TestCase):
+    def _processor(self, files, summaries, delay=0.0):
+        from omegaconf import OmegaConf
+
+        cfg = OmegaConf.create({"vectara": {}, "doc_processing": {"summarization_workers": 4}})
+        self.active = self.max_active = 0
+        lock = threading.Lock()
+
+        def _get(image_url, **kwargs):
+            with lock:
+                self.active += 1
+                self.max_active = max(self.max_active, self.active)
+            # later images answer sooner, so completion order differs from page order
+            time.sleep(delay * (len(files) - list(files).index(image_url)))
+            with lock:
+                self.active -= 1
+            body = files[image_url]
+            return SimpleNamespace(status_code=200 if body else 404, reason="", content=body or b"")
+
+        session = MagicMock()
+        session.get.side_effect = _get
+        processor = ImageProcessor(cfg, {"vision": {"provider": "openai"}}, session=session)
+        summarizer = MagicMock()
+        summarizer.summarize_image.side_effect = lambda path, image_url, prev, image_bytes=None: summaries.get(image_url)
+        processor.image_summarizer = summarizer
+        return processor
+
+    def test_images_are_processed_concurrently_in_page_order(self):
+        files = {f"https://ex.com/{i}.png": _png_bytes(128) for i in range(8)}
+        summaries = {u: f"summary of {u}" for u in files}
+        processor = self._processor(files, summaries, delay=0.05)
+        images = [{"src": u, "alt": ""} for u in files]
+        processed, image_bytes = processor.process_web_images(images, "https://ex.com/page", {"lang": "en"})
+        self.assertEqual([s for _, s, _ in processed], [summaries[u] for u in files])
+        self.assertEqual([m["image_id"] for _, _, m in processed], [i for i, _ in image_bytes])
+        self.assertEqual(processed[3][0], "https-ex-com-page_image_3")
+        self.assertEqual(processed[0][2]["lang"], "en")
+        self.assertEqual(self.max_active, 4)
+
+    def test_small_missing_and_unsummarized_images(self):
+        files = {"https://ex.com/icon.png": _png_bytes(8), "https://ex.com/gone.png": None,
+                 "https://ex.com/chart.png": _png_bytes(128), "https://ex.com/logo.svg": b"<svg xmlns='x'/>"}
+        processor = self._processor(files, {"https://ex.com/logo.svg": "a logo"})
+        with patch.object(_cairosvg_stub, "svg2png", return_value=_TINY_PNG) as svg2png:
+            processed, image_bytes = processor.process_web_images(
+                [{"src": u} for u in files], "https://ex.com/page", {})
+        svg2png.assert_called_once_with(bytestring=b"<svg xmlns='x'/>")
+        self.assertEqual([(d, s) for d, s, _ in processed], [("https-ex-com-page_image_3", "a logo")])
+        # The chart has no summary but its bytes are still kept; the icon and 404 are dropped
+        self.assertEqual([i for i, _ in image_bytes], ["web_https-ex-com-page_image_2", "web_https-ex-com-page_image_3"])
+        self.assertEqual(image_bytes[1][1], _TINY_PNG)
+
+
 if __name__ == "__main__":
     unittest.main()
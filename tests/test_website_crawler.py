@@ -45,7 +45,7 @@ class TestRemoveOldContentEncoding(unittest.TestCase):
     def _run(self, crawled_urls, existing_docs):
         fake_indexer = MagicMock()
         fake_indexer._list_docs.return_value = existing_docs
-        fake_indexer.delete_doc.return_value = True
+        fake_indexer.delete_docs.side_effect = lambda ids: {i: True for i in ids}
         # Use __new__ so the real _ensure_manifest/_remove_old_content_if_needed methods are
         # available; set the incremental-state attributes that __init__ would normally set.
         fake_self = WebsiteCrawler.__new__(WebsiteCrawler)
@@ -56,7 +56,7 @@ class TestRemoveOldContentEncoding(unittest.TestCase):
         fake_self._manifest = None
         fake_self._crawl_interrupted = False
         WebsiteCrawler._remove_old_content_if_needed(fake_self, crawled_urls)
-        return [c.args[0] for c in fake_indexer.delete_doc.call_args_list]
+        return [i for c in fake_indexer.delete_docs.call_args_list for i in c.args[0]]
 
     def test_percent_encoded_discovery_matches_decoded_corpus_url(self):
         # Same logical URL, discovery percent-encoded, corpus URL-decoded.
@@ -112,7 +112,7 @@ class TestRemoveOldContentEncoding(unittest.TestCase):
         )
         WebsiteCrawler._remove_old_content_if_needed(fake_self, [])
         fake_indexer._list_docs.assert_not_called()
-        fake_indexer.delete_doc.assert_not_called()
+        fake_indexer.delete_docs.assert_not_called()
 
 
 def _google_auth_cfg(credentials_file=None, pages_source="crawl"):
@@ -351,9 +351,9 @@ class TestRayShutdownOnFailure(unittest.TestCase):
 
     def test_ray_shutdown_called_when_dispatch_raises(self):
         fake_self = self._fake_self()
-        with patch("crawlers.website_crawler.ray") as mock_ray:
-            # The actor pool blows up mid-crawl (e.g. a worker task error).
-            mock_ray.util.ActorPool.return_value.map.side_effect = RuntimeError("worker died")
+        with patch("crawlers.website_crawler.ray") as mock_ray, \
+             patch("crawlers.website_crawler.stream_actor_tasks",
+                   side_effect=RuntimeError("worker died")):   # a worker task error mid-crawl
             with self.assertRaises(RuntimeError):
                 WebsiteCrawler._dispatch_to_ray_workers(
                     fake_self, ["https://example.com/a"], ray_workers=2,
@@ -362,13 +362,100 @@ class TestRayShutdownOnFailure(unittest.TestCase):
 
     def test_ray_shutdown_called_on_happy_path(self):
         fake_self = self._fake_self()
-        with patch("crawlers.website_crawler.ray") as mock_ray:
-            mock_ray.util.ActorPool.return_value.map.return_value = []
+        with patch("crawlers.website_crawler.ray") as mock_ray, \
+             patch("crawlers.website_crawler.stream_actor_tasks", return_value=iter([])):
             WebsiteCrawler._dispatch_to_ray_workers(
                 fake_self, ["https://example.com/a"], ray_workers=2,
                 num_per_second=1, source="website")
             mock_ray.shutdown.assert_called_once()
 
 
+class TestPipelinedDiscovery(unittest.TestCase):
+    """pipeline_discovery: sitemap URLs reach the worker while discovery is still running, and
+    old content is only removed once discovery has completed."""
+
+    def _fake_self(self, **settings):
+        values = {"pipeline_discovery": True, "pages_source": "sitemap", "remove_old_content": True,
+                  "deletion_safety_ratio": 0.0, "incremental": True, **settings}
+        fake_self = WebsiteCrawler.__new__(WebsiteCrawler)
+        fake_self.cfg = SimpleNamespace(
+            website_crawler=SimpleNamespace(urls=["https://ex.com"], get=lambda k, d=None: values.get(k, d)),
+            vectara=SimpleNamespace(get=lambda key, default=None: default),
+        )
+        fake_self.indexer = MagicMock()
+        fake_self.indexer._list_docs.return_value = []
+        fake_self.indexer.config_sig = "sig"
+        fake_self.incremental = values["incremental"]
+        fake_self.source = "website"
+        fake_self.tracker = None
+        fake_self.saml_session = fake_self.google_cookies = fake_self.google_storage_state_path = None
+        fake_self._sitemap_lastmod = {}
+        fake_self._manifest = None
+        fake_self._crawl_interrupted = False
+        fake_self.check_shutdown = MagicMock()
+        return fake_self
+
+    def _run(self, fake_self, sitemap):
+        processed = []
+
+        class _Worker:
+            def __init__(self, cfg, num_per_second, prior_fingerprints, sitemap_lastmods, rate_limiter):
+                pass
+
+            def setup(self):
+                pass
+
+            def process_batch(self, urls, source, lastmods=None):
+                processed.append((list(urls), dict(lastmods), list(events)))
+                return [0] * len(urls)
+
+            def collect_uploads(self, wait=False):
+                return []
+
+            def cleanup(self):
+                pass
+
+        events = []
+
+        def _iter_sitemap(url, session=None, workers=None):
+            for loc, lastmod in sitemap:
+                events.append(loc)
+                yield loc, lastmod
+            events.append("done")
+
+        with patch("crawlers.website_crawler.iter_sitemap", side_effect=_iter_sitemap), \
+             patch("crawlers.website_crawler.PageCrawlWorker", _Worker), \
+             patch("crawlers.website_crawler.create_host_rate_limiter", return_value=None):
+            fake_self.crawl()
+        return processed
+
+    def test_urls_are_indexed_while_discovery_runs(self):
+        fake_self = self._fake_self()
+        fake_self.indexer.delete_docs.return_value = {}
+        processed = self._run(fake_self, [("https://ex.com/a", "2024-01-01"), ("https://ex.com/a", None),
+                                          ("https://ex.com/b", None), ("https://other.com/x.png", None)])
+        self.assertEqual([urls for urls, _, _ in processed], [["https://ex.com/a"], ["https://ex.com/b"]])
+        # The first page was handed over before the sitemap had been read to the end
+        self.assertNotIn("done", processed[0][2])
+        self.assertEqual(processed[0][1], {"https://ex.com/a": "2024-01-01"})
+        self.assertFalse(fake_self._crawl_interrupted)
+
+    def test_failed_discovery_deletes_nothing(self):
+        fake_self = self._fake_self()
+        fake_self.indexer._list_docs.return_value = [
+            {"id": "old", "metadata": {"url": "https://ex.com/old", "source": "website"}}]
+
+        def _broken(url, session=None, workers=None):
+            yield "https://ex.com/a", None
+            raise RuntimeError("sitemap fetch died")
+
+        with patch("crawlers.website_crawler.iter_sitemap", side_effect=_broken), \
+             patch("crawlers.website_crawler.PageCrawlWorker"), \
+             patch("crawlers.website_crawler.create_host_rate_limiter", return_value=None), \
+             self.assertRaises(RuntimeError):
+            fake_self.crawl()
+        fake_self.indexer.delete_docs.assert_not_called()
+
+
 if __name__ == "__main__":
     unittest.main()